@@ -0,0 +1,24 @@
+"""
+Admin configuration for ai_services app
+"""
+from django.contrib import admin
+from .models import AIJob, ConsiliumRun
+
+
+@admin.register(AIJob)
+class AIJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'status', 'user', 'created_at', 'finished_at']
+    list_filter = ['kind', 'status', 'created_at']
+    search_fields = ['id', 'user__phone']
+    readonly_fields = ['created_at', 'started_at', 'finished_at']
+    date_hierarchy = 'created_at'
+
+
+@admin.register(ConsiliumRun)
+class ConsiliumRunAdmin(admin.ModelAdmin):
+    list_display = ['session_id', 'stage', 'user', 'blob_size', 'created_at', 'updated_at']
+    list_filter = ['stage', 'created_at']
+    search_fields = ['session_id', 'user__phone']
+    readonly_fields = ['created_at', 'updated_at']
+    exclude = ['blob']
+    date_hierarchy = 'created_at'
@@ -0,0 +1,236 @@
+"""
+Agent fan-out uchun umumiy, chegaralangan executor (process-wide).
+
+Har bir konsilium o'z ThreadPoolExecutor'ini yaratish o'rniga shu poolga topshiriladi:
+  - max_workers : worker ichidagi agent threadlari soni (settings.AI_POOL_WORKERS)
+  - max_queue   : kutayotgan + bajarilayotgan vazifalar chegarasi (settings.AI_POOL_MAX_QUEUE)
+  - fairness    : tenant (klinika) bo'yicha alohida navbat, round-robin  -  bitta klinikaning
+                  konsilium to'lqini boshqalarini bo'g'ib qo'ymaydi
+  - backpressure: pool to'lsa PoolSaturated(retry_after) ko'tariladi -> view 429 qaytaradi
+
+Threadlar birinchi submit'da ishga tushadi va PID tekshiriladi (gunicorn preload_app=True
+fork'idan keyin master threadlari workerga o'tmaydi).
+"""
+
+from __future__ import annotations
+
+import contextvars
+import functools
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, CancelledError, Future, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Iterator
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PoolSaturated(RuntimeError):
+    """Pool navbati to'la. retry_after  -  taxminiy kutish (soniya)."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"AI agent pool band, {retry_after}s dan keyin qayta urinib ko'ring")
+        self.retry_after = retry_after
+
+
+@dataclass
+class _Task:
+    future:      Future
+    fn:          Callable[[], Any]
+    enqueued_at: float
+
+
+class FairExecutor:
+    """Tenant bo'yicha round-robin navbatli, chegaralangan thread pool."""
+
+    def __init__(self, max_workers: int, max_queue: int, name: str = "agent-pool"):
+        self.max_workers = max(1, max_workers)
+        self.max_queue   = max(self.max_workers, max_queue)
+        self.name        = name
+        self._cond       = threading.Condition()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pid = os.getpid()
+        self._queues: OrderedDict[Hashable, deque[_Task]] = OrderedDict()
+        self._threads: list[threading.Thread] = []
+        self._pending = 0     # navbatda
+        self._running = 0     # bajarilmoqda
+        self._avg_task_sec = 10.0
+        self._stats = {
+            "submitted": 0, "rejected": 0, "completed": 0, "cancelled": 0,
+            "queue_wait_ms_total": 0, "queue_wait_ms_max": 0,
+        }
+
+    # ------------------------------------------------------------------ workers
+
+    def _ensure_started(self) -> None:
+        # self._cond ostida chaqiriladi
+        if self._pid != os.getpid():
+            self._reset()
+        while len(self._threads) < self.max_workers:
+            t = threading.Thread(
+                target=self._worker, name=f"{self.name}-{len(self._threads)}", daemon=True,
+            )
+            self._threads.append(t)
+            t.start()
+
+    def _next_task(self) -> _Task:
+        with self._cond:
+            while not self._queues:
+                self._cond.wait()
+            tenant, q = next(iter(self._queues.items()))
+            task = q.popleft()
+            if q:
+                self._queues.move_to_end(tenant)
+            else:
+                del self._queues[tenant]
+            self._pending -= 1
+            self._running += 1
+            wait_ms = int((time.monotonic() - task.enqueued_at) * 1000)
+            self._stats["queue_wait_ms_total"] += wait_ms
+            self._stats["queue_wait_ms_max"] = max(self._stats["queue_wait_ms_max"], wait_ms)
+            return task
+
+    def _worker(self) -> None:
+        while True:
+            task = self._next_task()
+            t0 = time.monotonic()
+            ran = task.future.set_running_or_notify_cancel()
+            if ran:
+                try:
+                    task.future.set_result(task.fn())
+                except BaseException as exc:
+                    task.future.set_exception(exc)
+            with self._cond:
+                self._running -= 1
+                if ran:
+                    self._stats["completed"] += 1
+                    self._avg_task_sec = 0.8 * self._avg_task_sec + 0.2 * (time.monotonic() - t0)
+                else:
+                    self._stats["cancelled"] += 1
+
+    # ------------------------------------------------------------------ API
+
+    def _retry_after(self, extra: int) -> int:
+        backlog = self._pending + self._running + extra
+        return max(1, math.ceil(self._avg_task_sec * backlog / self.max_workers))
+
+    def submit_many(
+        self,
+        calls: list[Callable[[], Any]],
+        tenant: Hashable = None,
+        force: bool = False,
+    ) -> list[Future]:
+        """
+        calls ni bitta partiya sifatida navbatga qo'yadi (hammasi yoki hech biri).
+        force=True  -  allaqachon qabul qilingan so'rovning davomi (masalan Phase 2),
+        navbat chegarasi tekshirilmaydi: boshlangan konsilium o'rtada 429 olmasin.
+        """
+        now = time.monotonic()
+        with self._cond:
+            self._ensure_started()
+            if not force and self._pending + self._running + len(calls) > self.max_queue:
+                self._stats["rejected"] += 1
+                retry_after = self._retry_after(len(calls))
+                logger.warning(
+                    "Agent pool saturated (pending=%d running=%d, tenant=%s), retry after %ds",
+                    self._pending, self._running, tenant, retry_after,
+                )
+                raise PoolSaturated(retry_after)
+            q = self._queues.setdefault(tenant, deque())
+            futures = []
+            for fn in calls:
+                fut: Future = Future()
+                # contextvars (masalan llm_governor ustuvorligi) worker threadga o'tadi
+                q.append(_Task(fut, functools.partial(contextvars.copy_context().run, fn), now))
+                futures.append(fut)
+            self._pending += len(calls)
+            self._stats["submitted"] += len(calls)
+            self._cond.notify(len(calls))
+        return futures
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            started = self._stats["submitted"] - self._pending
+            return {
+                **self._stats,
+                "queue_wait_ms_avg": round(self._stats["queue_wait_ms_total"] / started) if started > 0 else 0,
+                "pending": self._pending,
+                "running": self._running,
+                "tenants_waiting": len(self._queues),
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+            }
+
+
+pool = FairExecutor(
+    max_workers=int(getattr(settings, "AI_POOL_WORKERS", 8)),
+    max_queue=int(getattr(settings, "AI_POOL_MAX_QUEUE", 32)),
+)
+
+
+def _outcome(fut: Future) -> tuple[Any, BaseException | None]:
+    if fut.cancelled():
+        return None, CancelledError()
+    exc = fut.exception()
+    return (None, exc) if exc is not None else (fut.result(), None)
+
+
+def fan_out_iter(
+    calls: list[Callable[[], Any]],
+    tenant: Hashable,
+    timeout: float,
+    force: bool = False,
+) -> Iterator[tuple[int, Any, BaseException | None]]:
+    """
+    calls ni DARHOL poolga topshiradi (PoolSaturated shu yerda ko'tariladi) va
+    (index, natija, xato) ni tugash tartibida beradigan iterator qaytaradi.
+    timeout ichida tugamaganlar bekor qilinadi va TimeoutError bilan beriladi.
+    """
+    futures = pool.submit_many(calls, tenant=tenant, force=force)
+    return _iter_completed(futures, time.monotonic() + timeout, timeout)
+
+
+def _iter_completed(futures: list[Future], deadline: float, timeout: float):
+    index = {fut: i for i, fut in enumerate(futures)}
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for fut in sorted(done, key=index.__getitem__):
+                yield (index[fut], *_outcome(fut))
+        for fut in sorted(pending, key=index.__getitem__):
+            fut.cancel()
+            yield index[fut], None, FutureTimeout(f"agent timeout ({timeout:.0f}s)")
+    finally:
+        # Iterator tashlab ketilsa (mijoz uzildi) navbatdagilar ishga tushmaydi
+        for fut in pending:
+            fut.cancel()
+
+
+def fan_out(
+    calls: list[Callable[[], Any]],
+    tenant: Hashable,
+    timeout: float,
+    force: bool = False,
+) -> list[tuple[Any, BaseException | None]]:
+    """fan_out_iter ning yig'ma varianti: [(natija, xato)] calls tartibida."""
+    out: list[tuple[Any, BaseException | None]] = [(None, None)] * len(calls)
+    for i, res, exc in fan_out_iter(calls, tenant, timeout, force=force):
+        out[i] = (res, exc)
+    return out
+
+
+def stats() -> dict[str, Any]:
+    return pool.stats()
@@ -0,0 +1,147 @@
+"""
+Phase 1 kelishuv detektori (early-exit konsensus).
+
+Agar mustaqil tahlilda agentlar bir xil tashxisga yuqori ehtimollik bilan kelgan
+bo'lsa, Phase 2 debate yangi ma'lumot bermaydi  -  konsilium to'g'ridan-to'g'ri
+(qisqartirilgan) Phase 3 ga o'tadi.
+
+Tashxislar ICD-10 kategoriyasi (I21.4 -> I21) yoki normallashtirilgan nomi bo'yicha
+solishtiriladi. Chegaralar settings.AI_EARLY_EXIT_* da.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+from collections import Counter
+from dataclasses import asdict, dataclass
+from typing import Any, Optional
+
+from django.conf import settings
+
+from .prompt_budget import as_weight
+
+_ICD10_RE   = re.compile(r"([A-Z])\s*(\d{2})")
+_APOSTROPHE = re.compile(r"[ʻʼ’‘`´]")
+_PARENS     = re.compile(r"\([^)]*\)")
+_NON_WORD   = re.compile(r"[^\w']+")
+
+_stats_lock = threading.Lock()
+_reasons: Counter[str] = Counter()
+
+
+@dataclass
+class Agreement:
+    agreed:          bool
+    diagnosis:       str              # ko'pchilik tashxisi (asl nomi)
+    share:           float            # shu tashxisga kelgan agentlar ulushi
+    min_probability: Optional[float]
+    spread:          Optional[float]  # ehtimolliklar farqi (max - min)
+    reason:          str
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+def icd10_category(code: Any) -> str:
+    """'i21.4 ' -> 'I21'; tanilmasa ''."""
+    m = _ICD10_RE.search(str(code or "").upper())
+    return f"{m.group(1)}{m.group(2)}" if m else ""
+
+
+def normalize_name(name: Any) -> str:
+    """Registr, apostrof variantlari, qavs ichidagi izoh va tinish belgilarini olib tashlaydi."""
+    text = _APOSTROPHE.sub("'", str(name or "").lower())
+    text = _PARENS.sub(" ", text)
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+def _same(a: dict, b: dict) -> bool:
+    code_a, code_b = icd10_category(a.get("icd10")), icd10_category(b.get("icd10"))
+    if code_a and code_b:
+        return code_a == code_b
+    name_a, name_b = normalize_name(a.get("primary_diagnosis")), normalize_name(b.get("primary_diagnosis"))
+    return bool(name_a) and name_a == name_b
+
+
+def _enabled() -> bool:
+    return bool(getattr(settings, "AI_EARLY_EXIT_ENABLED", True))
+
+
+def _thresholds() -> tuple[float, float, float]:
+    return (
+        float(getattr(settings, "AI_EARLY_EXIT_MIN_SHARE", 1.0)),
+        float(getattr(settings, "AI_EARLY_EXIT_MIN_PROBABILITY", 85)),
+        float(getattr(settings, "AI_EARLY_EXIT_MAX_SPREAD", 10)),
+    )
+
+
+def _valid(p1: list[dict]) -> list[dict]:
+    return [r for r in p1 if r and not r.get("error") and r.get("primary_diagnosis")]
+
+
+def still_possible(done: list[dict], total_agents: int) -> bool:
+    """
+    Qolgan agentlar qanday javob bermasin, early-exit hali mumkinmi?
+    (Ulush faqat kamayishi, eng past ehtimollik faqat pasayishi, farq faqat o'sishi mumkin.)
+    False bo'lsa Phase 2 ni kutmasdan boshlash xavfsiz  -  u baribir kerak bo'ladi.
+    """
+    if not _enabled():
+        return False
+    min_share, min_prob, max_sprd = _thresholds()
+    valid   = _valid(done)
+    pending = total_agents - len(done)
+    for anchor in valid or [None]:
+        group = [r for r in valid if anchor is not None and _same(anchor, r)]
+        if (len(group) + pending) / max(total_agents, 1) < min_share:
+            continue
+        probs = [as_weight(r.get("probability"), default=0.0) for r in group]
+        if probs and (min(probs) < min_prob or max(probs) - min(probs) > max_sprd):
+            continue
+        return True
+    return False
+
+
+def assess(p1: list[dict], total_agents: int) -> Agreement:
+    """
+    p1 bo'yicha kelishuvni baholaydi. Xato bergan agent kelishmagan hisoblanadi,
+    shuning uchun ulush total_agents ga nisbatan olinadi.
+    """
+    min_share, min_prob, max_sprd = _thresholds()
+    valid = _valid(p1)
+    if not valid:
+        with _stats_lock:
+            _reasons["no_valid_results"] += 1
+        return Agreement(False, "", 0.0, None, None, "no_valid_results")
+
+    group = max(([r for r in valid if _same(anchor, r)] for anchor in valid), key=len)
+    share = len(group) / max(total_agents, 1)
+    probs = [as_weight(r.get("probability"), default=0.0) for r in group]
+    lowest, spread = min(probs), max(probs) - min(probs)
+    diagnosis = str(group[0].get("primary_diagnosis", ""))
+
+    if not _enabled():
+        reason = "disabled"
+    elif share < min_share:
+        reason = "diagnoses_differ"
+    elif lowest < min_prob:
+        reason = "low_probability"
+    elif spread > max_sprd:
+        reason = "probability_spread"
+    else:
+        reason = "agreed"
+    with _stats_lock:
+        _reasons[reason] += 1
+    return Agreement(reason == "agreed", diagnosis, round(share, 2), lowest, spread, reason)
+
+
+def stats() -> dict[str, Any]:
+    """Qaysi yo'l tanlangani: agreed = early_consensus, qolganlari = full_debate sababi."""
+    with _stats_lock:
+        total = sum(_reasons.values())
+        return {
+            "runs": total,
+            "early_exit": _reasons["agreed"],
+            "early_exit_ratio": round(_reasons["agreed"] / total, 3) if total else 0.0,
+            "reasons": dict(_reasons),
+        }
@@ -26,12 +26,17 @@ Natija: GuardResult(passed, level, message, details)
 from __future__ import annotations
 
 import functools
-import json
 import logging
 import re
+import time
 from dataclasses import dataclass
 from typing import Callable
 
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from . import guard_context, guard_rules, guard_verdicts
+from .guard_context import GuardContext
+
 logger = logging.getLogger(__name__)
 
 # в”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђ
@@ -118,42 +123,36 @@ _PHYSIO_CONTRADICTION = re.compile(
     re.IGNORECASE,
 )
 
+# Barcha qoidalar bitta kompilyatsiya qilingan to'plamda (ai_services.guard_rules);
+# tartib  -  ustuvorlik: anatomic > deceptive > injection
+_RULES = guard_rules.register("anatomy_guard", [
+    *(("anatomic", tag, f"(?s:{pattern})") for pattern, tag in _ANATOMIC_RULES),
+    *(("deceptive", tag, pattern) for pattern, tag in _DECEPTIVE_RULES),
+    *(("injection", tag, pattern) for pattern, tag in _INJECTION_RULES),
+])
+
+_L1_MESSAGES = {
+    "anatomic": (
+        "Inson anatomiyasiga ko'ra bu joylashuv tibbiy jihatdan mumkin emas. "
+        "Iltimos, simptomlar va ularning aniq joylashuvini qayta ko'rib chiqing."
+    ),
+    "deceptive": (
+        "Bu so'rov tibbiy maslahat maqsadiga mos emas. "
+        "Iltimos, haqiqiy tibbiy holatingizni tasvirlang."
+    ),
+    "injection": "Bu so'rov tizimga kirib borish urinishi sifatida aniqlandi.",
+}
 
-def _level1_check(text: str) -> GuardResult | None:
-    lower = text.lower()
-
-    for pattern, tag in _ANATOMIC_RULES:
-        if re.search(pattern, lower, re.IGNORECASE | re.DOTALL):
-            return GuardResult(
-                passed  = False,
-                level   = "anatomic",
-                message = (
-                    "Inson anatomiyasiga ko'ra bu joylashuv tibbiy jihatdan mumkin emas. "
-                    "Iltimos, simptomlar va ularning aniq joylashuvini qayta ko'rib chiqing."
-                ),
-                details = f"L1-anatomic: {tag}",
-            )
-
-    for pattern, tag in _DECEPTIVE_RULES:
-        if re.search(pattern, lower, re.IGNORECASE):
-            return GuardResult(
-                passed  = False,
-                level   = "deceptive",
-                message = (
-                    "Bu so'rov tibbiy maslahat maqsadiga mos emas. "
-                    "Iltimos, haqiqiy tibbiy holatingizni tasvirlang."
-                ),
-                details = f"L1-deceptive: {tag}",
-            )
 
-    for pattern, tag in _INJECTION_RULES:
-        if re.search(pattern, lower, re.IGNORECASE):
-            return GuardResult(
-                passed  = False,
-                level   = "injection",
-                message = "Bu so'rov tizimga kirib borish urinishi sifatida aniqlandi.",
-                details = f"L1-injection: {tag}",
-            )
+def _level1_check(text: str) -> GuardResult | None:
+    rule = _RULES.first(text)
+    if rule is not None:
+        return GuardResult(
+            passed  = False,
+            level   = rule.category,
+            message = _L1_MESSAGES[rule.category],
+            details = f"L1-{rule.category}: {rule.tag}",
+        )
 
     # Fiziologik ziddiyat
     m = _PHYSIO_CONTRADICTION.search(text)
@@ -190,33 +189,43 @@ Siz tibbiy ma'lumot tekshiruvchisi siz. Berilgan klinik matnda:
 FAQAT JSON: {"status":"ok"|"anatomic"|"physiologic"|"deceptive","reason":"..."}"""
 
 
+_L2_MESSAGES = {
+    "anatomic":    "Inson anatomiyasiga ko'ra bu joylashuv mumkin emas.",
+    "physiologic": "Tibbiy ma'lumotlarda fiziologik ziddiyat aniqlandi.",
+    "deceptive":   "Bu so'rov tibbiy maslahat maqsadiga mos emas.",
+}
+
+
 def _level2_check(text: str) -> GuardResult | None:
-    try:
-        from .azure_utils import call_model, build_messages, parse_json, Deployments
-        raw = call_model(
-            Deployments.mini(),
-            build_messages(_L2_SYSTEM, f"Matn:\n{text[:600]}", want_json=True),
-            response_json=True, temperature=0.0, max_tokens=150,
-        )
-        data   = parse_json(raw, "anatomy_guard_l2")
-        status = str(data.get("status", "ok")).lower()
-        reason = str(data.get("reason", ""))
-        if status == "ok":
+    text    = text[:600]
+    verdict = guard_verdicts.get("anatomy_guard", text)   # normallashtirilgan matn bo'yicha kesh
+    if verdict is None:
+        t0 = time.monotonic()
+        try:
+            from .azure_utils import call_model, build_messages, parse_json, Deployments
+            raw = call_model(
+                Deployments.mini(),
+                build_messages(_L2_SYSTEM, f"Matn:\n{text}", want_json=True),
+                response_json=True, temperature=0.0, max_tokens=150,
+                endpoint="anatomy_guard_l2",
+            )
+            verdict = guard_verdicts.from_reply(parse_json(raw, "anatomy_guard_l2"))
+        except Exception as exc:
+            logger.warning("AnatomyGuard L2 failed (pass-through): %s", exc)
+            return None   # fail-open: AI xato bo'lsa, o'tkazib yubor
+        if verdict is None:
+            logger.warning("AnatomyGuard L2 reply has no status (pass-through, not cached)")
             return None
-        msgs = {
-            "anatomic":    "Inson anatomiyasiga ko'ra bu joylashuv mumkin emas.",
-            "physiologic": "Tibbiy ma'lumotlarda fiziologik ziddiyat aniqlandi.",
-            "deceptive":   "Bu so'rov tibbiy maslahat maqsadiga mos emas.",
-        }
-        return GuardResult(
-            passed  = False,
-            level   = status,
-            message = msgs.get(status, "Ma'lumotlarda xatolik aniqlandi."),
-            details = f"L2-AI: {reason}",
-        )
-    except Exception as exc:
-        logger.warning("AnatomyGuard L2 failed (pass-through): %s", exc)
-        return None   # fail-open: AI xato bo'lsa, o'tkazib yubor
+        guard_verdicts.put("anatomy_guard", text, verdict, (time.monotonic() - t0) * 1000)
+
+    if verdict.passed:
+        return None
+    return GuardResult(
+        passed  = False,
+        level   = verdict.status,
+        message = _L2_MESSAGES.get(verdict.status, "Ma'lumotlarda xatolik aniqlandi."),
+        details = f"L2-AI: {verdict.reason}",
+    )
 
 
 # в”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђ
@@ -229,13 +238,20 @@ class AnatomyGuard:
     """
 
     @classmethod
-    def check(cls, patient_data: dict | str, use_ai: bool = True) -> GuardResult:
+    def check(
+        cls,
+        patient_data: dict | str,
+        use_ai: bool = True,
+        context: GuardContext | None = None,
+    ) -> GuardResult:
         """
         Run full anatomy/logic guard on patient data.
 
         Args:
             patient_data:  dict (patient fields) or plain text string.
             use_ai:        Enable Level-2 AI check.
+            context:       So'rov guard konteksti  -  shu patient_data uchun L1/L2 natijalari
+                           (middleware hisoblagan) qayta ishlatiladi.
 
         Returns:
             GuardResult  -  .passed=True means safe to proceed.
@@ -250,14 +266,15 @@ class AnatomyGuard:
             text = str(patient_data)
 
         # Level 1
-        l1 = _level1_check(text)
+        l1 = guard_context.memo(context, "anatomy_guard:l1", patient_data, lambda: _level1_check(text))
         if l1 is not None:
             logger.info("AnatomyGuard L1 BLOCKED: %s", l1.details)
             return l1
 
         # Level 2 (only if text is substantial)
         if use_ai and len(text.strip()) > 30:
-            l2 = _level2_check(text[:1200])
+            l2 = guard_context.memo(context, "anatomy_guard:l2", patient_data,
+                                    lambda: _level2_check(text[:1200]))
             if l2 is not None:
                 logger.info("AnatomyGuard L2 BLOCKED: %s", l2.details)
                 return l2
@@ -286,7 +303,8 @@ def anatomy_guard(use_ai: bool = True):
         def wrapper(request, *args, **kwargs):
             from rest_framework.response import Response
             patient_data = request.data.get("patient_data") or {}
-            result       = AnatomyGuard.check(patient_data, use_ai=use_ai)
+            result       = AnatomyGuard.check(patient_data, use_ai=use_ai,
+                                              context=guard_context.current(request))
             if not result.passed:
                 return Response(
                     {
@@ -311,7 +329,7 @@ def anatomy_guard(use_ai: bool = True):
 
 class AnatomyGuardMiddleware:
     """
-    Django WSGI middleware. Faqat AI endpointlariga tegishli POST so'rovlarni
+    Django middleware (WSGI va ASGI). Faqat AI endpointlariga tegishli POST so'rovlarni
     tekshiradi (URL /api/ai/ prefiksi bilan).
 
     settings.py ga qo'shish:
@@ -322,34 +340,57 @@ class AnatomyGuardMiddleware:
         ]
     """
 
+    sync_capable  = True
+    async_capable = True
+
     _GUARDED_PATHS = ("/api/ai/consilium/", "/api/ai/doctor-support/",
                       "/api/ai/generate-diagnoses/", "/api/ai/autonomous-protocol/")
 
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
-    def __call__(self, request):
-        if (request.method == "POST"
+    def _blocked_response(self, request):
+        if not (request.method == "POST"
                 and any(request.path.startswith(p) for p in self._GUARDED_PATHS)):
-            try:
-                body  = json.loads(request.body.decode("utf-8"))
-                pd    = body.get("patient_data") or {}
-                guard = AnatomyGuard.check(pd, use_ai=False)  # middleware'da AI off (hД±zlД±)
-                if not guard.passed:
-                    from django.http import JsonResponse
-                    return JsonResponse(
-                        {
-                            "success":      False,
-                            "filtered":     True,
-                            "filter_level": guard.level,
-                            "error": {
-                                "code":    422,
-                                "message": guard.message,
-                            },
+            return None
+        try:
+            # Body bir marta parse qilinadi; DRF / async view'lar va keyingi guard'lar shu
+            # kontekstdan foydalanadi (guard_context)
+            ctx = guard_context.attach(request)
+            if ctx.error is not None:
+                raise ValueError(ctx.error)
+            pd    = ctx.patient_data
+            guard = AnatomyGuard.check(pd, use_ai=False, context=ctx)  # middleware'da AI off (tezkor)
+            if not guard.passed:
+                from django.http import JsonResponse
+                return JsonResponse(
+                    {
+                        "success":      False,
+                        "filtered":     True,
+                        "filter_level": guard.level,
+                        "error": {
+                            "code":    422,
+                            "message": guard.message,
                         },
-                        status=422,
-                    )
-            except Exception as exc:
-                logger.debug("AnatomyGuardMiddleware parse error (skip): %s", exc)
+                    },
+                    status=422,
+                )
+        except Exception as exc:
+            logger.debug("AnatomyGuardMiddleware parse error (skip): %s", exc)
+        return None
 
-        return self.get_response(request)
\ No newline at end of file
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        blocked = self._blocked_response(request)
+        if blocked is not None:
+            return blocked
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        blocked = self._blocked_response(request)
+        if blocked is not None:
+            return blocked
+        return await self.get_response(request)
@@ -4,4 +4,8 @@ from django.apps import AppConfig
 class AiServicesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ai_services'
-    verbose_name = 'AI Xizmatlar'
\ No newline at end of file
+    verbose_name = 'AI Xizmatlar'
+
+    def ready(self):
+        # Bilimlar bazasi fayli shu yerda (gunicorn preload_app bo'lsa master jarayonda) yuklanadi
+        from . import uzbekistan_knowledge_base  # noqa: F401
@@ -0,0 +1,176 @@
+"""
+AI Services  -  asyncio (ASGI) endpointlar
+  - /api/ai/consilium/async/       -> arun_consilium
+  - /api/ai/doctor-support/async/  -> adoctor_consult
+  - /api/ziyrak/chat/async/        -> aziyrak_chat
+
+medoraai_backend.asgi (uvicorn worker) ostida ishga tushirilganda bir nechta konsilium
+bitta event loop'ni bo'lishadi  -  har bir so'rov uchun 4-5 OS thread band qilinmaydi.
+WSGI ostida ham ishlaydi (Django async view'ni o'zi moslashtiradi).
+
+PhysiologyFilter Level 2 (AI) birinchi AI bosqichi bilan parallel ishlaydi
+(physiology_filter.arun_guarded); guard bloklasa bosqich bekor qilinadi va 422 qaytadi.
+
+DRF @api_view async view'larni qo'llab-quvvatlamaydi, shuning uchun JWT autentifikatsiya
+va javob shakli (success/error) bu yerda qo'lda takrorlanadi.
+"""
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from . import guard_context
+from .doctor_support import adoctor_consult, TASK_QUICK_CONSULT
+from .multi_agent_system import arun_consilium
+from .physiology_filter import arun_guarded
+from .ziyrak_engine import aziyrak_chat
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def _err(code: int, msg: str):
+    return JsonResponse({"success": False, "error": {"code": code, "message": msg}},
+                        status=code)
+
+
+def _authenticate(request):
+    """JWT (Authorization: Bearer ...) -> user yoki None."""
+    try:
+        res = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return res[0] if res else None
+
+
+async def _prepare(request):
+    """
+    Auth + JSON body. (body, None) yoki (None, xato javobi) qaytaradi.
+    Body AnatomyGuardMiddleware parse qilgan guard kontekstidan olinadi (qayta decode yo'q).
+    """
+    user = await sync_to_async(_authenticate)(request)
+    if user is None or not user.is_authenticated:
+        return None, _err(401, "Autentifikatsiya talab qilinadi")
+    ctx = guard_context.attach(request)
+    if ctx.error is not None:
+        return None, _err(400, "Noto'g'ri JSON")
+    body = ctx.payload
+    if not isinstance(body, dict):
+        return None, _err(400, "Noto'g'ri JSON")
+    return body, None
+
+
+def _filtered(result):
+    """views._run_filter javobining async varianti (PhysiologyFilter bloklagan)."""
+    return JsonResponse(
+        {
+            "success": False,
+            "filtered": True,
+            "filter_level": result.level,
+            "error": {"code": 422, "message": result.message},
+        },
+        status=422,
+    )
+
+
+def _patient_checks(patient_data: dict):
+    if not patient_data or not patient_data.get("complaints"):
+        return _err(400, "Bemor shikoyatlari kiritilmagan")
+    if not getattr(settings, "GEMINI_API_KEY", None):
+        return _err(503, "AI xizmati sozlanmagan. Iltimos, GEMINI_API_KEY ni .env faylga kiriting.")
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Views
+# ---------------------------------------------------------------------------
+
+@csrf_exempt
+@require_POST
+async def consilium_async_view(request):
+    """POST /api/ai/consilium/async/  -  Body: { patient_data, language }"""
+    body, error = await _prepare(request)
+    if error:
+        return error
+    patient_data = body.get("patient_data") or {}
+    language     = body.get("language", "uz-L")
+
+    error = _patient_checks(patient_data)
+    if error:
+        return error
+
+    try:
+        guard, result = await arun_guarded(patient_data, lambda: arun_consilium(patient_data, language),
+                                           context=guard_context.current(request))
+        if not guard.passed:
+            return _filtered(guard)
+        return JsonResponse({"success": True, "data": result})
+    except Exception as exc:
+        logger.exception("Consilium (async) error: %s", exc)
+        return _err(500, f"Konsilium xatosi: {exc}")
+
+
+@csrf_exempt
+@require_POST
+async def doctor_support_async_view(request):
+    """POST /api/ai/doctor-support/async/  -  Body: { patient_data, query?, task_type?, language }"""
+    from .views import _VALID_TASKS
+
+    body, error = await _prepare(request)
+    if error:
+        return error
+    patient_data = body.get("patient_data") or {}
+    query        = body.get("query", "")
+    task_type    = body.get("task_type", TASK_QUICK_CONSULT)
+    language     = body.get("language", "uz-L")
+
+    error = _patient_checks(patient_data)
+    if error:
+        return error
+    if task_type not in _VALID_TASKS:
+        return _err(400, f"Noto'g'ri task_type: {task_type}")
+
+    try:
+        guard, result = await arun_guarded(
+            patient_data, lambda: adoctor_consult(patient_data, query, task_type, language),
+            context=guard_context.current(request),
+        )
+        if not guard.passed:
+            return _filtered(guard)
+        return JsonResponse({"success": True, "data": result})
+    except Exception as exc:
+        logger.exception("DoctorSupport (async) error: %s", exc)
+        return _err(500, f"Doktor yordami xatosi: {exc}")
+
+
+@csrf_exempt
+@require_POST
+async def ziyrak_chat_async_view(request):
+    """POST /api/ziyrak/chat/async/  -  Body: { session_id, message, voice_mode }"""
+    body, error = await _prepare(request)
+    if error:
+        return error
+    session_id = body.get("session_id", "")
+    message    = body.get("message", "")
+    voice_mode = body.get("voice_mode", True)
+
+    if not session_id:
+        return _err(400, "session_id talab qilinadi")
+    if not str(message).strip():
+        return _err(400, "message talab qilinadi")
+
+    try:
+        result = await aziyrak_chat(session_id, message, voice_mode=bool(voice_mode))
+        return JsonResponse({"success": True, "data": result})
+    except ValueError as exc:
+        return _err(404, str(exc))
+    except RuntimeError as exc:
+        return _err(503, str(exc))
@@ -11,6 +11,9 @@ from django.db import transaction
 from django.utils import timezone
 
 from .azure_utils import _call_gemini, DEPLOY_GPT4O, DEPLOY_MINI
+from .json_extract import extract as extract_json
+from .agent_pool import PoolSaturated
+from .stage_graph import Stage, run as run_stages
 
 # Backwards-compat aliases
 GEMINI_PRO = DEPLOY_GPT4O()
@@ -19,6 +22,11 @@ GEMINI_FLASH = DEPLOY_MINI()
 logger = logging.getLogger(__name__)
 
 
+def pipeline_deadline() -> float:
+    """Bosqichlar grafi uchun umumiy muddat (gunicorn timeout'idan kichik)."""
+    return float(getattr(settings, 'AI_PIPELINE_DEADLINE', 120))
+
+
 class AutonomousProtocolGenerator:
     """AI-powered autonomous treatment protocol generation system"""
     
@@ -34,45 +42,77 @@ class AutonomousProtocolGenerator:
             ]
         }
     
-    def generate_autonomous_protocol(self, patient_data: Dict, language: str = 'uz-L') -> Dict:
+    def generate_autonomous_protocol(self, patient_data: Dict, language: str = 'uz-L',
+                                     tenant: Any = None) -> Dict:
         """
         Generate complete treatment protocol autonomously
         
         Args:
             patient_data: Patient clinical data
             language: Language for output
+            tenant: agent_pool fairness key
             
         Returns:
             Complete treatment protocol with safety checks
         """
         try:
-            # Step 1: Risk assessment and safety check
-            safety_assessment = self._perform_safety_assessment(patient_data)
-            
-            # Step 2: Generate initial protocol
-            initial_protocol = self._generate_initial_protocol(patient_data, language)
-            
-            # Step 3: Apply safety modifications
-            safe_protocol = self._apply_safety_modifications(initial_protocol, safety_assessment)
-            
-            # Step 4: Optimize for Uzbekistan context
-            optimized_protocol = self._optimize_for_uzbekistan(safe_protocol, patient_data)
-            
-            # Step 5: Self-learning integration
-            enhanced_protocol = self._apply_learning_patterns(optimized_protocol, patient_data)
-            
-            # Step 6: Final validation
-            final_protocol = self._final_validation(enhanced_protocol, safety_assessment)
-            
-            # Step 7: Store for continuous learning
-            self._store_protocol_for_learning(final_protocol, patient_data)
-            
-            return final_protocol
+            results, timings = run_stages(
+                self.protocol_stages(patient_data, language),
+                deadline=pipeline_deadline(), tenant=tenant, graph="autonomous_protocol",
+            )
+            protocol = results['protocol']
+            protocol['stage_timings'] = timings
+            return protocol
             
+        except PoolSaturated:
+            raise
         except Exception as e:
             logger.error(f"Error in autonomous protocol generation: {e}")
             return self._generate_fallback_protocol(patient_data, language)
     
+    def protocol_stages(self, patient_data: Dict, language: str) -> List[Stage]:
+        """
+        Protokol bosqichlari grafi: xavfsizlik bahosi va boshlang'ich protokol faqat
+        patient_data ga bog'liq  -  parallel ishlaydi; "protocol" ikkalasini kutadi.
+        ClinicalDecisionEngine shu bosqichlarni o'z grafiga qo'shadi.
+        """
+        return [
+            # Step 1: Risk assessment and safety check
+            Stage("safety_assessment",
+                  lambda: self._perform_safety_assessment(patient_data),
+                  fallback=self._safety_assessment_fallback),
+            # Step 2: Generate initial protocol
+            Stage("initial_protocol",
+                  lambda: self._generate_initial_protocol(patient_data, language),
+                  fallback=dict),
+            # Steps 3-7
+            Stage("protocol",
+                  lambda initial_protocol, safety_assessment: self._complete_protocol(
+                      initial_protocol, safety_assessment, patient_data),
+                  deps=("initial_protocol", "safety_assessment"),
+                  fallback=lambda: self._generate_fallback_protocol(patient_data, language)),
+        ]
+    
+    def _complete_protocol(self, initial_protocol: Dict, safety_assessment: Dict,
+                           patient_data: Dict) -> Dict:
+        """Steps 3-7: safety modifications, local optimization, learning, validation"""
+        # Step 3: Apply safety modifications
+        safe_protocol = self._apply_safety_modifications(initial_protocol, safety_assessment)
+        
+        # Step 4: Optimize for Uzbekistan context
+        optimized_protocol = self._optimize_for_uzbekistan(safe_protocol, patient_data)
+        
+        # Step 5: Self-learning integration
+        enhanced_protocol = self._apply_learning_patterns(optimized_protocol, patient_data)
+        
+        # Step 6: Final validation
+        final_protocol = self._final_validation(enhanced_protocol, safety_assessment)
+        
+        # Step 7: Store for continuous learning
+        self._store_protocol_for_learning(final_protocol, patient_data)
+        
+        return final_protocol
+    
     def _perform_safety_assessment(self, patient_data: Dict) -> Dict:
         """Comprehensive safety assessment"""
         text = self._build_patient_text(patient_data)
@@ -94,18 +134,21 @@ Javobni faqat JSON formatida qaytaring."""
         
         try:
             raw = _call_gemini(prompt, GEMINI_PRO, response_mime_type="application/json")
-            raw = raw.replace("```json", "").replace("```", "").strip()
-            return json.loads(raw)
+            return extract_json(raw, dict)
         except Exception as e:
             logger.error(f"Safety assessment failed: {e}")
-            return {
-                "critical_condition": True,
-                "emergency_level": "high",
-                "autonomous_safe": False,
-                "human_review_required": True,
-                "safety_score": 0.5,
-                "risk_factors": ["AI assessment failed"]
-            }
+            return self._safety_assessment_fallback()
+    
+    @staticmethod
+    def _safety_assessment_fallback() -> Dict:
+        return {
+            "critical_condition": True,
+            "emergency_level": "high",
+            "autonomous_safe": False,
+            "human_review_required": True,
+            "safety_score": 0.5,
+            "risk_factors": ["AI assessment failed"]
+        }
     
     def _generate_initial_protocol(self, patient_data: Dict, language: str) -> Dict:
         """Generate initial treatment protocol using AI"""
@@ -141,8 +184,7 @@ Javobni faqat JSON formatida qaytaring."""
         
         try:
             raw = _call_gemini(prompt, GEMINI_PRO, response_mime_type="application/json")
-            raw = raw.replace("```json", "").replace("```", "").strip()
-            return json.loads(raw)
+            return extract_json(raw, dict)
         except Exception as e:
             logger.error(f"Initial protocol generation failed: {e}")
             return {}
@@ -193,8 +235,7 @@ Javobni JSON formatida qaytaring."""
         
         try:
             raw = _call_gemini(optimization_prompt, GEMINI_FLASH, response_mime_type="application/json")
-            raw = raw.replace("```json", "").replace("```", "").strip()
-            optimized = json.loads(raw)
+            optimized = extract_json(raw, dict)
             protocol.update(optimized)
         except Exception as e:
             logger.error(f"Uzbekistan optimization failed: {e}")
@@ -240,8 +281,7 @@ Javobni JSON formatida: {{"valid": boolean, "issues": [], "confidence": float}}"
         
         try:
             raw = _call_gemini(validation_prompt, GEMINI_PRO, response_mime_type="application/json")
-            raw = raw.replace("```json", "").replace("```", "").strip()
-            validation = json.loads(raw)
+            validation = extract_json(raw, dict)
             
             protocol['validation'] = validation
             protocol['final_confidence'] = validation.get('confidence', 0.8)
@@ -5,12 +5,17 @@ All call_model / _call_gemini use Google Gemini when GEMINI_API_KEY is set.
 
 from __future__ import annotations
 
-import json
+import asyncio
 import logging
-from typing import Any
+import time
+from typing import Any, Iterator
 
 from django.conf import settings
 
+from . import json_extract, llm_telemetry
+from .prompt_prefix import StaticPrefix
+from .response_schemas import ResponseSchema
+
 logger = logging.getLogger(__name__)
 
 # When True, all AI calls use Gemini (gemini_utils). No Azure/OpenAI.
@@ -139,6 +144,52 @@ def _deployment_to_gemini_model(deployment_name: str):
     return gemini_utils.GEMINI_PRO
 
 
+def _split_prefix(messages: list[dict[str, Any]]) -> tuple[StaticPrefix | None, list[dict[str, Any]]]:
+    """Birinchi xabar statik prefiks bo'lsa (prefix_message), uni alohida qaytaradi."""
+    if messages and isinstance(messages[0].get("prefix"), StaticPrefix):
+        return messages[0]["prefix"], messages[1:]
+    return None, messages
+
+
+def _validator(schema: ResponseSchema | None, response_json: bool):
+    """Keshga faqat yaroqli javob yoziladi: sxema bo'lsa schema.parse, JSON rejimida json_extract."""
+    if schema is not None:
+        return schema.parse
+    return json_extract.extract if response_json else None
+
+
+def _wire(messages: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Legacy Azure: faqat role/content (prefix kaliti API ga yuborilmaydi)."""
+    return [{"role": m["role"], "content": m["content"]} for m in messages]
+
+
+def _messages_to_prompt(messages: list[dict[str, Any]]) -> str:
+    """Chat messages -> Gemini uchun bitta prompt matni (statik prefiks alohida yuboriladi)."""
+    parts = []
+    for m in messages:
+        role = (m.get("role") or "user").lower()
+        content = (m.get("content") or "").strip()
+        if not content:
+            continue
+        if role == "system":
+            parts.append(f"[Tizim]: {content}")
+        else:
+            parts.append(content)
+    return "\n\n".join(parts)
+
+
+def _client_for(deployment_name: str):
+    """Legacy Azure: deployment -> client (noma'lum bo'lsa GPT-4o)."""
+    deploy_to_client = {
+        Deployments.gpt4o():    gpt4o_client,
+        Deployments.deepseek(): deepseek_client,
+        Deployments.llama():    llama_client,
+        Deployments.mistral():  mistral_client,
+        Deployments.mini():     mini_client,
+    }
+    return deploy_to_client.get(deployment_name, gpt4o_client)()
+
+
 def call_model(
     deployment_name: str,
     messages: list[dict[str, Any]],
@@ -146,69 +197,157 @@ def call_model(
     temperature: float = 0.1,
     max_tokens: int = 4096,
     stream: bool = False,
+    use_cache: bool = True,
+    endpoint: str | None = None,
+    schema: ResponseSchema | None = None,
 ) -> str:
     """
     Call AI model. When GEMINI_API_KEY is set, uses Gemini; otherwise Azure (legacy).
+    use_cache=False  -  chat kabi takrorlanmaydigan javoblar uchun keshni chetlab o'tadi.
+    schema  -  Gemini structured output (response_schema) va JSON rejimi. Xom matn qaytadi:
+    tekshirish chaqiruvchida  -  data = schema.parse(raw) (SchemaError bo'lishi mumkin);
+    sxemadan o'tmagan javob keshga yozilmaydi.
     """
+    response_json = response_json or schema is not None
     if USE_GEMINI:
         from . import gemini_utils
-        parts = []
-        for m in messages:
-            role = (m.get("role") or "user").lower()
-            content = (m.get("content") or "").strip()
-            if not content:
-                continue
-            if role == "system":
-                parts.append(f"[Tizim]: {content}")
-            else:
-                parts.append(content)
-        prompt = "\n\n".join(parts)
+        prefix, rest = _split_prefix(messages)
+        prompt = _messages_to_prompt(rest)
         model = _deployment_to_gemini_model(deployment_name)
         mime = "application/json" if response_json else None
-        return gemini_utils._call_gemini(prompt, model_name=model, response_mime_type=mime)
+        return gemini_utils._call_gemini(
+            prompt, model_name=model, response_mime_type=mime,
+            endpoint=endpoint, use_cache=use_cache,
+            response_schema=schema.schema if schema else None,
+            prefix=prefix, validate=_validator(schema, response_json),
+        )
 
     # Legacy Azure path
-    deploy_to_client = {
-        Deployments.gpt4o():    gpt4o_client,
-        Deployments.deepseek(): deepseek_client,
-        Deployments.llama():    llama_client,
-        Deployments.mistral():  mistral_client,
-        Deployments.mini():     mini_client,
-    }
-    client_factory = deploy_to_client.get(deployment_name, gpt4o_client)
-    client = client_factory()
+    client = _client_for(deployment_name)
     kwargs: dict[str, Any] = {
         "model": deployment_name,
-        "messages": messages,
+        "messages": _wire(messages),
         "temperature": temperature,
         "max_tokens": max_tokens,
     }
     if response_json:
         kwargs["response_format"] = {"type": "json_object"}
+    t0 = time.monotonic()
     try:
         resp = client.chat.completions.create(**kwargs)
+        llm_telemetry.record(deployment_name, endpoint, llm_telemetry.OUTCOME_OK,
+                             (time.monotonic() - t0) * 1000, resp)
         return (resp.choices[0].message.content or "").strip()
     except Exception as exc:
+        llm_telemetry.record(deployment_name, endpoint, llm_telemetry.OUTCOME_ERROR,
+                             (time.monotonic() - t0) * 1000, error=exc)
         logger.error("Azure call failed (deployment=%s): %s", deployment_name, exc)
         raise RuntimeError(f"Azure OpenAI xatosi [{deployment_name}]: {exc}") from exc
 
 
+async def acall_model(
+    deployment_name: str,
+    messages: list[dict[str, Any]],
+    response_json: bool = False,
+    temperature: float = 0.1,
+    max_tokens: int = 4096,
+    use_cache: bool = True,
+    endpoint: str | None = None,
+    schema: ResponseSchema | None = None,
+) -> str:
+    """
+    call_model ning asyncio varianti. Gemini'da SDK ning async klienti ishlatiladi;
+    legacy Azure yo'li threadga o'tkaziladi.
+    """
+    response_json = response_json or schema is not None
+    if USE_GEMINI:
+        from . import gemini_utils
+        prefix, rest = _split_prefix(messages)
+        return await gemini_utils._acall_gemini(
+            _messages_to_prompt(rest),
+            model_name=_deployment_to_gemini_model(deployment_name),
+            response_mime_type="application/json" if response_json else None,
+            endpoint=endpoint, use_cache=use_cache,
+            response_schema=schema.schema if schema else None,
+            prefix=prefix, validate=_validator(schema, response_json),
+        )
+    return await asyncio.to_thread(
+        call_model, deployment_name, messages,
+        response_json=response_json, temperature=temperature, max_tokens=max_tokens,
+        use_cache=use_cache, endpoint=endpoint,
+    )
+
+
+def stream_model(
+    deployment_name: str,
+    messages: list[dict[str, Any]],
+    response_json: bool = False,
+    temperature: float = 0.1,
+    max_tokens: int = 4096,
+    use_cache: bool = True,
+    endpoint: str | None = None,
+    schema: ResponseSchema | None = None,
+) -> Iterator[str]:
+    """
+    call_model ning streaming varianti  -  matn bo'laklarini yield qiladi (SSE uchun).
+    Gemini'da generate_content_stream, legacy Azure'da stream=True.
+    """
+    response_json = response_json or schema is not None
+    if USE_GEMINI:
+        from . import gemini_utils
+        prefix, rest = _split_prefix(messages)
+        yield from gemini_utils._stream_gemini(
+            _messages_to_prompt(rest),
+            model_name=_deployment_to_gemini_model(deployment_name),
+            response_mime_type="application/json" if response_json else None,
+            endpoint=endpoint, use_cache=use_cache,
+            response_schema=schema.schema if schema else None,
+            prefix=prefix, validate=_validator(schema, response_json),
+        )
+        return
+
+    kwargs: dict[str, Any] = {
+        "model": deployment_name,
+        "messages": _wire(messages),
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "stream": True,
+    }
+    if response_json:
+        kwargs["response_format"] = {"type": "json_object"}
+    for chunk in _client_for(deployment_name).chat.completions.create(**kwargs):
+        delta = (chunk.choices[0].delta.content or "") if chunk.choices else ""
+        if delta:
+            yield delta
+
+
 # ---------------------------------------------------------------------------
 # Convenience: build_messages helper
 # ---------------------------------------------------------------------------
 
+def prefix_message(prefix: StaticPrefix) -> dict[str, Any]:
+    """Statik prefiks xabari  -  har doim ro'yxatning BIRINCHI elementi bo'lishi kerak."""
+    return {"role": "system", "content": prefix.text, "prefix": prefix}
+
+
 def build_messages(
     system: str,
     user: str,
     want_json: bool = False,
-) -> list[dict[str, str]]:
-    """Build a standard [system, user] messages list."""
+    prefix: StaticPrefix | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Build a standard [system, user] messages list.
+    prefix berilsa u birinchi keladi (Gemini: cached content / system_instruction),
+    system esa faqat chaqiruvga xos dinamik qism bo'ladi (bo'sh bo'lsa tushib qoladi).
+    """
     if want_json:
         user = user + "\n\nMuhim: Javobni FAQAT toza JSON formatida qaytaring."
-    return [
-        {"role": "system", "content": system},
-        {"role": "user",   "content": user},
-    ]
+    messages: list[dict[str, Any]] = [prefix_message(prefix)] if prefix is not None else []
+    if system:
+        messages.append({"role": "system", "content": system})
+    messages.append({"role": "user", "content": user})
+    return messages
 
 
 # ---------------------------------------------------------------------------
@@ -216,23 +355,8 @@ def build_messages(
 # ---------------------------------------------------------------------------
 
 def parse_json(raw: str, context: str = "") -> dict | list:
-    """Parse JSON from model response, with markdown-fence cleanup."""
-    cleaned = raw.strip()
-    if cleaned.startswith("```"):
-        lines = [l for l in cleaned.splitlines() if not l.strip().startswith("```")]
-        cleaned = "\n".join(lines).strip()
-    for start in ("{", "["):
-        idx = cleaned.find(start)
-        if idx >= 0:
-            try:
-                return json.loads(cleaned[idx:])
-            except json.JSONDecodeError:
-                pass
-    try:
-        return json.loads(cleaned)
-    except json.JSONDecodeError:
-        logger.warning("parse_json failed%s: %s", f" ({context})" if context else "", cleaned[:300])
-        return {}
+    """Parse JSON from model response (json_extract: fences, prose, trailing commas). {} on failure."""
+    return json_extract.parse(raw, context=context)
 
 
 # ---------------------------------------------------------------------------
@@ -275,7 +399,10 @@ def _call_gemini(prompt: str, model_name: str | None = None,
             n = model_name.lower()
             if "flash" in n or "mini" in n:
                 model = gemini_utils.GEMINI_FLASH
-        return gemini_utils._call_gemini(prompt, model_name=model, response_mime_type=response_mime_type)
+        return gemini_utils._call_gemini(
+            prompt, model_name=model, response_mime_type=response_mime_type,
+            validate=_validator(None, response_mime_type == "application/json"),
+        )
     is_json = response_mime_type == "application/json"
     deployment = _map_old_model(model_name)
     msgs = build_messages(
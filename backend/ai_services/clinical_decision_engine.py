@@ -11,11 +11,14 @@ from django.utils import timezone
 from django.db import transaction
 
 from .azure_utils import _call_gemini, DEPLOY_GPT4O, DEPLOY_MINI
+from .json_extract import extract as extract_json
 
 # Backwards-compat aliases
 GEMINI_PRO = DEPLOY_GPT4O()
 GEMINI_FLASH = DEPLOY_MINI()
-from .autonomous_protocol_generator import autonomous_generator
+from .autonomous_protocol_generator import autonomous_generator, pipeline_deadline
+from .agent_pool import PoolSaturated
+from .stage_graph import Stage, run as run_stages
 from .self_learning_system import self_learning_system
 
 logger = logging.getLogger(__name__)
@@ -43,57 +46,81 @@ class ClinicalDecisionEngine:
             'geriatric': self._geriatric_algorithm
         }
     
-    def make_autonomous_decision(self, patient_data: Dict, language: str = 'uz-L') -> Dict:
+    def make_autonomous_decision(self, patient_data: Dict, language: str = 'uz-L',
+                                 tenant: Any = None) -> Dict:
         """
         Make comprehensive autonomous clinical decision
         
+        Bosqichlar bog'liqlik grafi bo'yicha bajariladi (stage_graph): triaj, klinik
+        algoritm, protokol xavfsizlik bahosi va boshlang'ich protokol parallel;
+        muddat tugasa bosqich o'z fallback qiymatiga tushadi.
+        
         Args:
             patient_data: Complete patient clinical data
             language: Language for output
+            tenant: agent_pool fairness key
             
         Returns:
             Complete clinical decision with recommendations
         """
         try:
-            # Step 1: Triage and emergency assessment
-            triage_result = self._perform_triage(patient_data)
-            
-            # Step 2: Determine clinical pathway
-            clinical_pathway = self._determine_clinical_pathway(patient_data, triage_result)
-            
-            # Step 3: Apply specialized clinical algorithm
-            algorithm_result = self._apply_clinical_algorithm(
-                patient_data, clinical_pathway, language
-            )
-            
-            # Step 4: Risk-benefit analysis
-            risk_benefit = self._perform_risk_benefit_analysis(
-                patient_data, algorithm_result, triage_result
+            results, timings = run_stages(
+                self._decision_stages(patient_data, language),
+                deadline=pipeline_deadline(), tenant=tenant, graph="clinical_decision",
             )
             
-            # Step 5: Generate autonomous treatment plan
-            treatment_plan = self._generate_autonomous_treatment_plan(
-                patient_data, algorithm_result, risk_benefit, language
-            )
-            
-            # Step 6: Safety validation
-            safety_validation = self._validate_safety(treatment_plan, triage_result)
-            
             # Step 7: Decision finalization
             final_decision = self._finalize_decision(
-                triage_result, algorithm_result, risk_benefit, 
-                treatment_plan, safety_validation
+                results['triage'], results['algorithm'], results['risk_benefit'],
+                results['treatment_plan'], results['safety_validation']
             )
+            final_decision['stage_timings'] = timings
             
             # Step 8: Learning integration
             self._integrate_learning(final_decision, patient_data)
             
             return final_decision
             
+        except PoolSaturated:
+            raise
         except Exception as e:
             logger.error(f"Error in autonomous decision making: {e}")
             return self._generate_emergency_fallback(patient_data, language)
     
+    def _decision_stages(self, patient_data: Dict, language: str) -> List[Stage]:
+        """Qaror bosqichlari grafi (deps  -  qaysi natijalar kerak)."""
+        # Step 2: Determine clinical pathway (kalit so'zlar bo'yicha, LLM'siz)
+        clinical_pathway = self._determine_clinical_pathway(patient_data)
+        
+        return [
+            # Step 1: Triage and emergency assessment
+            Stage("triage",
+                  lambda: self._perform_triage(patient_data),
+                  fallback=self._triage_fallback),
+            # Step 3: Apply specialized clinical algorithm
+            Stage("algorithm",
+                  lambda: self._apply_clinical_algorithm(patient_data, clinical_pathway, language),
+                  fallback=lambda: {"algorithm_used": clinical_pathway, "error": "Algorithm timed out"}),
+            # Step 4: Risk-benefit analysis
+            Stage("risk_benefit",
+                  lambda algorithm, triage: self._perform_risk_benefit_analysis(
+                      patient_data, algorithm, triage),
+                  deps=("algorithm", "triage"),
+                  fallback=self._risk_benefit_fallback),
+            # Step 5: Generate autonomous treatment plan (protokol bosqichlari + learning)
+            *autonomous_generator.protocol_stages(patient_data, language),
+            Stage("treatment_plan",
+                  lambda protocol, algorithm, risk_benefit: self._generate_autonomous_treatment_plan(
+                      patient_data, algorithm, risk_benefit, language, base_protocol=protocol),
+                  deps=("protocol", "algorithm", "risk_benefit"),
+                  fallback=lambda: autonomous_generator._generate_fallback_protocol(patient_data, language)),
+            # Step 6: Safety validation
+            Stage("safety_validation",
+                  lambda treatment_plan, triage: self._validate_safety(treatment_plan, triage),
+                  deps=("treatment_plan", "triage"),
+                  fallback=self._safety_validation_fallback),
+        ]
+    
     def _perform_triage(self, patient_data: Dict) -> Dict:
         """Perform emergency triage assessment"""
         text = self._build_patient_text(patient_data)
@@ -121,20 +148,23 @@ Javobni faqat JSON formatida qaytaring."""
         
         try:
             raw = _call_gemini(prompt, GEMINI_PRO, response_mime_type="application/json")
-            raw = raw.replace("```json", "").replace("```", "").strip()
-            return json.loads(raw)
+            return extract_json(raw, dict)
         except Exception as e:
             logger.error(f"Triage assessment failed: {e}")
-            return {
-                "triage_level": "yellow",
-                "urgency_score": 0.7,
-                "life_threatened": False,
-                "time_to_treatment": 30,
-                "emergency_actions": ["Shifokor tekshiruvi zarur"],
-                "vital_signs_critical": []
-            }
+            return self._triage_fallback()
     
-    def _determine_clinical_pathway(self, patient_data: Dict, triage_result: Dict) -> str:
+    @staticmethod
+    def _triage_fallback() -> Dict:
+        return {
+            "triage_level": "yellow",
+            "urgency_score": 0.7,
+            "life_threatened": False,
+            "time_to_treatment": 30,
+            "emergency_actions": ["Shifokor tekshiruvi zarur"],
+            "vital_signs_critical": []
+        }
+    
+    def _determine_clinical_pathway(self, patient_data: Dict, triage_result: Optional[Dict] = None) -> str:
         """Determine the appropriate clinical pathway"""
         complaints = patient_data.get('complaints', '').lower()
         age = patient_data.get('age', 0)
@@ -192,8 +222,7 @@ Javobni faqat JSON formatida qaytaring."""
         
         try:
             raw = _call_gemini(prompt, GEMINI_PRO, response_mime_type="application/json")
-            raw = raw.replace("```json", "").replace("```", "").strip()
-            result = json.loads(raw)
+            result = extract_json(raw, dict)
             result['algorithm_used'] = 'cardiovascular'
             return result
         except Exception as e:
@@ -224,8 +253,7 @@ Javobni faqat JSON formatida qaytaring."""
         
         try:
             raw = _call_gemini(prompt, GEMINI_PRO, response_mime_type="application/json")
-            raw = raw.replace("```json", "").replace("```", "").strip()
-            result = json.loads(raw)
+            result = extract_json(raw, dict)
             result['algorithm_used'] = 'respiratory'
             return result
         except Exception as e:
@@ -256,8 +284,7 @@ Javobni faqat JSON formatida qaytaring."""
         
         try:
             raw = _call_gemini(prompt, GEMINI_PRO, response_mime_type="application/json")
-            raw = raw.replace("```json", "").replace("```", "").strip()
-            result = json.loads(raw)
+            result = extract_json(raw, dict)
             result['algorithm_used'] = 'gastrointestinal'
             return result
         except Exception as e:
@@ -288,8 +315,7 @@ Javobni faqat JSON formatida qaytaring."""
         
         try:
             raw = _call_gemini(prompt, GEMINI_PRO, response_mime_type="application/json")
-            raw = raw.replace("```json", "").replace("```", "").strip()
-            result = json.loads(raw)
+            result = extract_json(raw, dict)
             result['algorithm_used'] = 'neurological'
             return result
         except Exception as e:
@@ -320,8 +346,7 @@ Javobni faqat JSON formatida qaytaring."""
         
         try:
             raw = _call_gemini(prompt, GEMINI_PRO, response_mime_type="application/json")
-            raw = raw.replace("```json", "").replace("```", "").strip()
-            result = json.loads(raw)
+            result = extract_json(raw, dict)
             result['algorithm_used'] = 'infectious'
             return result
         except Exception as e:
@@ -352,8 +377,7 @@ Javobni faqat JSON formatida qaytaring."""
         
         try:
             raw = _call_gemini(prompt, GEMINI_PRO, response_mime_type="application/json")
-            raw = raw.replace("```json", "").replace("```", "").strip()
-            result = json.loads(raw)
+            result = extract_json(raw, dict)
             result['algorithm_used'] = 'musculoskeletal'
             return result
         except Exception as e:
@@ -384,8 +408,7 @@ Javobni faqat JSON formatida qaytaring."""
         
         try:
             raw = _call_gemini(prompt, GEMINI_PRO, response_mime_type="application/json")
-            raw = raw.replace("```json", "").replace("```", "").strip()
-            result = json.loads(raw)
+            result = extract_json(raw, dict)
             result['algorithm_used'] = 'pediatric'
             return result
         except Exception as e:
@@ -416,8 +439,7 @@ Javobni faqat JSON formatida qaytaring."""
         
         try:
             raw = _call_gemini(prompt, GEMINI_PRO, response_mime_type="application/json")
-            raw = raw.replace("```json", "").replace("```", "").strip()
-            result = json.loads(raw)
+            result = extract_json(raw, dict)
             result['algorithm_used'] = 'geriatric'
             return result
         except Exception as e:
@@ -448,8 +470,7 @@ Javobni faqat JSON formatida qaytaring."""
         
         try:
             raw = _call_gemini(prompt, GEMINI_PRO, response_mime_type="application/json")
-            raw = raw.replace("```json", "").replace("```", "").strip()
-            result = json.loads(raw)
+            result = extract_json(raw, dict)
             result['algorithm_used'] = 'general'
             return result
         except Exception as e:
@@ -480,25 +501,30 @@ Javobni faqat JSON formatida qaytaring."""
         
         try:
             raw = _call_gemini(analysis_prompt, GEMINI_PRO, response_mime_type="application/json")
-            raw = raw.replace("```json", "").replace("```", "").strip()
-            return json.loads(raw)
+            return extract_json(raw, dict)
         except Exception as e:
             logger.error(f"Risk-benefit analysis failed: {e}")
-            return {
-                "autonomous_risk": 0.3,
-                "human_intervention_benefit": 0.7,
-                "urgent_intervention": False,
-                "delay_risk": 0.2,
-                "complication_risk": 0.1,
-                "success_probability": 0.8,
-                "recommendation": "human"
-            }
+            return self._risk_benefit_fallback()
+    
+    @staticmethod
+    def _risk_benefit_fallback() -> Dict:
+        return {
+            "autonomous_risk": 0.3,
+            "human_intervention_benefit": 0.7,
+            "urgent_intervention": False,
+            "delay_risk": 0.2,
+            "complication_risk": 0.1,
+            "success_probability": 0.8,
+            "recommendation": "human"
+        }
     
     def _generate_autonomous_treatment_plan(self, patient_data: Dict, algorithm_result: Dict, 
-                                          risk_benefit: Dict, language: str) -> Dict:
+                                          risk_benefit: Dict, language: str,
+                                          base_protocol: Optional[Dict] = None) -> Dict:
         """Generate autonomous treatment plan"""
-        # Use the autonomous protocol generator
-        base_protocol = autonomous_generator.generate_autonomous_protocol(patient_data, language)
+        # Use the autonomous protocol generator (grafda allaqachon tayyor bo'lsa  -  o'sha)
+        if base_protocol is None:
+            base_protocol = autonomous_generator.generate_autonomous_protocol(patient_data, language)
         
         # Enhance with algorithm-specific insights
         enhanced_protocol = base_protocol.copy()
@@ -534,19 +560,22 @@ Javobni faqat JSON formatida qaytaring."""
         
         try:
             raw = _call_gemini(validation_prompt, GEMINI_PRO, response_mime_type="application/json")
-            raw = raw.replace("```json", "").replace("```", "").strip()
-            return json.loads(raw)
+            return extract_json(raw, dict)
         except Exception as e:
             logger.error(f"Safety validation failed: {e}")
-            return {
-                "safe": False,
-                "emergency_covered": False,
-                "dosage_safe": False,
-                "drug_interactions": True,
-                "allergy_risk": True,
-                "monitoring_adequate": False,
-                "safety_score": 0.3
-            }
+            return self._safety_validation_fallback()
+    
+    @staticmethod
+    def _safety_validation_fallback() -> Dict:
+        return {
+            "safe": False,
+            "emergency_covered": False,
+            "dosage_safe": False,
+            "drug_interactions": True,
+            "allergy_risk": True,
+            "monitoring_adequate": False,
+            "safety_score": 0.3
+        }
     
     def _finalize_decision(self, triage_result: Dict, algorithm_result: Dict, 
                           risk_benefit: Dict, treatment_plan: Dict, safety_validation: Dict) -> Dict:
@@ -0,0 +1,185 @@
+"""
+Konsilium SSE oqimi: iter_consilium hodisalarini fon threadida yig'ish va qayta ulanish.
+
+start() Phase 1 ni so'rov threadida poolga topshiradi (to'la bo'lsa PoolSaturated -> 429),
+qolgan bosqichlar fon threadida davom etadi va hodisalar run jurnaliga yoziladi.
+SSE javobi jurnalni o'qiydi  -  mijoz uzilsa konsilium to'xtamaydi, Last-Event-ID bilan
+qayta ulanib, qolgan hodisalarni oladi.
+
+Jurnal jarayon ichida saqlanadi; REDIS_URL bo'lsa Django cache'ga ham yoziladi, shuning
+uchun qayta ulanish boshqa gunicorn workerga tushsa ham ishlaydi.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Iterator
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .multi_agent_system import iter_consilium
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = "consilium:stream:"
+_HEARTBEAT_SEC = 15.0
+_POLL_SEC = 0.5
+
+
+def _ttl() -> int:
+    return int(getattr(settings, "AI_CONSILIUM_STREAM_TTL", 900))
+
+
+def _shared_enabled() -> bool:
+    return bool(getattr(settings, "REDIS_URL", ""))
+
+
+class _RunLog:
+    """Bitta konsilium run'ining hodisalari (seq 1 dan boshlanadi)."""
+
+    def __init__(self, run_id: str, owner: Any):
+        self.run_id  = run_id
+        self.owner   = owner
+        self.events: list[dict] = []
+        self.done    = False
+        self.created = time.monotonic()
+        self._cond   = threading.Condition()
+
+    def append(self, event: str, data: Any) -> None:
+        with self._cond:
+            self.events.append({"id": len(self.events) + 1, "event": event, "data": data})
+            self._cond.notify_all()
+        self._publish()
+
+    def close(self) -> None:
+        with self._cond:
+            self.done = True
+            self._cond.notify_all()
+        self._publish()
+
+    def _publish(self) -> None:
+        if not _shared_enabled():
+            return
+        try:
+            from django.core.cache import cache
+            with self._cond:
+                snapshot = {"owner": self.owner, "events": list(self.events), "done": self.done}
+            cache.set(_KEY_PREFIX + self.run_id, snapshot, _ttl())
+        except Exception as exc:
+            logger.warning("Consilium stream publish failed: %s", exc)
+
+    def wait(self, after: int, timeout: float) -> tuple[list[dict], bool]:
+        with self._cond:
+            if len(self.events) <= after and not self.done:
+                self._cond.wait(timeout)
+            return self.events[after:], self.done
+
+
+_runs_lock = threading.Lock()
+_runs: dict[str, _RunLog] = {}
+
+
+def _prune() -> None:
+    cutoff = time.monotonic() - _ttl()
+    with _runs_lock:
+        for run_id in [k for k, v in _runs.items() if v.done and v.created < cutoff]:
+            del _runs[run_id]
+
+
+def _drain(log: _RunLog, events: Iterator[tuple[str, Any]]) -> None:
+    try:
+        for event, data in events:
+            log.append(event, data)
+    except Exception as exc:
+        logger.exception("Consilium stream %s failed: %s", log.run_id, exc)
+        log.append("error", {"message": f"Konsilium xatosi: {exc}"})
+    finally:
+        log.close()
+        close_old_connections()   # run_store checkpoint'lari shu threadda yozilgan
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def start(patient_data: dict, language: str, owner: Any, tenant: Any = None,
+          session_id: str | None = None) -> str:
+    """
+    Konsiliumni boshlaydi va run_id qaytaradi. Pool to'la bo'lsa
+    agent_pool.PoolSaturated, begona session_id bo'lsa run_store.RunConflict
+    shu yerda (so'rov threadida) ko'tariladi.
+    """
+    _prune()
+    events = iter_consilium(patient_data, language, tenant, session_id=session_id, owner=owner)
+    first = next(events)
+
+    log = _RunLog(uuid.uuid4().hex, owner)
+    with _runs_lock:
+        _runs[log.run_id] = log
+    log.append(*first)
+    threading.Thread(
+        target=_drain, args=(log, events), name=f"consilium-{log.run_id[:8]}", daemon=True,
+    ).start()
+    return log.run_id
+
+
+def exists(run_id: str, owner: Any) -> bool:
+    with _runs_lock:
+        log = _runs.get(run_id)
+    if log is not None:
+        return log.owner == owner
+    snapshot = _shared_snapshot(run_id)
+    return snapshot is not None and snapshot.get("owner") == owner
+
+
+def _shared_snapshot(run_id: str) -> dict | None:
+    if not _shared_enabled():
+        return None
+    try:
+        from django.core.cache import cache
+        return cache.get(_KEY_PREFIX + run_id)
+    except Exception as exc:
+        logger.warning("Consilium stream lookup failed: %s", exc)
+        return None
+
+
+def events(run_id: str, after: int = 0) -> Iterator[dict | None]:
+    """
+    seq > after bo'lgan hodisalarni beradi, run tugaguncha kutadi.
+    None  -  heartbeat (proxy ulanishni yopmasligi uchun).
+    """
+    with _runs_lock:
+        log = _runs.get(run_id)
+    if log is not None:
+        while True:
+            batch, done = log.wait(after, _HEARTBEAT_SEC)
+            if batch:
+                yield from batch
+                after = batch[-1]["id"]
+            elif done:
+                return
+            else:
+                yield None
+
+    # Boshqa workerda ishlayotgan run  -  umumiy keshdan o'qiymiz
+    idle = 0.0
+    while True:
+        snapshot = _shared_snapshot(run_id)
+        if snapshot is None:
+            return
+        batch = snapshot["events"][after:]
+        if batch:
+            yield from batch
+            after = batch[-1]["id"]
+            idle = 0.0
+        elif snapshot["done"]:
+            return
+        time.sleep(_POLL_SEC)
+        idle += _POLL_SEC
+        if idle >= _HEARTBEAT_SEC:
+            idle = 0.0
+            yield None
@@ -20,16 +20,18 @@ from __future__ import annotations
 import logging
 from typing import Iterator
 
+from . import prompt_prefix, response_schemas
 from .azure_utils import (
+    acall_model,
     call_model,
     build_messages,
-    parse_json,
     patient_text,
     Deployments,
-    gpt4o_client,
-    USE_GEMINI,
+    stream_model,
 )
-from .uzbekistan_knowledge_base import get_uz_context, get_drug_context
+from .prompt_prefix import StaticPrefix
+from .response_schemas import SchemaError, array, boolean, integer, obj, string
+from .uzbekistan_knowledge_base import UZ_BASE_CONTEXT, get_drug_context, get_uz_protocols
 
 logger = logging.getLogger(__name__)
 
@@ -82,142 +84,168 @@ TASK_FOLLOW_UP     = "follow_up"            # Kuzatuv rejasi
 # System prompt builder
 # ---------------------------------------------------------------------------
 
-def _doctor_system_prompt(task_type: str, language_hint: str,
-                           complaints: str = "") -> str:
-    lang_map = {
-        "uz-L": "O'zbek tilida (Lotin grafikasida)",
-        "uz-C": "O'zbek tilida (Kirill grafikasida)",
-        "kaa":  "Qoraqolpoq tilida",
-        "ru":   "Ruscha",
-        "en":   "English",
-    }
-    lang_instruction = lang_map.get(language_hint, lang_map["uz-L"])
-
-    task_instructions = {
-        TASK_QUICK_CONSULT: (
-            "Shifokorga qisqa, aniq va amaliy maslahat bering. "
-            "Asosiy tashxis, zaruriy tekshiruvlar, darhol choralar. "
-            "Maksimal 5 qadam."
-        ),
-        TASK_DIAGNOSIS: (
-            "3 - 5 ta differensial tashxis bering. "
-            "Har biri uchun: ehtimollik (%), asoslash va SSV protokol havolasi. "
-            "Eng kuchli dalil asosida asosiy tashxisni ajratib ko'rsating."
-        ),
-        TASK_TREATMENT: (
-            "O'zbekiston SSV protokoliga mos to'liq davolash rejasi yozing. "
-            "Dori dozalari, qabul vaqti, davomiyligi aniq ko'rsatilsin. "
-            "Nojo'ya ta'sirlar va qarshi ko'rsatmalarni qayd eting."
-        ),
-        TASK_DRUG_CHECK: (
-            "Berilgan dorilarni tahlil qiling: "
-            "o'zaro ta'sirlar, dozalar to'g'riligi, O'zbekistonda mavjudligi. "
-            "Xavfli kombinatsiyalarni alohida belgilang."
-        ),
-        TASK_LAB_INTERPRET: (
-            "Lab natijalarini O'zbekiston LITS standartlari bo'yicha izohlang. "
-            "Anormal ko'rsatkichlarni klinik ahamiyati bilan tushuntiring."
-        ),
-        TASK_FOLLOW_UP: (
-            "Kuzatuv rejasi tuzing: qachon qaytib kelish, qanday belgilarda darhol "
-            "murojaat etish, qanday tekshiruvlar kerak."
-        ),
-    }
-
-    task_instr = task_instructions.get(task_type, task_instructions[TASK_QUICK_CONSULT])
-
-    # Dynamic knowledge base context
-    kb_context = get_uz_context(complaints_text=complaints, include_protocols=True)
-    drug_ctx   = get_drug_context()
-
-    return f"""Siz Farg'ona JSTI tibbiy yordamchisiz  -  yuqori malakali klinik mutaxassis.
+_LANG_MAP = {
+    "uz-L": "O'zbek tilida (Lotin grafikasida)",
+    "uz-C": "O'zbek tilida (Kirill grafikasida)",
+    "kaa":  "Qoraqolpoq tilida",
+    "ru":   "Ruscha",
+    "en":   "English",
+}
 
-VAZIFA: {task_instr}
+_TASK_INSTRUCTIONS = {
+    TASK_QUICK_CONSULT: (
+        "Shifokorga qisqa, aniq va amaliy maslahat bering. "
+        "Asosiy tashxis, zaruriy tekshiruvlar, darhol choralar. "
+        "Maksimal 5 qadam."
+    ),
+    TASK_DIAGNOSIS: (
+        "3 - 5 ta differensial tashxis bering. "
+        "Har biri uchun: ehtimollik (%), asoslash va SSV protokol havolasi. "
+        "Eng kuchli dalil asosida asosiy tashxisni ajratib ko'rsating."
+    ),
+    TASK_TREATMENT: (
+        "O'zbekiston SSV protokoliga mos to'liq davolash rejasi yozing. "
+        "Dori dozalari, qabul vaqti, davomiyligi aniq ko'rsatilsin. "
+        "Nojo'ya ta'sirlar va qarshi ko'rsatmalarni qayd eting."
+    ),
+    TASK_DRUG_CHECK: (
+        "Berilgan dorilarni tahlil qiling: "
+        "o'zaro ta'sirlar, dozalar to'g'riligi, O'zbekistonda mavjudligi. "
+        "Xavfli kombinatsiyalarni alohida belgilang."
+    ),
+    TASK_LAB_INTERPRET: (
+        "Lab natijalarini O'zbekiston LITS standartlari bo'yicha izohlang. "
+        "Anormal ko'rsatkichlarni klinik ahamiyati bilan tushuntiring."
+    ),
+    TASK_FOLLOW_UP: (
+        "Kuzatuv rejasi tuzing: qachon qaytib kelish, qanday belgilarda darhol "
+        "murojaat etish, qanday tekshiruvlar kerak."
+    ),
+}
 
-{kb_context}
+_DOCTOR_SYSTEM = """\
+Siz Farg'ona JSTI tibbiy yordamchisiz  -  yuqori malakali klinik mutaxassis.
 
-{drug_ctx}
+VAZIFA: {task}
 
-TIL: Barcha javoblar {lang_instruction} bo'lsin.
+TIL: Barcha javoblar {language} bo'lsin.
 MUHIM: Javobni FAQAT JSON formatida qaytaring."""
 
 
-# ---------------------------------------------------------------------------
-# JSON output schemas per task
-# ---------------------------------------------------------------------------
+def _compile_prefixes() -> dict[tuple[str, str], StaticPrefix]:
+    """(vazifa, til) bo'yicha statik prefikslar: O'zbekiston konteksti + dorilar + vazifa."""
+    shared = UZ_BASE_CONTEXT + "\n\n" + get_drug_context() + "\n\n"
+    return {
+        (task, lang): prompt_prefix.register(
+            f"doctor:{task}:{lang}", shared + _DOCTOR_SYSTEM.format(task=instr, language=language),
+        )
+        for task, instr in _TASK_INSTRUCTIONS.items()
+        for lang, language in _LANG_MAP.items()
+    }
 
-_SCHEMA_QUICK = (
-    '{{'
-    '"summary": "Qisqa klinik xulosa",'
-    '"primary_diagnosis": "Asosiy tashxis",'
-    '"probability": 80,'
-    '"immediate_actions": ["1-chora", "2-chora"],'
-    '"medications": [{{"name":"...","dosage":"...","frequency":"...","duration":"...","instructions":"..."}}],'
-    '"recommended_tests": ["..."],'
-    '"follow_up": "Kuzatuv ko\'rsatmasi",'
-    '"critical_alert": {{"present": false, "message": ""}}'
-    '}}'
-)
 
-_SCHEMA_DIAGNOSIS = (
-    '{{'
-    '"diagnoses": ['
-    '  {{"name":"...","probability":70,"justification":"...","evidence_level":"High",'
-    '    "reasoning_chain":["..."],"uzbek_protocol":"SSV protokol nomi"}}'
-    '],'
-    '"recommended_tests": ["..."],'
-    '"red_flags": ["Shoshilinch belgilar"]'
-    '}}'
-)
+# Import paytida bir marta yig'iladi  -  har chaqiruvda faqat SSV protokollari qo'shiladi
+_DOCTOR_PREFIXES = _compile_prefixes()
 
-_SCHEMA_TREATMENT = (
-    '{{'
-    '"diagnosis": "Tasdiqlangan tashxis",'
-    '"treatment_plan": ["1-qadam...", "2-qadam..."],'
-    '"medications": ['
-    '  {{"name":"Savdo nomi","dosage":"...","frequency":"...","duration":"...","timing":"Ovqatdan keyin",'
-    '    "instructions":"...","contraindications":"...","local_availability":"O\'zbekistonda mavjud"}}'
-    '],'
-    '"non_pharmacological": ["Rejim ko\'rsatmasi"],'
-    '"monitoring": ["Kuzatish parametri"],'
-    '"uzbek_protocol_ref": "SSV protokol havolasi"'
-    '}}'
-)
 
-_SCHEMA_DRUG = (
-    '{{'
-    '"drugs_analyzed": ['
-    '  {{"name":"...","registered_in_uzbekistan": true,'
-    '    "dose_correct": true,"dose_comment":"..."}}'
-    '],'
-    '"interactions": [{{"drugs":["A","B"],"severity":"HIGH/MEDIUM/LOW","description":"..."}}],'
-    '"allergies_check": "...", '
-    '"overall_safety": "SAFE/CAUTION/DANGEROUS",'
-    '"recommendations": ["..."]'
-    '}}'
-)
+def _doctor_prefix(task_type: str, language_hint: str) -> StaticPrefix:
+    task = task_type if task_type in _TASK_INSTRUCTIONS else TASK_QUICK_CONSULT
+    lang = language_hint if language_hint in _LANG_MAP else "uz-L"
+    return _DOCTOR_PREFIXES[(task, lang)]
 
-_SCHEMA_LAB = (
-    '{{'
-    '"interpretations": ['
-    '  {{"parameter":"...","value":"...","unit":"...","reference":"...","status":"HIGH/LOW/NORMAL",'
-    '    "clinical_significance":"...","action_needed":false}}'
-    '],'
-    '"summary": "Umumiy xulosa",'
-    '"urgent_findings": ["Shoshilinch topilmalar"]'
-    '}}'
-)
 
-_SCHEMA_FOLLOW_UP = (
-    '{{'
-    '"return_visit": "7 kun ichida",'
-    '"red_flag_symptoms": ["Darhol murojaat belgilari"],'
-    '"monitoring_at_home": ["Uyda kuzatish"],'
-    '"repeat_tests": ["Takror tahlillar"],'
-    '"lifestyle_advice": ["Turmush tarzi"],'
-    '"emergency_contact": "103  -  Tez tibbiy yordam"'
-    '}}'
-)
+# ---------------------------------------------------------------------------
+# JSON output schemas per task (Gemini response_schema + server-side validation)
+# ---------------------------------------------------------------------------
+
+_PROBABILITY = integer("Ehtimollik, %", minimum=0, maximum=100)
+_SEVERITY = ("HIGH", "MEDIUM", "LOW")
+
+_MEDICATION = obj({
+    "name":         string("Savdo nomi (O'zbekistonda ro'yxatdan o'tgan)"),
+    "dosage":       string(),
+    "frequency":    string(),
+    "duration":     string(),
+    "instructions": string(),
+}, required=("name",))
+
+_SCHEMA_QUICK = response_schemas.register("doctor_quick_consult", obj({
+    "summary":           string("Qisqa klinik xulosa"),
+    "primary_diagnosis": string("Asosiy tashxis"),
+    "probability":       _PROBABILITY,
+    "immediate_actions": array(string()),
+    "medications":       array(_MEDICATION),
+    "recommended_tests": array(string()),
+    "follow_up":         string("Kuzatuv ko'rsatmasi"),
+    "critical_alert":    obj({"present": boolean(), "message": string()}),
+}, required=("summary",)))
+
+_SCHEMA_DIAGNOSIS = response_schemas.register("doctor_diagnosis", obj({
+    "diagnoses": array(obj({
+        "name":            string(),
+        "probability":     _PROBABILITY,
+        "justification":   string(),
+        "evidence_level":  string("High/Moderate/Low"),
+        "reasoning_chain": array(string()),
+        "uzbek_protocol":  string("SSV protokol nomi"),
+    }, required=("name",)), min_items=1, max_items=8),
+    "recommended_tests": array(string()),
+    "red_flags":         array(string("Shoshilinch belgilar")),
+}, required=("diagnoses",)))
+
+_SCHEMA_TREATMENT = response_schemas.register("doctor_treatment_plan", obj({
+    "diagnosis":      string("Tasdiqlangan tashxis"),
+    "treatment_plan": array(string("N-qadam")),
+    "medications": array(obj({
+        **_MEDICATION["properties"],
+        "timing":             string("Ovqatdan keyin/oldin"),
+        "contraindications":  string(),
+        "local_availability": string("O'zbekistonda mavjud"),
+    }, required=("name",))),
+    "non_pharmacological": array(string("Rejim ko'rsatmasi")),
+    "monitoring":          array(string("Kuzatish parametri")),
+    "uzbek_protocol_ref":  string("SSV protokol havolasi"),
+}, required=("treatment_plan",)))
+
+_SCHEMA_DRUG = response_schemas.register("doctor_drug_check", obj({
+    "drugs_analyzed": array(obj({
+        "name":                     string(),
+        "registered_in_uzbekistan": boolean(),
+        "dose_correct":             boolean(),
+        "dose_comment":             string(),
+    }, required=("name",))),
+    "interactions": array(obj({
+        "drugs":       array(string()),
+        "severity":    string(enum=_SEVERITY),
+        "description": string(),
+    })),
+    "allergies_check": string(),
+    "overall_safety":  string(enum=("SAFE", "CAUTION", "DANGEROUS")),
+    "recommendations": array(string()),
+}, required=("overall_safety",)))
+
+_SCHEMA_LAB = response_schemas.register("doctor_lab_interpretation", obj({
+    "interpretations": array(obj({
+        "parameter":             string(),
+        "value":                 string(),
+        "unit":                  string(),
+        "reference":             string(),
+        "status":                string(enum=("HIGH", "LOW", "NORMAL")),
+        "clinical_significance": string(),
+        "action_needed":         boolean(),
+    }, required=("parameter",))),
+    "summary":         string("Umumiy xulosa"),
+    "urgent_findings": array(string("Shoshilinch topilmalar")),
+}, required=("summary",)))
+
+_SCHEMA_FOLLOW_UP = response_schemas.register("doctor_follow_up", obj({
+    "return_visit":       string("Masalan: 7 kun ichida"),
+    "red_flag_symptoms":  array(string("Darhol murojaat belgilari")),
+    "monitoring_at_home": array(string()),
+    "repeat_tests":       array(string()),
+    "lifestyle_advice":   array(string()),
+    "emergency_contact":  string("103  -  Tez tibbiy yordam"),
+}, required=("return_visit",)))
 
 SCHEMAS = {
     TASK_QUICK_CONSULT: _SCHEMA_QUICK,
@@ -233,6 +261,41 @@ SCHEMAS = {
 # Core: synchronous call
 # ---------------------------------------------------------------------------
 
+def _consult_messages(
+    patient_data: dict,
+    query: str,
+    task_type: str,
+    language: str,
+) -> list[dict]:
+    complaints  = str(patient_data.get("complaints", ""))
+    ptext       = patient_text(patient_data)
+    schema      = SCHEMAS.get(task_type, _SCHEMA_QUICK)
+    system      = get_uz_protocols(complaints)
+
+    user = (
+        f"BEMOR:\n{ptext}\n\n"
+        + (f"SHIFOKOR SO'ROVI:\n{query}\n\n" if query else "")
+        + f"Quyidagi JSON strukturada javob bering (* majburiy maydon):\n{schema.hint}"
+    )
+    return build_messages(system, user, want_json=True, prefix=_doctor_prefix(task_type, language))
+
+
+def _consult_result(raw: str | None, exc: Exception | None, task_type: str, language: str) -> dict:
+    if exc is None:
+        try:
+            result = SCHEMAS.get(task_type, _SCHEMA_QUICK).parse(raw or "")
+        except SchemaError as err:
+            logger.warning("DoctorSupport.consult invalid response: %s", err)
+            result = {"error": "AI javob qayta ishlashda xatolik", "raw": (raw or "")[:200]}
+    else:
+        logger.error("DoctorSupport.consult failed: %s", exc)
+        result = {"error": str(exc)}
+
+    result["_task_type"] = task_type
+    result["_language"]  = language
+    return result
+
+
 def doctor_consult(
     patient_data: dict,
     query: str = "",
@@ -251,35 +314,39 @@ def doctor_consult(
     Returns:
         Parsed JSON result dict.
     """
-    complaints  = str(patient_data.get("complaints", ""))
-    ptext       = patient_text(patient_data)
-    schema      = SCHEMAS.get(task_type, _SCHEMA_QUICK)
-    system      = _doctor_system_prompt(task_type, language, complaints)
-
-    user = (
-        f"BEMOR:\n{ptext}\n\n"
-        + (f"SHIFOKOR SO'ROVI:\n{query}\n\n" if query else "")
-        + f"Quyidagi JSON strukturada javob bering:\n{schema}"
-    )
-
     try:
         raw = call_model(
             Deployments.gpt4o(),
-            build_messages(system, user, want_json=True),
-            response_json=True,
+            _consult_messages(patient_data, query, task_type, language),
+            schema=SCHEMAS.get(task_type, _SCHEMA_QUICK),
             temperature=0.1,
             max_tokens=3000,
+            endpoint=f"doctor_{task_type}",
         )
-        result = parse_json(raw, f"doctor_{task_type}")
-        if not isinstance(result, dict):
-            result = {"error": "AI javob qayta ishlashda xatolik", "raw": raw[:200]}
     except Exception as exc:
-        logger.error("DoctorSupport.consult failed: %s", exc)
-        result = {"error": str(exc)}
+        return _consult_result(None, exc, task_type, language)
+    return _consult_result(raw, None, task_type, language)
 
-    result["_task_type"] = task_type
-    result["_language"]  = language
-    return result
+
+async def adoctor_consult(
+    patient_data: dict,
+    query: str = "",
+    task_type: str = TASK_QUICK_CONSULT,
+    language: str = "uz-L",
+) -> dict:
+    """doctor_consult ning asyncio varianti (ASGI)."""
+    try:
+        raw = await acall_model(
+            Deployments.gpt4o(),
+            _consult_messages(patient_data, query, task_type, language),
+            schema=SCHEMAS.get(task_type, _SCHEMA_QUICK),
+            temperature=0.1,
+            max_tokens=3000,
+            endpoint=f"doctor_{task_type}",
+        )
+    except Exception as exc:
+        return _consult_result(None, exc, task_type, language)
+    return _consult_result(raw, None, task_type, language)
 
 
 # ---------------------------------------------------------------------------
@@ -293,46 +360,18 @@ def doctor_consult_stream(
     language: str = "uz-L",
 ) -> Iterator[str]:
     """
-    Stream tokens from GPT-4o for Doctor Support Mode.
+    Stream tokens for Doctor Support Mode (Gemini: generate_content_stream).
     Yields raw text chunks; caller wraps in SSE format.
     """
-    ptext  = patient_text(patient_data)
-    schema = SCHEMAS.get(task_type, _SCHEMA_QUICK)
-    system = _doctor_system_prompt(task_type, language)
-
-    user = (
-        f"BEMOR:\n{ptext}\n\n"
-        + (f"SHIFOKOR SO'ROVI:\n{query}\n\n" if query else "")
-        + f"Quyidagi JSON strukturada javob bering:\n{schema}"
-    )
-
-    msgs = build_messages(system, user, want_json=True)
-
     try:
-        if USE_GEMINI:
-            full = call_model(
-                Deployments.gpt4o(),
-                msgs,
-                response_json=True,
-                temperature=0.1,
-                max_tokens=3000,
-            )
-            if full:
-                yield full
-        else:
-            client = gpt4o_client()
-            stream = client.chat.completions.create(
-                model=Deployments.gpt4o(),
-                messages=msgs,
-                temperature=0.1,
-                max_tokens=3000,
-                response_format={"type": "json_object"},
-                stream=True,
-            )
-            for chunk in stream:
-                delta = chunk.choices[0].delta.content or ""
-                if delta:
-                    yield delta
+        yield from stream_model(
+            Deployments.gpt4o(),
+            _consult_messages(patient_data, query, task_type, language),
+            schema=SCHEMAS.get(task_type, _SCHEMA_QUICK),
+            temperature=0.1,
+            max_tokens=3000,
+            endpoint="doctor_stream",
+        )
     except Exception as exc:
         logger.error("DoctorSupport stream failed: %s", exc)
         yield f'{{"error": "{exc}"}}'
\ No newline at end of file
@@ -2,10 +2,17 @@
 Gemini API helpers for AI Services.
 Uses google-genai (official SDK). API key from settings.GEMINI_API_KEY.
 """
-import json
+import asyncio
 import logging
+import threading
+import time
+from collections import deque
+
 from django.conf import settings
 
+from . import llm_cache, llm_governor, llm_policy, llm_telemetry, prompt_prefix, response_schemas, singleflight
+from .response_schemas import SchemaError, array, integer, obj, string
+
 logger = logging.getLogger(__name__)
 
 # Lazy client (api_key stripped in settings)
@@ -96,27 +103,372 @@ def _response_text(response):
     return ""
 
 
-def _call_gemini(prompt, model_name=GEMINI_FLASH, response_mime_type=None, max_output_tokens=8192):
-    """Call Gemini via google-genai Client. Returns response text."""
-    client = _get_client()
-    if not client:
-        raise RuntimeError("Gemini API key sozlanmagan. GEMINI_API_KEY ni .env ga kiriting.")
+def _usage_tokens(response):
+    usage = getattr(response, "usage_metadata", None)
+    return getattr(usage, "total_token_count", None) if usage else None
+
+
+def _generation_config(response_mime_type, max_output_tokens, response_schema=None):
     config = {"temperature": 0.1, "max_output_tokens": max_output_tokens}
     if response_mime_type:
         config["response_mime_type"] = response_mime_type
+    if response_schema:
+        # Structured output (response_schemas registri)  -  kesh kaliti sxemani ham o'z ichiga oladi
+        config["response_mime_type"] = "application/json"
+        config["response_schema"] = response_schema
+    return config
+
+
+def _keyed_config(config, prefix):
+    """Kesh kaliti uchun config: statik prefiks matni o'rniga uning digest'i."""
+    if prefix is None:
+        return config
+    return {**config, "system_instruction": prefix.digest}
+
+
+def _request_config(client, model_name, config, prefix, use_context_cache=True):
+    """So'rov config'i: statik prefiks cached content nomi yoki system_instruction sifatida."""
+    if prefix is None:
+        return config
+    name = prompt_prefix.cached_content(client, model_name, prefix) if use_context_cache else None
+    if name:
+        return {**config, "cached_content": name}
+    return {**config, "system_instruction": prefix.text}
+
+
+def _generate(client, model_name, prompt, config, prefix):
+    request = _request_config(client, model_name, config, prefix)
     try:
+        response = client.models.generate_content(model=model_name, contents=prompt, config=request)
+    except Exception as e:
+        if "cached_content" not in request or llm_governor.is_provider_429(e):
+            raise
+        # Cached content topilmadi / muddati o'tgan  -  bir marta inline qayta urinish
+        logger.warning("Gemini cached content rad etildi (%s), inline: %s", prefix.name, e)
+        prompt_prefix.drop(model_name, prefix)
         response = client.models.generate_content(
+            model=model_name, contents=prompt,
+            config=_request_config(client, model_name, config, prefix, use_context_cache=False),
+        )
+    prompt_prefix.note_usage(response)
+    return response
+
+
+async def _agenerate(client, model_name, prompt, config, prefix):
+    if prefix is not None and prompt_prefix.needs_create(model_name, prefix):
+        # caches.create sync SDK chaqiruvi  -  event loop'ni band qilmasin
+        request = await asyncio.to_thread(_request_config, client, model_name, config, prefix)
+    else:
+        request = _request_config(client, model_name, config, prefix)
+    try:
+        response = await client.aio.models.generate_content(model=model_name, contents=prompt, config=request)
+    except Exception as e:
+        if "cached_content" not in request or llm_governor.is_provider_429(e):
+            raise
+        logger.warning("Gemini cached content rad etildi (%s), inline: %s", prefix.name, e)
+        prompt_prefix.drop(model_name, prefix)
+        response = await client.aio.models.generate_content(
+            model=model_name, contents=prompt,
+            config=_request_config(client, model_name, config, prefix, use_context_cache=False),
+        )
+    prompt_prefix.note_usage(response)
+    return response
+
+
+def _call_gemini(prompt, model_name=GEMINI_FLASH, response_mime_type=None, max_output_tokens=8192,
+                 endpoint=None, use_cache=True, response_schema=None, prefix=None, validate=None):
+    """
+    Call Gemini via google-genai Client. Returns response text.
+
+    Javoblar llm_cache da (model, prompt, config) bo'yicha keshlanadi; endpoint TTL ni
+    tanlaydi. Deterministik bo'lmagan chaqiruvlar (chat) use_cache=False beradi.
+    Bir vaqtdagi bir xil chaqiruvlar singleflight orqali birlashtiriladi; haqiqiy API
+    chaqiruvi llm_governor (RPM/TPM bucket, ustuvorlik) ruxsatini kutadi.
+    prefix (prompt_prefix.StaticPrefix)  -  promptdan oldin keladigan statik tizim qismi:
+    Gemini cached content yoki system_instruction sifatida yuboriladi.
+    validate(text)  -  chaqiruvchining tekshiruvi (masalan schema.parse); xato bersa javob
+    qaytariladi, lekin keshga yozilmaydi.
+    """
+    client = _get_client()
+    if not client:
+        raise RuntimeError("Gemini API key sozlanmagan. GEMINI_API_KEY ni .env ga kiriting.")
+    config = _generation_config(response_mime_type, max_output_tokens, response_schema)
+    key = llm_cache.make_key(model_name, prompt, _keyed_config(config, prefix))
+    cacheable = use_cache and llm_cache.enabled()
+    if cacheable:
+        cached = llm_cache.get(key, endpoint)
+        if cached is not None:
+            llm_telemetry.record(model_name, endpoint, llm_telemetry.OUTCOME_CACHE_HIT, 0)
+            return cached
+    else:
+        llm_cache.note_bypass(endpoint)
+
+    est_tokens = llm_governor.estimate_tokens(prompt) + (prefix.tokens if prefix else 0)
+
+    def _fetch():
+        llm_governor.acquire(model_name, est_tokens)
+        t0 = time.monotonic()
+        try:
+            response = _generate(client, model_name, prompt, config, prefix)
+        except Exception as e:
+            llm_telemetry.record(model_name, endpoint, llm_telemetry.OUTCOME_ERROR,
+                                 (time.monotonic() - t0) * 1000, error=e)
+            if llm_governor.is_provider_429(e):
+                llm_governor.note_provider_429(model_name)
+            logger.exception("Gemini API xatosi: %s", e)
+            raise
+        llm_telemetry.record(model_name, endpoint, llm_telemetry.OUTCOME_OK,
+                             (time.monotonic() - t0) * 1000, response)
+        llm_governor.settle(model_name, est_tokens, _usage_tokens(response))
+        text = _response_text(response)
+        if not text:
+            raise ValueError("Gemini bo'sh javob qaytardi")
+        if cacheable:
+            llm_cache.put(key, text, endpoint, validate)
+        return text
+
+    # Parallel bir xil so'rovlar (double-click, ikki tab) bitta API chaqiruviga birlashadi
+    return singleflight.do(key, _fetch, peek=llm_cache.peek_shared if cacheable else None)
+
+
+async def _acall_gemini(prompt, model_name=GEMINI_FLASH, response_mime_type=None, max_output_tokens=8192,
+                        endpoint=None, use_cache=True, response_schema=None, prefix=None, validate=None):
+    """
+    _call_gemini ning asyncio varianti (client.aio). ASGI ostida konsilium agentlari
+    thread band qilmasdan bitta event loop'da parallel ishlaydi. Kesh va
+    single-flight semantikasi sync yo'l bilan bir xil.
+    """
+    client = _get_client()
+    if not client:
+        raise RuntimeError("Gemini API key sozlanmagan. GEMINI_API_KEY ni .env ga kiriting.")
+    config = _generation_config(response_mime_type, max_output_tokens, response_schema)
+    key = llm_cache.make_key(model_name, prompt, _keyed_config(config, prefix))
+    cacheable = use_cache and llm_cache.enabled()
+    if cacheable:
+        cached = llm_cache.get(key, endpoint)
+        if cached is not None:
+            llm_telemetry.record(model_name, endpoint, llm_telemetry.OUTCOME_CACHE_HIT, 0)
+            return cached
+    else:
+        llm_cache.note_bypass(endpoint)
+
+    est_tokens = llm_governor.estimate_tokens(prompt) + (prefix.tokens if prefix else 0)
+
+    async def _fetch():
+        await llm_governor.aacquire(model_name, est_tokens)
+        t0 = time.monotonic()
+        try:
+            response = await _agenerate(client, model_name, prompt, config, prefix)
+        except Exception as e:
+            llm_telemetry.record(model_name, endpoint, llm_telemetry.OUTCOME_ERROR,
+                                 (time.monotonic() - t0) * 1000, error=e)
+            if llm_governor.is_provider_429(e):
+                llm_governor.note_provider_429(model_name)
+            logger.exception("Gemini API xatosi: %s", e)
+            raise
+        llm_telemetry.record(model_name, endpoint, llm_telemetry.OUTCOME_OK,
+                             (time.monotonic() - t0) * 1000, response)
+        llm_governor.settle(model_name, est_tokens, _usage_tokens(response))
+        text = _response_text(response)
+        if not text:
+            raise ValueError("Gemini bo'sh javob qaytardi")
+        if cacheable:
+            llm_cache.put(key, text, endpoint, validate)
+        return text
+
+    return await singleflight.ado(key, _fetch)
+
+
+# ---------------------------------------------------------------------------
+# Streaming (SSE)  -  generate_content_stream
+# ---------------------------------------------------------------------------
+
+_stream_lock = threading.Lock()
+_stream_stats = {}
+_stream_ttft = {}
+
+
+def _record_stream(endpoint, outcome, ttft_ms=None, chars=0, total_ms=0):
+    name = endpoint or "default"
+    with _stream_lock:
+        row = _stream_stats.setdefault(name, {
+            "streams": 0, "ok": 0, "cached": 0, "errors": 0, "aborted": 0,
+            "chars": 0, "stream_ms_total": 0,
+        })
+        row["streams"] += 1
+        row[outcome] += 1
+        row["chars"] += chars
+        row["stream_ms_total"] += total_ms
+        if ttft_ms is not None and outcome == "ok":
+            _stream_ttft.setdefault(name, deque(maxlen=200)).append(ttft_ms)
+
+
+def stream_stats():
+    """Endpoint bo'yicha TTFT (p50/p90) va throughput (belgi/soniya)."""
+    with _stream_lock:
+        out = {k: dict(v) for k, v in _stream_stats.items()}
+        samples = {k: sorted(v) for k, v in _stream_ttft.items()}
+    for name, row in out.items():
+        ttft = samples.get(name)
+        if ttft:
+            row["ttft_ms_p50"] = ttft[len(ttft) // 2]
+            row["ttft_ms_p90"] = ttft[min(len(ttft) - 1, int(0.9 * len(ttft)))]
+        if row["stream_ms_total"]:
+            row["chars_per_sec"] = round(row["chars"] * 1000 / row["stream_ms_total"])
+    return out
+
+
+def _stream_gemini(prompt, model_name=GEMINI_FLASH, response_mime_type=None, max_output_tokens=8192,
+                   endpoint=None, use_cache=True, response_schema=None, prefix=None, validate=None):
+    """
+    Javobni generate_content_stream orqali bo'laklab yield qiladi  -  birinchi token
+    to'liq javobni kutmasdan SSE ga chiqadi. Kesh _call_gemini bilan umumiy: hit bo'lsa
+    butun javob bitta bo'lak, stream tugagach to'liq matn keshga yoziladi.
+    Har bir stream uchun TTFT / throughput log qilinadi (stream_stats()).
+    """
+    client = _get_client()
+    if not client:
+        raise RuntimeError("Gemini API key sozlanmagan. GEMINI_API_KEY ni .env ga kiriting.")
+    config = _generation_config(response_mime_type, max_output_tokens, response_schema)
+    key = llm_cache.make_key(model_name, prompt, _keyed_config(config, prefix))
+    cacheable = use_cache and llm_cache.enabled()
+    if cacheable:
+        cached = llm_cache.get(key, endpoint)
+        if cached is not None:
+            _record_stream(endpoint, "cached", chars=len(cached))
+            llm_telemetry.record(model_name, endpoint, llm_telemetry.OUTCOME_CACHE_HIT, 0)
+            yield cached
+            return
+    else:
+        llm_cache.note_bypass(endpoint)
+
+    est_tokens = llm_governor.estimate_tokens(prompt) + (prefix.tokens if prefix else 0)
+    llm_governor.acquire(model_name, est_tokens)
+
+    t0 = time.monotonic()
+    ttft_ms = None
+    parts = []
+    usage = None
+    last_chunk = None
+    error = None
+    outcome = "errors"
+    request = _request_config(client, model_name, config, prefix)
+    try:
+        for chunk in client.models.generate_content_stream(
             model=model_name,
             contents=prompt,
-            config=config,
-        )
+            config=request,
+        ):
+            usage = _usage_tokens(chunk) or usage
+            if getattr(chunk, "usage_metadata", None) is not None:
+                last_chunk = chunk
+            prompt_prefix.note_usage(chunk)
+            text = getattr(chunk, "text", None) or ""
+            if not text:
+                continue
+            if ttft_ms is None:
+                ttft_ms = int((time.monotonic() - t0) * 1000)
+            parts.append(text)
+            yield text
+        if not parts:
+            raise ValueError("Gemini bo'sh javob qaytardi")
+        outcome = "ok"
+    except GeneratorExit:
+        outcome = "aborted"   # mijoz ulanishni uzdi
+        raise
     except Exception as e:
-        logger.exception("Gemini API xatosi: %s", e)
+        error = e
+        if llm_governor.is_provider_429(e):
+            llm_governor.note_provider_429(model_name)
+        elif "cached_content" in request and not parts:
+            prompt_prefix.drop(model_name, prefix)   # keyingi urinish yangisini yaratadi
+        logger.exception("Gemini stream xatosi: %s", e)
         raise
-    text = _response_text(response)
-    if not text:
-        raise ValueError("Gemini bo'sh javob qaytardi")
-    return text
+    finally:
+        total_ms = int((time.monotonic() - t0) * 1000)
+        chars = sum(len(p) for p in parts)
+        _record_stream(endpoint, outcome, ttft_ms, chars, total_ms)
+        llm_telemetry.record(model_name, endpoint, {"ok": llm_telemetry.OUTCOME_OK, "aborted": "aborted"}.get(
+            outcome, llm_telemetry.OUTCOME_ERROR), total_ms, last_chunk, error=error)
+        llm_governor.settle(model_name, est_tokens, usage)
+        logger.info(
+            "Gemini stream %s [%s]: %s, ttft=%s ms, %d chunks, %d chars in %d ms (%d chars/s)",
+            endpoint or "default", model_name, outcome,
+            ttft_ms if ttft_ms is not None else "-", len(parts), chars, total_ms,
+            chars * 1000 // total_ms if total_ms else 0,
+        )
+
+    if cacheable:
+        llm_cache.put(key, "".join(parts), endpoint, validate)
+
+
+# ---------------------------------------------------------------------------
+# Retry / fallback siyosatlari (llm_policy)
+# ---------------------------------------------------------------------------
+
+_QUESTIONS_POLICY = llm_policy.RetryPolicy(
+    name="clarifying_questions",
+    attempts=((GEMINI_PRO, False), (GEMINI_PRO, True), (GEMINI_FLASH, False), (GEMINI_FLASH, True)),
+    hedge=True,
+)
+
+_SPECIALISTS_POLICY = llm_policy.RetryPolicy(
+    name="recommend_specialists",
+    attempts=((GEMINI_PRO, True), (GEMINI_PRO, False), (GEMINI_FLASH, True), (GEMINI_FLASH, False)),
+    hedge=True,
+)
+
+
+def _diagnoses_policy():
+    model_order = []
+    for m in (
+        GEMINI_FLASH,
+        "gemini-2.5-flash",
+        "gemini-2.0-flash",
+        "gemini-3-flash-preview",
+        GEMINI_PRO,
+        "gemini-2.5-pro",
+        "gemini-3-pro-preview",
+    ):
+        if m and m not in model_order:
+            model_order.append(m)
+    attempts = []
+    for m in model_order:
+        attempts.extend(((m, True), (m, False)))
+    return llm_policy.RetryPolicy(name="generate_diagnoses", attempts=tuple(attempts))
+
+
+_DIAGNOSES_POLICY = _diagnoses_policy()
+
+
+_QUESTIONS_SCHEMA = response_schemas.register(
+    "gemini_clarifying_questions", array(string("Savol"), max_items=8), unwrap=("questions",),
+)
+
+_SPECIALISTS_SCHEMA = response_schemas.register("gemini_specialists", obj({
+    "recommendations": array(obj({
+        "model":  string("Ro'yxatdagi aniq nom"),
+        "reason": string("Sabab", max_length=200),
+    }, required=("model",)), min_items=1),
+}, required=("recommendations",)))
+
+_DIAGNOSES_SCHEMA = response_schemas.register("gemini_diagnoses", array(obj({
+    "name":               string("O'zbekcha"),
+    "probability":        integer(minimum=0, maximum=100),
+    "justification":      string(max_length=500),
+    "evidenceLevel":      string(enum=("High", "Moderate", "Low")),
+    "reasoningChain":     array(string("Qisqa qadam")),
+    "uzbekProtocolMatch": string(max_length=300),
+}, required=("name",)), min_items=1, max_items=8))
+
+
+def _validated(schema, raw, context):
+    """response_schemas; mos kelmasa InvalidResponse (retry policy keyingi urinishga o'tadi)."""
+    try:
+        return schema.parse(raw)
+    except SchemaError as e:
+        logger.warning("Gemini %s: invalid response (%s), raw=%s", context, e, (raw or "")[:500])
+        raise llm_policy.InvalidResponse(f"{context}: javob sxemaga mos emas") from e
 
 
 def generate_clarifying_questions(patient_data):
@@ -134,47 +486,23 @@ TAQIQLANGAN: Umumiy tibbiy savollar (har qanday kasallikka mos keladigan), shabl
 
 3–5 ta qisqa savol. Har biri shikoyat matnidagi aniq narsaga murojaat qilsin.
 Javobni faqat JSON massiv: ["Savol 1?", "Savol 2?"]. O'zbek tilida (Lotin)."""
-    raw = None
-    last_exc = None
-    for model in (GEMINI_PRO, GEMINI_FLASH):
-        for use_json in (False, True):
-            try:
-                raw = _call_gemini(
-                    prompt, model,
-                    response_mime_type="application/json" if use_json else None,
-                )
-                break
-            except Exception as e:
-                last_exc = e
-                logger.warning("Gemini clarifying_questions (model=%s, use_json=%s) failed: %s", model, use_json, e)
-        if raw:
-            break
-    if not raw and last_exc is not None:
-        raise last_exc
-    if not raw:
-        return []
-    # Clean up markdown code blocks and extra whitespace
-    raw = (raw or "").replace("```json", "").replace("```", "").replace("```text", "").strip()
+
+    def _call(model, use_json):
+        return _call_gemini(
+            prompt, model,
+            response_mime_type="application/json" if use_json else None,
+            endpoint="clarifying_questions",
+            response_schema=_QUESTIONS_SCHEMA.schema if use_json else None,
+            validate=_QUESTIONS_SCHEMA.parse,
+        )
+
+    def _parse(raw):
+        return [q for q in _validated(_QUESTIONS_SCHEMA, raw, "clarifying_questions") if q.strip()]
+
     try:
-        data = json.loads(raw)
-    except json.JSONDecodeError as e:
-        logger.warning("Gemini clarifying_questions: invalid JSON (error=%s), raw=%s", e, raw[:500])
-        # Try to extract array from text using regex
-        import re
-        match = re.search(r'\[[\s\S]*\]', raw)
-        if match:
-            try:
-                data = json.loads(match.group(0))
-                logger.info("Successfully extracted JSON array from malformed response")
-            except json.JSONDecodeError:
-                return []
-        else:
-            return []
-    if isinstance(data, list):
-        return [str(q) for q in data if q][:8]
-    if isinstance(data, dict) and "questions" in data:
-        return [str(q) for q in data["questions"] if q][:8]
-    return []
+        return llm_policy.run(_QUESTIONS_POLICY, _call, _parse).value
+    except llm_policy.InvalidResponse:
+        return []
 
 
 def recommend_specialists(patient_data):
@@ -188,53 +516,37 @@ def recommend_specialists(patient_data):
 
 Ushbu klinik holat uchun 5–6 ta mutaxassis tanlang. Faqat quyidagi nomlardan: {names_str}.
 Har biri uchun qisqa, aniq sabab bering (shikoyat yoki holatga nima uchun shu mutaxassis kerak). Javobni aniq quyidagi formatda JSON qaytaring:
-{{ "recommendations": [ {{ "model": "Nom exactly from list", "reason": "Sabab" }} ] }}
+{_SPECIALISTS_SCHEMA.hint}
 O'zbek tilida (Lotin)."""
-    last_exc = None
-    for model_name in (GEMINI_PRO, GEMINI_FLASH):
-        for use_json in (True, False):
-            try:
-                raw = _call_gemini(
-                    prompt, model_name,
-                    response_mime_type="application/json" if use_json else None,
-                )
-                # Clean up markdown code blocks and extra whitespace
-                raw = (raw or "").replace("```json", "").replace("```", "").replace("```text", "").strip()
-                try:
-                    data = json.loads(raw)
-                except json.JSONDecodeError as e:
-                    logger.warning("Gemini recommend_specialists: invalid JSON (error=%s), raw=%s", e, raw[:500])
-                    # Try to extract object from text using regex
-                    import re
-                    match = re.search(r'\{[\s\S]*\}', raw)
-                    if match:
-                        try:
-                            data = json.loads(match.group(0))
-                            logger.info("Successfully extracted JSON object from malformed response")
-                        except json.JSONDecodeError:
-                            raise
-                    else:
-                        raise
-                
-                recs = (data or {}).get("recommendations") or []
-                out = []
-                for r in recs:
-                    model = (r.get("model") or "").strip()
-                    if model not in SPECIALIST_NAMES:
-                        for n in SPECIALIST_NAMES:
-                            if n.lower() in model.lower() or model.lower() in n.lower():
-                                model = n
-                                break
-                    if model in SPECIALIST_NAMES:
-                        out.append({"model": model, "reason": (r.get("reason") or "Holatga mos.")[:200]})
-                if out:
-                    return out[:8]
-            except Exception as e:
-                last_exc = e
-                logger.warning("Gemini recommend_specialists (model=%s, json=%s) failed: %s", model_name, use_json, e)
-    if last_exc is not None:
-        raise last_exc
-    return []
+
+    def _match(recs):
+        out = []
+        for r in recs:
+            model = r["model"].strip()
+            if model not in SPECIALIST_NAMES:
+                for n in SPECIALIST_NAMES:
+                    if n.lower() in model.lower() or model.lower() in n.lower():
+                        model = n
+                        break
+            if model in SPECIALIST_NAMES:
+                out.append({"model": model, "reason": (r.get("reason") or "Holatga mos.")[:200]})
+        if not out:
+            raise llm_policy.InvalidResponse("recommend_specialists: mos mutaxassis yo'q")
+        return out[:8]
+
+    def _call(model, use_json):
+        return _call_gemini(
+            prompt, model,
+            response_mime_type="application/json" if use_json else None,
+            endpoint="recommend_specialists",
+            response_schema=_SPECIALISTS_SCHEMA.schema if use_json else None,
+            validate=lambda raw: _match(_SPECIALISTS_SCHEMA.parse(raw)["recommendations"]),
+        )
+
+    def _parse(raw):
+        return _match(_validated(_SPECIALISTS_SCHEMA, raw, "recommend_specialists")["recommendations"])
+
+    return llm_policy.run(_SPECIALISTS_POLICY, _call, _parse).value
 
 
 def generate_diagnoses(patient_data):
@@ -250,82 +562,34 @@ def generate_diagnoses(patient_data):
 Har biri uchun: name (o'zbekcha), probability (0–100), justification, evidenceLevel (High/Moderate/Low), reasoningChain (qisqa qadamlar massivi), uzbekProtocolMatch.
 AMALIY: justification va reasoningChain dalilli va qisqa bo'lsin; uzbekProtocolMatch da SSV protokol nomi yoki yo'nalishi keltiring (masalan: Arterial gipertenziya bo'yicha SSV protokoliga muvofiq).
 ANIQLIK: probability ni dalil kuchiga mos qo'ying; ma'lumot yetishmasa pastroq bering. Eng ehtimolini birinchi qo'ying. reasoningChain da har qadam "nima uchun" javob bersin. Taxminiy tashxisni yakuniy deb yozmang.
-Javobni faqat JSON massiv qilib qaytaring, masalan:
-[ {{ "name": "...", "probability": 70, "justification": "...", "evidenceLevel": "High", "reasoningChain": ["...", "..."], "uzbekProtocolMatch": "..." }} ]
+Javobni faqat JSON massiv qilib qaytaring (* majburiy maydon):
+{_DIAGNOSES_SCHEMA.hint}
 O'zbek tilida (Lotin)."""
-    import re
 
-    model_order = []
-    for m in (
-        GEMINI_FLASH,
-        "gemini-2.5-flash",
-        "gemini-2.0-flash",
-        "gemini-3-flash-preview",
-        GEMINI_PRO,
-        "gemini-2.5-pro",
-        "gemini-3-pro-preview",
-    ):
-        if m and m not in model_order:
-            model_order.append(m)
+    def _call(model_name, use_json):
+        return _call_gemini(
+            prompt,
+            model_name,
+            response_mime_type="application/json" if use_json else None,
+            max_output_tokens=4096,
+            endpoint="generate_diagnoses",
+            response_schema=_DIAGNOSES_SCHEMA.schema if use_json else None,
+            validate=_DIAGNOSES_SCHEMA.parse,
+        )
+
+    def _parse(raw):
+        # Tur, chegaralar (0-100, 500/300 belgi), max 8 ta  -  sxema tekshiruvida
+        return [{
+            "name": d["name"].strip(),
+            "probability": d.get("probability", 50),
+            "justification": d.get("justification", ""),
+            "evidenceLevel": d.get("evidenceLevel", "Moderate"),
+            "reasoningChain": [x.strip() for x in d.get("reasoningChain", ()) if x.strip()],
+            "uzbekProtocolMatch": d.get("uzbekProtocolMatch", ""),
+        } for d in _validated(_DIAGNOSES_SCHEMA, raw, "generate_diagnoses")]
 
-    for model_name in model_order:
-        for use_json in (True, False):
-            try:
-                raw = _call_gemini(
-                    prompt,
-                    model_name,
-                    response_mime_type="application/json" if use_json else None,
-                    max_output_tokens=4096,
-                )
-                raw = (raw or "").replace("```json", "").replace("```", "").replace("```text", "").strip()
-                try:
-                    data = json.loads(raw)
-                except json.JSONDecodeError as e:
-                    logger.warning(
-                        "Gemini generate_diagnoses: invalid JSON (model=%s, error=%s), raw=%s",
-                        model_name,
-                        e,
-                        raw[:500],
-                    )
-                    match = re.search(r'\[[\s\S]*\]', raw)
-                    if match:
-                        try:
-                            data = json.loads(match.group(0))
-                        except json.JSONDecodeError:
-                            continue
-                    else:
-                        continue
-
-                if not isinstance(data, list):
-                    data = [data] if isinstance(data, dict) else []
-                out = []
-                for d in data[:8]:
-                    if not isinstance(d, dict):
-                        continue
-                    name = (d.get("name") or "Tashxis").strip()
-                    prob = max(0, min(100, int(d.get("probability", 50))))
-                    rc = d.get("reasoningChain")
-                    if isinstance(rc, list):
-                        reasoning_chain = [str(x).strip() for x in rc if str(x).strip()]
-                    elif isinstance(rc, str) and rc.strip():
-                        reasoning_chain = [rc.strip()]
-                    else:
-                        reasoning_chain = []
-                    out.append({
-                        "name": name,
-                        "probability": prob,
-                        "justification": (d.get("justification") or "")[:500],
-                        "evidenceLevel": (d.get("evidenceLevel") or "Moderate")[:50],
-                        "reasoningChain": reasoning_chain,
-                        "uzbekProtocolMatch": (d.get("uzbekProtocolMatch") or "")[:300],
-                    })
-                if out:
-                    return out
-            except Exception as e:
-                logger.warning(
-                    "Gemini generate_diagnoses (model=%s, json=%s) failed: %s",
-                    model_name,
-                    use_json,
-                    e,
-                )
-    return []
+    try:
+        return llm_policy.run(_DIAGNOSES_POLICY, _call, _parse).value
+    except Exception as e:
+        logger.warning("Gemini generate_diagnoses: all attempts failed: %s", e)
+        return []
@@ -0,0 +1,107 @@
+"""
+So'rov bo'yicha guard konteksti: JSON body bir marta parse qilinadi, guard natijalari
+shu so'rov ichida qayta ishlatiladi.
+
+Avval himoyalangan yo'llarda body 2-4 marta o'qilardi: AnatomyGuardMiddleware
+json.loads(request.body), keyin DRF JSONParser (yoki async view'lar) yana parse qilardi,
+keyin views._run_filter va @anatomy_guard o'z tekshiruvlarini qaytadan ishga tushirardi.
+Endi:
+  - attach(request)  -  body bir marta parse qilinib HttpRequest ga biriktiriladi
+    (middleware yoki async view, qaysi biri birinchi bo'lsa)
+  - ContextJSONParser  -  DRF request.data shu payload'ni qaytaradi (qayta decode yo'q)
+  - GuardContext.memo(key, subject, fn)  -  AnatomyGuard / PhysiologyFilter Level 1 va
+    Level 2 natijalari shu patient_data obyekti uchun bir marta hisoblanadi
+Kontekst faqat bitta so'rov umri davomida yashaydi. Hisoblagichlar stats() da (health/detailed).
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+from rest_framework.parsers import JSONParser
+
+_ATTR = "_guard_context"
+
+_lock = threading.Lock()
+_counters: Counter[str] = Counter()
+
+
+def _count(name: str) -> None:
+    with _lock:
+        _counters[name] += 1
+
+
+@dataclass
+class GuardContext:
+    payload: Any = None                 # json.loads natijasi
+    error:   Optional[str] = None       # body JSON emas
+    results: dict[str, tuple[Any, Any]] = field(default_factory=dict)   # key -> (subject, natija)
+
+    @property
+    def patient_data(self) -> Any:
+        if not isinstance(self.payload, dict):
+            return {}
+        return self.payload.get("patient_data") or {}
+
+    def memo(self, key: str, subject: Any, fn: Callable[[], Any]) -> Any:
+        """key bo'yicha natija; subject (patient_data) aynan o'sha obyekt bo'lsagina qayta ishlatiladi."""
+        entry = self.results.get(key)
+        if entry is not None and entry[0] is subject:
+            _count("memo_hits")
+            return entry[1]
+        value = fn()
+        self.results[key] = (subject, value)
+        return value
+
+
+def _django_request(request: Any) -> Any:
+    return getattr(request, "_request", request)     # DRF Request -> HttpRequest
+
+
+def current(request: Any) -> Optional[GuardContext]:
+    """Biriktirilgan kontekst yoki None (request None bo'lishi ham mumkin)."""
+    if request is None:
+        return None
+    return getattr(_django_request(request), _ATTR, None)
+
+
+def attach(request: Any) -> GuardContext:
+    """Body ni bir marta parse qilib kontekstni biriktiradi; mavjud bo'lsa o'shani qaytaradi."""
+    target = _django_request(request)
+    ctx = getattr(target, _ATTR, None)
+    if ctx is not None:
+        _count("body_reused")
+        return ctx
+    ctx = GuardContext()
+    try:
+        ctx.payload = json.loads(target.body.decode("utf-8") or "{}")
+    except (ValueError, UnicodeDecodeError) as exc:
+        ctx.error = str(exc)
+    _count("body_parsed")
+    setattr(target, _ATTR, ctx)
+    return ctx
+
+
+def memo(ctx: Optional[GuardContext], key: str, subject: Any, fn: Callable[[], Any]) -> Any:
+    """ctx bo'lsa GuardContext.memo, bo'lmasa fn()  -  guard'lar kontekstsiz ham ishlaydi."""
+    return ctx.memo(key, subject, fn) if ctx is not None else fn()
+
+
+class ContextJSONParser(JSONParser):
+    """DRF JSONParser: guard konteksti body ni allaqachon parse qilgan bo'lsa o'shani qaytaradi."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        ctx = current((parser_context or {}).get("request"))
+        if ctx is not None and ctx.error is None:
+            _count("body_reused")
+            return ctx.payload
+        return super().parse(stream, media_type, parser_context)
+
+
+def stats() -> dict[str, int]:
+    with _lock:
+        return dict(_counters)
@@ -0,0 +1,200 @@
+"""
+Guard qoidalari registri: physiology_filter va anatomy_guard Level 1 uchun umumiy kompilyatsiya
+qilingan dvigatel.
+
+Avval har bir so'rovda xom regex satrlari ro'yxati aylanib chiqilardi: har bir qoida uchun
+re.search(pattern, text.lower(), re.IGNORECASE)  -  re keshidan qidirish va matnni N marta
+to'liq skanerlash. Endi:
+  - qoidalar (kategoriya, teg, pattern) modul import paytida register() bilan bir marta
+    kompilyatsiya qilinadi
+  - har bir qoidadan majburiy boshlang'ich literallar (trigger) ajratiladi: r"\\b(jigar|yurak)\\b.{0,40}..."
+    -> {"jigar", "yurak"}; barcha to'plam trigger'lari bitta literal alternatsiyaga
+    birlashtiriladi (Aho-Corasick o'rnida  -  C regex dvigateli)
+  - first(text): kichik harfli matn bir marta skanerlanadi (overlapping lookahead), faqat
+    trigger'i topilgan qoidalar tartib bo'yicha to'liq regex bilan tasdiqlanadi va birinchi
+    mos qoida qaytadi  -  eski ustuvorlik (anatomic > deceptive > injection) saqlanadi.
+    Haqiqiy shikoyatlarda odatda 0-2 qoida tasdiqlanadi
+  - trigger ajratib bo'lmaydigan qoidalar (masalan r"i\\s+am") har doim tekshiriladi
+Qoidalar ularni ishlatadigan modulda e'lon qilinadi (response_schemas kabi):
+
+    _RULES = guard_rules.register("anatomy_guard", [("anatomic", "tag", r"..."), ...])
+    rule   = _RULES.first(text)          # Rule | None
+
+Hisoblagichlar stats() da (health/detailed); benchmark: manage.py bench_guard_rules.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from re import _constants as sre_constants, _parser as sre_parse
+from typing import Any, Optional, Sequence
+
+_FLAGS = re.IGNORECASE
+_MIN_TRIGGER = 2          # bundan qisqa trigger foydasiz  -  qoida har doim tekshiriladi
+_MAX_TRIGGERS = 64        # bitta qoida uchun (char class kengaytmasi portlamasligi uchun)
+
+
+@dataclass(frozen=True)
+class Rule:
+    category: str        # "anatomic" | "deceptive" | "injection" | ...
+    tag:      str
+    pattern:  re.Pattern = field(repr=False)
+
+
+# ---------------------------------------------------------------------------
+# Stats
+# ---------------------------------------------------------------------------
+
+_stats_lock = threading.Lock()
+_stats: dict[str, Counter[str]] = {}
+
+
+def _record(name: str, outcome: str, elapsed: float) -> None:
+    with _stats_lock:
+        counts = _stats.setdefault(name, Counter())
+        counts[outcome] += 1
+        counts["checks"] += 1
+        counts["_ns"] += int(elapsed * 1e9)
+
+
+# ---------------------------------------------------------------------------
+# Trigger extraction  -  pattern boshidagi majburiy literallar
+# ---------------------------------------------------------------------------
+
+def _prefixes(items) -> tuple[set[str], bool]:
+    """
+    (prefikslar, to'liq): har qanday moslik shu prefikslardan biri bilan boshlanadi.
+    to'liq=False  -  keyingi elementlar qo'shilmagan (takrorlash, \\s, . va h.k.).
+    """
+    out = {""}
+    for op, av in items:
+        if op is sre_constants.AT:                     # \b, ^  -  nol kenglik
+            continue
+        if op is sre_constants.LITERAL:
+            out = {p + chr(av) for p in out}
+            continue
+        if op is sre_constants.IN:
+            chars = [chr(v) for o, v in av if o is sre_constants.LITERAL]
+            if len(chars) != len(av) or len(out) * len(chars) > _MAX_TRIGGERS:
+                return out, False
+            out = {p + ch for p in out for ch in chars}
+            continue
+        if op is sre_constants.SUBPATTERN:
+            sub, complete = _prefixes(av[-1])
+        elif op is sre_constants.BRANCH:
+            sub, complete = set(), True
+            for branch in av[1]:
+                found, done = _prefixes(branch)
+                sub |= found
+                complete = complete and done
+        else:
+            return out, False
+        if len(out) * len(sub) > _MAX_TRIGGERS:
+            return out, False
+        out = {p + q for p in out for q in sub}
+        if not complete:
+            return out, False
+    return out, True
+
+
+def _triggers(pattern: str) -> Optional[frozenset[str]]:
+    """Qoida uchun trigger'lar (kichik harf); ajratib bo'lmasa None  -  qoida har doim tekshiriladi."""
+    try:
+        found, _ = _prefixes(sre_parse.parse(pattern, _FLAGS))
+    except Exception:
+        return None
+    found = {t.lower() for t in found}
+    if not found or min(map(len, found)) < _MIN_TRIGGER:
+        return None
+    return frozenset(found)
+
+
+# ---------------------------------------------------------------------------
+# Rule sets
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True, eq=False)
+class RuleSet:
+    name:     str
+    rules:    tuple[Rule, ...]
+    _always:  frozenset[int] = field(repr=False)
+    _targets: dict[str, frozenset[int]] = field(repr=False)     # trigger -> qoida indekslari
+    _scan:    Optional[re.Pattern] = field(repr=False)
+
+    def candidates(self, text: str) -> list[int]:
+        """Trigger'i matnda uchragan (yoki trigger'siz) qoidalar indekslari, tartib bo'yicha."""
+        hits = set(self._always)
+        if self._scan is not None:
+            for trigger in self._scan.findall(text.lower()):
+                hits |= self._targets[trigger]
+        return sorted(hits)
+
+    def first(self, text: str) -> Optional[Rule]:
+        """Tartib bo'yicha birinchi mos qoida; hech biri mos kelmasa None."""
+        t0 = time.perf_counter()
+        if text:
+            for i in self.candidates(text):
+                rule = self.rules[i]
+                if rule.pattern.search(text):
+                    _record(self.name, f"{rule.category}:{rule.tag}", time.perf_counter() - t0)
+                    return rule
+        _record(self.name, "clean", time.perf_counter() - t0)
+        return None
+
+
+_registry: dict[str, RuleSet] = {}
+
+
+def register(name: str, rules: Sequence[tuple[str, str, str]]) -> RuleSet:
+    """
+    (kategoriya, teg, pattern) ro'yxatini kompilyatsiya qilib registrga qo'shadi.
+    Qoida o'ziga xos flag kerak bo'lsa patternda scoped flag ishlatiladi: (?s:...).
+    """
+    compiled = tuple(Rule(category, tag, re.compile(pattern, _FLAGS)) for category, tag, pattern in rules)
+    always, owners = set(), {}
+    for i, rule in enumerate(compiled):
+        triggers = _triggers(rule.pattern.pattern)
+        if triggers is None:
+            always.add(i)
+            continue
+        for trigger in triggers:
+            owners.setdefault(trigger, set()).add(i)
+    # Lookahead bir pozitsiyada faqat eng uzun trigger'ni qaytaradi  -  shu pozitsiyada
+    # boshlanadigan qisqaroq trigger'lar (uning prefikslari) qoidalari ham qo'shiladi
+    targets = {
+        trigger: frozenset().union(*(ids for other, ids in owners.items() if trigger.startswith(other)))
+        for trigger in owners
+    }
+    scan = None
+    if targets:
+        alternation = "|".join(re.escape(t) for t in sorted(targets, key=len, reverse=True))
+        scan = re.compile(f"(?=({alternation}))")
+    entry = RuleSet(name, compiled, frozenset(always), targets, scan)
+    _registry[name] = entry
+    return entry
+
+
+def get(name: str) -> RuleSet:
+    return _registry[name]
+
+
+def registered() -> dict[str, RuleSet]:
+    return dict(_registry)
+
+
+def stats() -> dict[str, Any]:
+    """To'plam bo'yicha: tekshiruvlar, clean / teg bo'yicha bloklar, o'rtacha vaqt (us)."""
+    with _stats_lock:
+        out = {}
+        for name, counts in _stats.items():
+            row = {k: v for k, v in counts.items() if k != "_ns"}
+            row["avg_us"] = round(counts["_ns"] / counts["checks"] / 1000, 1) if counts["checks"] else 0
+            entry = _registry.get(name)
+            row["rules"] = len(entry.rules) if entry else 0
+            row["triggers"] = len(entry._targets) if entry else 0
+            out[name] = row
+        return out
@@ -0,0 +1,148 @@
+"""
+Guard Level 2 (AI semantik tekshiruv) verdiktlari keshi.
+
+physiology_filter / anatomy_guard Level 2 har bir himoyalangan so'rovda mini model
+chaqiradi; bir xil yoki deyarli bir xil shikoyatlar qayta-qayta tekshirilardi. Endi:
+  - kalit  -  normallashtirilgan matn fingerprint'i: kichik harf, apostrof variantlari
+    (' ' ʻ ʼ `) bitta ', tinish belgilari va bo'shliqlar bitta probel; sha256
+  - qiymat  -  (status, reason) va tekshiruv davomiyligi (tejalgan vaqt hisobi uchun)
+  - Django cache (REDIS_URL bo'lsa workerlar o'rtasida umumiy), TTL
+    settings.AI_GUARD_VERDICT_TTL
+Faqat muvaffaqiyatli verdiktlar saqlanadi: AI xatosi yoki "status"siz / o'qib bo'lmaydigan
+javob (fail-open) keshlanmaydi  -  from_reply() None qaytaradi.
+
+Async view'lar Level 2 ni birinchi AI bosqichi bilan parallel ishga tushiradi
+(physiology_filter.arun_guarded); guard bloklasa bosqich bekor qilinadi. note_overlap()
+shu yo'l hisoblagichlari. Hammasi stats() da (health/detailed).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = "guard:l2:"
+_APOSTROPHES = str.maketrans({c: "'" for c in "‘’ʻʼ`´"})
+_NOISE = re.compile(r"[^\w']+")
+
+
+@dataclass(frozen=True)
+class Verdict:
+    status: str          # "ok" | "anatomic" | "anatomic_error" | "physiologic" | "deceptive" | ...
+    reason: str = ""
+
+    @property
+    def passed(self) -> bool:
+        return self.status == "ok"
+
+
+def from_reply(data: Any) -> Optional[Verdict]:
+    """Mini model JSON javobi -> Verdict; dict emas yoki "status" yo'q bo'lsa None (tekshiruv bo'lmadi)."""
+    if not isinstance(data, dict):
+        return None
+    status = str(data.get("status") or "").strip().lower()
+    if not status:
+        return None
+    return Verdict(status, str(data.get("reason", "")))
+
+
+# ---------------------------------------------------------------------------
+# Settings
+# ---------------------------------------------------------------------------
+
+def enabled() -> bool:
+    return bool(getattr(settings, "AI_GUARD_VERDICT_CACHE_ENABLED", True))
+
+
+def _ttl() -> int:
+    return int(getattr(settings, "AI_GUARD_VERDICT_TTL", 21600))
+
+
+# ---------------------------------------------------------------------------
+# Fingerprint
+# ---------------------------------------------------------------------------
+
+def normalize(text: str) -> str:
+    return _NOISE.sub(" ", str(text).lower().translate(_APOSTROPHES)).strip()
+
+
+def fingerprint(guard: str, text: str) -> str:
+    """Guard nomi + normallashtirilgan matn -> kalit (registr, tinish belgilari farqi yo'q)."""
+    return hashlib.sha256(f"{guard}\0{normalize(text)}".encode("utf-8")).hexdigest()[:32]
+
+
+# ---------------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------------
+
+_lock = threading.Lock()
+_counters: dict[str, Counter[str]] = {}
+
+
+def _bump(guard: str, field: str, n: float = 1) -> None:
+    with _lock:
+        _counters.setdefault(guard, Counter())[field] += n
+
+
+def get(guard: str, text: str) -> Optional[Verdict]:
+    """Keshdagi verdikt yoki None. Kesh xatosi  -  miss (fail-open)."""
+    if not enabled():
+        return None
+    try:
+        from django.core.cache import cache
+        entry = cache.get(_KEY_PREFIX + fingerprint(guard, text))
+    except Exception as exc:
+        logger.warning("Guard verdict cache get failed: %s", exc)
+        entry = None
+    if not entry:
+        _bump(guard, "misses")
+        return None
+    _bump(guard, "hits")
+    _bump(guard, "saved_ms", int(entry.get("ms", 0)))
+    return Verdict(entry["status"], entry.get("reason", ""))
+
+
+def put(guard: str, text: str, verdict: Verdict, elapsed_ms: float) -> None:
+    if not enabled():
+        return
+    try:
+        from django.core.cache import cache
+        cache.set(
+            _KEY_PREFIX + fingerprint(guard, text),
+            {"status": verdict.status, "reason": verdict.reason, "ms": int(elapsed_ms)},
+            _ttl(),
+        )
+        _bump(guard, "stored")
+        _bump(guard, "check_ms", int(elapsed_ms))
+    except Exception as exc:
+        logger.warning("Guard verdict cache set failed: %s", exc)
+
+
+def note_overlap(guard: str, outcome: str, saved_ms: float = 0) -> None:
+    """Parallel yo'l: outcome = "passed" | "blocked" | "cancelled" (bosqich bekor qilindi)."""
+    _bump(guard, f"parallel_{outcome}")
+    if saved_ms > 0:
+        _bump(guard, "overlap_saved_ms", int(saved_ms))
+
+
+def stats() -> dict[str, Any]:
+    """Guard bo'yicha: hits/misses, hit_rate, tejalgan ms (kesh + parallel), bekor qilingan bosqichlar."""
+    with _lock:
+        out = {}
+        for guard, counts in _counters.items():
+            lookups = counts["hits"] + counts["misses"]
+            out[guard] = {
+                **dict(counts),
+                "hit_rate": round(counts["hits"] / lookups, 3) if lookups else 0.0,
+                "avg_check_ms": round(counts["check_ms"] / counts["stored"]) if counts["stored"] else 0,
+            }
+        return out
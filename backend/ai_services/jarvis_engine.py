@@ -26,8 +26,9 @@ from typing import Iterator
 from django.core.cache import cache
 from django.utils import timezone
 
-from .azure_utils import call_model, Deployments, gpt4o_client, parse_json
-from .uzbekistan_knowledge_base import get_uz_context
+from . import prompt_prefix
+from .azure_utils import call_model, Deployments, parse_json, prefix_message, stream_model
+from .uzbekistan_knowledge_base import UZ_BASE_CONTEXT, get_uz_protocols
 from .anatomy_guard import AnatomyGuard
 
 logger = logging.getLogger(__name__)
@@ -68,6 +69,14 @@ LANG_HINTS = {
     "kaa":  "Barcha javoblar Qoraqolpoq tilida bo'lsin.",
 }
 
+# Statik prefiks (til bo'yicha) import paytida: O'zbekiston konteksti + Jarvis qoidalari
+_CHAT_PREFIXES = {
+    lang: prompt_prefix.register(
+        f"jarvis_chat:{lang}", UZ_BASE_CONTEXT + "\n\n" + _ZIYRAK_SYSTEM.format(language_hint=hint),
+    )
+    for lang, hint in LANG_HINTS.items()
+}
+
 # в”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђ
 # Session context (in-memory + cache)
 # в”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђ
@@ -178,13 +187,9 @@ def end_session(session_id: str) -> bool:
 
 def _build_gpt_messages(session: ZIYRAKSession,
                         new_user_message: str) -> list[dict]:
-    lang_hint = LANG_HINTS.get(session.language, _ZIYRAK_SYSTEM_UZ)
-    kb_ctx    = get_uz_context(
-        complaints_text = session.patient_data.get("complaints", ""),
-        include_protocols = True,
-    )
-
-    system_content = _ZIYRAK_SYSTEM.format(language_hint=lang_hint) + "\n\n" + kb_ctx
+    # Statik prefiks birinchi, keyin faqat shu sessiyaga xos dinamik qism
+    prefix         = _CHAT_PREFIXES.get(session.language, _CHAT_PREFIXES["uz-L"])
+    system_content = get_uz_protocols(session.patient_data.get("complaints", ""))
 
     # Add patient summary if available
     pd = session.patient_data
@@ -203,7 +208,9 @@ def _build_gpt_messages(session: ZIYRAKSession,
     if transcript:
         system_content += f"\n\nKONSULTATSIYA TRANSKRIPTI:\n{transcript[-2000:]}\n"
 
-    messages: list[dict] = [{"role": "system", "content": system_content}]
+    messages: list[dict] = [prefix_message(prefix)]
+    if system_content.strip():
+        messages.append({"role": "system", "content": system_content.strip()})
 
     # Add rolling history
     for msg in session.messages:
@@ -268,6 +275,8 @@ def ZIYRAK_chat(
             response_json=False,
             temperature=0.2,
             max_tokens=500 if voice_mode else 1200,
+            use_cache=False,
+            endpoint="jarvis_chat",
         )
         response_text = raw.strip()
     except Exception as exc:
@@ -320,19 +329,16 @@ def ZIYRAK_chat_stream(
 
     full_text = ""
     try:
-        client = gpt4o_client()
-        stream = client.chat.completions.create(
-            model       = Deployments.gpt4o(),
-            messages    = messages,
+        for delta in stream_model(
+            Deployments.gpt4o(),
+            messages,
             temperature = 0.2,
             max_tokens  = 500 if voice_mode else 1200,
-            stream      = True,
-        )
-        for chunk in stream:
-            delta = chunk.choices[0].delta.content or ""
-            if delta:
-                full_text += delta
-                yield delta
+            use_cache   = False,
+            endpoint    = "jarvis_chat",
+        ):
+            full_text += delta
+            yield delta
 
     except Exception as exc:
         logger.error("ZIYRAK stream error: %s", exc)
@@ -438,6 +444,13 @@ Quyidagi JSON formatida tahlil bering:
   "consultation_duration_note": "Suhbat davomiyligi va sifati haqida"
 }}"""
 
+_DIAGNOSIS_PREFIXES = {
+    lang: prompt_prefix.register(
+        f"jarvis_diagnosis:{lang}", UZ_BASE_CONTEXT + "\n\n" + _DIAGNOSIS_SYSTEM.format(language_hint=hint),
+    )
+    for lang, hint in LANG_HINTS.items()
+}
+
 
 def generate_consultation_diagnosis(
     session_id: str,
@@ -471,10 +484,7 @@ def generate_consultation_diagnosis(
     if len(transcript.strip()) < 50:
         return {"error": "Transkript juda qisqa, tashxis qo'yish uchun yetarli ma'lumot yo'q."}
 
-    lang_hint = LANG_HINTS.get(language, _ZIYRAK_SYSTEM_UZ)
-    kb_ctx    = get_uz_context(include_protocols=True)
-
-    system = _DIAGNOSIS_SYSTEM.format(language_hint=lang_hint) + "\n\n" + kb_ctx
+    prefix = _DIAGNOSIS_PREFIXES.get(language, _DIAGNOSIS_PREFIXES["uz-L"])
     user   = _DIAGNOSIS_USER.format(
         transcript   = transcript[:4000],
         patient_info = patient_info,
@@ -483,11 +493,12 @@ def generate_consultation_diagnosis(
     try:
         raw    = call_model(
             Deployments.gpt4o(),
-            [{"role": "system", "content": system},
+            [prefix_message(prefix),
              {"role": "user",   "content": user}],
             response_json  = True,
             temperature    = 0.1,
             max_tokens     = 3000,
+            endpoint       = "jarvis_diagnosis",
         )
         result = parse_json(raw, "consultation_diagnosis")
         if not isinstance(result, dict):
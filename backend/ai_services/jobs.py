@@ -0,0 +1,258 @@
+"""
+AI fon ishlari (job queue): submit -> job_id -> poll / subscribe, cancel.
+
+Uzoq AI ishlari (konsilium, avtonom protokol, klinik qaror) gunicorn so'rov threadidan
+chiqariladi  -  180s timeout va thread ochligi muammosi bo'lmaydi.
+
+Backend (settings.AI_JOBS_BACKEND):
+  "local"  -  jarayon ichidagi thread pool (development / bitta server). Server qayta
+              ishga tushsa bajarilayotgan ishlar yo'qoladi.
+  "celery" -  medoraai_backend.celery ilovasi, ai_services.tasks.run_ai_job
+              (CELERY_BROKER_URL; worker: celery -A medoraai_backend worker)
+
+Holat, jarayon va natija AIJob modelida saqlanadi. Foydalanuvchi boshiga faol
+(queued + running) ishlar soni AI_JOBS_PER_USER bilan cheklangan.
+
+Worker qayta ishga tushsa (gunicorn max_requests, graceful_timeout < konsilium) running
+ish yetim qoladi. started_at AI_JOBS_STALE_AFTER soniyadan eski running ishlar reap_stale()
+bilan yopiladi: submit (chegara hisobidan oldin), cancel va events oqimi shuni chaqiradi.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any, Callable
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .agent_pool import PoolSaturated
+from .models import AIJob
+
+logger = logging.getLogger(__name__)
+
+_SATURATED_RETRIES = 5
+_STALE_ERROR = "AI ishi bajaruvchi worker to'xtadi (vaqt chegarasi o'tdi)"
+
+
+class JobLimitExceeded(Exception):
+    """Foydalanuvchining faol ishlari chegarasi to'lgan."""
+
+
+class JobCancelled(Exception):
+    """Bajarilayotgan ish bekor qilindi (kooperativ tekshiruv)."""
+
+
+def _backend() -> str:
+    return str(getattr(settings, "AI_JOBS_BACKEND", "local")).lower()
+
+
+def _per_user_limit() -> int:
+    return int(getattr(settings, "AI_JOBS_PER_USER", 2))
+
+
+def _stale_after() -> int:
+    return int(getattr(settings, "AI_JOBS_STALE_AFTER", 0)) or int(getattr(settings, "AI_PIPELINE_DEADLINE", 120)) + 300
+
+
+def events_timeout() -> int:
+    """Events oqimining qat'iy muddati (soniya)  -  thread cheksiz band qilinmaydi."""
+    return int(getattr(settings, "AI_JOBS_EVENTS_TIMEOUT", 0)) or _stale_after() + 60
+
+
+# ---------------------------------------------------------------------------
+# Runners
+# ---------------------------------------------------------------------------
+
+def _cancel_requested(job_id) -> bool:
+    return AIJob.objects.filter(pk=job_id, cancel_requested=True).exists()
+
+
+def _run_consilium(job: AIJob) -> Any:
+    from .multi_agent_system import iter_consilium
+
+    p = job.params
+    events = iter_consilium(p["patient_data"], p.get("language", "uz-L"), tenant=p.get("tenant"),
+                            session_id=p.get("session_id"), owner=job.user_id)
+    count = 0
+    for event, data in events:
+        if event == "result":
+            return data
+        count += 1
+        AIJob.objects.filter(pk=job.pk).update(progress={"event": event, "events": count})
+        if _cancel_requested(job.pk):
+            events.close()   # navbatdagi agentlar ishga tushmaydi
+            raise JobCancelled()
+    raise RuntimeError("Konsilium natija qaytarmadi")
+
+
+def _run_autonomous_protocol(job: AIJob) -> Any:
+    from .autonomous_protocol_generator import autonomous_generator
+
+    p = job.params
+    return autonomous_generator.generate_autonomous_protocol(
+        p["patient_data"], p.get("language", "uz-L"), tenant=p.get("tenant"),
+    )
+
+
+def _run_clinical_decision(job: AIJob) -> Any:
+    from .clinical_decision_engine import clinical_decision_engine
+
+    p = job.params
+    return clinical_decision_engine.make_autonomous_decision(
+        p["patient_data"], p.get("language", "uz-L"), tenant=p.get("tenant"),
+    )
+
+
+_RUNNERS: dict[str, Callable[[AIJob], Any]] = {
+    "consilium":           _run_consilium,
+    "autonomous_protocol": _run_autonomous_protocol,
+    "clinical_decision":   _run_clinical_decision,
+}
+
+KINDS = tuple(_RUNNERS)
+
+
+def _finish(job_id, status: str, **fields) -> None:
+    AIJob.objects.filter(pk=job_id).update(status=status, finished_at=timezone.now(), **fields)
+
+
+def run(job_id) -> None:
+    """Ishni bajaradi (local thread yoki Celery worker ichida)."""
+    claimed = AIJob.objects.filter(pk=job_id, status=AIJob.STATUS_QUEUED).update(
+        status=AIJob.STATUS_RUNNING, started_at=timezone.now(),
+    )
+    if not claimed:
+        return   # bekor qilingan yoki boshqa worker olgan
+    job = AIJob.objects.get(pk=job_id)
+    logger.info("AI job %s (%s) started", job.pk, job.kind)
+    t0 = time.monotonic()
+    try:
+        for attempt in range(_SATURATED_RETRIES + 1):
+            try:
+                result = _RUNNERS[job.kind](job)
+                break
+            except PoolSaturated as exc:
+                # Fon ishi  -  429 o'rniga pool bo'shashini kutamiz
+                if attempt == _SATURATED_RETRIES or _cancel_requested(job.pk):
+                    raise
+                time.sleep(min(exc.retry_after, 30))
+    except JobCancelled:
+        _finish(job.pk, AIJob.STATUS_CANCELLED)
+        logger.info("AI job %s cancelled", job.pk)
+        return
+    except Exception as exc:
+        logger.exception("AI job %s failed: %s", job.pk, exc)
+        _finish(job.pk, AIJob.STATUS_FAILED, error=str(exc)[:2000])
+        return
+
+    if _cancel_requested(job.pk):
+        _finish(job.pk, AIJob.STATUS_CANCELLED)
+    else:
+        _finish(job.pk, AIJob.STATUS_SUCCEEDED, result=result)
+    logger.info("AI job %s (%s) finished in %.1fs", job.pk, job.kind, time.monotonic() - t0)
+
+
+# ---------------------------------------------------------------------------
+# Local backend
+# ---------------------------------------------------------------------------
+
+_local_lock = threading.Lock()
+_local_pool: ThreadPoolExecutor | None = None
+_local_pid: int | None = None
+
+
+def _run_local(job_id) -> None:
+    try:
+        run(job_id)
+    finally:
+        close_old_connections()
+
+
+def _local_executor() -> ThreadPoolExecutor:
+    global _local_pool, _local_pid
+    with _local_lock:
+        # preload_app=True: master'da yaratilgan pool fork'dan keyin ishlamaydi
+        if _local_pool is None or _local_pid != os.getpid():
+            _local_pool = ThreadPoolExecutor(
+                max_workers=int(getattr(settings, "AI_JOBS_LOCAL_WORKERS", 2)),
+                thread_name_prefix="ai-job",
+            )
+            _local_pid = os.getpid()
+        return _local_pool
+
+
+def _dispatch(job_id) -> None:
+    if _backend() == "celery":
+        from .tasks import run_ai_job
+        run_ai_job.delay(str(job_id))
+    else:
+        _local_executor().submit(_run_local, job_id)
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def submit(user, kind: str, params: dict) -> AIJob:
+    """Ishni navbatga qo'yadi. Chegara to'lsa JobLimitExceeded."""
+    if kind not in _RUNNERS:
+        raise ValueError(f"Noma'lum ish turi: {kind}")
+    with transaction.atomic():
+        # Foydalanuvchi qatorini qulflash  -  parallel submit'lar chegarani oshirmasin
+        type(user).objects.select_for_update().filter(pk=user.pk).first()
+        reap_stale(user=user)
+        active = AIJob.objects.filter(user=user, status__in=AIJob.ACTIVE_STATUSES).count()
+        if active >= _per_user_limit():
+            raise JobLimitExceeded(
+                f"Bir vaqtda {_per_user_limit()} tadan ortiq AI ishi bajarib bo'lmaydi"
+            )
+        job = AIJob.objects.create(user=user, kind=kind, params=params)
+        transaction.on_commit(lambda: _dispatch(job.pk))
+    return job
+
+
+def is_stale(job: AIJob) -> bool:
+    return (
+        job.status == AIJob.STATUS_RUNNING and job.started_at is not None
+        and job.started_at < timezone.now() - timedelta(seconds=_stale_after())
+    )
+
+
+def reap_stale(**filters) -> int:
+    """
+    started_at AI_JOBS_STALE_AFTER dan eski running ishlarni yopadi: bekor qilish so'ralgan
+    bo'lsa cancelled, aks holda failed. Worker aslida tirik bo'lsa uning natijasi keyin yoziladi.
+    """
+    stale = AIJob.objects.filter(
+        status=AIJob.STATUS_RUNNING,
+        started_at__lt=timezone.now() - timedelta(seconds=_stale_after()),
+        **filters,
+    )
+    now = timezone.now()
+    cancelled = stale.filter(cancel_requested=True).update(status=AIJob.STATUS_CANCELLED, finished_at=now)
+    failed = stale.update(status=AIJob.STATUS_FAILED, finished_at=now, error=_STALE_ERROR)
+    if cancelled or failed:
+        logger.warning("Reaped %d stale AI job(s) (worker gone, running > %ss)", cancelled + failed, _stale_after())
+    return cancelled + failed
+
+
+def cancel(job: AIJob) -> AIJob:
+    """
+    Navbatdagi ish darhol bekor qilinadi, bajarilayotgani  -  keyingi tekshiruvda; worker'i
+    yo'qolgan (stale) running ish ham darhol yopiladi.
+    """
+    updated = AIJob.objects.filter(pk=job.pk, status=AIJob.STATUS_QUEUED).update(
+        status=AIJob.STATUS_CANCELLED, cancel_requested=True, finished_at=timezone.now(),
+    )
+    if not updated:
+        AIJob.objects.filter(pk=job.pk, status=AIJob.STATUS_RUNNING).update(cancel_requested=True)
+        reap_stale(pk=job.pk)
+    job.refresh_from_db()
+    return job
@@ -0,0 +1,208 @@
+"""
+LLM javoblaridan JSON ajratib olish (yagona extractor).
+
+Model javobi ko'pincha toza JSON emas: ```json fence, oldida/ortida izoh matni,
+oxirgi elementdan keyin vergul, yoki kerakli massiv obyekt ichiga o'ralgan bo'ladi.
+Bu modul:
+  - tez yo'l: javob '{' yoki '[' bilan boshlansa  -  to'g'ridan-to'g'ri decode
+  - aks holda ochuvchi qavslar chapdan o'ngga ko'riladi: har biridan json skaneri
+    (raw_decode) balanslangan qiymatni bir o'tishda o'qiydi, ortidagi matn e'tiborsiz  -
+    birinchi to'g'ri obyekt/massiv olinadi; greedy regex va qayta fence-strip yo'q
+  - javob o'rtada uzilgan bo'lsa (max_tokens), yopilmagan tashqi qiymat ichidagi
+    to'liq bo'laklar (masalan steps[0]) natija sifatida olinmaydi  -  JSONNotFound
+  - decoder "}" / "]" oldidagi ortiqcha vergulda to'xtasa, shu vergul olib tashlanib
+    o'sha joydan qayta urinadi (string ichidagi vergullarga tegilmaydi)
+  - expect (dict / list) berilsa, natija shu turga keltiriladi: {"questions": [...]}
+    -> [...] (keys bo'yicha), [{...}] -> {...}, {...} -> [{...}]
+
+orjson o'rnatilgan bo'lsa to'liq decode u orqali (ixtiyoriy, requirements.txt).
+Benchmark: manage.py bench_json_extract.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import re
+import threading
+from collections import Counter
+from typing import Any, Optional, Sequence
+
+try:
+    import orjson
+except ImportError:          # ixtiyoriy bog'liqlik
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+_OPENERS = {"{": "}", "[": "]"}
+_OPEN_RE = re.compile(r"[{\[]")
+_BRACKET_RE = re.compile(r'[{}\[\]"\\]')
+_WHITESPACE = frozenset(" \t\r\n")
+_MAX_REPAIRS = 16
+_raw_decode = json.JSONDecoder().raw_decode
+
+_stats_lock = threading.Lock()
+_counters: Counter[str] = Counter()
+
+
+class JSONNotFound(ValueError):
+    """Javobda kutilgan turdagi to'g'ri JSON topilmadi."""
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _counters[name] += 1
+
+
+if orjson is not None:
+    _DECODE_ERRORS: tuple[type[Exception], ...] = (orjson.JSONDecodeError, ValueError)
+
+    def loads(text: str) -> Any:
+        return orjson.loads(text)
+else:
+    _DECODE_ERRORS = (ValueError,)
+
+    def loads(text: str) -> Any:
+        return json.loads(text)
+
+
+# ---------------------------------------------------------------------------
+# Scanner
+# ---------------------------------------------------------------------------
+
+def _decode_at(text: str, start: int) -> tuple[Any, int]:
+    """
+    text[start] dan bitta JSON qiymatni o'qiydi (ortidagi matn e'tiborsiz).
+    Decoder "}" / "]" da to'xtasa va undan oldin vergul bo'lsa (trailing comma), shu
+    vergul olib tashlanib qayta o'qiladi  -  pozitsiyani decoder bergani uchun string
+    ichidagi vergullarga tegilmaydi. Qaytaradi: (qiymat, tuzatishlar soni).
+    """
+    for repairs in range(_MAX_REPAIRS + 1):
+        try:
+            return _raw_decode(text, start)[0], repairs
+        except json.JSONDecodeError as exc:
+            pos = exc.pos
+            if repairs == _MAX_REPAIRS or pos >= len(text) or text[pos] not in "}]":
+                raise
+            j = pos - 1
+            while j > start and text[j] in _WHITESPACE:
+                j -= 1
+            if text[j] != ",":
+                raise
+            text = text[:j] + text[j + 1:]
+    raise AssertionError("unreachable")
+
+
+def _unterminated_at(text: str) -> int:
+    """
+    Oxirigacha yopilmagan eng tashqi qavs pozitsiyasi (hammasi yopilgan bo'lsa len(text)).
+    Qavslar ichidagi string'lar (escape bilan) hisobga olinadi; tashqaridagi matndagi
+    qo'shtirnoqlar e'tiborsiz.
+    """
+    stack: list[int] = []
+    in_string = False
+    skip = -1
+    for m in _BRACKET_RE.finditer(text):
+        pos, ch = m.start(), m.group()
+        if pos == skip:
+            continue
+        if in_string:
+            if ch == "\\":
+                skip = pos + 1
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = bool(stack)
+        elif ch in _OPENERS:
+            stack.append(pos)
+        elif stack:
+            stack.pop()
+    return stack[0] if stack else len(text)
+
+
+def _coerce(value: Any, expect: Optional[type], keys: Sequence[str]) -> Any:
+    """value ni expect turiga keltiradi; iloji bo'lmasa JSONNotFound."""
+    if expect is None or isinstance(value, expect):
+        return value
+    if expect is list and isinstance(value, dict):
+        if not keys:
+            return [value]
+        for key in keys:
+            if isinstance(value.get(key), list):
+                return value[key]
+    if expect is dict and isinstance(value, list) and len(value) == 1 and isinstance(value[0], dict):
+        return value[0]
+    raise JSONNotFound(f"{expect.__name__} kutilgan, {type(value).__name__} keldi")
+
+
+def _accept(value: Any, expect: Optional[type], keys: Sequence[str]) -> Any:
+    coerced = _coerce(value, expect, keys)
+    if coerced is not value:
+        _count("coerced")
+    return coerced
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def extract(raw: Any, expect: Optional[type] = None, *, keys: Sequence[str] = ()) -> Any:
+    """
+    raw matndan birinchi to'g'ri JSON obyekt/massivni qaytaradi (expect ga keltirilgan).
+    Topilmasa JSONNotFound.
+    """
+    text = raw.decode("utf-8", "replace") if isinstance(raw, (bytes, bytearray)) else str(raw or "")
+    stripped = text.strip()
+    if stripped[:1] in _OPENERS:
+        try:
+            value = _accept(loads(stripped), expect, keys)
+        except (*_DECODE_ERRORS, JSONNotFound):
+            pass
+        else:
+            _count("direct")
+            return value
+
+    limit = None
+    for m in _OPEN_RE.finditer(text):
+        # Uzilgan tashqi qiymat ichidagi qavslar nomzod emas. Ichki nomzoddan oldin tashqisi
+        # albatta rad etilgan bo'ladi  -  shuning uchun skan faqat birinchi rad etilishda
+        if limit is not None and m.start() > limit:
+            break
+        try:
+            value, repairs = _decode_at(text, m.start())
+            value = _accept(value, expect, keys)
+        except ValueError:          # JSONDecodeError yoki JSONNotFound (noto'g'ri tur)
+            if limit is None:
+                limit = _unterminated_at(text)
+            continue
+        _count("repaired" if repairs else "scanned")
+        return value
+
+    _count("failed")
+    raise JSONNotFound("Javobda JSON topilmadi")
+
+
+def parse(raw: Any, expect: Optional[type] = None, *, keys: Sequence[str] = (),
+          context: str = "", default: Any = None) -> Any:
+    """extract() ning xato bermaydigan varianti: topilmasa warning va default ({} / [])."""
+    try:
+        return extract(raw, expect, keys=keys)
+    except JSONNotFound:
+        logger.warning("JSON extract failed%s: %s", f" ({context})" if context else "",
+                       str(raw or "")[:300])
+        if default is not None:
+            return default
+        return [] if expect is list else {}
+
+
+def stats() -> dict[str, Any]:
+    with _stats_lock:
+        parsed = _counters["direct"] + _counters["scanned"] + _counters["repaired"]
+        total = parsed + _counters["failed"]
+        return {
+            "backend": "orjson" if orjson is not None else "json",
+            "parsed": parsed,
+            **dict(_counters),
+            "failure_ratio": round(_counters["failed"] / total, 3) if total else 0.0,
+        }
@@ -0,0 +1,109 @@
+"""
+Kalit so'zlar indeksi: matndan SSV / jarrohlik protokollarini topish va reytinglash.
+
+Avval find_protocols / find_surgery_protocols har bir kalit so'z uchun `kw in text` qilardi
+(N kalit so'z -> matn N marta skanerlanadi) va dict[kalit -> id] bir nechta protokolga
+tegishli kalit so'zni jimgina ustiga yozardi. Endi:
+  - kalit so'zlar import paytida bitta belgi-trie ga yig'iladi; har bir kalit so'z
+    bir nechta protokolga tegishli bo'lishi mumkin
+  - matn bir marta normallashtiriladi (kichik harf, apostrof variantlari -> ', bo'shliqlar
+    bitta probel) va faqat so'z boshlaridan trie bo'ylab yuriladi  -  narx matn uzunligiga
+    bog'liq, bazadagi kalit so'zlar soniga emas
+  - kalit so'z so'z boshida topilishi kerak (qo'shimchalar mumkin: "diabetim", "gipertoniyasi");
+    katta harfli qisqartmalar ("MI", "AKS", "UTI") faqat butun so'z sifatida  -  eski
+    substring qidiruvdagi "kamida" -> "mi" kabi soxta mosliklar yo'q
+  - reyting: topilgan turli kalit so'zlar bo'yicha specificity yig'indisi
+    (so'zlar soni / shu kalit so'zga ega protokollar soni), teng bo'lsa  -  uchrashlar soni,
+    keyin bazadagi tartib
+
+    _INDEX = KeywordIndex((p["id"], p["keywords"]) for p in PROTOCOL_DB)
+    ids    = _INDEX.rank(text, top_k=3)          # ["uz-ssv-htn-2022", ...]
+
+Benchmark: manage.py bench_protocol_match.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+_APOSTROPHES = re.compile("[‘’ʻʼ`´]")        # str.translate(dict) bu yerda ~15x sekinroq
+_WORD_START = re.compile(r"(?<![\w'])\w")
+_END = ""                 # trie tugunidagi terminal kalit (belgi bo'la olmaydi)
+
+
+def normalize(text: str) -> str:
+    return " ".join(_APOSTROPHES.sub("'", str(text).lower()).split())
+
+
+@dataclass(frozen=True)
+class Keyword:
+    text: str                     # normallashtirilgan
+    owners: tuple[str, ...]       # protokol id lari (bazadagi tartibda)
+    whole_word: bool              # qisqartma  -  o'ng chegara ham talab qilinadi
+
+    @property
+    def specificity(self) -> float:
+        return len(self.text.split(" ")) / len(self.owners)
+
+
+class KeywordIndex:
+    """(id, kalit so'zlar) juftliklaridan qurilgan trie; match() / rank() thread-safe (faqat o'qish)."""
+
+    def __init__(self, entries: Iterable[tuple[str, Iterable[str]]]):
+        owners: dict[str, list[str]] = {}
+        whole: dict[str, bool] = {}
+        self._order: dict[str, int] = {}
+        for item_id, keywords in entries:
+            self._order.setdefault(item_id, len(self._order))
+            for raw in keywords:
+                kw = normalize(raw)
+                if not kw:
+                    continue
+                ids = owners.setdefault(kw, [])
+                if item_id not in ids:
+                    ids.append(item_id)
+                whole[kw] = whole.get(kw, False) or raw.isupper()
+
+        self.keywords: tuple[Keyword, ...] = tuple(
+            Keyword(kw, tuple(ids), whole[kw]) for kw, ids in owners.items()
+        )
+        self._root: dict = {}
+        for i, keyword in enumerate(self.keywords):
+            node = self._root
+            for ch in keyword.text:
+                node = node.setdefault(ch, {})
+            node[_END] = i
+
+    def __len__(self) -> int:
+        return len(self.keywords)
+
+    def match(self, text: str) -> Counter[int]:
+        """Topilgan kalit so'z indekslari -> uchrashlar soni."""
+        text = normalize(text)
+        n, root, hits = len(text), self._root, Counter()
+        for start in _WORD_START.finditer(text):
+            node, j = root, start.start()
+            while j < n:
+                node = node.get(text[j])
+                if node is None:
+                    break
+                j += 1
+                i = node.get(_END)
+                if i is not None and not (self.keywords[i].whole_word and j < n and text[j].isalnum()):
+                    hits[i] += 1
+        return hits
+
+    def rank(self, text: str, top_k: Optional[int] = None) -> list[str]:
+        """Id lar reyting bo'yicha (score, uchrashlar, bazadagi tartib); top_k  -  nechtasi."""
+        scores: dict[str, float] = {}
+        counts: Counter[str] = Counter()
+        for i, n in self.match(text).items():
+            keyword = self.keywords[i]
+            for item_id in keyword.owners:
+                scores[item_id] = scores.get(item_id, 0.0) + keyword.specificity
+                counts[item_id] += n
+        ranked = sorted(scores, key=lambda pid: (-scores[pid], -counts[pid], self._order[pid]))
+        return ranked[:top_k] if top_k is not None else ranked
@@ -0,0 +1,229 @@
+"""
+O'zbekiston tibbiy bilimlar bazasi fayli: yuklash, ixcham yozuvlar va indekslar.
+
+Avval DRUG_DB / PROTOCOL_DB / SURGERY_PROTOCOLS uzbekistan_knowledge_base.py da Python
+literallari edi: to'liq milliy dori reyestri (minglab yozuv) modul import vaqtini va har
+worker xotirasini shishirardi, yangilash uchun deploy + gunicorn restart kerak edi. Endi:
+  - ma'lumotlar versiyalangan JSON lines faylida (ai_services/data/uzbekistan_kb.jsonl):
+    birinchi qator {"kind": "meta", "version": ...}, keyin {"kind": "drug" | "protocol" |
+    "surgery", ...} yozuvlari
+  - har yozuv __slots__ li frozen dataclass (dict o'rniga ~3-4x kam xotira); takrorlanuvchi
+    qisqa satrlar (dori sinfi, shakli, ICD-10) sys.intern bilan bitta nusxada
+  - trade / generic / class indekslari va protokol kalit so'z trie'lari load() da bir marta
+    quriladi; KnowledgeBase  -  o'zgarmas snapshot, reload atomik almashtirish bilan
+  - yozuvlar eski dict kodini buzmaslik uchun d["trade"], d.get("note") ni qo'llab-quvvatlaydi
+
+Hot reload va worker'lar o'rtasida xotira ulashish uzbekistan_knowledge_base da.
+Benchmark: manage.py bench_kb_load.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+from .keyword_index import KeywordIndex
+
+FORMAT = 1                # meta.format  -  fayl tuzilishi o'zgarsa oshiriladi
+
+
+class KnowledgeBaseError(ValueError):
+    """Fayl o'qilmadi yoki yozuv noto'g'ri (qator raqami bilan)."""
+
+
+# ---------------------------------------------------------------------------
+# Records
+# ---------------------------------------------------------------------------
+
+class _Record:
+    """dict-ga o'xshash o'qish: record["trade"], record.get("note", "")."""
+    __slots__ = ()
+    _KEYS: dict[str, str] = {}          # JSON kaliti -> atribut (Python kalit so'zlari uchun)
+    _INTERN: tuple[str, ...] = ()       # takrorlanuvchi qisqa satrlar (yoki ularning ro'yxati)
+    _TUPLES: tuple[str, ...] = ()       # JSON ro'yxati -> tuple
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, self._KEYS.get(key, key))
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, self._KEYS.get(key, key), default)
+
+    def to_dict(self) -> dict[str, Any]:
+        attrs = {v: k for k, v in self._KEYS.items()}
+        out = {}
+        for f in fields(self):
+            value = getattr(self, f.name)
+            out[attrs.get(f.name, f.name)] = list(value) if isinstance(value, tuple) else value
+        return out
+
+
+@dataclass(frozen=True, slots=True)
+class Drug(_Record):
+    trade:      str
+    generic:    str
+    drug_class: str
+    forms:      str
+    available:  bool = True
+    note:       str = ""
+
+    _KEYS = {"class": "drug_class"}
+    _INTERN = ("drug_class", "forms")
+
+
+@dataclass(frozen=True, slots=True)
+class Protocol(_Record):
+    id:         str
+    name:       str
+    icd10:      tuple[str, ...]
+    keywords:   tuple[str, ...]
+    first_line: tuple[str, ...]
+    targets:    str
+    ref:        str
+    monitoring: str
+
+    _INTERN = ("icd10",)
+    _TUPLES = ("keywords", "first_line")
+
+
+@dataclass(frozen=True, slots=True)
+class SurgeryProtocol(_Record):
+    id:       str
+    name:     str
+    icd10:    tuple[str, ...]
+    keywords: tuple[str, ...]
+    steps:    tuple[str, ...]
+    ref:      str
+
+    _INTERN = ("icd10",)
+    _TUPLES = ("keywords", "steps")
+
+
+def _record(cls: type, row: dict[str, Any]) -> Any:
+    """JSON qatori (dict joyida o'zgartiriladi) -> yozuv; faqat _KEYS / _INTERN / _TUPLES maydonlari aylanadi."""
+    for key, name in cls._KEYS.items():
+        if key in row:
+            row[name] = row.pop(key)
+    for name in cls._INTERN:
+        value = row.get(name)
+        if isinstance(value, str):
+            row[name] = sys.intern(value)
+        elif value is not None:
+            row[name] = tuple(map(sys.intern, value))
+    for name in cls._TUPLES:
+        if name in row:
+            row[name] = tuple(row[name])
+    return cls(**row)
+
+
+_KINDS: dict[str, type] = {"drug": Drug, "protocol": Protocol, "surgery": SurgeryProtocol}
+
+
+# ---------------------------------------------------------------------------
+# Snapshot
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True, slots=True, eq=False)
+class KnowledgeBase:
+    version:         str
+    path:            str
+    mtime:           float
+    drugs:           tuple[Drug, ...]
+    protocols:       tuple[Protocol, ...]
+    surgery:         tuple[SurgeryProtocol, ...]
+    drug_by_trade:   dict[str, Drug]
+    drug_by_generic: dict[str, Drug]
+    drug_by_class:   dict[str, tuple[Drug, ...]]
+    protocol_by_id:  dict[str, Protocol]
+    protocol_index:  KeywordIndex
+    surgery_by_id:   dict[str, SurgeryProtocol]
+    surgery_index:   KeywordIndex
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "version": self.version,
+            "path": self.path,
+            "drugs": len(self.drugs),
+            "protocols": len(self.protocols),
+            "surgery_protocols": len(self.surgery),
+            "protocol_keywords": len(self.protocol_index),
+        }
+
+
+def build(drugs: Iterable[Drug], protocols: Iterable[Protocol], surgery: Iterable[SurgeryProtocol],
+          version: str = "", path: str = "", mtime: float = 0.0) -> KnowledgeBase:
+    """Yozuvlardan indekslangan snapshot (birinchi uchragan trade / generic nomi ustun)."""
+    drugs, protocols, surgery = tuple(drugs), tuple(protocols), tuple(surgery)
+    by_trade: dict[str, Drug] = {}
+    by_generic: dict[str, Drug] = {}
+    by_class: dict[str, list[Drug]] = {}
+    for d in drugs:
+        by_trade.setdefault(d.trade.lower(), d)
+        by_generic.setdefault(d.generic.lower(), d)
+        by_class.setdefault(d.drug_class, []).append(d)
+    return KnowledgeBase(
+        version=version,
+        path=path,
+        mtime=mtime,
+        drugs=drugs,
+        protocols=protocols,
+        surgery=surgery,
+        drug_by_trade=by_trade,
+        drug_by_generic=by_generic,
+        drug_by_class={k: tuple(v) for k, v in by_class.items()},
+        protocol_by_id={p.id: p for p in protocols},
+        protocol_index=KeywordIndex((p.id, p.keywords) for p in protocols),
+        surgery_by_id={sp.id: sp for sp in surgery},
+        surgery_index=KeywordIndex((sp.id, sp.keywords) for sp in surgery),
+    )
+
+
+# ---------------------------------------------------------------------------
+# File I/O
+# ---------------------------------------------------------------------------
+
+def load(path: str | os.PathLike) -> KnowledgeBase:
+    """JSON lines faylini o'qiydi; xato bo'lsa KnowledgeBaseError (qator raqami bilan)."""
+    path = Path(path)
+    rows: dict[str, list] = {kind: [] for kind in _KINDS}
+    meta: dict[str, Any] = {}
+    try:
+        mtime = path.stat().st_mtime
+        with path.open(encoding="utf-8") as f:
+            for lineno, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                    kind = row.pop("kind")
+                    if kind == "meta":
+                        meta = row
+                        continue
+                    rows[kind].append(_record(_KINDS[kind], row))
+                except (ValueError, KeyError, TypeError) as exc:
+                    raise KnowledgeBaseError(f"{path}:{lineno}: {exc!r}") from exc
+    except OSError as exc:
+        raise KnowledgeBaseError(f"{path}: {exc}") from exc
+    if int(meta.get("format", FORMAT)) > FORMAT:
+        raise KnowledgeBaseError(f"{path}: format {meta['format']} qo'llab-quvvatlanmaydi (<= {FORMAT})")
+    return build(rows["drug"], rows["protocol"], rows["surgery"],
+                 version=str(meta.get("version", "")), path=str(path), mtime=mtime)
+
+
+def dump(path: str | os.PathLike, kb: KnowledgeBase, version: Optional[str] = None) -> None:
+    """Snapshot ni JSON lines ga yozadi (vaqtinchalik fayl + os.replace  -  o'quvchi yarim faylni ko'rmaydi)."""
+    path = Path(path)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with tmp.open("w", encoding="utf-8", newline="\n") as f:
+        f.write(json.dumps({"kind": "meta", "format": FORMAT, "version": version or kb.version},
+                           ensure_ascii=False) + "\n")
+        for kind, records in (("drug", kb.drugs), ("protocol", kb.protocols), ("surgery", kb.surgery)):
+            for record in records:
+                f.write(json.dumps({"kind": kind, **record.to_dict()}, ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
@@ -0,0 +1,210 @@
+"""
+LLM javob keshi (content-addressed response cache).
+
+Kalit = sha256(model, prompt, config). Ikki qavat:
+  1. Jarayon ichidagi LRU (TTL bilan)  -  har bir gunicorn worker uchun alohida
+  2. Django cache (REDIS_URL sozlangan bo'lsa)  -  workerlar o'rtasida umumiy
+
+Endpoint bo'yicha TTL settings.AI_RESPONSE_CACHE_TTLS da, hit/miss hisoblagichlari
+``stats()`` orqali. Kesh xatolari hech qachon AI chaqiruvini to'xtatmaydi (fail-open).
+Chaqiruvchi tekshiruvidan (response_schemas) o'tmaydigan javob keshga yozilmaydi
+(put(..., validate=schema.parse))  -  aks holda qayta yuborilgan so'rov va retry
+policy TTL davomida o'sha yaroqsiz javobni olardi.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = "llm:resp:"
+
+_DEFAULT_TTLS: dict[str, int] = {
+    "clarifying_questions": 1800,
+    "recommend_specialists": 1800,
+    "generate_diagnoses": 900,
+}
+
+
+# ---------------------------------------------------------------------------
+# Settings
+# ---------------------------------------------------------------------------
+
+def enabled() -> bool:
+    return bool(getattr(settings, "AI_RESPONSE_CACHE_ENABLED", True))
+
+
+def ttl_for(endpoint: str | None) -> int:
+    """Endpoint uchun TTL (soniya). 0 bo'lsa kesh ishlatilmaydi."""
+    ttls = {**_DEFAULT_TTLS, **(getattr(settings, "AI_RESPONSE_CACHE_TTLS", None) or {})}
+    if endpoint and endpoint in ttls:
+        return int(ttls[endpoint])
+    return int(getattr(settings, "AI_RESPONSE_CACHE_TTL", 600))
+
+
+def make_key(model: str, prompt: str, config: dict[str, Any]) -> str:
+    """Content-addressed key: bir xil (model, prompt, config) -> bir xil kalit."""
+    payload = json.dumps(
+        {"m": model, "p": prompt, "c": config},
+        sort_keys=True, ensure_ascii=False, separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Tier 1: in-process LRU
+# ---------------------------------------------------------------------------
+
+class _LRU:
+    """Thread-safe LRU with per-entry expiry (gthread worker uchun)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(1, max_entries)
+        self._data: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires <= now:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: int) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+_local = _LRU(int(getattr(settings, "AI_RESPONSE_CACHE_MAX_ENTRIES", 512)))
+
+
+# ---------------------------------------------------------------------------
+# Tier 2: shared Django cache (Redis)
+# ---------------------------------------------------------------------------
+
+def _shared_enabled() -> bool:
+    return bool(getattr(settings, "AI_RESPONSE_CACHE_SHARED", bool(getattr(settings, "REDIS_URL", ""))))
+
+
+def _shared_get(key: str) -> str | None:
+    try:
+        from django.core.cache import cache
+        return cache.get(_KEY_PREFIX + key)
+    except Exception as exc:
+        logger.warning("LLM cache shared get failed: %s", exc)
+        return None
+
+
+def _shared_set(key: str, value: str, ttl: int) -> None:
+    try:
+        from django.core.cache import cache
+        cache.set(_KEY_PREFIX + key, value, ttl)
+    except Exception as exc:
+        logger.warning("LLM cache shared set failed: %s", exc)
+
+
+# ---------------------------------------------------------------------------
+# Counters
+# ---------------------------------------------------------------------------
+
+_stats_lock = threading.Lock()
+_stats: dict[str, dict[str, int]] = {}
+
+
+def _bump(endpoint: str | None, field: str) -> None:
+    with _stats_lock:
+        row = _stats.setdefault(endpoint or "default", {
+            "hits_local": 0, "hits_shared": 0, "misses": 0, "bypass": 0, "rejected": 0,
+        })
+        row[field] += 1
+
+
+def stats() -> dict[str, Any]:
+    """Hit/miss hisoblagichlari (health/detailed uchun)."""
+    with _stats_lock:
+        endpoints = {k: dict(v) for k, v in _stats.items()}
+    return {
+        "enabled": enabled(),
+        "shared": _shared_enabled(),
+        "local_entries": len(_local),
+        "endpoints": endpoints,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def get(key: str, endpoint: str | None = None) -> str | None:
+    value = _local.get(key)
+    if value is not None:
+        _bump(endpoint, "hits_local")
+        return value
+    if _shared_enabled():
+        value = _shared_get(key)
+        if value is not None:
+            _local.set(key, value, ttl_for(endpoint))
+            _bump(endpoint, "hits_shared")
+            return value
+    _bump(endpoint, "misses")
+    return None
+
+
+def put(key: str, value: str, endpoint: str | None = None,
+        validate: Callable[[str], Any] | None = None) -> None:
+    """validate(value) xato bersa (SchemaError, InvalidResponse va h.k.) javob keshlanmaydi."""
+    ttl = ttl_for(endpoint)
+    if ttl <= 0 or not value:
+        return
+    if validate is not None:
+        try:
+            validate(value)
+        except Exception:
+            _bump(endpoint, "rejected")
+            return
+    _local.set(key, value, ttl)
+    if _shared_enabled():
+        _shared_set(key, value, ttl)
+
+
+def peek_shared(key: str) -> str | None:
+    """Hisoblagichlarsiz umumiy qavatni o'qish (single-flight follower uchun)."""
+    if not _shared_enabled():
+        return None
+    return _shared_get(key)
+
+
+def note_bypass(endpoint: str | None = None) -> None:
+    _bump(endpoint, "bypass")
+
+
+def clear() -> None:
+    """Faqat jarayon ichidagi qavatni tozalaydi (testlar / admin uchun)."""
+    _local.clear()
+    with _stats_lock:
+        _stats.clear()
@@ -0,0 +1,362 @@
+"""
+Gemini'ga chiquvchi trafik uchun token-bucket governor (RPM + TPM, model bo'yicha).
+
+Provider 429 larini oldini olish uchun har bir API chaqiruvi oldidan acquire():
+  - Redis (REDIS_URL) bo'lsa  -  Lua skript bilan atomik, barcha workerlar uchun umumiy bucket
+  - aks holda (yoki Redis xatosida)  -  jarayon ichidagi bucket (fail-open)
+
+Ustuvorlik sinflari (contextvar orqali uzatiladi  -  priority() context manager):
+  HIGH   -  operatsiya xonasi favqulodda javoblari; zaxira sig'imni ham ishlatadi va
+            muddat tugasa ham chaqiruv bajariladi
+  NORMAL -  oddiy so'rovlar; sig'imning AI_RATE_RESERVE_NORMAL qismini HIGH ga qoldiradi
+  LOW    -  fon ishlari (self-learning); AI_RATE_RESERVE_LOW qismini qoldiradi
+Bitta worker ichida shu modelning bucket'ida yuqori ustuvorlikdagi kutayotgan bo'lsa,
+pastkilar navbat beradi (boshqa modellar bucket'iga ta'sir qilmaydi). Kutayotgan deb faqat
+birinchi urinishda token ololmagan chaqiruv hisoblanadi.
+
+Kutish vaqtlari stats() da (health/detailed).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+from typing import Any, Iterator
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+HIGH, NORMAL, LOW = 0, 1, 2
+_PRIORITY_NAMES = {HIGH: "high", NORMAL: "normal", LOW: "low"}
+
+_KEY_PREFIX = "llm:rate:"
+_POLL_SEC = 0.05
+_THROTTLE_WINDOW_SEC = 30.0     # provider 429 dan keyin shu vaqt "cheklanmoqda" hisoblanadi
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("llm_priority", default=NORMAL)
+
+
+class RateLimited(RuntimeError):
+    """Bucket muddat ichida bo'shamadi (retry policy keyingi modelga o'tadi)."""
+
+
+# ---------------------------------------------------------------------------
+# Settings
+# ---------------------------------------------------------------------------
+
+def _enabled() -> bool:
+    return bool(getattr(settings, "AI_RATE_LIMIT_ENABLED", True))
+
+
+def _limits(model: str) -> tuple[float, float]:
+    """(rpm, tpm) model uchun; ro'yxatda bo'lmasa "default"."""
+    table = getattr(settings, "AI_RATE_LIMITS", None) or {}
+    row = table.get(model) or table.get("default") or {}
+    return float(row.get("rpm", 300)), float(row.get("tpm", 1_000_000))
+
+
+def _reserve(prio: int) -> float:
+    if prio == HIGH:
+        return 0.0
+    if prio == LOW:
+        return float(getattr(settings, "AI_RATE_RESERVE_LOW", 0.3))
+    return float(getattr(settings, "AI_RATE_RESERVE_NORMAL", 0.1))
+
+
+def _max_wait() -> float:
+    return float(getattr(settings, "AI_RATE_MAX_WAIT", 20))
+
+
+def _shared_enabled() -> bool:
+    return bool(getattr(settings, "REDIS_URL", ""))
+
+
+def estimate_tokens(prompt: Any) -> int:
+    """Taxminiy token soni (~4 belgi = 1 token); aniq qiymat settle() da."""
+    return max(1, len(str(prompt)) // 4)
+
+
+# ---------------------------------------------------------------------------
+# Priority context
+# ---------------------------------------------------------------------------
+
+@contextlib.contextmanager
+def priority(level: int) -> Iterator[None]:
+    """Blok ichidagi barcha LLM chaqiruvlari shu ustuvorlikda (thread/task-local)."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+# ---------------------------------------------------------------------------
+# Buckets
+# ---------------------------------------------------------------------------
+
+# KEYS[1]=bucket; ARGV: rpm, tpm, tokens, reserve. Qaytaradi: kutish soniyasi (0 = olindi).
+_LUA_TAKE = """
+local rpm, tpm = tonumber(ARGV[1]), tonumber(ARGV[2])
+local need_t, reserve = tonumber(ARGV[3]), tonumber(ARGV[4])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local s = redis.call('HMGET', KEYS[1], 'r', 't', 'ts')
+local r = tonumber(s[1]) or rpm
+local tk = tonumber(s[2]) or tpm
+local dt = math.max(0, now - (tonumber(s[3]) or now))
+r = math.min(rpm, r + dt * rpm / 60)
+tk = math.min(tpm, tk + dt * tpm / 60)
+local want_r = 1 + reserve * rpm
+local want_t = math.min(need_t, tpm) + reserve * tpm
+local wait = 0
+if r < want_r then wait = math.max(wait, (want_r - r) * 60 / rpm) end
+if tk < want_t then wait = math.max(wait, (want_t - tk) * 60 / tpm) end
+if wait == 0 then
+  r = r - 1
+  tk = tk - need_t
+end
+redis.call('HSET', KEYS[1], 'r', r, 't', tk, 'ts', now)
+redis.call('EXPIRE', KEYS[1], 120)
+return tostring(wait)
+"""
+
+
+class _LocalBucket:
+    """_LUA_TAKE ning jarayon ichidagi nusxasi."""
+
+    def __init__(self, rpm: float, tpm: float):
+        self.rpm, self.tpm = rpm, tpm
+        self.r, self.t = rpm, tpm
+        self.ts = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, tokens: int, reserve: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            dt = max(0.0, now - self.ts)
+            self.ts = now
+            self.r = min(self.rpm, self.r + dt * self.rpm / 60)
+            self.t = min(self.tpm, self.t + dt * self.tpm / 60)
+            want_r = 1 + reserve * self.rpm
+            want_t = min(tokens, self.tpm) + reserve * self.tpm
+            wait = 0.0
+            if self.r < want_r:
+                wait = max(wait, (want_r - self.r) * 60 / self.rpm)
+            if self.t < want_t:
+                wait = max(wait, (want_t - self.t) * 60 / self.tpm)
+            if wait == 0:
+                self.r -= 1
+                self.t -= tokens
+            return wait
+
+    def adjust(self, tokens: float) -> None:
+        with self._lock:
+            self.t = min(self.tpm, self.t + tokens)
+
+    def drain(self) -> None:
+        with self._lock:
+            self.r = 0.0
+
+
+_local_lock = threading.Lock()
+_local: dict[str, _LocalBucket] = {}
+_script = None
+
+
+def _local_bucket(model: str) -> _LocalBucket:
+    rpm, tpm = _limits(model)
+    with _local_lock:
+        bucket = _local.get(model)
+        if bucket is None or (bucket.rpm, bucket.tpm) != (rpm, tpm):
+            bucket = _local[model] = _LocalBucket(rpm, tpm)
+        return bucket
+
+
+def _redis():
+    from django_redis import get_redis_connection
+    return get_redis_connection("default")
+
+
+def _take(model: str, tokens: int, prio: int) -> float:
+    global _script
+    reserve = _reserve(prio)
+    if _shared_enabled():
+        try:
+            if _script is None:
+                _script = _redis().register_script(_LUA_TAKE)
+            rpm, tpm = _limits(model)
+            return float(_script(keys=[_KEY_PREFIX + model], args=[rpm, tpm, tokens, reserve]))
+        except Exception as exc:
+            logger.warning("Rate governor Redis unavailable, using local bucket: %s", exc)
+    return _local_bucket(model).take(tokens, reserve)
+
+
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+
+_stats_lock = threading.Lock()
+_stats: dict[str, dict[str, dict[str, int]]] = {}
+_throttled: dict[str, int] = {}
+_last_429: dict[str, float] = {}
+_waiting: dict[tuple[str, int], int] = {}     # (model, ustuvorlik) -> kutayotganlar
+
+
+def _record(model: str, prio: int, wait_ms: int, timed_out: bool) -> None:
+    with _stats_lock:
+        row = _stats.setdefault(model, {}).setdefault(_PRIORITY_NAMES[prio], {
+            "acquired": 0, "waited": 0, "timeouts": 0, "wait_ms_total": 0, "wait_ms_max": 0,
+        })
+        row["timeouts" if timed_out else "acquired"] += 1
+        if wait_ms:
+            row["waited"] += 1
+            row["wait_ms_total"] += wait_ms
+            row["wait_ms_max"] = max(row["wait_ms_max"], wait_ms)
+
+
+def stats() -> dict[str, Any]:
+    with _stats_lock:
+        models = {m: {p: dict(r) for p, r in rows.items()} for m, rows in _stats.items()}
+        return {
+            "enabled": _enabled(),
+            "backend": "redis" if _shared_enabled() else "local",
+            "waiting": {
+                model: {_PRIORITY_NAMES[p]: n for (m, p), n in sorted(_waiting.items()) if m == model}
+                for model in sorted({m for m, _ in _waiting})
+            },
+            "provider_429": dict(_throttled),
+            "models": models,
+        }
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def _preempted(model: str, prio: int) -> bool:
+    with _stats_lock:
+        return any(_waiting.get((model, p)) for p in range(prio))
+
+
+def _set_waiting(model: str, prio: int, delta: int) -> None:
+    with _stats_lock:
+        n = _waiting.get((model, prio), 0) + delta
+        if n > 0:
+            _waiting[(model, prio)] = n
+        else:
+            _waiting.pop((model, prio), None)
+
+
+def _next_delay(model: str, tokens: int, prio: int) -> float:
+    """0 = ruxsat olindi; aks holda qancha uxlash kerak."""
+    if _preempted(model, prio):
+        return _POLL_SEC
+    return _take(model, tokens, prio)
+
+
+def _give_up(model: str, prio: int, wait_ms: int) -> None:
+    if prio == HIGH:
+        logger.warning("Rate governor: %s bucket empty, HIGH priority call proceeds anyway", model)
+        _record(model, prio, wait_ms, timed_out=False)
+        return
+    _record(model, prio, wait_ms, timed_out=True)
+    raise RateLimited(f"AI so'rovlar limiti ({model}): {wait_ms} ms kutildi")
+
+
+def acquire(model: str, tokens: int) -> None:
+    """Bucket'dan 1 so'rov + tokens oladi, kerak bo'lsa kutadi (RateLimited)."""
+    if not _enabled():
+        return
+    prio = _priority.get()
+    started = time.monotonic()
+    deadline = started + _max_wait()
+    delay = _next_delay(model, tokens, prio)
+    if delay <= 0:
+        return _record(model, prio, 0, timed_out=False)
+    _set_waiting(model, prio, 1)
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return _give_up(model, prio, int((time.monotonic() - started) * 1000))
+            time.sleep(min(delay, remaining, 1.0))
+            delay = _next_delay(model, tokens, prio)
+            if delay <= 0:
+                return _record(model, prio, int((time.monotonic() - started) * 1000), timed_out=False)
+    finally:
+        _set_waiting(model, prio, -1)
+
+
+async def aacquire(model: str, tokens: int) -> None:
+    """acquire() ning asyncio varianti (event loop bloklanmaydi)."""
+    if not _enabled():
+        return
+    prio = _priority.get()
+    started = time.monotonic()
+    deadline = started + _max_wait()
+    delay = _next_delay(model, tokens, prio)
+    if delay <= 0:
+        return _record(model, prio, 0, timed_out=False)
+    _set_waiting(model, prio, 1)
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return _give_up(model, prio, int((time.monotonic() - started) * 1000))
+            await asyncio.sleep(min(delay, remaining, 1.0))
+            delay = _next_delay(model, tokens, prio)
+            if delay <= 0:
+                return _record(model, prio, int((time.monotonic() - started) * 1000), timed_out=False)
+    finally:
+        _set_waiting(model, prio, -1)
+
+
+def settle(model: str, estimated: int, actual: int | None) -> None:
+    """Haqiqiy token sarfi ma'lum bo'lganda bucket'ni to'g'rilaydi."""
+    if not _enabled() or not actual or actual == estimated:
+        return
+    delta = estimated - actual
+    if _shared_enabled():
+        try:
+            _redis().hincrbyfloat(_KEY_PREFIX + model, "t", delta)
+            return
+        except Exception as exc:
+            logger.warning("Rate governor settle failed: %s", exc)
+    _local_bucket(model).adjust(delta)
+
+
+def throttling(model: str) -> bool:
+    """Governor shu modelni cheklayaptimi: uning bucket'ida kutayotgan bor yoki yaqinda 429 qaytgan."""
+    with _stats_lock:
+        if any(m == model for m, _ in _waiting):
+            return True
+        last = _last_429.get(model)
+    return last is not None and time.monotonic() - last < _THROTTLE_WINDOW_SEC
+
+
+def note_provider_429(model: str) -> None:
+    """Provider 429 qaytardi  -  so'rov bucket'ini bo'shatamiz (to'lishini kutish)."""
+    with _stats_lock:
+        _throttled[model] = _throttled.get(model, 0) + 1
+        _last_429[model] = time.monotonic()
+    if _shared_enabled():
+        try:
+            _redis().hset(_KEY_PREFIX + model, "r", 0)
+            return
+        except Exception as exc:
+            logger.warning("Rate governor drain failed: %s", exc)
+    _local_bucket(model).drain()
+
+
+def is_provider_429(exc: BaseException) -> bool:
+    text = str(exc)
+    return "429" in text or "RESOURCE_EXHAUSTED" in text
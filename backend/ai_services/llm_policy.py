@@ -0,0 +1,296 @@
+"""
+LLM retry / fallback siyosati (declarative policy engine).
+
+Har bir AI funksiya o'z ichki model x json tsikllarini yozish o'rniga RetryPolicy e'lon
+qiladi:
+  - attempts    : tartiblangan (model, json_mode) urinishlar
+  - deadline    : umumiy vaqt byudjeti  -  undan keyin kutilmaydi
+  - backoff     : muvaffaqiyatsiz urinishdan keyin exponential backoff + jitter
+  - hedge       : birinchi urinish p90 (tarixiy) ichida javob bermasa keyingisi parallel
+                  yuboriladi, qaysi biri birinchi yaroqli javob bersa  -  o'sha olinadi.
+                  Ixtiyoriy: policy.hedge va AI_RETRY_HEDGE_ENABLED ikkalasi kerak; governor
+                  cheklayotganda (kutayotganlar bor yoki yaqinda 429) hedge yuborilmaydi
+
+Urinishlar umumiy poolda (AI_RETRY_POOL_WORKERS) bajariladi. Muddati o'tgan urinishni
+to'xtatib bo'lmaydi, shuning uchun band threadlar semafor bilan sanaladi: yangi urinish
+navbatga tushmaydi  -  o'z muddati ichida bo'sh slot kutadi, hedge esa slot bo'lmasa
+yuborilmaydi.
+
+Har bir urinish vaqti yoziladi (stats() / log).
+"""
+
+from __future__ import annotations
+
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from django.conf import settings
+
+from . import llm_governor
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidResponse(ValueError):
+    """Model javob qaytardi, lekin uni ishlatib bo'lmaydi (JSON emas, bo'sh va h.k.)."""
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    name:            str
+    attempts:        tuple[tuple[str, bool], ...]   # (model, json_mode)
+    deadline_sec:    float | None = None            # None -> settings.AI_RETRY_DEADLINE_SEC
+    backoff_base:    float = 0.25
+    backoff_max:     float = 2.0
+    hedge:           bool  = False
+    hedge_after_sec: float = 8.0                    # tarix yetarli bo'lmaganda
+    hedge_quantile:  float = 0.9
+    max_parallel:    int   = 2
+
+
+@dataclass
+class AttemptRecord:
+    model:      str
+    json_mode:  bool
+    elapsed_ms: int
+    ok:         bool
+    hedged:     bool = False
+    error:      str  = ""
+
+
+@dataclass
+class PolicyOutcome:
+    value:    Any
+    attempts: list[AttemptRecord] = field(default_factory=list)
+    total_ms: int = 0
+
+
+@dataclass(frozen=True)
+class AttemptContext:
+    policy: str | None = None
+    number: int = 0                 # 0  -  birinchi urinish, >0  -  retry / fallback / hedge
+
+
+_attempt: contextvars.ContextVar[AttemptContext] = contextvars.ContextVar(
+    "llm_policy_attempt", default=AttemptContext(),
+)
+
+
+def current_attempt() -> AttemptContext:
+    """Joriy LLM chaqiruvi qaysi policy va nechanchi urinish ichida (llm_telemetry uchun)."""
+    return _attempt.get()
+
+
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+
+_MIN_SAMPLES = 20
+
+_stats_lock = threading.Lock()
+_latency: dict[str, deque] = {}
+_stats: dict[str, dict[str, int]] = {}
+
+
+def _row(policy: str) -> dict[str, int]:
+    return _stats.setdefault(policy, {
+        "attempts": 0, "ok": 0, "failed": 0, "hedged": 0, "deadline_exceeded": 0,
+        "hedge_skipped": 0, "pool_saturated": 0,
+    })
+
+
+def _record(policy: str, rec: AttemptRecord) -> None:
+    with _stats_lock:
+        row = _row(policy)
+        row["attempts"] += 1
+        row["ok" if rec.ok else "failed"] += 1
+        if rec.hedged:
+            row["hedged"] += 1
+        if rec.ok:
+            _latency.setdefault(policy, deque(maxlen=200)).append(rec.elapsed_ms / 1000.0)
+
+
+def _note(policy: str, event: str) -> None:
+    with _stats_lock:
+        _row(policy)[event] += 1
+
+
+def _quantile(policy: str, q: float) -> float | None:
+    with _stats_lock:
+        samples = sorted(_latency.get(policy) or ())
+    if len(samples) < _MIN_SAMPLES:
+        return None
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def stats() -> dict[str, Any]:
+    with _stats_lock:
+        out = {k: dict(v) for k, v in _stats.items()}
+    for name, row in out.items():
+        p50, p90 = _quantile(name, 0.5), _quantile(name, 0.9)
+        if p90 is not None:
+            row["p50_sec"] = round(p50, 3)
+            row["p90_sec"] = round(p90, 3)
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Engine
+# ---------------------------------------------------------------------------
+
+_pool_lock = threading.Lock()
+_pool: ThreadPoolExecutor | None = None
+_pool_pid: int | None = None
+_slots: threading.BoundedSemaphore | None = None
+
+
+def _executor() -> tuple[ThreadPoolExecutor, threading.BoundedSemaphore]:
+    """Urinishlar pooli va band threadlar semafori (slotlar soni = threadlar soni)."""
+    global _pool, _pool_pid, _slots
+    with _pool_lock:
+        # preload_app=True: master'da yaratilgan pool fork'dan keyin ishlamaydi
+        if _pool is None or _pool_pid != os.getpid():
+            workers = max(1, int(getattr(settings, "AI_RETRY_POOL_WORKERS", 16)))
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-policy")
+            _slots = threading.BoundedSemaphore(workers)
+            _pool_pid = os.getpid()
+        return _pool, _slots
+
+
+def _deadline(policy: RetryPolicy) -> float:
+    if policy.deadline_sec is not None:
+        return policy.deadline_sec
+    return float(getattr(settings, "AI_RETRY_DEADLINE_SEC", 60))
+
+
+def _backoff(policy: RetryPolicy, failures: int) -> float:
+    cap = min(policy.backoff_max, policy.backoff_base * (2 ** (failures - 1)))
+    return random.uniform(0, cap)   # full jitter
+
+
+def _hedge_enabled(policy: RetryPolicy) -> bool:
+    return policy.hedge and bool(getattr(settings, "AI_RETRY_HEDGE_ENABLED", False))
+
+
+def _hedge_delay(policy: RetryPolicy) -> float:
+    q = _quantile(policy.name, policy.hedge_quantile)
+    return q if q is not None else policy.hedge_after_sec
+
+
+def run(
+    policy: RetryPolicy,
+    call: Callable[[str, bool], str],
+    parse: Callable[[str], Any],
+) -> PolicyOutcome:
+    """
+    Urinishlarni policy bo'yicha bajaradi. call(model, json_mode) -> raw matn,
+    parse(raw) -> qiymat yoki InvalidResponse. Birinchi yaroqli qiymat qaytariladi.
+    Hammasi muvaffaqiyatsiz bo'lsa oxirgi xato (yoki TimeoutError) ko'tariladi.
+    """
+    started = time.monotonic()
+    deadline = started + _deadline(policy)
+    queue = list(policy.attempts)
+    pending: dict[Future, tuple[str, bool, float, bool]] = {}
+    records: list[AttemptRecord] = []
+    failures = 0
+    last_exc: BaseException | None = None
+
+    def _launch(hedged: bool) -> bool:
+        """Bo'sh slot bo'lsa urinishni poolga yuboradi (hedge kutmaydi, asosiy  -  muddatgacha)."""
+        pool, slots = _executor()
+        if hedged:
+            acquired = slots.acquire(blocking=False)
+        else:
+            acquired = slots.acquire(timeout=max(0.0, deadline - time.monotonic()))
+        if not acquired:
+            _note(policy.name, "pool_saturated")
+            logger.warning("LLM policy %s: all pool threads busy, attempt not started", policy.name)
+            return False
+        model, json_mode = queue.pop(0)
+        # contextvars (llm_governor ustuvorligi, urinish raqami) pool threadiga o'tadi
+        ctx = contextvars.copy_context()
+        ctx.run(_attempt.set, AttemptContext(policy.name, len(records) + len(pending)))
+
+        def _attempt_call() -> Any:
+            try:
+                return ctx.run(lambda: parse(call(model, json_mode)))
+            finally:
+                slots.release()
+
+        pending[pool.submit(_attempt_call)] = (model, json_mode, time.monotonic(), hedged)
+        return True
+
+    def _outcome(value: Any) -> PolicyOutcome:
+        total_ms = int((time.monotonic() - started) * 1000)
+        logger.info(
+            "LLM policy %s: ok in %d ms after %d attempt(s) [%s]",
+            policy.name, total_ms, len(records),
+            ", ".join(f"{r.model}/{'json' if r.json_mode else 'text'}:{r.elapsed_ms}ms{'' if r.ok else '!'}" for r in records),
+        )
+        return PolicyOutcome(value=value, attempts=records, total_ms=total_ms)
+
+    while queue or pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        if not pending:
+            if failures:
+                time.sleep(min(_backoff(policy, failures), max(0.0, remaining)))
+            if not _launch(hedged=False):
+                break
+            continue
+
+        can_hedge = _hedge_enabled(policy) and queue and len(pending) < policy.max_parallel
+        timeout = min(_hedge_delay(policy), remaining) if can_hedge else remaining
+        done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            if can_hedge and deadline - time.monotonic() > 0:
+                model = queue[0][0]
+                if llm_governor.throttling(model):
+                    # Governor cheklayapti  -  hedge faqat chiquvchi chaqiruvlarni ikkilantiradi
+                    _note(policy.name, "hedge_skipped")
+                elif _launch(hedged=True):
+                    logger.info("LLM policy %s: hedging with %s", policy.name, model)
+            continue
+
+        for fut in done:
+            model, json_mode, t0, hedged = pending.pop(fut)
+            elapsed_ms = int((time.monotonic() - t0) * 1000)
+            try:
+                value = fut.result()
+            except Exception as exc:
+                failures += 1
+                last_exc = exc
+                rec = AttemptRecord(model, json_mode, elapsed_ms, ok=False, hedged=hedged, error=str(exc)[:200])
+                records.append(rec)
+                _record(policy.name, rec)
+                logger.warning(
+                    "LLM policy %s: attempt failed (model=%s, json=%s, %d ms): %s",
+                    policy.name, model, json_mode, elapsed_ms, exc,
+                )
+                continue
+            rec = AttemptRecord(model, json_mode, elapsed_ms, ok=True, hedged=hedged)
+            records.append(rec)
+            _record(policy.name, rec)
+            return _outcome(value)
+
+    # Muddat tugadi yoki slot bo'lmadi; ishlayotgan urinishlar tugagach slotini bo'shatadi
+    if pending or queue or (deadline - time.monotonic()) <= 0:
+        _note(policy.name, "deadline_exceeded")
+        logger.warning(
+            "LLM policy %s: deadline %.0fs exceeded after %d attempt(s)",
+            policy.name, _deadline(policy), len(records),
+        )
+        if last_exc is None:
+            raise TimeoutError(f"AI javob berish muddati tugadi ({policy.name})")
+    if last_exc is not None:
+        raise last_exc
+    raise InvalidResponse(f"AI javob bermadi ({policy.name})")
@@ -0,0 +1,242 @@
+"""
+LLM chaqiruvlari telemetriyasi: latency histogrammasi, token sarfi va narx (endpoint bo'yicha).
+
+Har bir haqiqiy API chaqiruvi (gemini_utils, legacy Azure) va javob keshi hit'i record()
+orqali yoziladi:
+  - jarayon ichidagi agregat: (model, caller, outcome) bo'yicha chaqiruvlar soni, latency
+    histogrammasi, prompt / output / cached tokenlar (usage_metadata), taxminiy narx (USD)
+    va retry soni (llm_policy urinish raqami > 0)
+  - har bir chaqiruv uchun bitta strukturali log qatori: "llm_call key=value ..." va
+    JSON formatter'lar uchun extra={"llm": {...}}
+caller  -  endpoint (clarifying_questions, consilium_phase1, doctor_diagnosis, ...); berilmasa
+llm_policy nomi, u ham bo'lmasa "default".
+
+Prometheus text formatida /health/metrics da (render()), qisqa jadval health/detailed da
+(stats()). Har bir gunicorn worker o'z agregatini beradi. Narx settings.AI_MODEL_PRICES
+bo'yicha (USD / 1M token); noma'lum model  -  0.
+"""
+
+from __future__ import annotations
+
+import bisect
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from django.conf import settings
+
+from . import llm_policy
+
+logger = logging.getLogger(__name__)
+
+# Latency bucket'lari (soniya)  -  flash ~1-5s, pro / konsilium Phase 3 ~20-60s
+BUCKETS: tuple[float, ...] = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 40, 80, 160)
+
+OUTCOME_OK = "ok"
+OUTCOME_ERROR = "error"
+OUTCOME_CACHE_HIT = "cache_hit"
+
+
+@dataclass
+class _Series:
+    count:         int = 0
+    latency_sum:   float = 0.0
+    buckets:       list[int] = field(default_factory=lambda: [0] * len(BUCKETS))
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    cached_tokens: int = 0
+    cost_usd:      float = 0.0
+
+
+_lock = threading.Lock()
+_series: dict[tuple[str, str, str], _Series] = {}
+_retries: dict[str, int] = {}
+
+
+# ---------------------------------------------------------------------------
+# Usage / cost
+# ---------------------------------------------------------------------------
+
+def usage_from(response: Any) -> tuple[int, int, int]:
+    """(prompt, output, cached) tokenlar: Gemini usage_metadata yoki OpenAI usage."""
+    meta = getattr(response, "usage_metadata", None)
+    if meta is not None:
+        output = (getattr(meta, "candidates_token_count", 0) or 0) + (getattr(meta, "thoughts_token_count", 0) or 0)
+        return (
+            getattr(meta, "prompt_token_count", 0) or 0,
+            output,
+            getattr(meta, "cached_content_token_count", 0) or 0,
+        )
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        return getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0, 0
+    return 0, 0, 0
+
+
+def cost_usd(model: str, prompt: int, output: int, cached: int = 0) -> float:
+    """Taxminiy narx: keshdan o'qilgan prompt tokenlar 'cached' narxida."""
+    price = (getattr(settings, "AI_MODEL_PRICES", None) or {}).get(model)
+    if not price:
+        return 0.0
+    fresh = max(0, prompt - cached)
+    return (
+        fresh * price.get("input", 0.0)
+        + cached * price.get("cached", price.get("input", 0.0))
+        + output * price.get("output", 0.0)
+    ) / 1_000_000
+
+
+# ---------------------------------------------------------------------------
+# Recording
+# ---------------------------------------------------------------------------
+
+def record(
+    model: str,
+    caller: Optional[str],
+    outcome: str,
+    latency_ms: float,
+    response: Any = None,
+    error: Optional[BaseException] = None,
+) -> None:
+    """Bitta chaqiruvni agregatga qo'shadi va log qatorini yozadi. Hech qachon xato bermaydi."""
+    try:
+        attempt = llm_policy.current_attempt()
+        caller = caller or attempt.policy or "default"
+        prompt, output, cached = usage_from(response) if response is not None else (0, 0, 0)
+        cost = cost_usd(model, prompt, output, cached)
+        seconds = latency_ms / 1000
+        with _lock:
+            row = _series.setdefault((model, caller, outcome), _Series())
+            row.count += 1
+            row.latency_sum += seconds
+            idx = bisect.bisect_left(BUCKETS, seconds)
+            if idx < len(BUCKETS):
+                row.buckets[idx] += 1
+            row.prompt_tokens += prompt
+            row.output_tokens += output
+            row.cached_tokens += cached
+            row.cost_usd += cost
+            if attempt.number > 0 and outcome != OUTCOME_CACHE_HIT:
+                _retries[caller] = _retries.get(caller, 0) + 1
+        fields = {
+            "model": model, "caller": caller, "outcome": outcome,
+            "latency_ms": int(latency_ms), "prompt_tokens": prompt, "output_tokens": output,
+            "cached_tokens": cached, "cost_usd": round(cost, 6), "attempt": attempt.number,
+        }
+        if error is not None:
+            fields["error"] = type(error).__name__
+        logger.info("llm_call %s", " ".join(f"{k}={v}" for k, v in fields.items()), extra={"llm": fields})
+    except Exception as exc:         # telemetriya chaqiruvni hech qachon buzmaydi
+        logger.warning("LLM telemetry record failed: %s", exc)
+
+
+def reset() -> None:
+    with _lock:
+        _series.clear()
+        _retries.clear()
+
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+def _label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: str) -> str:
+    return "{" + ",".join(f'{k}="{_label(v)}"' for k, v in labels.items()) + "}"
+
+
+def _quantile(row: _Series, q: float) -> Optional[float]:
+    """Histogramdan taxminiy kvantil (bucket yuqori chegarasi, ms)."""
+    if not row.count:
+        return None
+    target, seen = q * row.count, 0
+    for bound, n in zip(BUCKETS, row.buckets):
+        seen += n
+        if seen >= target:
+            return bound * 1000
+    return None          # eng katta bucket'dan ham uzun
+
+
+def render() -> str:
+    """Prometheus text exposition format (0.0.4)."""
+    with _lock:
+        series = {k: _Series(v.count, v.latency_sum, list(v.buckets), v.prompt_tokens,
+                             v.output_tokens, v.cached_tokens, v.cost_usd)
+                  for k, v in sorted(_series.items())}
+        retries = dict(sorted(_retries.items()))
+
+    lines = [
+        "# HELP ai_llm_calls_total LLM calls by model, caller and outcome.",
+        "# TYPE ai_llm_calls_total counter",
+    ]
+    for (model, caller, outcome), row in series.items():
+        lines.append(f"ai_llm_calls_total{_labels(model=model, caller=caller, outcome=outcome)} {row.count}")
+
+    lines += [
+        "# HELP ai_llm_call_duration_seconds LLM call latency.",
+        "# TYPE ai_llm_call_duration_seconds histogram",
+    ]
+    for (model, caller, outcome), row in series.items():
+        cumulative = 0
+        for bound, n in zip(BUCKETS, row.buckets):
+            cumulative += n
+            lines.append("ai_llm_call_duration_seconds_bucket"
+                         f"{_labels(model=model, caller=caller, outcome=outcome, le=f'{bound:g}')} {cumulative}")
+        base = _labels(model=model, caller=caller, outcome=outcome)
+        lines.append(f"ai_llm_call_duration_seconds_bucket{_labels(model=model, caller=caller, outcome=outcome, le='+Inf')} {row.count}")
+        lines.append(f"ai_llm_call_duration_seconds_sum{base} {row.latency_sum:.6f}")
+        lines.append(f"ai_llm_call_duration_seconds_count{base} {row.count}")
+
+    lines += [
+        "# HELP ai_llm_tokens_total LLM tokens by kind (prompt, output, cached).",
+        "# TYPE ai_llm_tokens_total counter",
+    ]
+    totals: dict[tuple[str, str], list[float]] = {}
+    for (model, caller, _), row in series.items():
+        acc = totals.setdefault((model, caller), [0, 0, 0, 0.0])
+        acc[0] += row.prompt_tokens
+        acc[1] += row.output_tokens
+        acc[2] += row.cached_tokens
+        acc[3] += row.cost_usd
+    for (model, caller), acc in totals.items():
+        for kind, value in zip(("prompt", "output", "cached"), acc[:3]):
+            lines.append(f"ai_llm_tokens_total{_labels(model=model, caller=caller, kind=kind)} {value}")
+
+    lines += [
+        "# HELP ai_llm_cost_usd_total Estimated LLM cost in USD (settings.AI_MODEL_PRICES).",
+        "# TYPE ai_llm_cost_usd_total counter",
+    ]
+    for (model, caller), acc in totals.items():
+        lines.append(f"ai_llm_cost_usd_total{_labels(model=model, caller=caller)} {acc[3]:.6f}")
+
+    lines += [
+        "# HELP ai_llm_retries_total LLM calls made as a retry/fallback attempt.",
+        "# TYPE ai_llm_retries_total counter",
+    ]
+    for caller, n in retries.items():
+        lines.append(f"ai_llm_retries_total{_labels(caller=caller)} {n}")
+    return "\n".join(lines) + "\n"
+
+
+def stats() -> dict[str, Any]:
+    """caller bo'yicha qisqa jadval (health/detailed): chaqiruvlar, p50/p95 ms, tokenlar, narx."""
+    out: dict[str, Any] = {}
+    with _lock:
+        for (model, caller, outcome), row in sorted(_series.items()):
+            out[f"{caller}/{model}/{outcome}"] = {
+                "calls": row.count,
+                "avg_ms": round(row.latency_sum * 1000 / row.count) if row.count else 0,
+                "p50_ms": _quantile(row, 0.5),
+                "p95_ms": _quantile(row, 0.95),
+                "prompt_tokens": row.prompt_tokens,
+                "output_tokens": row.output_tokens,
+                "cached_tokens": row.cached_tokens,
+                "cost_usd": round(row.cost_usd, 4),
+            }
+        if _retries:
+            out["retries"] = dict(_retries)
+    return out
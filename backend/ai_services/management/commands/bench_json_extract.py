@@ -0,0 +1,73 @@
+"""
+json_extract micro-benchmark: eski fence-strip + json.loads + greedy regex yo'li bilan solishtirish.
+
+  python manage.py bench_json_extract                 # 4 KB javob, 2000 marta
+  python manage.py bench_json_extract --kb 32 -n 500
+"""
+import json
+import re
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from ai_services import json_extract
+
+
+def _legacy(raw: str):
+    """Oldingi gemini_utils yo'li (_clean_raw + _loads_or_extract)."""
+    raw = raw.replace("```json", "").replace("```", "").strip()
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        match = re.search(r"\{[\s\S]*\}", raw)
+        if match:
+            try:
+                return json.loads(match.group(0))
+            except json.JSONDecodeError:
+                pass
+    return None
+
+
+def _payload(kb: int) -> str:
+    item = {
+        "name": "Arterial gipertenziya",
+        "probability": 70,
+        "justification": "Qon bosimi 160/100, bosh og'rig'i {ertalab}, anamnezda [irsiy] moyillik.",
+        "reasoningChain": ["Vital belgilar", "Anamnez", "SSV protokoli"],
+    }
+    items, body = [], ""
+    while len(body) < kb * 1024:
+        items.append(item)
+        body = json.dumps({"diagnoses": items}, ensure_ascii=False, indent=2)
+    return body
+
+
+class Command(BaseCommand):
+    help = "json_extract va eski JSON parse yo'lini solishtirish (micro-benchmark)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--kb", type=int, default=4, help="Javob hajmi, KB (default: 4)")
+        parser.add_argument("-n", "--repeat", type=int, default=2000, help="Har bir holat uchun (default: 2000)")
+
+    def handle(self, *args, **options):
+        body, n = _payload(options["kb"]), max(1, options["repeat"])
+        cases = {
+            "clean":          body,
+            "fenced":         f"```json\n{body}\n```",
+            "prose_wrapped":  f"Mana tahlil natijasi:\n{body}\n\nIzoh: {{taxminiy}} baho, [manba] yo'q.",
+            "trailing_comma": body[:-1].rstrip() + ",\n}",
+        }
+        self.stdout.write(f"{len(body)} bayt, {n} marta, backend={json_extract.stats()['backend']}")
+        for name, raw in cases.items():
+            ok_old = _legacy(raw) is not None
+            try:
+                json_extract.extract(raw, dict)
+                ok_new = True
+            except json_extract.JSONNotFound:
+                ok_new = False
+            old_us = timeit.timeit(lambda: _legacy(raw), number=n) / n * 1e6
+            new_us = timeit.timeit(lambda: json_extract.parse(raw, dict), number=n) / n * 1e6
+            self.stdout.write(
+                f"  {name:<15} legacy {old_us:8.1f} us ({'ok' if ok_old else 'FAIL'})   "
+                f"json_extract {new_us:8.1f} us ({'ok' if ok_new else 'FAIL'})"
+            )
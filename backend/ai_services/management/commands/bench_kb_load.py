@@ -0,0 +1,118 @@
+"""
+Bilimlar bazasi yuklash benchmarki: import vaqti va RSS, sintetik N ta dori (default 10000).
+
+Har variant alohida jarayonda o'lchanadi (toza RSS, import keshisiz):
+  literal .py (cold)   -  eski uslub: DRUG_DB Python literali + dict indekslar, .pyc yo'q
+  literal .py (.pyc)   -  xuddi shu, bytecode keshidan
+  jsonl -> dict        -  JSON lines, har yozuv dict (slots'siz loader)
+  knowledge_store      -  JSON lines -> __slots__ yozuvlar, intern, indekslar + kalit so'z trie'lari
+Protokollar  -  joriy bazadagi SSV va jarrohlik protokollari (hamma variantda bir xil).
+
+  python manage.py bench_kb_load
+  python manage.py bench_kb_load --drugs 50000
+"""
+import json
+import random
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ai_services import knowledge_store, uzbekistan_knowledge_base as kb
+
+_CLASSES = ["NSAID", "Antibiotik", "Antibiotik/Makrolid", "Antikonvulsant", "Vitamin", "Mineral",
+            "Antigipertenziv", "Antidiabetik", "Statin", "Antikoagulyant", "Antigistamin", "PPI",
+            "Kortikosteroid", "Bronxodilatator", "Antidepressant", "Antiemetik", "Diuretik", "Vaksina"]
+_FORMS = ["tab", "tab 250/500mg", "kaps", "amp", "sirop", "suspenziya", "gel", "tab, amp", "inhaler"]
+_NOTES = ["", "", "", "Jigar kasalligida EHTIYOTKORLIK", "Homiladorlikda QARSHI", "Bolalarda 12 yoshdan"]
+
+_CHILD = r"""
+import json, resource, sys, time
+sys.path.insert(0, sys.argv[1])
+sys.dont_write_bytecode = sys.argv[3] == "cold"
+def rss():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() // 1024
+import ai_services.keyword_index, ai_services.knowledge_store
+base = rss()
+t0 = time.perf_counter()
+variant, path = sys.argv[2], sys.argv[4]
+if variant == "literal":
+    import legacy_kb
+    n = len(legacy_kb.DRUG_DB)
+elif variant == "dict":
+    rows = [json.loads(line) for line in open(path, encoding="utf-8")]
+    drugs = [r for r in rows if r.get("kind") == "drug"]
+    idx = ({d["trade"].lower(): d for d in drugs}, {d["generic"].lower(): d for d in drugs})
+    n = len(drugs)
+else:
+    n = len(ai_services.knowledge_store.load(path).drugs)
+print(json.dumps({"s": time.perf_counter() - t0, "rss_kb": rss() - base, "n": n}))
+"""
+
+
+def _drugs(n: int, seed: int = 11) -> list[dict]:
+    rnd = random.Random(seed)
+    syl = ["ka", "ri", "to", "ne", "mo", "sul", "gar", "bek", "zon", "fi", "lar", "qo", "yu", "xi", "dom"]
+    rows = []
+    for i in range(n):
+        stem = "".join(rnd.choice(syl) for _ in range(3)).capitalize()
+        rows.append({
+            "trade": f"{stem}-{i}", "generic": f"{stem.lower()}in {i % 997}",
+            "class": rnd.choice(_CLASSES), "forms": rnd.choice(_FORMS),
+            "available": rnd.random() > 0.05, "note": rnd.choice(_NOTES),
+        })
+    return rows
+
+
+class Command(BaseCommand):
+    help = "Bilimlar bazasi: literal Python moduli va knowledge_store yuklash vaqti / RSS"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--drugs", type=int, default=10000, help="Sintetik dorilar soni (default: 10000)")
+
+    def handle(self, *args, **options):
+        drugs = _drugs(max(1, options["drugs"]))
+        current = kb.current()
+        protocols = [p.to_dict() for p in current.protocols]
+        surgery = [sp.to_dict() for sp in current.surgery]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            jsonl = Path(tmp) / "kb.jsonl"
+            records = knowledge_store.build(
+                (knowledge_store._record(knowledge_store.Drug, d) for d in drugs),
+                (knowledge_store._record(knowledge_store.Protocol, p) for p in protocols),
+                (knowledge_store._record(knowledge_store.SurgeryProtocol, sp) for sp in surgery),
+            )
+            knowledge_store.dump(jsonl, records, version="bench")
+            (Path(tmp) / "legacy_kb.py").write_text(
+                "DRUG_DB = [\n" + "".join(f"    {d!r},\n" for d in drugs) + "]\n"
+                f"PROTOCOL_DB = {protocols!r}\n"
+                f"SURGERY_PROTOCOLS = {surgery!r}\n"
+                "DRUG_BY_TRADE = {d['trade'].lower(): d for d in DRUG_DB}\n"
+                "DRUG_BY_GENERIC = {d['generic'].lower(): d for d in DRUG_DB}\n",
+                encoding="utf-8",
+            )
+            self.stdout.write(f"{len(drugs)} ta dori, fayl {jsonl.stat().st_size // 1024} KB")
+
+            for label, variant, mode in (
+                ("literal .py (cold)", "literal", "cold"),
+                ("literal .py (.pyc)", "literal", "warm"),
+                ("jsonl -> dict", "dict", "cold"),
+                ("knowledge_store", "store", "cold"),
+            ):
+                if mode == "warm":      # .pyc yozib olish uchun bir marta
+                    self._run(tmp, variant, "prime", jsonl)
+                row = self._run(tmp, variant, mode, jsonl)
+                self.stdout.write(f"  {label:<20} {row['s'] * 1000:8.1f} ms   RSS +{row['rss_kb'] / 1024:6.1f} MB")
+
+    def _run(self, tmp, variant, mode, jsonl):
+        out = subprocess.run(
+            [sys.executable, "-c", _CHILD, tmp, variant, mode, str(jsonl)],
+            cwd=settings.BASE_DIR, env={"PYTHONPATH": str(settings.BASE_DIR)},
+            capture_output=True, text=True, check=True,
+        )
+        return json.loads(out.stdout)
@@ -0,0 +1,96 @@
+"""
+keyword_index micro-benchmark: find_protocols ning eski yo'li (har kalit so'z uchun `kw in text`)
+va trie indeksi, haqiqiy baza hamda sintetik kattalashtirilgan bazada (milliy protokollar to'plami
+hajmini taqlid qiladi).
+
+Korpus  -  frontend shoshilinch holat shablonlaridagi haqiqiy shikoyatlar. Haqiqiy bazada
+ikki yo'l natijalari farqi (so'z chegarasi tufayli olib tashlangan soxta mosliklar) ko'rsatiladi.
+
+  python manage.py bench_protocol_match                 # 500 marta, 60 / 1000 / 10000 kalit so'z
+  python manage.py bench_protocol_match -n 100 --sizes 5000 50000
+"""
+import random
+import re
+import timeit
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ai_services import uzbekistan_knowledge_base as kb
+from ai_services.keyword_index import KeywordIndex
+
+_TEMPLATES = Path(settings.BASE_DIR).parent / "frontend" / "src" / "constants" / "emergencyTemplates.ts"
+_COMPLAINTS = re.compile(r'complaints:\s*"((?:[^"\\]|\\.)*)"')
+_SYLLABLES = ["ka", "ri", "to", "ne", "mo", "sul", "gar", "bek", "zon", "fi", "lar", "qo", "yu", "xi", "dom"]
+
+
+def _legacy_index(entries) -> dict[str, str]:
+    """Oldingi _PROTOCOL_KEYWORD_INDEX: kalit -> oxirgi protokol id."""
+    index = {}
+    for pid, keywords in entries:
+        for kw in keywords:
+            index[kw.lower()] = pid
+    return index
+
+
+def _legacy_find(index: dict[str, str], text: str) -> set[str]:
+    text = text.lower()
+    return {pid for kw, pid in index.items() if kw in text}
+
+
+def _synthetic(size: int, seed: int = 7) -> list[tuple[str, list[str]]]:
+    """size ta kalit so'z: 6 tadan protokolga, 1-3 so'zli sun'iy atamalar."""
+    rnd = random.Random(seed)
+    entries = [(pid, list(keywords)) for pid, keywords in
+               ((p["id"], p["keywords"]) for p in kb.PROTOCOL_DB)]
+    total = sum(len(k) for _, k in entries)
+    n = 0
+    while total < size:
+        words = [
+            "".join(rnd.choice(_SYLLABLES) for _ in range(rnd.randint(2, 4)))
+            for _ in range(rnd.randint(1, 3))
+        ]
+        if n % 6 == 0:
+            entries.append((f"synthetic-{n // 6}", []))
+        entries[-1][1].append(" ".join(words))
+        n += 1
+        total += 1
+    return entries
+
+
+class Command(BaseCommand):
+    help = "find_protocols: trie indeksi va eski `kw in text` tsikli (micro-benchmark)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("-n", "--repeat", type=int, default=500, help="Korpus necha marta (default: 500)")
+        parser.add_argument("--sizes", type=int, nargs="*", default=[1000, 10000],
+                            help="Sintetik baza hajmlari (kalit so'zlar soni)")
+        parser.add_argument("--path", default=str(_TEMPLATES), help="Shikoyatlar olinadigan fayl")
+
+    def handle(self, *args, **options):
+        path, n = Path(options["path"]), max(1, options["repeat"])
+        texts = []
+        if path.exists():
+            texts = [m.group(1).replace('\\"', '"')
+                     for m in _COMPLAINTS.finditer(path.read_text(encoding="utf-8"))]
+        if not texts:
+            self.stderr.write(f"{path} da shikoyatlar topilmadi")
+            return
+        self.stdout.write(f"{len(texts)} ta shikoyat, {n} marta")
+
+        real = [(p["id"], p["keywords"]) for p in kb.PROTOCOL_DB]
+        index = kb.current().protocol_index
+        legacy = _legacy_index(real)
+        dropped = sum(len(_legacy_find(legacy, t) - set(index.rank(t))) for t in texts)
+        added = sum(len(set(index.rank(t)) - _legacy_find(legacy, t)) for t in texts)
+        self.stdout.write(f"  haqiqiy baza: eski yo'lga nisbatan -{dropped} soxta moslik, +{added} yangi")
+
+        for label, entries in [("haqiqiy", real)] + [(str(s), _synthetic(s)) for s in options["sizes"]]:
+            legacy, index = _legacy_index(entries), KeywordIndex(entries)
+            old_us = timeit.timeit(lambda: [_legacy_find(legacy, t) for t in texts], number=n) / n / len(texts) * 1e6
+            new_us = timeit.timeit(lambda: [index.rank(t, 3) for t in texts], number=n) / n / len(texts) * 1e6
+            self.stdout.write(
+                f"  {label:>8} ({len(index):>6} kalit) legacy {old_us:8.1f} us/matn   "
+                f"trie {new_us:6.1f} us/matn   x{old_us / new_us:5.1f}"
+            )
@@ -0,0 +1,94 @@
+"""
+get_uz_context / get_uz_protocols micro-benchmark: har chaqiriqda `+=` bilan qayta yig'ish
+(eski yo'l) va id lar kortegi bo'yicha LRU keshlangan, oldindan tayyorlangan bloklar.
+
+Bir chat turi = get_uz_protocols (ziyrak / jarvis / doctor_support) + get_uz_context (consilium).
+Korpus  -  frontend shoshilinch holat shablonlaridagi haqiqiy shikoyatlar; har ikki yo'l natijasi
+bir xil ekanligi tekshiriladi. Sessiyada shikoyat matni o'zgarmaydi  -  yangi yo'lda qidirish
+natijasi ham matn bo'yicha keshlanadi.
+
+  python manage.py bench_uz_context            # 500 marta
+"""
+import re
+import timeit
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ai_services import uzbekistan_knowledge_base as kb
+
+_TEMPLATES = Path(settings.BASE_DIR).parent / "frontend" / "src" / "constants" / "emergencyTemplates.ts"
+_COMPLAINTS = re.compile(r'complaints:\s*"((?:[^"\\]|\\.)*)"')
+
+
+def _legacy_protocols(complaints_text: str) -> str:
+    """Oldingi get_uz_protocols: har chaqiriqda satrni += bilan yig'ish."""
+    if not complaints_text:
+        return ""
+    return _legacy_assemble(kb.find_protocols(complaints_text, top_k=3))
+
+
+def _legacy_assemble(protos: list[dict]) -> str:
+    if not protos:
+        return ""
+    ctx = "TEGISHLI SSV PROTOKOLLAR (USHBU HOLAT UCHUN):\n"
+    for p in protos:
+        ctx += (
+            f"\n- {p['name']} ({p['ref']})\n"
+            f"  ICD-10: {', '.join(p['icd10'])}\n"
+            f"  1-qator: {'; '.join(p['first_line'])}\n"
+            f"  Maqsad: {p['targets']}\n"
+            f"  Monitoring: {p['monitoring']}\n"
+        )
+    return ctx
+
+
+def _legacy_context(complaints_text: str) -> str:
+    return _with_base(_legacy_protocols(complaints_text))
+
+
+def _with_base(protocols: str) -> str:
+    return f"{kb._BASE_CONTEXT}\n\n{protocols}" if protocols else kb._BASE_CONTEXT
+
+
+class Command(BaseCommand):
+    help = "get_uz_context: LRU keshlangan bloklar va har chaqiriqda qayta yig'ish (micro-benchmark)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("-n", "--repeat", type=int, default=500, help="Korpus necha marta (default: 500)")
+        parser.add_argument("--path", default=str(_TEMPLATES), help="Shikoyatlar olinadigan fayl")
+
+    def handle(self, *args, **options):
+        path, n = Path(options["path"]), max(1, options["repeat"])
+        texts = []
+        if path.exists():
+            texts = [m.group(1).replace('\\"', '"')
+                     for m in _COMPLAINTS.finditer(path.read_text(encoding="utf-8"))]
+        if not texts:
+            self.stderr.write(f"{path} da shikoyatlar topilmadi")
+            return
+        state = kb._state()
+        matched = sum(1 for t in texts if kb._match_ids(state, t))
+        self.stdout.write(f"{len(texts)} ta shikoyat ({matched} tasida protokol topildi), {n} marta")
+
+        mismatches = [t[:40] for t in texts
+                      if (kb.get_uz_protocols(t), kb.get_uz_context(t)) != (_legacy_protocols(t), _legacy_context(t))]
+        ids = [i for i in (kb._match_ids(state, t) for t in texts) if i]
+
+        def per_text(fn, items):
+            return timeit.timeit(lambda: [fn(x) for x in items], number=n) / n / len(items) * 1e6
+
+        rows = [
+            ("tur (qidirish + yig'ish)",
+             per_text(lambda t: (_legacy_protocols(t), _legacy_context(t)), texts),
+             per_text(lambda t: (kb.get_uz_protocols(t), kb.get_uz_context(t)), texts)),
+            ("faqat yig'ish (topilganlar)",
+             per_text(lambda i: _with_base(_legacy_assemble([state.kb.protocol_by_id[p] for p in i])), ids),
+             per_text(lambda i: kb._context_block(state, i), ids)),
+        ]
+        for label, old_us, new_us in rows:
+            self.stdout.write(
+                f"  {label:<30} legacy {old_us:6.1f} us   cached {new_us:6.2f} us   x{old_us / new_us:6.1f}"
+            )
+        self.stdout.write(f"  natijalar {'mos' if not mismatches else f'FARQ: {mismatches}'}; kesh: {kb.stats()}")
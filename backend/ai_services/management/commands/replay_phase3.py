@@ -0,0 +1,65 @@
+"""
+Saqlangan konsilium (run_store) Phase 3 promptini oflayn qayta ishlatish  -  benchmark.
+
+  python manage.py replay_phase3 <session_id>                # prompt hajmi va yig'ish vaqti
+  python manage.py replay_phase3 <session_id> --call -n 3    # Orchestrator'ni 3 marta chaqirish
+"""
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ai_services import run_store
+from ai_services.llm_governor import estimate_tokens
+from ai_services.models import ConsiliumRun
+from ai_services.multi_agent_system import (
+    _equal_weights,
+    _phase3_messages,
+    _score_refutations,
+    run_phase3,
+)
+
+
+class Command(BaseCommand):
+    help = "Saqlangan konsilium Phase 3 promptini qayta ishlatish (benchmark)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("session_id")
+        parser.add_argument("--call", action="store_true", help="Orchestrator modelini chaqirish")
+        parser.add_argument("-n", "--repeat", type=int, default=1, help="Necha marta (default: 1)")
+
+    def handle(self, *args, **options):
+        try:
+            cp = run_store.replay(options["session_id"])
+        except ConsiliumRun.DoesNotExist:
+            raise CommandError(f"Konsilium run topilmadi: {options['session_id']}")
+
+        early = cp.phases.get("path") == "early_consensus"
+        if cp.stage == ConsiliumRun.STAGE_PHASE1 and not early:
+            raise CommandError("Phase 2 checkpoint'i yo'q  -  Phase 3 ni qayta ishlatib bo'lmaydi")
+        p1, p2 = cp.p1, cp.p2
+        weights = _equal_weights() if early else (cp.weights or _score_refutations(p2))
+
+        t0 = time.monotonic()
+        messages = _phase3_messages(cp.ptext, p1, p2, weights)
+        build_ms = (time.monotonic() - t0) * 1000
+        sections = ", ".join(f"{m['role']}=~{estimate_tokens(m['content'])}" for m in messages)
+        total = sum(estimate_tokens(m["content"]) for m in messages)
+        self.stdout.write(
+            f"{cp.session_id} ({cp.stage}, {'early_consensus' if early else 'full_debate'}): "
+            f"~{total} input tokens ({sections}), built in {build_ms:.1f} ms"
+        )
+        if not options["call"]:
+            return
+
+        timings = []
+        for i in range(max(1, options["repeat"])):
+            t0 = time.monotonic()
+            consensus = run_phase3(cp.ptext, p1, p2, weights)
+            timings.append((time.monotonic() - t0) * 1000)
+            status = "error" if consensus.get("error") else "ok"
+            self.stdout.write(f"  run {i + 1}: {timings[-1]:.0f} ms ({status})")
+        self.stdout.write(self.style.SUCCESS(
+            f"Phase 3: avg {statistics.mean(timings):.0f} ms, "
+            f"min {min(timings):.0f} ms, max {max(timings):.0f} ms"
+        ))
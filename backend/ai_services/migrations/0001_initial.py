@@ -0,0 +1,118 @@
+# Generated by Django 5.0.1 on 2026-10-18 04:26
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonitoringSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_id', models.CharField(max_length=255, unique=True, verbose_name='Sessiya ID')),
+                ('patient_data_hash', models.CharField(max_length=255, verbose_name="Bemor ma'lumotlari xeshi")),
+                ('protocol_id', models.CharField(max_length=255, verbose_name='Protokol ID')),
+                ('treatment_plan', models.JSONField(default=dict, verbose_name='Davolash reja')),
+                ('monitoring_frequency', models.IntegerField(default=3600, verbose_name='Monitoring chastotasi (sekund)')),
+                ('vital_signs_required', models.JSONField(default=list, verbose_name='Talab qilinadigan vital belgilar')),
+                ('alert_thresholds', models.JSONField(default=dict, verbose_name='Ogohlantirish chegaralari')),
+                ('active', models.BooleanField(default=True, verbose_name='Aktiv')),
+                ('last_check', models.DateTimeField(auto_now=True, verbose_name='Oxirgi tekshiruv')),
+                ('next_check', models.DateTimeField(verbose_name='Keyingi tekshiruv')),
+                ('alerts_triggered', models.JSONField(default=list, verbose_name='Ogohlantirishlar')),
+                ('adaptations_made', models.JSONField(default=list, verbose_name="O'zgarishlar")),
+                ('outcome_data', models.JSONField(default=dict, verbose_name="Natija ma'lumotlari")),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Yaratilgan sana')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Yangilangan sana')),
+            ],
+            options={
+                'verbose_name': 'Monitoring sessiyasi',
+                'verbose_name_plural': 'Monitoring sessiyalari',
+                'indexes': [models.Index(fields=['session_id'], name='ms_session_id_idx'), models.Index(fields=['active'], name='ms_active_idx'), models.Index(fields=['next_check'], name='ms_next_check_idx'), models.Index(fields=['protocol_id'], name='ms_protocol_id_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProtocolOutcome',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('protocol_id', models.CharField(max_length=255, verbose_name='Protokol ID')),
+                ('patient_data_hash', models.CharField(max_length=255, verbose_name="Bemor ma'lumotlari xeshi")),
+                ('protocol_details', models.JSONField(default=dict, verbose_name='Protokol tafsilotlari')),
+                ('treatment_success', models.BooleanField(blank=True, null=True, verbose_name='Davolash muvaffaqiyati')),
+                ('patient_satisfaction', models.IntegerField(blank=True, null=True, verbose_name='Bemor qoniqishi (1-10)')),
+                ('complication_occurred', models.BooleanField(default=False, verbose_name='Asoratlar yuz bergan')),
+                ('complication_details', models.TextField(blank=True, verbose_name='Asorat tafsilotlari')),
+                ('recovery_time_days', models.IntegerField(blank=True, null=True, verbose_name='Tiklanish vaqti (kun)')),
+                ('follow_up_required', models.BooleanField(default=True, verbose_name='Keyingi kuzatuv kerak')),
+                ('effectiveness_score', models.FloatField(default=0.0, verbose_name='Samaradorlik balli')),
+                ('safety_score', models.FloatField(default=0.0, verbose_name='Xavfsizlik balli')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Yaratilgan sana')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Yangilangan sana')),
+            ],
+            options={
+                'verbose_name': 'Protokol natijasi',
+                'verbose_name_plural': 'Protokol natijalari',
+                'indexes': [models.Index(fields=['protocol_id'], name='po_protocol_id_idx'), models.Index(fields=['treatment_success'], name='po_success_idx'), models.Index(fields=['effectiveness_score'], name='po_effectiveness_idx'), models.Index(fields=['created_at'], name='po_created_at_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='AIJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('consilium', 'Konsilium'), ('autonomous_protocol', 'Avtonom protokol'), ('clinical_decision', 'Klinik qaror')], max_length=32, verbose_name='Turi')),
+                ('status', models.CharField(choices=[('queued', 'Navbatda'), ('running', 'Bajarilmoqda'), ('succeeded', 'Tayyor'), ('failed', 'Xatolik'), ('cancelled', 'Bekor qilingan')], default='queued', max_length=16, verbose_name='Holati')),
+                ('params', models.JSONField(default=dict, verbose_name='Parametrlar')),
+                ('progress', models.JSONField(blank=True, default=dict, verbose_name='Jarayon')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='Natija')),
+                ('error', models.TextField(blank=True, verbose_name='Xatolik')),
+                ('cancel_requested', models.BooleanField(default=False, verbose_name="Bekor qilish so'ralgan")),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Yaratilgan sana')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Boshlangan')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Tugagan')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ai_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Foydalanuvchi')),
+            ],
+            options={
+                'verbose_name': 'AI ishi',
+                'verbose_name_plural': 'AI ishlari',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', 'status'], name='ai_services_user_id_135269_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VitalSignsReading',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('blood_pressure_systolic', models.IntegerField(blank=True, null=True, verbose_name='Qon bosimi sistola')),
+                ('blood_pressure_diastolic', models.IntegerField(blank=True, null=True, verbose_name='Qon bosimi diastola')),
+                ('heart_rate', models.IntegerField(blank=True, null=True, verbose_name='Yurak urishi')),
+                ('respiratory_rate', models.IntegerField(blank=True, null=True, verbose_name='Nafas soni')),
+                ('temperature', models.FloatField(blank=True, null=True, verbose_name='Harorat')),
+                ('oxygen_saturation', models.FloatField(blank=True, null=True, verbose_name='SpO2')),
+                ('blood_glucose', models.FloatField(blank=True, null=True, verbose_name='Qon shakari')),
+                ('pain_level', models.IntegerField(blank=True, null=True, verbose_name="Og'riq darajasi (0-10)")),
+                ('symptoms', models.TextField(blank=True, verbose_name='Simptomlar')),
+                ('medication_taken', models.JSONField(default=list, verbose_name='Ichilgan dorilar')),
+                ('status', models.CharField(choices=[('normal', 'Normal'), ('attention', "E'tibor talab qiladi"), ('warning', 'Ogohlantirish'), ('critical', 'Kritik')], default='normal', max_length=20, verbose_name='Holat')),
+                ('alerts', models.JSONField(default=list, verbose_name='Ogohlantirishlar')),
+                ('recommendations', models.JSONField(default=list, verbose_name='Tavsiyalar')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Yaratilgan sana')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vital_readings', to='ai_services.monitoringsession', verbose_name='Monitoring sessiyasi')),
+            ],
+            options={
+                'verbose_name': "Vital belgilar o'lchovi",
+                'verbose_name_plural': "Vital belgilar o'lchovlari",
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['session', 'created_at'], name='vsr_session_created_idx'), models.Index(fields=['status'], name='vsr_status_idx'), models.Index(fields=['created_at'], name='vsr_created_at_idx')],
+            },
+        ),
+    ]
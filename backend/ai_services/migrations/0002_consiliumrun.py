@@ -0,0 +1,36 @@
+# Generated by Django 5.0.1 on 2026-10-18 04:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_services', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsiliumRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_id', models.CharField(max_length=64, unique=True, verbose_name='Sessiya ID')),
+                ('language', models.CharField(max_length=16, verbose_name='Til')),
+                ('fingerprint', models.CharField(max_length=64, verbose_name="Bemor ma'lumotlari xeshi")),
+                ('stage', models.CharField(choices=[('phase1', 'Phase 1 tugagan'), ('phase2', 'Phase 2 tugagan'), ('completed', 'Yakunlangan')], max_length=16, verbose_name='Oxirgi tugagan faza')),
+                ('blob', models.BinaryField(verbose_name='Holat (zlib JSON)')),
+                ('blob_size', models.PositiveIntegerField(default=0, verbose_name='Hajmi (bayt)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Yaratilgan sana')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Yangilangan sana')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='consilium_runs', to=settings.AUTH_USER_MODEL, verbose_name='Foydalanuvchi')),
+            ],
+            options={
+                'verbose_name': 'Konsilium run',
+                'verbose_name_plural': 'Konsilium runlar',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,116 @@
+"""
+AI Services Models
+"""
+import uuid
+
+from django.conf import settings
+from django.db import models
+
+
+class AIJob(models.Model):
+    """Uzoq AI ishi (konsilium, avtonom protokol, klinik qaror)  -  fon navbatida bajariladi."""
+
+    KIND_CHOICES = [
+        ('consilium', 'Konsilium'),
+        ('autonomous_protocol', 'Avtonom protokol'),
+        ('clinical_decision', 'Klinik qaror'),
+    ]
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Navbatda'),
+        (STATUS_RUNNING, 'Bajarilmoqda'),
+        (STATUS_SUCCEEDED, 'Tayyor'),
+        (STATUS_FAILED, 'Xatolik'),
+        (STATUS_CANCELLED, 'Bekor qilingan'),
+    ]
+    ACTIVE_STATUSES = (STATUS_QUEUED, STATUS_RUNNING)
+    FINAL_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED, STATUS_CANCELLED)
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='ai_jobs',
+        verbose_name='Foydalanuvchi'
+    )
+    kind = models.CharField(max_length=32, choices=KIND_CHOICES, verbose_name='Turi')
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED, verbose_name='Holati')
+    params = models.JSONField(default=dict, verbose_name='Parametrlar')
+    progress = models.JSONField(default=dict, blank=True, verbose_name='Jarayon')
+    result = models.JSONField(null=True, blank=True, verbose_name='Natija')
+    error = models.TextField(blank=True, verbose_name='Xatolik')
+    cancel_requested = models.BooleanField(default=False, verbose_name='Bekor qilish so\'ralgan')
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Yaratilgan sana')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Boshlangan')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Tugagan')
+
+    class Meta:
+        verbose_name = 'AI ishi'
+        verbose_name_plural = 'AI ishlari'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.id} ({self.status})"
+
+    def to_dict(self, include_result: bool = True) -> dict:
+        data = {
+            'job_id': str(self.id),
+            'kind': self.kind,
+            'status': self.status,
+            'progress': self.progress,
+            'error': self.error,
+            'cancel_requested': self.cancel_requested,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+        if include_result:
+            data['result'] = self.result
+        return data
+
+
+class ConsiliumRun(models.Model):
+    """Konsilium fazalari checkpoint'i (run_store)  -  resume va Phase 3 replay uchun."""
+
+    STAGE_PHASE1 = 'phase1'
+    STAGE_PHASE2 = 'phase2'
+    STAGE_COMPLETED = 'completed'
+    STAGE_CHOICES = [
+        (STAGE_PHASE1, 'Phase 1 tugagan'),
+        (STAGE_PHASE2, 'Phase 2 tugagan'),
+        (STAGE_COMPLETED, 'Yakunlangan'),
+    ]
+
+    session_id = models.CharField(max_length=64, unique=True, verbose_name='Sessiya ID')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='consilium_runs',
+        verbose_name='Foydalanuvchi'
+    )
+    language = models.CharField(max_length=16, verbose_name='Til')
+    fingerprint = models.CharField(max_length=64, verbose_name='Bemor ma\'lumotlari xeshi')
+    stage = models.CharField(max_length=16, choices=STAGE_CHOICES, verbose_name='Oxirgi tugagan faza')
+    blob = models.BinaryField(verbose_name='Holat (zlib JSON)')
+    blob_size = models.PositiveIntegerField(default=0, verbose_name='Hajmi (bayt)')
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Yaratilgan sana')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Yangilangan sana')
+
+    class Meta:
+        verbose_name = 'Konsilium run'
+        verbose_name_plural = 'Konsilium runlar'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.session_id} ({self.stage})"
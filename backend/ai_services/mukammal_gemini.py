@@ -257,16 +257,12 @@ Javoblar aniq, ilmiy asoslangan va amaliy bo'lishi kerak. Barcha javoblar o'zbek
        return ""
     
    def _extract_json_from_text(self, text: str) -> Dict[str, Any]:
-        """Try to extract JSON from text response"""
-       import re
+        """Try to extract JSON from text response (json_extract scanner)"""
+       from .json_extract import JSONNotFound, extract
        try:
-            # Find JSON block
-            json_match = re.search(r'\{[\s\S]*\}', text)
-           if json_match:
-               return json.loads(json_match.group())
-        except:
-           pass
-       return {'error': 'Failed to parse response', 'raw': text}
+           return extract(text, dict)
+       except JSONNotFound:
+           return {'error': 'Failed to parse response', 'raw': text}
     
    def _get_analysis_schema(self, analysis_type: str) -> Dict[str, Any]:
         """Get JSON schema for analysis type"""
@@ -10,19 +10,26 @@ Arxitektura:
     3. Llama 3.3 (FJSTI-llama)    ->  Prof. Nodira Karimova (Tibbiy Ensiklopedist, Onkolog)
     4. Mistral (FJSTI-mistral)    ->  Prof. Bahrom Nazarov (Klinik Standartlar, Gastroenterolog)
     5. GPT-4o-mini (FJSTI-mini)   ->  Prof. Sarvinoz Mirzayeva (Farmakolog)
+
+Bosqichlar stage_graph runtime'ida graf sifatida e'lon qilingan (consilium_stages):
+rejalashtirish, timeout, metrikalar multi_agent_system konsiliumi bilan umumiy;
+model chaqiruvlari call_model orqali (kesh, retry, rate governor).
 """
 
 import json
 import logging
-import concurrent.futures
+import functools
 from typing import Any, Optional
 
+from django.conf import settings
 from django.utils import timezone
 
+from . import stage_graph
+
 from .azure_utils import (
-    get_azure_client,
-    _patient_text,
-    _parse_json_response,
+    call_model,
+    parse_json,
+    patient_text as _patient_text,
     DEPLOY_GPT4O,
     DEPLOY_DEEPSEEK,
     DEPLOY_LLAMA,
@@ -113,24 +120,14 @@ DEPLOY_MAP = {
 
 def _chat(deployment: str, system_msg: str, user_msg: str,
           response_json: bool = False, max_tokens: int = 2000) -> str:
-    """Simple chat completion call with optimized timeout for speed."""
-    client = get_azure_client()
+    """Bitta model chaqiruvi  -  umumiy call_model yo'li (timeout graf bosqichida)."""
     messages = [
         {"role": "system", "content": system_msg},
         {"role": "user", "content": user_msg},
     ]
-    kwargs: dict[str, Any] = {
-        "model": deployment,
-        "messages": messages,
-        "temperature": 0.1,  # Lower for faster convergence
-        "max_tokens": max_tokens,
-        "timeout": 30,  # Optimized timeout for speed (was 45)
-    }
-    if response_json:
-        kwargs["response_format"] = {"type": "json_object"}
     try:
-        resp = client.chat.completions.create(**kwargs)
-        return (resp.choices[0].message.content or "").strip()
+        return call_model(deployment, messages, response_json=response_json,
+                          temperature=0.1, max_tokens=max_tokens).strip()
     except Exception as e:
         logger.error("Chat call failed (deployment=%s): %s", deployment, e)
         return f"[Xatolik: {e}]"
@@ -173,8 +170,8 @@ def _professor_initial_diagnosis(prof: dict, patient_text: str, language_hint: s
         '"recommended_tests": ["..."], "initial_treatment": "..."}'
     )
     raw = _chat(deployment, system, user, response_json=True, max_tokens=1000)  # Reduced from 1200
-    parsed = _parse_json_response(raw, f"prof_{prof['id']}_initial")
-    if not isinstance(parsed, dict):
+    parsed = parse_json(raw, f"prof_{prof['id']}_initial")
+    if not isinstance(parsed, dict) or not parsed:
         parsed = {"primary_diagnosis": "Tashxis aniqlanmadi", "error": raw[:200]}
     parsed["professor_id"] = prof["id"]
     parsed["professor_name"] = prof["name"]
@@ -242,8 +239,8 @@ def _professor_debate(
         '"key_argument": "Asosiy ilmiy dalil..."}'
     )
     raw = _chat(deployment, system, user, response_json=True, max_tokens=1200)  # Reduced from 1500
-    parsed = _parse_json_response(raw, f"prof_{prof['id']}_debate")
-    if not isinstance(parsed, dict):
+    parsed = parse_json(raw, f"prof_{prof['id']}_debate")
+    if not isinstance(parsed, dict) or not parsed:
         parsed = {"critique": "", "defense": raw[:200], "revised_diagnosis": ""}
     parsed["professor_id"] = prof["id"]
     parsed["professor_name"] = prof["name"]
@@ -338,8 +335,8 @@ def _final_consensus(
         "Barcha matn qiymatlari (critical_finding finding, implication va boshqalar) faqat o'zbek tilida bo'lsin; yulduzcha (*) va inglizcha iboralar ishlatmang."
     )
     raw = _chat(DEPLOY_GPT4O(), system, user, response_json=True, max_tokens=4000)
-    parsed = _parse_json_response(raw, "final_consensus")
-    if not isinstance(parsed, dict):
+    parsed = parse_json(raw, "final_consensus")
+    if not isinstance(parsed, dict) or not parsed:
         return {
             "error": "Konsensus yaratishda xatolik",
             "raw": raw[:300],
@@ -365,12 +362,6 @@ def _pharmacology_review(
         f"Javob tili: {language_hint}. FAQAT JSON."
     )
     meds = consensus.get("medications", [])
-    allergies = ""
-    for line in patient_data_context:
-        if "Allergiya:" in line:
-            allergies = line
-            break
-
     user = (
         f"Bemor:\n{patient_text}\n\n"
         f"Taklif etilgan dorilar:\n{json.dumps(meds, ensure_ascii=False)}\n\n"
@@ -379,23 +370,98 @@ def _pharmacology_review(
         '"warnings": [...], "substitutions": [...], "pharmacology_note": "..."}'
     )
     raw = _chat(DEPLOY_MINI(), system, user, response_json=True, max_tokens=2000)
-    return _parse_json_response(raw, "pharmacology_review")
+    return parse_json(raw, "pharmacology_review")
+
+
+# ---------------------------------------------------------------------------
+# Agent graph (stage_graph runtime)
+# ---------------------------------------------------------------------------
+
+_STEP_TIMEOUT = 35   # professor bosqichi (initial / debate) uchun, soniya
+
+
+def _deadline() -> float:
+    return float(getattr(settings, "AI_PIPELINE_DEADLINE", 120))
+
+
+def _initial_fallback(prof: dict) -> dict:
+    logger.error("Professor %s initial diagnosis timed out", prof["name"])
+    return {
+        "professor_id": prof["id"],
+        "professor_name": prof["name"],
+        "professor_title": prof["title"],
+        "primary_diagnosis": "Vaqt tugadi - tezkor rejim",
+        "error": "Timeout - fast mode",
+    }
 
 
-# Workaround: patient_data_context passed via module-level temp
-patient_data_context: list[str] = []
+def _debate_fallback(prof: dict) -> dict:
+    logger.error("Professor %s debate timed out", prof["name"])
+    return {
+        "professor_id": prof["id"],
+        "professor_name": prof["name"],
+        "critique": "",
+        "defense": "Vaqt tugadi - tezkor rejim",
+        "revised_diagnosis": "",
+    }
+
+
+def _synthesis_step(patient_text: str, language_hint: str, **initial: dict) -> str:
+    return _moderator_synthesis(patient_text, list(initial.values()), 1, language_hint)
+
+
+def _debate_step(prof: dict, patient_text: str, language_hint: str,
+                 synthesis: str, **initial: dict) -> dict:
+    return _professor_debate(prof, patient_text, list(initial.values()), synthesis, language_hint)
+
+
+def _consensus_step(patient_text: str, language_hint: str, **opinions: dict) -> dict:
+    initial = [v for k, v in opinions.items() if k.startswith("initial_")]
+    debate = [v for k, v in opinions.items() if k.startswith("debate_")]
+    return _final_consensus(patient_text, initial, debate, language_hint)
+
+
+def consilium_stages(patient_text: str, language_hint: str) -> list[stage_graph.Stage]:
+    """
+    Konsilium grafi  -  agentlar va bog'liqliklar ma'lumot sifatida:
+
+        intro                                  (mustaqil, initial bilan parallel)
+        initial_<id> x5 -> synthesis -> debate_<id> x5 -> consensus -> pharmacology
+    """
+    Stage = stage_graph.Stage
+    initial = tuple(f"initial_{p['id']}" for p in PROFESSORS)
+    debate = tuple(f"debate_{p['id']}" for p in PROFESSORS)
+    return [
+        Stage("intro", functools.partial(_moderator_intro, patient_text, language_hint),
+              fallback=lambda: "Kengash ochildi."),
+        *(Stage(name, functools.partial(_professor_initial_diagnosis, prof, patient_text, language_hint),
+                fallback=functools.partial(_initial_fallback, prof), timeout=_STEP_TIMEOUT)
+          for name, prof in zip(initial, PROFESSORS)),
+        Stage("synthesis", functools.partial(_synthesis_step, patient_text, language_hint),
+              deps=initial, fallback=lambda: "Barcha professorlar o'z fikrlarini bildirdi."),
+        *(Stage(name, functools.partial(_debate_step, prof, patient_text, language_hint),
+                deps=("synthesis",) + initial,
+                fallback=functools.partial(_debate_fallback, prof), timeout=_STEP_TIMEOUT)
+          for name, prof in zip(debate, PROFESSORS)),
+        Stage("consensus", functools.partial(_consensus_step, patient_text, language_hint),
+              deps=initial + debate,
+              fallback=lambda: {"error": "Konsensus vaqtida tayyor bo'lmadi",
+                                "consensus_diagnosis": {"name": "Xatolik", "probability": 0}}),
+        Stage("pharmacology", lambda consensus: _pharmacology_review(patient_text, consensus, language_hint),
+              deps=("consensus",), fallback=lambda: {"error": "Farmakologik tekshiruv vaqtida tayyor bo'lmadi"}),
+    ]
 
 
 # ---------------------------------------------------------------------------
 # Main Public Function
 # ---------------------------------------------------------------------------
 
-def run_multi_agent_consilium(patient_data: dict, language: str = "uz-L") -> dict:
+def run_multi_agent_consilium(patient_data: dict, language: str = "uz-L", tenant: Any = None) -> dict:
     """
     Run the full Multi-Agent Medical Consilium.
 
-    Flow:
-        1. Moderator opens the session (GPT-4o)
+    Flow (consilium_stages, stage_graph runtime):
+        1. Moderator opens the session (GPT-4o)  -  parallel with step 2
         2. All 5 professors give independent diagnoses (parallel)
         3. Moderator synthesizes & raises debate points (GPT-4o)
         4. Professors debate each other (parallel)
@@ -405,12 +471,12 @@ def run_multi_agent_consilium(patient_data: dict, language: str = "uz-L") -> dic
     Args:
         patient_data: Patient clinical data dict.
         language: Output language code (uz-L, uz-C, ru, en).
+        tenant: agent_pool fairness key (clinic). Raises agent_pool.PoolSaturated
+            when the shared pool is full.
 
     Returns:
-        Full consilium result dict.
+        Full consilium result dict (stage_timings  -  per-step timings).
     """
-    global patient_data_context
-
     lang_map = {
         "uz-L": "O'zbek (Lotin)",
         "uz-C": "O'zbek (Kirill)",
@@ -420,7 +486,6 @@ def run_multi_agent_consilium(patient_data: dict, language: str = "uz-L") -> dic
     }
     language_hint = lang_map.get(language, "O'zbek (Lotin)")
     patient_text = _patient_text(patient_data)
-    patient_data_context = patient_text.split("\n")
 
     result: dict[str, Any] = {
         "session_id": f"consilium_{timezone.now().strftime('%Y%m%d_%H%M%S')}",
@@ -439,136 +504,31 @@ def run_multi_agent_consilium(patient_data: dict, language: str = "uz-L") -> dic
         "final_report": None,
     }
 
-    # -----------------------------------------------------------------------
-    # STEP 1: Moderator intro
-    # -----------------------------------------------------------------------
-    logger.info("[Consilium] Step 1: Moderator intro")
-    try:
-        intro = _moderator_intro(patient_text, language_hint)
-        result["steps"]["intro"] = intro
-    except Exception as e:
-        logger.error("Moderator intro failed: %s", e)
-        result["steps"]["intro"] = "Kengash ochildi."
-
-    # -----------------------------------------------------------------------
-    # STEP 2: Parallel initial diagnoses
-    # -----------------------------------------------------------------------
-    logger.info("[Consilium] Step 2: Parallel initial diagnoses (%d professors)", len(PROFESSORS))
-    initial_opinions: list[dict] = []
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        futures = {
-            executor.submit(_professor_initial_diagnosis, prof, patient_text, language_hint): prof
-            for prof in PROFESSORS
-        }
-        for future in concurrent.futures.as_completed(futures, timeout=35):  # Reduced from 50
-            prof = futures[future]
-            try:
-                opinion = future.result(timeout=30)  # Reduced from 45
-                initial_opinions.append(opinion)
-                logger.info("[Consilium] %s diagnosis done", prof["name"])
-            except concurrent.futures.TimeoutError:
-                logger.error("Professor %s initial diagnosis timed out", prof["name"])
-                initial_opinions.append({
-                    "professor_id": prof["id"],
-                    "professor_name": prof["name"],
-                    "professor_title": prof["title"],
-                    "primary_diagnosis": "Vaqt tugadi - tezkor rejim",
-                    "error": "Timeout - fast mode",
-                })
-            except Exception as e:
-                logger.error("Professor %s initial diagnosis failed: %s", prof["name"], e)
-                initial_opinions.append({
-                    "professor_id": prof["id"],
-                    "professor_name": prof["name"],
-                    "professor_title": prof["title"],
-                    "primary_diagnosis": "Tahlil muvaffaqiyatsiz",
-                    "error": str(e),
-                })
-
-    # Sort by PROFESSORS order
-    order = {p["id"]: i for i, p in enumerate(PROFESSORS)}
-    initial_opinions.sort(key=lambda x: order.get(x.get("professor_id", ""), 99))
-    result["steps"]["initial_opinions"] = initial_opinions
-
-    # -----------------------------------------------------------------------
-    # STEP 3: Moderator synthesis
-    # -----------------------------------------------------------------------
-    logger.info("[Consilium] Step 3: Moderator synthesis")
-    try:
-        synthesis = _moderator_synthesis(patient_text, initial_opinions, 1, language_hint)
-        result["steps"]["synthesis_round1"] = synthesis
-    except Exception as e:
-        logger.error("Moderator synthesis failed: %s", e)
-        synthesis = "Barcha professorlar o'z fikrlarini bildirdi."
-        result["steps"]["synthesis_round1"] = synthesis
-
-    # -----------------------------------------------------------------------
-    # STEP 4: Debate round (parallel)
-    # -----------------------------------------------------------------------
-    logger.info("[Consilium] Step 4: Debate round")
-    debate_responses: list[dict] = []
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        futures = {
-            executor.submit(
-                _professor_debate, prof, patient_text, initial_opinions, synthesis, language_hint
-            ): prof
-            for prof in PROFESSORS
-        }
-        for future in concurrent.futures.as_completed(futures, timeout=35):  # Reduced from 50
-            prof = futures[future]
-            try:
-                debate = future.result(timeout=30)  # Reduced from 45
-                debate_responses.append(debate)
-                logger.info("[Consilium] %s debate done", prof["name"])
-            except concurrent.futures.TimeoutError:
-                logger.error("Professor %s debate timed out", prof["name"])
-                debate_responses.append({
-                    "professor_id": prof["id"],
-                    "professor_name": prof["name"],
-                    "critique": "",
-                    "defense": "Vaqt tugadi - tezkor rejim",
-                    "revised_diagnosis": "",
-                })
-            except Exception as e:
-                logger.error("Professor %s debate failed: %s", prof["name"], e)
-                debate_responses.append({
-                    "professor_id": prof["id"],
-                    "professor_name": prof["name"],
-                    "critique": "",
-                    "defense": str(e),
-                    "revised_diagnosis": "",
-                })
-
-    debate_responses.sort(key=lambda x: order.get(x.get("professor_id", ""), 99))
-    result["steps"]["debate_responses"] = debate_responses
-
-    # -----------------------------------------------------------------------
-    # STEP 5: Final consensus
-    # -----------------------------------------------------------------------
-    logger.info("[Consilium] Step 5: Final consensus")
-    try:
-        consensus = _final_consensus(patient_text, initial_opinions, debate_responses, language_hint)
-        result["steps"]["consensus"] = consensus
-    except Exception as e:
-        logger.error("Final consensus failed: %s", e)
-        consensus = {"error": str(e), "consensus_diagnosis": {"name": "Xatolik", "probability": 0}}
-        result["steps"]["consensus"] = consensus
-
-    # -----------------------------------------------------------------------
-    # STEP 6: Pharmacology review
-    # -----------------------------------------------------------------------
-    logger.info("[Consilium] Step 6: Pharmacology review")
-    try:
-        pharma = _pharmacology_review(patient_text, consensus, language_hint)
-        result["steps"]["pharmacology_review"] = pharma
-        # Merge validated medications back into consensus
-        if isinstance(pharma, dict) and pharma.get("validated_medications"):
-            consensus["medications"] = pharma["validated_medications"]
-            consensus["pharmacology_warnings"] = pharma.get("warnings", [])
-            consensus["drug_interactions"] = pharma.get("interactions_found", [])
-    except Exception as e:
-        logger.error("Pharmacology review failed: %s", e)
-        result["steps"]["pharmacology_review"] = {"error": str(e)}
+    logger.info("[Consilium] Started (%d professors)", len(PROFESSORS))
+    steps, timings = stage_graph.run(
+        consilium_stages(patient_text, language_hint), _deadline(), tenant,
+        graph="professor_consilium",
+    )
+    initial_opinions = [steps[f"initial_{p['id']}"] for p in PROFESSORS]
+    debate_responses = [steps[f"debate_{p['id']}"] for p in PROFESSORS]
+    consensus = steps["consensus"]
+    pharma = steps["pharmacology"]
+
+    # Merge validated medications back into consensus
+    if isinstance(pharma, dict) and pharma.get("validated_medications"):
+        consensus["medications"] = pharma["validated_medications"]
+        consensus["pharmacology_warnings"] = pharma.get("warnings", [])
+        consensus["drug_interactions"] = pharma.get("interactions_found", [])
+
+    result["steps"] = {
+        "intro": steps["intro"],
+        "initial_opinions": initial_opinions,
+        "synthesis_round1": steps["synthesis"],
+        "debate_responses": debate_responses,
+        "consensus": consensus,
+        "pharmacology_review": pharma,
+    }
+    result["stage_timings"] = timings
 
     # -----------------------------------------------------------------------
     # Build final report
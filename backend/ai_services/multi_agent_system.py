@@ -33,21 +33,30 @@ Xavfsizlik:
 
 from __future__ import annotations
 
-import concurrent.futures
+import asyncio
+import functools
 import logging
 import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from concurrent.futures import TimeoutError as FutureTimeout
 from dataclasses import dataclass, field
-from typing import Any, Optional
+from typing import Any, Callable, Iterator, Optional
 
+from django.conf import settings
 from django.utils import timezone
 
+from . import agent_pool, agreement, prompt_budget, prompt_prefix, response_schemas, run_store, stage_graph
 from .azure_utils import (
+    acall_model,
     call_model,
     build_messages,
-    parse_json,
     patient_text,
     Deployments,
 )
+from .models import ConsiliumRun
+from .prompt_prefix import StaticPrefix
+from .response_schemas import SchemaError, array, boolean, integer, obj, string
 
 logger = logging.getLogger(__name__)
 
@@ -136,6 +145,9 @@ ORCHESTRATOR = Agent(
 
 _AGENT_ID_MAP: dict[str, Agent] = {a.id: a for a in AGENTS}
 
+# Bitta agent chaqiruvi uchun timeout (soniya)
+_AGENT_TIMEOUT = 60
+
 # в”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђ
 # Result container
 # в”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђ
@@ -183,38 +195,45 @@ _P1_USER = """\
 BEMOR MA'LUMOTLARI:
 {patient}
 
-Quyidagi JSON formatida MUSTAQIL tashxisingizni bildiring:
-{{
-  "primary_diagnosis": "Aniq tashxis nomi (O'zbek tilida)",
-  "probability": 80,
-  "reasoning_chain": [
-    "Belgi/simptom  ->  klinik ahamiyati",
-    "Lab/ob'ektiv  ->  xulosasi",
-    "Differensial  ->  nega bu ehtimolroq"
-  ],
-  "supporting_evidence": ["Dalil 1", "Dalil 2"],
-  "red_flags": ["Shoshilinch belgi (agar bo'lsa)"],
-  "differential": [
-    {{"name": "Alt tashxis", "probability": 20, "reason": "Nega kamroq"}}
-  ],
-  "recommended_tests": ["Tekshiruv 1"],
-  "initial_treatment_notes": "Qisqa tavsiya",
-  "confidence": "HIGH/MEDIUM/LOW",
-  "evidence_level": "A/B/C"
-}}"""
-
-
-def _phase1_single(agent: Agent, patient_str: str) -> dict:
-    system = _P1_SYSTEM.format(persona=agent.persona)
-    user   = _P1_USER.format(patient=patient_str)
-    t0 = time.monotonic()
-    try:
-        raw    = call_model(agent.deployment,
-                            build_messages(system, user, want_json=True),
-                            response_json=True, temperature=0.15, max_tokens=2000)  # Reduced from 2500
-        result = parse_json(raw, f"p1_{agent.id}")
-        result = result if isinstance(result, dict) else {}
-    except Exception as exc:
+MUSTAQIL tashxisingizni JSON formatida bildiring (* majburiy maydon):
+{schema}"""
+
+_PROBABILITY = integer("Ehtimollik, % (dalil kuchiga mos)", minimum=0, maximum=100)
+_LEVEL = ("HIGH", "MEDIUM", "LOW")
+
+P1_SCHEMA = response_schemas.register("consilium_phase1", obj({
+    "primary_diagnosis": string("Aniq tashxis nomi (O'zbek tilida)"),
+    "icd10":             string("ICD-10 kodi, masalan I21.4"),
+    "probability":       _PROBABILITY,
+    "reasoning_chain":   array(string(
+        "Belgi/simptom -> klinik ahamiyati; lab/ob'ektiv -> xulosa; differensial -> nega bu ehtimolroq"
+    ), max_items=8),
+    "supporting_evidence": array(string()),
+    "red_flags":           array(string("Shoshilinch belgi (agar bo'lsa)")),
+    "differential": array(obj({
+        "name":        string("Alternativ tashxis"),
+        "probability": _PROBABILITY,
+        "reason":      string("Nega kamroq ehtimol"),
+    }, required=("name",)), max_items=5),
+    "recommended_tests":       array(string()),
+    "initial_treatment_notes": string("Qisqa tavsiya"),
+    "confidence":              string(enum=_LEVEL),
+    "evidence_level":          string(enum=("A", "B", "C")),
+}, required=("primary_diagnosis", "probability")))
+
+
+def _phase1_messages(agent: Agent, patient_str: str) -> list[dict]:
+    user = _P1_USER.format(patient=patient_str, schema=P1_SCHEMA.hint)
+    return build_messages("", user, want_json=True, prefix=_system_prefix("p1", _P1_SYSTEM, agent))
+
+
+def _phase1_finish(agent: Agent, raw: str | None, exc: Exception | None, t0: float) -> dict:
+    if exc is None:
+        try:
+            result = P1_SCHEMA.parse(raw or "")
+        except SchemaError as err:
+            exc = err
+    if exc is not None:
         logger.error("Phase1[%s] failed: %s", agent.id, exc)
         result = {"error": str(exc), "primary_diagnosis": "Tahlil muvaffaqiyatsiz"}
     result.update({
@@ -226,24 +245,34 @@ def _phase1_single(agent: Agent, patient_str: str) -> dict:
     return result
 
 
-def run_phase1(patient_str: str) -> list[dict]:
-    """4 agent parallel  -  independent diagnosis. Optimized for speed."""
-    order = {a.id: i for i, a in enumerate(AGENTS)}
-    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as pool:
-        futures = {pool.submit(_phase1_single, a, patient_str): a for a in AGENTS}
-        results = []
-        for fut in concurrent.futures.as_completed(futures):
-            agent = futures[fut]
-            try:
-                results.append(fut.result(timeout=60))  # Reduced from 90
-            except Exception as exc:
-                logger.error("Phase1 timeout[%s]: %s", agent.id, exc)
-                results.append({
-                    "agent_id": agent.id, "agent_name": agent.name,
-                    "primary_diagnosis": "Timeout", "error": str(exc),
-                })
-    results.sort(key=lambda x: order.get(x.get("agent_id", ""), 99))
-    return results
+def _phase1_timeout(agent: Agent, exc: BaseException) -> dict:
+    logger.error("Phase1 timeout[%s]: %s", agent.id, exc)
+    return {
+        "agent_id": agent.id, "agent_name": agent.name,
+        "primary_diagnosis": "Timeout", "error": str(exc) or "timeout",
+    }
+
+
+def _phase1_single(agent: Agent, patient_str: str) -> dict:
+    t0 = time.monotonic()
+    try:
+        raw = call_model(agent.deployment, _phase1_messages(agent, patient_str),
+                         schema=P1_SCHEMA, temperature=0.15, max_tokens=2000,  # Reduced from 2500
+                         endpoint="consilium_phase1")
+    except Exception as exc:
+        return _phase1_finish(agent, None, exc, t0)
+    return _phase1_finish(agent, raw, None, t0)
+
+
+async def _aphase1_single(agent: Agent, patient_str: str) -> dict:
+    t0 = time.monotonic()
+    try:
+        raw = await acall_model(agent.deployment, _phase1_messages(agent, patient_str),
+                                schema=P1_SCHEMA, temperature=0.15, max_tokens=2000,
+                                endpoint="consilium_phase1")
+    except Exception as exc:
+        return _phase1_finish(agent, None, exc, t0)
+    return _phase1_finish(agent, raw, None, t0)
 
 
 # в”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђ
@@ -273,63 +302,67 @@ BOSHQA PROFESSORLAR MUSTAQIL TASHXISLARI:
 SIZNING DASTLABKI TASHXISINGIZ:
 {own_json}
 
-Debate javobingizni quyidagi JSON formatida yozing:
-{{
-  "refutations": [
-    {{
-      "target_agent_id": "deepseek",
-      "target_diagnosis": "Ular aytgan tashxis",
-      "refutation": "Bu noto'g'ri/zaif chunki: [ANIQ ILMIY SABAB]",
-      "strength": "STRONG/MODERATE/WEAK"
-    }}
-  ],
-  "defense": {{
-    "my_diagnosis_stands": true,
-    "argument": "O'z pozitsiyamni himoya qilaman chunki ...",
-    "new_evidence": "Yangi qo'shilgan dalil"
-  }},
-  "revised_diagnosis": "Yangilangan tashxis (o'zgarmasa, dastlabki tashxisni yozing)",
-  "revised_probability": 85,
-  "accepted_from_others": [
-    {{"agent_id": "llama", "point": "Bu professorda to'g'ri nuqta: ..."}}
-  ],
-  "key_argument": "Eng muhim klinik dalil yoki mantiqiy nuqta"
-}}"""
-
-
-def _phase2_single(agent: Agent, patient_str: str,
-                   own: dict, others: list[dict]) -> dict:
-    import json as _json
-    others_text = _json.dumps(
-        [{
-            "agent_id":   o.get("agent_id"),
-            "agent_name": o.get("agent_name"),
-            "diagnosis":  o.get("primary_diagnosis"),
-            "probability": o.get("probability"),
-            "reasoning":  o.get("reasoning_chain"),
-            "evidence":   o.get("supporting_evidence"),
-        } for o in others],
-        ensure_ascii=False, indent=2,
+Debate javobingizni JSON formatida yozing (* majburiy maydon):
+{schema}"""
+
+P2_SCHEMA = response_schemas.register("consilium_phase2", obj({
+    "refutations": array(obj({
+        "target_agent_id":  string("Inkor qilinayotgan professor agent_id si"),
+        "target_diagnosis": string("Ular aytgan tashxis"),
+        "refutation":       string("Bu noto'g'ri/zaif chunki: [aniq ilmiy sabab]"),
+        "strength":         string(enum=("STRONG", "MODERATE", "WEAK")),
+    }, required=("target_agent_id", "refutation", "strength"))),
+    "defense": obj({
+        "my_diagnosis_stands": boolean(),
+        "argument":            string("O'z pozitsiyamni himoya qilaman chunki ..."),
+        "new_evidence":        string("Yangi qo'shilgan dalil"),
+    }),
+    "revised_diagnosis":   string("Yangilangan tashxis (o'zgarmasa  -  dastlabki tashxis)"),
+    "revised_probability": _PROBABILITY,
+    "accepted_from_others": array(obj({
+        "agent_id": string(),
+        "point":    string("Shu professordagi to'g'ri nuqta"),
+    }, required=("point",))),
+    "key_argument": string("Eng muhim klinik dalil yoki mantiqiy nuqta"),
+}, required=("revised_diagnosis", "revised_probability")))
+
+
+def _phase2_messages(agent: Agent, patient_str: str,
+                     own: dict, others: list[dict]) -> list[dict]:
+    # Byudjet: boshqalar fikri 75%, o'z tashxisi 25%; oshsa eng past ehtimollik
+    # bilan aytilgan fikrlar birinchi qisqaradi
+    limit = prompt_budget.budget("phase2")
+    others_text, others_trim = prompt_budget.fit(
+        [prompt_budget.phase1_view(o) for o in others],
+        [prompt_budget.as_weight(o.get("probability")) for o in others],
+        int(limit * 0.75),
+        keep=("agent_id", "diagnosis", "probability"),
+    )
+    own_view = prompt_budget.phase1_view(own)
+    own_text, own_trim = prompt_budget.fit_one(
+        {k: own_view[k] for k in ("diagnosis", "probability", "reasoning", "evidence", "confidence")
+         if k in own_view},
+        int(limit * 0.25),
+        keep=("diagnosis", "probability", "confidence"),
     )
-    own_text = _json.dumps({
-        "diagnosis":   own.get("primary_diagnosis"),
-        "probability": own.get("probability"),
-        "reasoning":   own.get("reasoning_chain"),
-        "evidence":    own.get("supporting_evidence"),
-        "confidence":  own.get("confidence"),
-    }, ensure_ascii=False, indent=2)
-
-    system = _P2_SYSTEM.format(persona=agent.persona)
-    user   = _P2_USER.format(patient=patient_str,
+
+    prefix = _system_prefix("p2", _P2_SYSTEM, agent)
+    user   = _P2_USER.format(patient=patient_str, schema=P2_SCHEMA.hint,
                               others_json=others_text, own_json=own_text)
-    t0 = time.monotonic()
-    try:
-        raw    = call_model(agent.deployment,
-                            build_messages(system, user, want_json=True),
-                            response_json=True, temperature=0.2, max_tokens=2400)  # Reduced from 3000
-        result = parse_json(raw, f"p2_{agent.id}")
-        result = result if isinstance(result, dict) else {}
-    except Exception as exc:
+    prompt_budget.record("phase2", {
+        "system": prefix.text, "template": _P2_USER + P2_SCHEMA.hint, "patient": patient_str,
+        "others": others_text, "own": own_text,
+    }, others_trim + own_trim)
+    return build_messages("", user, want_json=True, prefix=prefix)
+
+
+def _phase2_finish(agent: Agent, raw: str | None, exc: Exception | None, t0: float) -> dict:
+    if exc is None:
+        try:
+            result = P2_SCHEMA.parse(raw or "")
+        except SchemaError as err:
+            exc = err
+    if exc is not None:
         logger.error("Phase2[%s] failed: %s", agent.id, exc)
         result = {"error": str(exc)}
     result.update({
@@ -340,26 +373,39 @@ def _phase2_single(agent: Agent, patient_str: str,
     return result
 
 
-def run_phase2(patient_str: str, p1: list[dict]) -> list[dict]:
-    """4 agent parallel  -  cross-examination + refutation. Optimized for speed."""
-    order      = {a.id: i for i, a in enumerate(AGENTS)}
-    id_to_p1   = {r.get("agent_id"): r for r in p1}
-    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as pool:
-        futures = {}
-        for agent in AGENTS:
-            own    = id_to_p1.get(agent.id, {})
-            others = [r for r in p1 if r.get("agent_id") != agent.id]
-            futures[pool.submit(_phase2_single, agent, patient_str, own, others)] = agent
-        results = []
-        for fut in concurrent.futures.as_completed(futures):
-            agent = futures[fut]
-            try:
-                results.append(fut.result(timeout=60))  # Reduced from 90
-            except Exception as exc:
-                logger.error("Phase2 timeout[%s]: %s", agent.id, exc)
-                results.append({"agent_id": agent.id, "error": str(exc)})
-    results.sort(key=lambda x: order.get(x.get("agent_id", ""), 99))
-    return results
+def _phase2_inputs(agent: Agent, p1: list[dict]) -> tuple[dict, list[dict]]:
+    own    = next((r for r in p1 if r.get("agent_id") == agent.id), {})
+    others = [r for r in p1 if r.get("agent_id") != agent.id]
+    return own, others
+
+
+def _phase2_single(agent: Agent, patient_str: str,
+                   own: dict, others: list[dict]) -> dict:
+    t0 = time.monotonic()
+    try:
+        raw = call_model(agent.deployment, _phase2_messages(agent, patient_str, own, others),
+                         schema=P2_SCHEMA, temperature=0.2, max_tokens=2400,  # Reduced from 3000
+                         endpoint="consilium_phase2")
+    except Exception as exc:
+        return _phase2_finish(agent, None, exc, t0)
+    return _phase2_finish(agent, raw, None, t0)
+
+
+async def _aphase2_single(agent: Agent, patient_str: str,
+                          own: dict, others: list[dict]) -> dict:
+    t0 = time.monotonic()
+    try:
+        raw = await acall_model(agent.deployment, _phase2_messages(agent, patient_str, own, others),
+                                schema=P2_SCHEMA, temperature=0.2, max_tokens=2400,
+                                endpoint="consilium_phase2")
+    except Exception as exc:
+        return _phase2_finish(agent, None, exc, t0)
+    return _phase2_finish(agent, raw, None, t0)
+
+
+def _phase2_timeout(agent: Agent, exc: BaseException) -> dict:
+    logger.error("Phase2 timeout[%s]: %s", agent.id, exc)
+    return {"agent_id": agent.id, "error": str(exc) or "timeout"}
 
 
 # в”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђ
@@ -426,104 +472,172 @@ PHASE 1  -  Mustaqil tashxislar:
 PHASE 2  -  Debate va refutation'lar:
 {phase2_json}
 
-Quyidagi JSON formatida YAKUNIY Farg'ona JSTI KONSILIUM XULOSASINI bering:
-{{
-  "consensus_diagnosis": {{
-    "name": "Asosiy tashxis nomi",
-    "icd10": "X00.0",
-    "probability": 94,
-    "justification": "Barcha dalillarni hisobga olgan xulosaning asosi ...",
-    "evidence_level": "A",
-    "reasoning_chain": ["Qadam 1 ...", "Qadam 2 ..."],
-    "uzbek_protocol_match": "SSV buyrug'i/protokol nomi",
-    "strongest_supporter": "deepseek"
-  }},
-  "differential_diagnoses": [
-    {{"name": "Alt tashxis", "probability": 6, "reason": "Nega kam ehtimol"}}
-  ],
-  "rejected_hypotheses": [
-    {{"name": "Rad etilgan tashxis", "reason": "Kim nima asosida rad etdi"}}
-  ],
-  "treatment_plan": [
-    "1-qadam: ...",
-    "2-qadam: ..."
-  ],
-  "medications": [
-    {{
-      "name": "Savdo nomi (O'zbekiston)",
-      "generic": "Generik nomi",
-      "dosage": "...",
-      "frequency": "...",
-      "duration": "...",
-      "timing": "Ovqatdan keyin/oldin",
-      "instructions": "...",
-      "contraindications": "...",
-      "local_availability": "O'zbekistonda mavjud / Aptekada bor"
-    }}
-  ],
-  "recommended_tests": ["Tekshiruv 1"],
-  "critical_finding": {{
-    "present": false,
-    "finding": "",
-    "implication": "",
-    "urgency": "HIGH/MEDIUM/LOW"
-  }},
-  "uzbekistan_protocol_note": "O'zbekiston Respublikasi SSV buyrug'i No. XX ...",
-  "agreement_level": "HIGH/MEDIUM/LOW",
-  "agreement_summary": "Professorlar kelishuvi haqida qisqa tavsif ...",
-  "dissenting_opinions": ["Farqli fikrlar (agar bo'lsa)"],
-  "follow_up_plan": "Kuzatuv rejasi ...",
-  "folk_medicine": {{
-    "intro": "Xalq tabobati qo'shimcha sifatida (qisqa)",
-    "disclaimer": "Rasmiy dori va shifokor ko'rsatmasi o'rnini bosmaydi",
-    "items": [
-      {{
-        "plant_name": "Matricaria chamomilla",
-        "plant_part": "gul",
-        "preparation_or_usage": "choy",
-        "traditional_context": "yumshoq spazm va uyqu uchun an'anaviy qo'llanish",
-        "precautions": "allergiya, dori bilan ta'sir"
-      }}
-    ]
-  }},
-  "nutrition_prevention": {{
-    "intro": "Kasalliklarni oldini olish va ovqatlanish (qisqa)",
-    "dietary_guidelines": ["Tuz va qandni nazorat", "Kuniga yetarli suv"],
-    "prevention_measures": ["Muntazam yengil harakat", "Rejalashtirilgan tekshiruvlar"],
-    "disclaimer": "Individual parhez uchun mutaxassis bilan maslahat"
-  }},
-  "agent_weights_used": {{}}
-}}"""
+YAKUNIY Farg'ona JSTI KONSILIUM XULOSASINI JSON formatida bering (* majburiy maydon):
+{schema}"""
+
+P3_SCHEMA = response_schemas.register("consilium_phase3", obj({
+    "consensus_diagnosis": obj({
+        "name":                 string("Asosiy tashxis nomi"),
+        "icd10":                string(),
+        "probability":          _PROBABILITY,
+        "justification":        string("Barcha dalillarni hisobga olgan xulosaning asosi"),
+        "evidence_level":       string("A/B/C"),
+        "reasoning_chain":      array(string()),
+        "uzbek_protocol_match": string("SSV buyrug'i/protokol nomi"),
+        "strongest_supporter":  string("Eng kuchli dalil keltirgan agent_id"),
+    }, required=("name", "probability")),
+    "differential_diagnoses": array(obj({
+        "name": string(), "probability": _PROBABILITY, "reason": string("Nega kam ehtimol"),
+    }, required=("name",)), max_items=5),
+    "rejected_hypotheses": array(obj({
+        "name": string(), "reason": string("Kim nima asosida rad etdi"),
+    }, required=("name",))),
+    "treatment_plan": array(string("N-qadam: ...")),
+    "medications": array(obj({
+        "name":               string("Savdo nomi (O'zbekiston)"),
+        "generic":            string(),
+        "dosage":             string(),
+        "frequency":          string(),
+        "duration":           string(),
+        "timing":             string("Ovqatdan keyin/oldin"),
+        "instructions":       string(),
+        "contraindications":  string(),
+        "local_availability": string("O'zbekistonda mavjud / Aptekada bor"),
+    }, required=("name",))),
+    "recommended_tests": array(string()),
+    "critical_finding": obj({
+        "present":     boolean(),
+        "finding":     string(),
+        "implication": string(),
+        "urgency":     string(enum=_LEVEL),
+    }),
+    "uzbekistan_protocol_note": string("O'zbekiston Respublikasi SSV buyrug'i No. ..."),
+    "agreement_level":          string(enum=_LEVEL),
+    "agreement_summary":        string("Professorlar kelishuvi haqida qisqa tavsif"),
+    "dissenting_opinions":      array(string()),
+    "follow_up_plan":           string("Kuzatuv rejasi"),
+    "folk_medicine": obj({
+        "intro":      string("Xalq tabobati qo'shimcha sifatida (qisqa)"),
+        "disclaimer": string("Rasmiy dori va shifokor ko'rsatmasi o'rnini bosmaydi"),
+        "items": array(obj({
+            "plant_name":           string("Lotincha nomi, masalan Matricaria chamomilla"),
+            "plant_part":           string(),
+            "preparation_or_usage": string(),
+            "traditional_context":  string(),
+            "precautions":          string("Allergiya, dori bilan ta'sir"),
+        }, required=("plant_name",))),
+    }),
+    "nutrition_prevention": obj({
+        "intro":               string("Kasalliklarni oldini olish va ovqatlanish (qisqa)"),
+        "dietary_guidelines":  array(string()),
+        "prevention_measures": array(string()),
+        "disclaimer":          string("Individual parhez uchun mutaxassis bilan maslahat"),
+    }),
+}, required=("consensus_diagnosis",)))
+
+
+_P3_NO_DEBATE = (
+    "Debate o'tkazilmadi: Phase 1 da barcha professorlar bir xil tashxisga "
+    "yuqori ehtimollik bilan kelishdi. Konsensusni shu tashxis asosida yozing."
+)
 
 
-def run_phase3(patient_str: str, p1: list[dict],
-               p2: list[dict], weights: dict[str, float]) -> dict:
-    """Orchestrator  -  weighted consensus."""
-    import json as _json
-    p1_text = _json.dumps(p1, ensure_ascii=False, indent=2)
-    p2_text = _json.dumps(p2, ensure_ascii=False, indent=2)
-    w_text  = _json.dumps(weights, ensure_ascii=False, indent=2)
+# Agent tizim promptlari (persona + faza qoidalari) import paytida bir marta yig'iladi
+# va xabarlarda statik prefiks sifatida birinchi turadi (prompt_prefix)
+def _register_system(phase: str, template: str, agent: Agent) -> StaticPrefix:
+    return prompt_prefix.register(f"consilium_{phase}:{agent.id}", template.format(persona=agent.persona))
+
 
-    system = _P3_SYSTEM.format(persona=ORCHESTRATOR.persona)
+_SYSTEM_PREFIXES: dict[tuple[str, str], StaticPrefix] = {
+    **{("p1", a.id): _register_system("p1", _P1_SYSTEM, a) for a in AGENTS},
+    **{("p2", a.id): _register_system("p2", _P2_SYSTEM, a) for a in AGENTS},
+    ("p3", ORCHESTRATOR.id): _register_system("p3", _P3_SYSTEM, ORCHESTRATOR),
+}
+
+
+def _system_prefix(phase: str, template: str, agent: Agent) -> StaticPrefix:
+    prefix = _SYSTEM_PREFIXES.get((phase, agent.id))
+    if prefix is None:          # AGENTS ro'yxatidan tashqari agent
+        prefix = _SYSTEM_PREFIXES[(phase, agent.id)] = _register_system(phase, template, agent)
+    return prefix
+
+
+def _phase3_messages(patient_str: str, p1: list[dict],
+                     p2: list[dict], weights: dict[str, float]) -> list[dict]:
+    # Byudjet: debate (p2) 60%, mustaqil tashxislar (p1) 40%; refutation weight'i
+    # eng past agentlar birinchi qisqaradi. Early-exit (p2 yo'q)  -  butun byudjet p1 ga
+    limit = prompt_budget.budget("phase3")
+    p1_text, p1_trim = prompt_budget.fit(
+        [prompt_budget.phase1_view(r) for r in p1],
+        [weights.get(r.get("agent_id"), 1.0) for r in p1],
+        int(limit * 0.4) if p2 else limit,
+        keep=("agent_id", "diagnosis", "probability"),
+    )
+    if p2:
+        p2_text, p2_trim = prompt_budget.fit(
+            [prompt_budget.phase2_view(r) for r in p2],
+            [weights.get(r.get("agent_id"), 1.0) for r in p2],
+            int(limit * 0.6),
+            keep=("agent_id", "revised_diagnosis", "revised_probability", "key_argument"),
+        )
+    else:
+        p2_text, p2_trim = _P3_NO_DEBATE, 0
+    w_text  = prompt_budget.compact(weights)
+
+    prefix = _system_prefix("p3", _P3_SYSTEM, ORCHESTRATOR)
     user   = _P3_USER.format(patient=patient_str,
+                              schema=P3_SCHEMA.hint,
                               weights_json=w_text,
                               phase1_json=p1_text,
                               phase2_json=p2_text)
-    t0 = time.monotonic()
-    try:
-        raw    = call_model(ORCHESTRATOR.deployment,
-                            build_messages(system, user, want_json=True),
-                            response_json=True, temperature=0.05, max_tokens=6000)
-        result = parse_json(raw, "p3_consensus")
-        result = result if isinstance(result, dict) else {}
-        result["agent_weights_used"] = weights
-    except Exception as exc:
+    prompt_budget.record("phase3", {
+        "system": prefix.text, "template": _P3_USER + P3_SCHEMA.hint, "patient": patient_str,
+        "phase1": p1_text, "phase2": p2_text, "weights": w_text,
+    }, p1_trim + p2_trim)
+    return build_messages("", user, want_json=True, prefix=prefix)
+
+
+def _phase3_finish(raw: str | None, exc: Exception | None,
+                   weights: dict[str, float], t0: float) -> dict:
+    if exc is None:
+        try:
+            result = P3_SCHEMA.parse(raw or "")
+            result["agent_weights_used"] = weights
+        except SchemaError as err:
+            exc = err
+    if exc is not None:
         logger.error("Phase3 consensus failed: %s", exc)
         result = {"error": str(exc)}
     result["_elapsed_ms"] = round((time.monotonic() - t0) * 1000)
     return result
 
 
+def run_phase3(patient_str: str, p1: list[dict],
+               p2: list[dict], weights: dict[str, float]) -> dict:
+    """Orchestrator  -  weighted consensus."""
+    t0 = time.monotonic()
+    try:
+        raw = call_model(ORCHESTRATOR.deployment, _phase3_messages(patient_str, p1, p2, weights),
+                         schema=P3_SCHEMA, temperature=0.05, max_tokens=6000,
+                         endpoint="consilium_phase3")
+    except Exception as exc:
+        return _phase3_finish(None, exc, weights, t0)
+    return _phase3_finish(raw, None, weights, t0)
+
+
+async def arun_phase3(patient_str: str, p1: list[dict],
+                      p2: list[dict], weights: dict[str, float]) -> dict:
+    """run_phase3 ning asyncio varianti."""
+    t0 = time.monotonic()
+    try:
+        raw = await acall_model(ORCHESTRATOR.deployment, _phase3_messages(patient_str, p1, p2, weights),
+                                schema=P3_SCHEMA, temperature=0.05, max_tokens=6000,
+                                endpoint="consilium_phase3")
+    except Exception as exc:
+        return _phase3_finish(None, exc, weights, t0)
+    return _phase3_finish(raw, None, weights, t0)
+
+
 # в”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђ
 # Final report builder
 # в”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђ
@@ -735,20 +849,249 @@ def _build_final_report(consensus: dict, p1: list[dict],
 
 
 # в”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђ
-# Main entry point
+# Debate scheduler  (Phase 1 -> Phase 2 quorum)
 # в”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђ
 
-def run_consilium(patient_data: dict, language: str = "uz-L") -> dict:
+def _quorum() -> int:
+    return max(1, min(len(AGENTS), int(getattr(settings, "AI_CONSILIUM_QUORUM", 3))))
+
+
+def _debate_deadline() -> float:
+    return float(getattr(settings, "AI_CONSILIUM_DEADLINE", 120))
+
+
+class _Debate:
+    """
+    Phase 1 -> Phase 2 rejalashtirish holati (stage_graph "consilium" grafi va async
+    drayver uchun umumiy).
+
+    Phase 2 agenti (Stage.ready = phase2_ready) quyidagi holatlarda boshlanadi:
+      - barcha Phase 1 javoblari keldi va early-exit bo'lmadi;
+      - kamida quorum agent javob berdi va early-exit endi mumkin emas
+        (agreement.still_possible)  -  tayyor agentlar debate'ni darhol boshlaydi,
+        kechikkanlar kelishi bilan qo'shiladi.
+    Early-exit da Phase 2 bosqichlari tashlab yuboriladi. Phase 1 + Phase 2 umumiy
+    muddati AI_CONSILIUM_DEADLINE; undan keyin tugamagan agentlar timeout deb belgilanadi.
+
+    p1 berilsa (checkpoint'dan resume)  -  Phase 1 tayyor, debate darhol boshlanadi.
     """
-    Full 3-phase Multi-Agent Medical Consilium.
 
-    Returns ConsiliumResult.to_dict() with all phases and final_report.
+    def __init__(self, result: ConsiliumResult, t_start: float,
+                 on_phase1: Optional[Callable[[list[dict]], None]] = None,
+                 p1: Optional[list[dict]] = None):
+        self.result   = result
+        self.t_start  = t_start
+        self.on_phase1 = on_phase1            # barcha Phase 1 javoblari kelganda (checkpoint)
+        self.deadline = t_start + _debate_deadline()
+        self.quorum   = _quorum()
+        self.p1: list[dict | None] = list(p1) if p1 else [None] * len(AGENTS)
+        self.p2: list[dict | None] = [None] * len(AGENTS)
+        self.mode: str | None = "debate" if p1 else None   # None | "debate" | "early"
+        self.timings: dict[str, Any] = {
+            "quorum": self.quorum, "deadline_s": _debate_deadline(), "speculative": False,
+            "phase1_ms": {}, "phase2_ms": {}, "timed_out": [],
+        }
+        if p1:
+            self.timings["resumed"] = True
+
+    def _ms(self) -> int:
+        return round((time.monotonic() - self.t_start) * 1000)
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cutoff(self, submitted_at: float) -> float:
+        return min(submitted_at + _AGENT_TIMEOUT, self.deadline)
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.deadline
+
+    def _mark(self, phase: str, i: int) -> None:
+        self.timings[f"{phase}_ms"][AGENTS[i].id] = self._ms()
+
+    def timed_out(self, phase: str, i: int) -> None:
+        self.timings["timed_out"].append(f"{phase}:{AGENTS[i].id}")
+
+    def phase1_done(self, i: int, res: dict) -> None:
+        """Natijani yozadi va (hali hal qilinmagan bo'lsa) early-exit / debate ni tanlaydi."""
+        self.p1[i] = res
+        self._mark("phase1", i)
+        done = [r for r in self.p1 if r is not None]
+        if self.mode is None:
+            if len(done) == len(AGENTS):
+                self.mode = "early" if _early_exit(self.result, done) else "debate"
+            elif len(done) >= self.quorum and not agreement.still_possible(done, len(AGENTS)):
+                self.mode = "debate"
+                self.timings["speculative"] = True
+                _early_exit(self.result, done)   # yo'l va sababni yozadi (full_debate)
+            if self.mode == "debate":
+                self.timings["phase2_started_ms"] = self._ms()
+                logger.info("[%s] Phase 2: Cross-examination started (%d/%d Phase 1 done)",
+                            self.result.session_id, len(done), len(AGENTS))
+            if len(done) >= self.quorum:
+                self.timings.setdefault("quorum_reached_ms", self._ms())
+        if len(done) == len(AGENTS) and self.on_phase1 is not None:
+            self.on_phase1(list(done))
+
+    def phase2_ready(self, i: int, results: Any = None) -> Optional[bool]:
+        """Stage.ready: i-agent Phase 2 si hozir boshlanadimi (None  -  early-exit, kerak emas)."""
+        if self.mode == "early":
+            return None
+        return self.mode == "debate" and self.p1[i] is not None
+
+    def phase2_inputs(self, i: int) -> tuple[dict, list[dict]]:
+        """Kechikkan agentlar hali kelmagan Phase 1 fikrlarini ko'rmaydi."""
+        done = [r for r in self.p1 if r is not None]
+        return _phase2_inputs(AGENTS[i], done)
+
+    def phase2_done(self, i: int, res: dict) -> None:
+        self.p2[i] = res
+        self._mark("phase2", i)
+
+    def phase2_expired(self, i: int) -> dict:
+        """Muddat o'tgach kelgan Phase 1 agenti uchun Phase 2 umuman ishga tushirilmaydi."""
+        res = _phase2_timeout(AGENTS[i], FutureTimeout("consilium deadline"))
+        self.timed_out("phase2", i)
+        self.phase2_done(i, res)
+        return res
+
+    def finish(self) -> tuple[list[dict], list[dict]]:
+        self.timings["debate_done_ms"] = self._ms()
+        self.result.phases["timings"] = self.timings
+        p1 = [r or {} for r in self.p1]
+        p2 = [] if self.mode == "early" else [r or {} for r in self.p2]
+        return p1, p2
+
+
+def _phase2_from_graph(agent: Agent, ptext: str, seeded: list[dict], **p1: dict) -> dict:
     """
-    t_start = time.monotonic()
-    now     = timezone.now()
+    Phase 2 bosqichi: p1  -  topshirish paytida tayyor bo'lgan Phase 1 natijalari,
+    seeded  -  checkpoint'dan tiklanganlari (grafda bosqich sifatida yo'q).
+    """
+    own, others = _phase2_inputs(agent, seeded + list(p1.values()))
+    return _phase2_single(agent, ptext, own, others)
 
-    result = ConsiliumResult(
-        session_id  = f"consilium_{now.strftime('%Y%m%d_%H%M%S')}",
+
+def _debate_stages(ptext: str, debate: _Debate) -> list[stage_graph.Stage]:
+    """
+    Konsilium Phase 1/2 grafi: agentlar, bog'liqliklar va timeout'lar  -  ma'lumot sifatida.
+    debate.p1 da tayyor bo'lgan agentlar uchun Phase 1 bosqichi qo'shilmaydi (resume).
+    """
+    todo     = [i for i in range(len(AGENTS)) if debate.p1[i] is None]
+    seeded   = [r for r in debate.p1 if r is not None]
+    p1_names = tuple(f"phase1_{AGENTS[i].id}" for i in todo)
+    stages = [
+        stage_graph.Stage(
+            f"phase1_{AGENTS[i].id}", functools.partial(_phase1_single, AGENTS[i], ptext),
+            fallback=functools.partial(_phase1_timeout, AGENTS[i], FutureTimeout("phase1 timeout")),
+            timeout=_AGENT_TIMEOUT,
+        )
+        for i in todo
+    ]
+    stages += [
+        stage_graph.Stage(
+            f"phase2_{agent.id}", functools.partial(_phase2_from_graph, agent, ptext, seeded),
+            deps=p1_names,
+            fallback=functools.partial(_phase2_timeout, agent, FutureTimeout("phase2 timeout")),
+            ready=functools.partial(debate.phase2_ready, i),
+            timeout=_AGENT_TIMEOUT,
+        )
+        for i, agent in enumerate(AGENTS)
+    ]
+    return stages
+
+
+def _debate_events(ptext: str, tenant: Any, debate: _Debate) -> Iterator[tuple[str, Any]]:
+    """
+    Sync drayver (stage_graph "consilium" grafi): Phase 1 agentlari DARHOL poolga
+    topshiriladi (PoolSaturated shu yerda), qaytarilgan iterator phase1_agent /
+    phase2_agent / phase2_skipped hodisalarini beradi.
+    """
+    graph_run = stage_graph.start(_debate_stages(ptext, debate), debate.remaining(),
+                                  tenant, graph="consilium")
+    index = {f"{phase}_{a.id}": (phase, i)
+             for phase in ("phase1", "phase2") for i, a in enumerate(AGENTS)}
+
+    def events() -> Iterator[tuple[str, Any]]:
+        stream = graph_run.events()
+        try:
+            for name, res, status in stream:
+                phase, i = index[name]
+                if status in ("timeout", "skipped"):
+                    debate.timed_out(phase, i)
+                if phase == "phase1":
+                    yield "phase1_agent", res
+                    was_undecided = debate.mode is None
+                    debate.phase1_done(i, res)
+                    if was_undecided and debate.mode == "early":
+                        yield "phase2_skipped", debate.result.phases["agreement"]
+                else:
+                    debate.phase2_done(i, res)
+                    yield "phase2_agent", res
+        finally:
+            # Iterator tashlab ketilsa (mijoz uzildi / job bekor qilindi)
+            stream.close()
+
+    return events()
+
+
+async def _adebate(ptext: str, debate: _Debate) -> None:
+    """
+    _debate_events ning asyncio drayveri (hodisalarsiz): agentlar event loop'da,
+    rejalashtirish qoidalari o'sha  -  _Debate.phase2_ready.
+    """
+    now = time.monotonic()
+    pending: dict[asyncio.Task, tuple[str, int, float]] = {
+        asyncio.ensure_future(_aphase1_single(a, ptext)): ("phase1", i, now)
+        for i, a in enumerate(AGENTS)
+    }
+    started2: set[int] = set()
+    try:
+        while pending:
+            nearest = min(debate.cutoff(t) for _, _, t in pending.values())
+            done, _ = await asyncio.wait(list(pending), timeout=max(0.0, nearest - time.monotonic()),
+                                         return_when=asyncio.FIRST_COMPLETED)
+            finished = []
+            for task in done:
+                phase, i, _ = pending.pop(task)
+                exc = task.exception()
+                finished.append((phase, i, None if exc else task.result(), exc))
+            now = time.monotonic()
+            for task, (phase, i, t) in list(pending.items()):
+                if now >= debate.cutoff(t):
+                    task.cancel()
+                    del pending[task]
+                    debate.timed_out(phase, i)
+                    finished.append((phase, i, None, TimeoutError(f"{phase} timeout")))
+
+            for phase, i, res, exc in sorted(finished, key=lambda f: (f[0], f[1])):
+                if phase == "phase2":
+                    debate.phase2_done(i, res if exc is None else _phase2_timeout(AGENTS[i], exc))
+                    continue
+                debate.phase1_done(i, res if exc is None else _phase1_timeout(AGENTS[i], exc))
+                for j in range(len(AGENTS)):
+                    if j in started2 or not debate.phase2_ready(j):
+                        continue
+                    started2.add(j)
+                    if debate.expired():
+                        debate.phase2_expired(j)
+                        continue
+                    own, others = debate.phase2_inputs(j)
+                    task = asyncio.ensure_future(_aphase2_single(AGENTS[j], ptext, own, others))
+                    pending[task] = ("phase2", j, time.monotonic())
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+# в”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђ
+# Main entry point
+# в”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђ
+
+def _new_result(language: str, session_id: Optional[str] = None) -> ConsiliumResult:
+    now = timezone.now()
+    return ConsiliumResult(
+        session_id  = session_id or f"consilium_{now.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}",
         started_at  = now.isoformat(),
         language    = language,
         professors  = [
@@ -758,31 +1101,233 @@ def run_consilium(patient_data: dict, language: str = "uz-L") -> dict:
         ],
     )
 
-    ptext = patient_text(patient_data)
 
-    # Phase 1
+def _finish_result(result: ConsiliumResult, consensus: dict, p1: list[dict],
+                   p2: list[dict], weights: dict[str, float], t_start: float) -> dict:
+    result.phases["phase3_consensus_raw"] = consensus
+    result.final_report = _build_final_report(consensus, p1, p2, weights)
+    result.completed_at = timezone.now().isoformat()
+    result.duration_sec = time.monotonic() - t_start
+
+    logger.info("[%s] Completed in %.1fs", result.session_id, result.duration_sec)
+    return result.to_dict()
+
+
+def _restore_result(cp: run_store.Checkpoint) -> ConsiliumResult:
+    data = cp.result
+    result = ConsiliumResult(
+        session_id   = cp.session_id,
+        started_at   = data.get("started_at", ""),
+        language     = data.get("language", ""),
+        professors   = data.get("professors") or [],
+        phases       = dict(cp.phases),
+        final_report = data.get("final_report") or {},
+        completed_at = data.get("completed_at", ""),
+        duration_sec = float(data.get("duration_sec") or 0.0),
+    )
+    result.phases["resumed_from"] = cp.stage
+    return result
+
+
+def _checkpointer(result: ConsiliumResult, ptext: str, owner: Any) -> Callable[[str, list[dict]], None]:
+    """
+    run_store ga faza checkpoint'ini yozadigan funksiya. Fazaning barcha natijalari xato
+    bo'lsa checkpoint yozilmaydi  -  resume shu fazani qaytadan bajaradi.
+    """
+    def checkpoint(stage: str, outputs: list[dict]) -> None:
+        if all(not r or r.get("error") for r in outputs):
+            return
+        run_store.save(result.session_id, stage, ptext=ptext, language=result.language,
+                       owner=owner, result=result.to_dict())
+    return checkpoint
+
+
+def _equal_weights() -> dict[str, float]:
+    return {a.id: 1.0 for a in AGENTS}
+
+
+def _early_exit(result: ConsiliumResult, p1: list[dict]) -> bool:
+    """Phase 1 kelishuvini baholaydi va tanlangan yo'lni result.phases ga yozadi."""
+    verdict = agreement.assess(p1, len(AGENTS))
+    result.phases["agreement"] = verdict.to_dict()
+    result.phases["path"] = "early_consensus" if verdict.agreed else "full_debate"
+    logger.info("[%s] Path: %s (%s, share=%.2f, min_p=%s, spread=%s)", result.session_id,
+                result.phases["path"], verdict.reason, verdict.share,
+                verdict.min_probability, verdict.spread)
+    return verdict.agreed
+
+
+def _phase3_events(result: ConsiliumResult, ptext: str, p1: list[dict], p2: list[dict],
+                   weights: dict[str, float], t_start: float,
+                   checkpoint: Callable[[str, list[dict]], None]) -> Iterator[tuple[str, Any]]:
+    logger.info("[%s] Phase 3: Weighted consensus started", result.session_id)
+    yield "phase3_started", {}
+    t3 = time.monotonic()
+    consensus = run_phase3(ptext, p1, p2, weights)
+    result.phases.setdefault("timings", {})["phase3_ms"] = round((time.monotonic() - t3) * 1000)
+
+    final = _finish_result(result, consensus, p1, p2, weights, t_start)
+    checkpoint(ConsiliumRun.STAGE_COMPLETED, [consensus])
+    yield "result", final
+
+
+def _iter_resumed(cp: run_store.Checkpoint, tenant: Any, owner: Any,
+                  t_start: float) -> Iterator[tuple[str, Any]]:
+    """Checkpoint'dan davom: saqlangan fazalar hodisa sifatida qayta yuboriladi."""
+    result     = _restore_result(cp)
+    checkpoint = _checkpointer(result, cp.ptext, owner)
+    start      = {"session_id": result.session_id, "professors": result.professors,
+                  "resumed_from": cp.stage}
+    if cp.stage == ConsiliumRun.STAGE_COMPLETED:
+        yield "start", start
+        yield "result", result.to_dict()
+        return
+
+    p1, early = cp.p1, result.phases.get("path") == "early_consensus"
+    p2_stream = debate = None
+    if cp.stage == ConsiliumRun.STAGE_PHASE1 and not early:
+        # Yangi konsilium bilan bir xil graf (timeout, fallback, AI_CONSILIUM_DEADLINE);
+        # birinchi to'lqin  -  yangi so'rov, pool chegarasi "start" dan OLDIN (PoolSaturated)
+        debate = _Debate(result, t_start, p1=p1)
+        p2_stream = _debate_events(cp.ptext, tenant, debate)
+    yield "start", start
+    for res in p1:
+        yield "phase1_agent", res
+
+    if early:
+        p2, weights = [], _equal_weights()
+        yield "phase2_skipped", result.phases.get("agreement", {})
+    elif p2_stream is not None:
+        logger.info("[%s] Phase 2: Cross-examination resumed", result.session_id)
+        yield from p2_stream
+        _, p2 = debate.finish()
+        result.phases["phase2_debate"] = p2
+        weights = _score_refutations(p2)
+        result.phases["refutation_weights"] = weights
+        yield "refutation_weights", weights
+        checkpoint(ConsiliumRun.STAGE_PHASE2, p2)
+    else:
+        p2 = cp.p2
+        weights = cp.weights or _score_refutations(p2)
+        for res in p2:
+            yield "phase2_agent", res
+        yield "refutation_weights", weights
+
+    yield from _phase3_events(result, cp.ptext, p1, p2, weights, t_start, checkpoint)
+
+
+def iter_consilium(
+    patient_data: dict,
+    language: str = "uz-L",
+    tenant: Any = None,
+    session_id: Optional[str] = None,
+    owner: Any = None,
+) -> Iterator[tuple[str, Any]]:
+    """
+    Konsiliumni bosqichma-bosqich bajaradi va (event, data) juftlarini yield qiladi:
+      start -> phase1_agent x4 -> phase2_agent x4 -> refutation_weights
+            -> phase3_started -> result (run_consilium natijasi bilan bir xil)
+    Phase 1 da agentlar kelishsa (agreement.assess) phase2_agent/refutation_weights
+    o'rniga bitta phase2_skipped hodisasi keladi; tanlangan yo'l phases["path"] da.
+
+    Agent natijalari tugash tartibida chiqadi. Quorum yetib, early-exit imkonsiz
+    bo'lsa Phase 2 kechikkan Phase 1 agentlarini kutmaydi (_Debate)  -  shu holda
+    phase1_agent va phase2_agent hodisalari aralash keladi. Vaqtlar phases["timings"] da.
+
+    Phase 1 agentlari birinchi "start" hodisasidan OLDIN poolga topshiriladi,
+    shuning uchun pool to'la bo'lsa agent_pool.PoolSaturated birinchi next() da ko'tariladi.
+
+    Har bir tugagan faza run_store ga checkpoint qilinadi (owner  -  foydalanuvchi pk).
+    Shu session_id bilan qayta chaqirilsa oxirgi tugagan fazadan davom etadi: saqlangan
+    hodisalar qayta yuboriladi ("start" da resumed_from), model faqat qolgan fazalar
+    uchun chaqiriladi. Boshqa foydalanuvchi/bemor sessiyasi  -  run_store.RunConflict.
+    """
+    t_start = time.monotonic()
+    ptext   = patient_text(patient_data)
+    cp = run_store.load(session_id, owner, ptext, language) if session_id else None
+    if cp is not None:
+        yield from _iter_resumed(cp, tenant, owner, t_start)
+        return
+
+    result     = _new_result(language, session_id)
+    checkpoint = _checkpointer(result, ptext, owner)
+
+    def phase1_checkpoint(p1: list[dict]) -> None:
+        result.phases["phase1_independent"] = p1
+        checkpoint(ConsiliumRun.STAGE_PHASE1, p1)
+
+    # Phase 1 + Phase 2 (quorum)
     logger.info("[%s] Phase 1: Independent analysis started", result.session_id)
-    p1 = run_phase1(ptext)
+    debate = _Debate(result, t_start, on_phase1=phase1_checkpoint)
+    stream = _debate_events(ptext, tenant, debate)
+    yield "start", {"session_id": result.session_id, "professors": result.professors}
+    yield from stream
+    p1, p2 = debate.finish()
     result.phases["phase1_independent"] = p1
 
-    # Phase 2
-    logger.info("[%s] Phase 2: Cross-examination started", result.session_id)
-    p2 = run_phase2(ptext, p1)
-    result.phases["phase2_debate"] = p2
+    if debate.mode == "early":
+        weights = _equal_weights()
+    else:
+        result.phases["phase2_debate"] = p2
 
-    # Refutation scoring
-    weights = _score_refutations(p2)
-    result.phases["refutation_weights"] = weights
+        # Refutation scoring
+        weights = _score_refutations(p2)
+        result.phases["refutation_weights"] = weights
+        yield "refutation_weights", weights
+        checkpoint(ConsiliumRun.STAGE_PHASE2, p2)
 
     # Phase 3
-    logger.info("[%s] Phase 3: Weighted consensus started", result.session_id)
-    consensus = run_phase3(ptext, p1, p2, weights)
-    result.phases["phase3_consensus_raw"] = consensus
+    yield from _phase3_events(result, ptext, p1, p2, weights, t_start, checkpoint)
 
-    # Final report
-    result.final_report = _build_final_report(consensus, p1, p2, weights)
-    result.completed_at = timezone.now().isoformat()
-    result.duration_sec = time.monotonic() - t_start
 
-    logger.info("[%s] Completed in %.1fs", result.session_id, result.duration_sec)
-    return result.to_dict()
\ No newline at end of file
+def run_consilium(
+    patient_data: dict,
+    language: str = "uz-L",
+    tenant: Any = None,
+    session_id: Optional[str] = None,
+    owner: Any = None,
+) -> dict:
+    """
+    Full 3-phase Multi-Agent Medical Consilium.
+
+    tenant  -  agent_pool fairness kaliti (klinika). Pool to'la bo'lsa Phase 1 oldidan
+    agent_pool.PoolSaturated ko'tariladi (view 429 qaytaradi).
+    session_id  -  shu sessiya checkpoint'idan davom etish (iter_consilium ga qarang).
+
+    Returns ConsiliumResult.to_dict() with all phases and final_report.
+    """
+    data: Any = None
+    for event, data in iter_consilium(patient_data, language, tenant, session_id, owner):
+        pass
+    return data
+
+
+async def arun_consilium(patient_data: dict, language: str = "uz-L") -> dict:
+    """
+    run_consilium ning asyncio varianti (ASGI). Bir nechta konsilium bitta event
+    loop'ni bo'lishadi  -  har biri uchun 4-5 OS thread band qilinmaydi.
+    """
+    t_start = time.monotonic()
+    result  = _new_result(language)
+    ptext   = patient_text(patient_data)
+
+    logger.info("[%s] Phase 1 (async): Independent analysis started", result.session_id)
+    debate = _Debate(result, t_start)
+    await _adebate(ptext, debate)
+    p1, p2 = debate.finish()
+    result.phases["phase1_independent"] = p1
+
+    if debate.mode == "early":
+        weights = _equal_weights()
+    else:
+        result.phases["phase2_debate"] = p2
+
+        weights = _score_refutations(p2)
+        result.phases["refutation_weights"] = weights
+
+    logger.info("[%s] Phase 3 (async): Weighted consensus started", result.session_id)
+    t3 = time.monotonic()
+    consensus = await arun_phase3(ptext, p1, p2, weights)
+    debate.timings["phase3_ms"] = round((time.monotonic() - t3) * 1000)
+
+    return _finish_result(result, consensus, p1, p2, weights, t_start)
@@ -30,10 +30,17 @@ Natija:
 
 from __future__ import annotations
 
+import asyncio
 import re
 import logging
+import time
 from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
 
+from asgiref.sync import sync_to_async
+
+from . import guard_context, guard_rules, guard_verdicts
+from .guard_context import GuardContext
 from .azure_utils import call_model, build_messages, parse_json, Deployments
 
 logger = logging.getLogger(__name__)
@@ -108,41 +115,47 @@ _CONTRADICTION_PATTERNS: list[tuple[str, str]] = [
      "yosh_vaqt_ziddiyati"),
 ]
 
+# Anatomik + aldamchi qoidalar bitta kompilyatsiya qilingan to'plamda (ai_services.guard_rules)
+_RULES = guard_rules.register("physiology_filter", [
+    *(("anatomic_error", tag, pattern) for pattern, tag in _ANATOMIC_MISPLACE_PATTERNS),
+    *(("deceptive", tag, pattern) for pattern, tag in _DECEPTIVE_PATTERNS),
+])
+_CONTRADICTIONS = [(re.compile(pattern, re.IGNORECASE), tag) for pattern, tag in _CONTRADICTION_PATTERNS]
+
+_L1_RESULTS = {
+    "anatomic_error": (
+        "Inson fiziologiyasiga ko'ra bu anatomik joylashuv mumkin emas. "
+        "Iltimos, simptomlar va ularning joylashishini qayta tekshiring.",
+        "Regex match",
+    ),
+    "deceptive": (
+        "Bu so'rov tibbiy maslahat uchun mos emas. "
+        "Iltimos, haqiqiy tibbiy holatni tavsiflang.",
+        "Deceptive match",
+    ),
+}
+
 
 def _level1_check(complaints: str, full_text: str) -> FilterResult | None:
     """
-    Level 1: Fast regex check.
+    Level 1: Fast regex check (single pass over the compiled rule set).
     Returns FilterResult if blocked, None if OK.
     """
-    text = (complaints + " " + full_text).lower()
-
-    for pattern, tag in _ANATOMIC_MISPLACE_PATTERNS:
-        if re.search(pattern, text, re.IGNORECASE):
-            return FilterResult(
-                passed=False,
-                level="anatomic_error",
-                message=(
-                    "Inson fiziologiyasiga ko'ra bu anatomik joylashuv mumkin emas. "
-                    "Iltimos, simptomlar va ularning joylashishini qayta tekshiring."
-                ),
-                details=f"Regex match: {tag}",
-            )
+    text = complaints + " " + full_text
 
-    for pattern, tag in _DECEPTIVE_PATTERNS:
-        if re.search(pattern, text, re.IGNORECASE):
-            return FilterResult(
-                passed=False,
-                level="deceptive",
-                message=(
-                    "Bu so'rov tibbiy maslahat uchun mos emas. "
-                    "Iltimos, haqiqiy tibbiy holatni tavsiflang."
-                ),
-                details=f"Deceptive match: {tag}",
-            )
+    rule = _RULES.first(text)
+    if rule is not None:
+        message, prefix = _L1_RESULTS[rule.category]
+        return FilterResult(
+            passed=False,
+            level=rule.category,
+            message=message,
+            details=f"{prefix}: {rule.tag}",
+        )
 
     # Yosh/vaqt ziddiyati
-    for pattern, tag in _CONTRADICTION_PATTERNS:
-        m = re.search(pattern, text, re.IGNORECASE)
+    for pattern, tag in _CONTRADICTIONS:
+        m = pattern.search(text)
         if m:
             age = int(m.group(1))
             years = int(m.group(2))
@@ -179,72 +192,135 @@ Javobni FAQAT JSON formatida: {"status": "ok"|"anatomic_error"|"physiologic_erro
 _L2_USER = "Tekshiriladigan ma'lumot:\n{text}\n\nJSON:"
 
 
+_L2_MESSAGES = {
+    "anatomic_error":    "Inson fiziologiyasiga ko'ra bu anatomik joylashuv mumkin emas.",
+    "physiologic_error": "Tibbiy ma'lumotlarda fiziologik ziddiyat aniqlandi.",
+    "deceptive":         "Bu so'rov tibbiy maslahat uchun mos emas.",
+}
+
+
 def _level2_check(text: str) -> FilterResult | None:
     """
     Level 2: AI semantic analysis via mini model.
+    Verdikt normallashtirilgan matn bo'yicha keshlanadi (guard_verdicts).
     Returns FilterResult if blocked, None if OK.
     """
-    try:
-        raw = call_model(
-            Deployments.mini(),
-            build_messages(_L2_SYSTEM, _L2_USER.format(text=text[:800]), want_json=True),
-            response_json=True,
-            temperature=0.0,
-            max_tokens=200,
-        )
-        result = parse_json(raw, "physiology_filter_l2")
-        status = str(result.get("status", "ok")).lower()
-        reason = str(result.get("reason", ""))
-
-        if status == "ok":
+    text = text[:800]
+    verdict = guard_verdicts.get("physiology_filter", text)
+    if verdict is None:
+        t0 = time.monotonic()
+        try:
+            raw = call_model(
+                Deployments.mini(),
+                build_messages(_L2_SYSTEM, _L2_USER.format(text=text), want_json=True),
+                response_json=True,
+                temperature=0.0,
+                max_tokens=200,
+                endpoint="physiology_filter_l2",
+            )
+            verdict = guard_verdicts.from_reply(parse_json(raw, "physiology_filter_l2"))
+        except Exception as exc:
+            logger.warning("PhysiologyFilter L2 failed (pass-through): %s", exc)
+            return None  # On AI error, pass through (fail-open)
+        if verdict is None:
+            logger.warning("PhysiologyFilter L2 reply has no status (pass-through, not cached)")
             return None
+        guard_verdicts.put("physiology_filter", text, verdict, (time.monotonic() - t0) * 1000)
 
-        messages = {
-            "anatomic_error":    "Inson fiziologiyasiga ko'ra bu anatomik joylashuv mumkin emas.",
-            "physiologic_error": "Tibbiy ma'lumotlarda fiziologik ziddiyat aniqlandi.",
-            "deceptive":         "Bu so'rov tibbiy maslahat uchun mos emas.",
-        }
-        return FilterResult(
-            passed=False,
-            level=status,
-            message=messages.get(status, "Ma'lumotlarda xatolik aniqlandi."),
-            details=f"AI L2: {reason}",
-        )
-    except Exception as exc:
-        logger.warning("PhysiologyFilter L2 failed (pass-through): %s", exc)
-        return None  # On AI error, pass through (fail-open)
+    if verdict.passed:
+        return None
+    return FilterResult(
+        passed=False,
+        level=verdict.status,
+        message=_L2_MESSAGES.get(verdict.status, "Ma'lumotlarda xatolik aniqlandi."),
+        details=f"AI L2: {verdict.reason}",
+    )
 
 
 # ---------------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------------
 
-def check(patient_data: dict, use_ai: bool = True) -> FilterResult:
+def _texts(patient_data: dict) -> tuple[str, str]:
+    complaints    = str(patient_data.get("complaints", ""))
+    history       = str(patient_data.get("history", ""))
+    objective     = str(patient_data.get("objectiveData", ""))
+    additional    = str(patient_data.get("additionalInfo", ""))
+    return complaints, f"{complaints} {history} {objective} {additional}"
+
+
+def _discard(task: asyncio.Future) -> None:
+    """Keraksiz bosqich: bekor qilinadi, tugagan bo'lsa xatosi jim o'qiladi."""
+    if not task.done():
+        task.cancel()
+    elif not task.cancelled():
+        task.exception()
+
+
+async def arun_guarded(
+    patient_data: dict,
+    stage: Callable[[], Awaitable[Any]],
+    use_ai: bool = True,
+    context: GuardContext | None = None,
+) -> tuple[FilterResult, Any]:
+    """
+    check() + birinchi AI bosqichi (async view'lar uchun): Level 1 darhol, Level 2 esa
+    stage() bilan parallel. Level 2 bloklasa stage bekor qilinadi -> (natija, None);
+    o'tkazsa -> (PASS, stage natijasi). stage xatosi faqat guard o'tkazgandan keyin ko'tariladi.
+    """
+    complaints, full_text = _texts(patient_data)
+    l1 = guard_context.memo(context, "physiology_filter:l1", patient_data,
+                            lambda: _level1_check(complaints, full_text))
+    if l1 is not None:
+        logger.info("PhysiologyFilter L1 BLOCKED: %s", l1.details)
+        return l1, None
+    if not (use_ai and len(full_text.strip()) > 30):
+        return PASS, await stage()
+
+    t0 = time.monotonic()
+    guard_task = asyncio.ensure_future(sync_to_async(
+        guard_context.memo, thread_sensitive=False,
+    )(context, "physiology_filter:l2", patient_data, lambda: _level2_check(full_text[:1200])))
+    stage_task = asyncio.ensure_future(stage())
+    try:
+        l2 = await guard_task
+    except BaseException:
+        _discard(stage_task)
+        raise
+    if l2 is not None:
+        guard_verdicts.note_overlap("physiology_filter", "blocked" if stage_task.done() else "cancelled")
+        _discard(stage_task)
+        logger.info("PhysiologyFilter L2 BLOCKED: %s", l2.details)
+        return l2, None
+    guard_verdicts.note_overlap("physiology_filter", "passed", (time.monotonic() - t0) * 1000)
+    return PASS, await stage_task
+
+
+def check(patient_data: dict, use_ai: bool = True, context: GuardContext | None = None) -> FilterResult:
     """
     Run full physiology/logic filter on patient data.
 
     Args:
         patient_data: Patient clinical data dict.
         use_ai:       If True, run Level 2 AI check when Level 1 passes.
+        context:      So'rov guard konteksti  -  shu patient_data uchun natijalar qayta ishlatiladi.
 
     Returns:
         FilterResult  -  .passed=True means safe to proceed.
     """
-    complaints    = str(patient_data.get("complaints", ""))
-    history       = str(patient_data.get("history", ""))
-    objective     = str(patient_data.get("objectiveData", ""))
-    additional    = str(patient_data.get("additionalInfo", ""))
-    full_text     = f"{complaints} {history} {objective} {additional}"
+    complaints, full_text = _texts(patient_data)
 
     # Level 1  -  fast regex
-    l1 = _level1_check(complaints, full_text)
+    l1 = guard_context.memo(context, "physiology_filter:l1", patient_data,
+                            lambda: _level1_check(complaints, full_text))
     if l1 is not None:
         logger.info("PhysiologyFilter L1 BLOCKED: %s", l1.details)
         return l1
 
     # Level 2  -  AI semantic (only if enabled and text is long enough)
     if use_ai and len(full_text.strip()) > 30:
-        l2 = _level2_check(full_text[:1200])
+        l2 = guard_context.memo(context, "physiology_filter:l2", patient_data,
+                                lambda: _level2_check(full_text[:1200]))
         if l2 is not None:
             logger.info("PhysiologyFilter L2 BLOCKED: %s", l2.details)
             return l2
@@ -0,0 +1,190 @@
+"""
+Konsilium Phase 2/3 promptlari uchun token byudjeti va siqish (compaction).
+
+Phase 2 har bir agentga boshqalarning to'liq fikrini, Phase 3 esa barcha p1/p2 ni
+beradi  -  agentlar soni oshsa prompt kvadratik o'sadi. Bu modul:
+  - faqat keyingi faza uchun kerakli maydonlarni qoldiradi (elapsed_ms, agent_title,
+    error matnlari va h.k. tushib qoladi)
+  - JSON ni indentsiyasiz yozadi
+  - byudjetdan oshsa, eng past og'irlikdagi yozuvlardan boshlab ro'yxat va matnlarni
+    bosqichma-bosqich qisqartiradi, oxirida faqat asosiy maydonlar qoladi
+
+Byudjet (taxminiy token, llm_governor.estimate_tokens) settings.AI_PROMPT_BUDGET da
+faza bo'yicha. Har bir prompt bo'limlari hajmi loglanadi va stats() da (health/detailed).
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import threading
+from typing import Any, Sequence
+
+from django.conf import settings
+
+from .llm_governor import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# (ro'yxat elementlari, matn belgilari) chegarasi  -  qisqartirish bosqichlari
+_LEVELS: tuple[tuple[int, int], ...] = ((5, 600), (3, 300), (2, 160), (1, 80))
+_STRENGTH_ORDER = {"STRONG": 0, "MODERATE": 1, "WEAK": 2}
+
+_DEFAULT_BUDGETS = {"phase2": 2500, "phase3": 6000}
+
+
+def budget(phase: str) -> int:
+    table = getattr(settings, "AI_PROMPT_BUDGET", None) or {}
+    return int(table.get(phase, _DEFAULT_BUDGETS.get(phase, 4000)))
+
+
+def as_weight(value: Any, default: float = 0.0) -> float:
+    """'85', '85%', 85 -> 85.0 (qisqartirish tartibi uchun)."""
+    try:
+        return float(str(value).strip().rstrip("%"))
+    except (TypeError, ValueError):
+        return default
+
+
+def compact(obj: Any) -> str:
+    """Indentsiyasiz, bo'sh joysiz JSON."""
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+# ---------------------------------------------------------------------------
+# Projections  -  keyingi faza uchun kerakli maydonlar
+# ---------------------------------------------------------------------------
+
+def _drop_empty(record: dict) -> dict:
+    return {k: v for k, v in record.items() if v not in (None, "", [], {})}
+
+
+def phase1_view(r: dict) -> dict:
+    """Phase 1 natijasi -> Phase 2/3 uchun."""
+    if r.get("error"):
+        return {"agent_id": r.get("agent_id"), "failed": True}
+    return _drop_empty({
+        "agent_id":    r.get("agent_id"),
+        "agent_name":  r.get("agent_name"),
+        "diagnosis":   r.get("primary_diagnosis"),
+        "probability": r.get("probability"),
+        "confidence":  r.get("confidence"),
+        "reasoning":   r.get("reasoning_chain"),
+        "evidence":    r.get("supporting_evidence"),
+        "red_flags":   r.get("red_flags"),
+        "differential": [d.get("name") for d in r.get("differential") or [] if isinstance(d, dict)],
+    })
+
+
+def phase2_view(r: dict) -> dict:
+    """Phase 2 natijasi -> Phase 3 uchun (refutation'lar kuchi bo'yicha tartiblangan)."""
+    if r.get("error"):
+        return {"agent_id": r.get("agent_id"), "failed": True}
+    refutations = sorted(
+        (x for x in r.get("refutations") or [] if isinstance(x, dict)),
+        key=lambda x: _STRENGTH_ORDER.get(str(x.get("strength", "WEAK")).upper(), 2),
+    )
+    defense = r.get("defense") if isinstance(r.get("defense"), dict) else {}
+    return _drop_empty({
+        "agent_id":            r.get("agent_id"),
+        "revised_diagnosis":   r.get("revised_diagnosis"),
+        "revised_probability": r.get("revised_probability"),
+        "key_argument":        r.get("key_argument"),
+        "diagnosis_stands":    defense.get("my_diagnosis_stands"),
+        "refutations": [_drop_empty({
+            "target":     x.get("target_agent_id"),
+            "strength":   x.get("strength"),
+            "refutation": x.get("refutation"),
+        }) for x in refutations],
+        "accepted": [a.get("point") for a in r.get("accepted_from_others") or [] if isinstance(a, dict)],
+    })
+
+
+# ---------------------------------------------------------------------------
+# Fitting
+# ---------------------------------------------------------------------------
+
+def _shrink(value: Any, items: int, chars: int) -> Any:
+    if isinstance(value, str):
+        return value if len(value) <= chars else value[:chars].rstrip() + "..."
+    if isinstance(value, list):
+        return [_shrink(v, items, chars) for v in value[:items]]
+    if isinstance(value, dict):
+        return {k: _shrink(v, items, chars) for k, v in value.items()}
+    return value
+
+
+def fit(
+    records: Sequence[dict],
+    weights: Sequence[float],
+    limit: int,
+    keep: tuple[str, ...],
+) -> tuple[str, int]:
+    """
+    records ni limit (token) ichiga sig'diradi. Qisqartirish eng past weight'dan
+    boshlanadi; oxirgi bosqichda faqat keep maydonlari qoladi.
+    Qaytaradi: (compact JSON, qisqartirish qadamlari soni).
+    """
+    current = list(records)
+    text = compact(current)
+    if estimate_tokens(text) <= limit:
+        return text, 0
+
+    order = sorted(range(len(current)), key=lambda i: weights[i])
+    steps = 0
+    for items, chars in _LEVELS:
+        for i in order:
+            current[i] = _shrink(records[i], items, chars)
+            steps += 1
+            text = compact(current)
+            if estimate_tokens(text) <= limit:
+                return text, steps
+    for i in order:
+        current[i] = {k: v for k, v in current[i].items() if k in keep}
+        steps += 1
+        text = compact(current)
+        if estimate_tokens(text) <= limit:
+            return text, steps
+    return text, steps
+
+
+def fit_one(record: dict, limit: int, keep: tuple[str, ...]) -> tuple[str, int]:
+    """fit() ning bitta yozuv (JSON obyekt) uchun varianti."""
+    text, steps = fit([record], [0.0], limit + 1, keep)   # +1: "[...]" qavslari
+    return text[1:-1], steps
+
+
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+
+_stats_lock = threading.Lock()
+_stats: dict[str, dict[str, int]] = {}
+
+
+def record(phase: str, sections: dict[str, str], trimmed: int = 0) -> None:
+    """Prompt bo'limlari hajmini loglaydi (taxminiy input token)."""
+    sizes = {name: estimate_tokens(text) for name, text in sections.items()}
+    total = sum(sizes.values())
+    with _stats_lock:
+        row = _stats.setdefault(phase, {
+            "prompts": 0, "tokens_total": 0, "tokens_max": 0, "trimmed": 0,
+        })
+        row["prompts"] += 1
+        row["tokens_total"] += total
+        row["tokens_max"] = max(row["tokens_max"], total)
+        row["trimmed"] += 1 if trimmed else 0
+    logger.info(
+        "Prompt %s: ~%d input tokens (%s)%s", phase, total,
+        ", ".join(f"{k}={v}" for k, v in sizes.items()),
+        f", trimmed in {trimmed} steps" if trimmed else "",
+    )
+
+
+def stats() -> dict[str, Any]:
+    with _stats_lock:
+        return {
+            phase: {**row, "tokens_avg": round(row["tokens_total"] / row["prompts"]) if row["prompts"] else 0,
+                    "budget": budget(phase)}
+            for phase, row in _stats.items()
+        }
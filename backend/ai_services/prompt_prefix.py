@@ -0,0 +1,214 @@
+"""
+Statik prompt prefikslari va Gemini kontekst keshi (cached content).
+
+Tizim promptlari (agent personasi, Ziyrak qoidalari, O'zbekiston tibbiy konteksti)
+har chaqiruvda qayta yig'ilib, to'liq yuborilar edi. Endi:
+  - statik qism import paytida bir marta yig'iladi va register() bilan ro'yxatga
+    olinadi (StaticPrefix: matn, sha256 digest, taxminiy token soni)
+  - xabarlarda prefiks har doim BIRINCHI turadi, dinamik qism (SSV protokollari,
+    bemor, transkript) undan keyin  -  Gemini implicit cache shu umumiy boshlanishni
+    qayta ishlatadi
+  - prefiks AI_CONTEXT_CACHE_MIN_TOKENS dan katta bo'lsa, model bo'yicha bir marta
+    caches.create() bilan cached content sifatida yaratiladi (TTL bilan) va keyingi
+    chaqiruvlar faqat uning nomini yuboradi; nom REDIS_URL bo'lsa workerlar o'rtasida
+    umumiy (Django cache)
+Yaratish xato bersa (model qo'llamaydi, prefiks juda kichik, kvota) prefiks oddiy
+system_instruction sifatida yuboriladi va shu (prefiks, model) bir muddat qayta
+urinilmaydi (fail-open). Hisoblagichlar stats() da (health/detailed).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from django.conf import settings
+
+from . import singleflight
+from .llm_governor import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = "llm:ctxcache:"
+_REFRESH_MARGIN = 60          # soniya: tugashiga shuncha qolganda yangisi yaratiladi
+
+
+@dataclass(frozen=True, eq=False)
+class StaticPrefix:
+    name:   str
+    text:   str
+    digest: str
+    tokens: int
+
+
+_registry: dict[str, StaticPrefix] = {}
+
+
+def register(name: str, text: str) -> StaticPrefix:
+    """Statik prefiksni ro'yxatga oladi (import paytida chaqiriladi)."""
+    text = text.strip()
+    prefix = StaticPrefix(
+        name=name,
+        text=text,
+        digest=hashlib.sha256(text.encode("utf-8")).hexdigest()[:16],
+        tokens=estimate_tokens(text),
+    )
+    _registry[name] = prefix
+    return prefix
+
+
+def registered() -> dict[str, StaticPrefix]:
+    return dict(_registry)
+
+
+# ---------------------------------------------------------------------------
+# Settings
+# ---------------------------------------------------------------------------
+
+def enabled() -> bool:
+    return bool(getattr(settings, "AI_CONTEXT_CACHE_ENABLED", True))
+
+
+def _ttl() -> int:
+    return max(_REFRESH_MARGIN * 2, int(getattr(settings, "AI_CONTEXT_CACHE_TTL", 3600)))
+
+
+def _min_tokens() -> int:
+    return int(getattr(settings, "AI_CONTEXT_CACHE_MIN_TOKENS", 768))
+
+
+# ---------------------------------------------------------------------------
+# Cached content registry (model bo'yicha)
+# ---------------------------------------------------------------------------
+
+_lock = threading.Lock()
+_entries: dict[tuple[str, str], tuple[str, float]] = {}     # (digest, model) -> (cache name, expires_at)
+_blocked: dict[tuple[str, str], float] = {}                 # (digest, model) -> qayta urinish vaqti
+_counters: Counter[str] = Counter()
+
+
+def _count(name: str, n: int = 1) -> None:
+    with _lock:
+        _counters[name] += n
+
+
+def _shared_get(key: str) -> Optional[str]:
+    try:
+        from django.core.cache import cache
+        return cache.get(key)
+    except Exception as exc:
+        logger.warning("Context cache shared get failed: %s", exc)
+        return None
+
+
+def _shared_set(key: str, value: str, ttl: int) -> None:
+    try:
+        from django.core.cache import cache
+        cache.set(key, value, ttl)
+    except Exception as exc:
+        logger.warning("Context cache shared set failed: %s", exc)
+
+
+def _lookup(slot: tuple[str, str], now: float) -> Optional[str]:
+    with _lock:
+        entry = _entries.get(slot)
+        if entry and entry[1] - _REFRESH_MARGIN > now:
+            return entry[0]
+        if _blocked.get(slot, 0) > now:
+            return ""
+    return None
+
+
+def _create(client: Any, model: str, prefix: StaticPrefix, slot: tuple[str, str]) -> str:
+    key = f"{_KEY_PREFIX}{prefix.digest}:{model}"
+    ttl = _ttl()
+    shared = _shared_get(key)
+    if shared:
+        with _lock:
+            # Boshqa worker yaratgan: qolgan muddat noma'lum, shuning uchun yarim TTL
+            _entries[slot] = (shared, time.time() + ttl // 2)
+        _count("shared_hits")
+        return shared
+    from google.genai import types
+    try:
+        cached = client.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                display_name=f"{prefix.name}:{prefix.digest[:8]}",
+                system_instruction=prefix.text,
+                ttl=f"{ttl}s",
+            ),
+        )
+    except Exception as exc:
+        with _lock:
+            _blocked[slot] = time.time() + ttl
+        _count("create_failed")
+        logger.warning("Context cache create failed (%s, %s): %s", prefix.name, model, exc)
+        return ""
+    with _lock:
+        _entries[slot] = (cached.name, time.time() + ttl)
+    _shared_set(key, cached.name, ttl - _REFRESH_MARGIN)
+    _count("created")
+    logger.info("Context cache created: %s [%s] %s (~%d tokens, ttl=%ds)",
+                prefix.name, model, cached.name, prefix.tokens, ttl)
+    return cached.name
+
+
+def cached_content(client: Any, model: str, prefix: StaticPrefix) -> Optional[str]:
+    """
+    Prefiks uchun cached content nomi; kesh ishlatilmasa None (prefiks inline yuboriladi).
+    Yaratish kerak bo'lsa bir worker ichida singleflight orqali bir marta.
+    """
+    if not enabled() or prefix.tokens < _min_tokens():
+        _count("inline")
+        return None
+    slot = (prefix.digest, model)
+    name = _lookup(slot, time.time())
+    if name is None:
+        name = singleflight.do(f"ctxcache:{prefix.digest}:{model}", lambda: _create(client, model, prefix, slot))
+    if not name:
+        _count("inline")
+        return None
+    _count("hits")
+    _count("tokens_saved", prefix.tokens)
+    return name
+
+
+def needs_create(model: str, prefix: StaticPrefix) -> bool:
+    """Async yo'l uchun: cached_content() tarmoqqa chiqadimi (threadga o'tkazish kerakmi)."""
+    if not enabled() or prefix.tokens < _min_tokens():
+        return False
+    return _lookup((prefix.digest, model), time.time()) is None
+
+
+def drop(model: str, prefix: StaticPrefix) -> None:
+    """Provider cached content ni topmasa (muddati o'tgan/o'chirilgan)  -  keyingi chaqiruvda qayta yaratiladi."""
+    with _lock:
+        _entries.pop((prefix.digest, model), None)
+    _shared_set(f"{_KEY_PREFIX}{prefix.digest}:{model}", "", 1)
+    _count("dropped")
+
+
+def note_usage(response: Any) -> None:
+    """usage_metadata.cached_content_token_count  -  provider tomonida keshdan o'qilgan tokenlar."""
+    usage = getattr(response, "usage_metadata", None)
+    cached = getattr(usage, "cached_content_token_count", None) if usage else None
+    if cached:
+        _count("provider_cached_tokens", int(cached))
+
+
+def stats() -> dict[str, Any]:
+    with _lock:
+        now = time.time()
+        return {
+            "enabled": enabled(),
+            "min_tokens": _min_tokens(),
+            **dict(_counters),
+            "active": sum(1 for _, exp in _entries.values() if exp > now),
+            "prefixes": {p.name: p.tokens for p in _registry.values()},
+        }
@@ -0,0 +1,330 @@
+"""
+Javob sxemalari registri: Gemini structured output (response_schema) + server tomonda tekshirish.
+
+Promptga katta JSON shablon yozish o'rniga sxema bir marta e'lon qilinadi:
+  - schema    -  Gemini ga response_schema sifatida yuboriladi (OpenAPI subset:
+                 type/properties/required/items/enum/minimum/maximum/max_items)
+  - hint      -  promptdagi qisqa maydonlar ro'yxati (structured output yo'q yo'llar uchun)
+  - validator -  ro'yxatga olishda bir marta kompilyatsiya qilinadi; javobni tekshiradi
+                 va keltiradi: "85%" -> 85, chegaradan tashqari son -> chegara, "high" ->
+                 "HIGH", bitta qiymat -> [qiymat], ortiqcha elementlar kesiladi
+Majburiy maydon yo'q yoki noto'g'ri bo'lsa SchemaError  -  javob darhol rad etiladi
+(keyinroq _build_final_report da emas). Ixtiyoriy maydon noto'g'ri bo'lsa tashlab yuboriladi.
+Sxemada yo'q maydonlar o'zgarishsiz qoladi.
+
+Sxemalar ularni ishlatadigan modulda e'lon qilinadi:
+
+    P1_SCHEMA = response_schemas.register("consilium_phase1", obj({...}, required=(...)))
+    raw  = call_model(..., schema=P1_SCHEMA)
+    data = P1_SCHEMA.parse(raw)        # SchemaError bo'lishi mumkin
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional, Sequence
+
+from . import json_extract
+from .llm_governor import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+_TRUE  = frozenset({"true", "ha", "yes", "1"})
+_FALSE = frozenset({"false", "yo'q", "no", "0"})
+
+
+class SchemaError(ValueError):
+    """Model javobi response sxemasiga mos emas."""
+
+
+class _Invalid(Exception):
+    def __init__(self, path: str, reason: str):
+        super().__init__(f"{path or '$'}: {reason}")
+
+
+# ---------------------------------------------------------------------------
+# Schema builders (Gemini response_schema formati)
+# ---------------------------------------------------------------------------
+
+def _node(kind: str, description: Optional[str], **extra: Any) -> dict:
+    node = {"type": kind, **{k: v for k, v in extra.items() if v is not None}}
+    if description:
+        node["description"] = description
+    return node
+
+
+def string(description: str | None = None, *, enum: Sequence[str] | None = None,
+           max_length: int | None = None) -> dict:
+    return _node("STRING", description, enum=list(enum) if enum else None, max_length=max_length)
+
+
+def number(description: str | None = None, *, minimum: float | None = None,
+           maximum: float | None = None) -> dict:
+    return _node("NUMBER", description, minimum=minimum, maximum=maximum)
+
+
+def integer(description: str | None = None, *, minimum: int | None = None,
+            maximum: int | None = None) -> dict:
+    return _node("INTEGER", description, minimum=minimum, maximum=maximum)
+
+
+def boolean(description: str | None = None) -> dict:
+    return _node("BOOLEAN", description)
+
+
+def array(items: dict, description: str | None = None, *, min_items: int | None = None,
+          max_items: int | None = None) -> dict:
+    return _node("ARRAY", description, items=items, min_items=min_items, max_items=max_items)
+
+
+def obj(properties: dict[str, dict], description: str | None = None, *,
+        required: Sequence[str] = ()) -> dict:
+    unknown = set(required) - set(properties)
+    if unknown:
+        raise ValueError(f"required maydonlar properties da yo'q: {sorted(unknown)}")
+    return _node("OBJECT", description, properties=properties,
+                 required=list(required) or None, property_ordering=list(properties))
+
+
+# ---------------------------------------------------------------------------
+# Compiler  -  sxema daraxti -> tekshiruvchi closure'lar
+# ---------------------------------------------------------------------------
+
+_Check = Callable[[Any, list], Any]
+
+
+def _compile_object(node: dict, path: str) -> _Check:
+    props = [(key, _compile(sub, f"{path}.{key}")) for key, sub in node.get("properties", {}).items()]
+    required = frozenset(node.get("required", ()))
+
+    def check(value: Any, fixes: list) -> Any:
+        if not isinstance(value, dict):
+            raise _Invalid(path, "obyekt kutilgan")
+        out = dict(value)
+        for key, sub in props:
+            current = out.get(key)
+            if current is None or current == "":
+                if key in required:
+                    raise _Invalid(f"{path}.{key}", "majburiy maydon yo'q")
+                continue
+            try:
+                out[key] = sub(current, fixes)
+            except _Invalid:
+                if key in required:
+                    raise
+                del out[key]
+                fixes.append(f"{path}.{key}")
+        return out
+    return check
+
+
+def _compile_array(node: dict, path: str) -> _Check:
+    item = _compile(node["items"], f"{path}[]")
+    min_items, max_items = node.get("min_items") or 0, node.get("max_items")
+
+    def check(value: Any, fixes: list) -> Any:
+        if not isinstance(value, list):
+            value = [value]
+            fixes.append(path)
+        out = []
+        for v in value:
+            try:
+                out.append(item(v, fixes))
+            except _Invalid:
+                fixes.append(f"{path}[]")
+        if max_items is not None and len(out) > max_items:
+            out = out[:max_items]
+            fixes.append(path)
+        if len(out) < min_items:
+            raise _Invalid(path, f"kamida {min_items} ta element kutilgan")
+        return out
+    return check
+
+
+def _compile_string(node: dict, path: str) -> _Check:
+    enum = {str(e).lower(): e for e in node.get("enum", ())}
+    max_length = node.get("max_length")
+
+    def check(value: Any, fixes: list) -> Any:
+        if isinstance(value, str):
+            text = value
+        elif isinstance(value, (int, float)):
+            text = str(value).lower() if isinstance(value, bool) else str(value)
+            fixes.append(path)
+        else:
+            raise _Invalid(path, "matn kutilgan")
+        if enum:
+            canonical = enum.get(text.strip().lower())
+            if canonical is None:
+                raise _Invalid(path, f"{'/'.join(enum.values())} kutilgan")
+            if canonical != text:
+                fixes.append(path)
+            return canonical
+        if max_length is not None and len(text) > max_length:
+            text = text[:max_length]
+            fixes.append(path)
+        return text
+    return check
+
+
+def _compile_number(node: dict, path: str) -> _Check:
+    as_int = node["type"] == "INTEGER"
+    lo, hi = node.get("minimum"), node.get("maximum")
+
+    def check(value: Any, fixes: list) -> Any:
+        if isinstance(value, bool):
+            raise _Invalid(path, "son kutilgan")
+        if isinstance(value, (int, float)):
+            num = value
+        elif isinstance(value, str):
+            try:
+                num = float(value.strip().rstrip("%").replace(",", "."))
+            except ValueError:
+                raise _Invalid(path, "son kutilgan") from None
+            fixes.append(path)
+        else:
+            raise _Invalid(path, "son kutilgan")
+        if not math.isfinite(num):
+            raise _Invalid(path, "son kutilgan")
+        if lo is not None and num < lo:
+            num = lo
+            fixes.append(path)
+        if hi is not None and num > hi:
+            num = hi
+            fixes.append(path)
+        if as_int and not isinstance(num, int):
+            num = int(round(num))
+        return num
+    return check
+
+
+def _compile_boolean(node: dict, path: str) -> _Check:
+    def check(value: Any, fixes: list) -> Any:
+        if isinstance(value, bool):
+            return value
+        token = str(value).strip().lower() if isinstance(value, (str, int)) else None
+        if token in _TRUE or token in _FALSE:
+            fixes.append(path)
+            return token in _TRUE
+        raise _Invalid(path, "true/false kutilgan")
+    return check
+
+
+_COMPILERS: dict[str, Callable[[dict, str], _Check]] = {
+    "OBJECT":  _compile_object,
+    "ARRAY":   _compile_array,
+    "STRING":  _compile_string,
+    "NUMBER":  _compile_number,
+    "INTEGER": _compile_number,
+    "BOOLEAN": _compile_boolean,
+}
+
+
+def _compile(node: dict, path: str = "") -> _Check:
+    try:
+        return _COMPILERS[node["type"]](node, path)
+    except KeyError:
+        raise ValueError(f"Qo'llab-quvvatlanmaydigan sxema turi ({path or '$'}): {node.get('type')}") from None
+
+
+def describe(node: dict) -> str:
+    """Promptga qisqa maydonlar ro'yxati: {"a"*: str, "b": 0-100, "c": [str]} (* majburiy)."""
+    kind = node["type"]
+    if kind == "OBJECT":
+        required = set(node.get("required", ()))
+        return "{" + ", ".join(
+            f'"{key}"{"*" if key in required else ""}: {describe(sub)}'
+            for key, sub in node.get("properties", {}).items()
+        ) + "}"
+    if kind == "ARRAY":
+        return f"[{describe(node['items'])}]"
+    if kind == "STRING":
+        return "/".join(node["enum"]) if node.get("enum") else "str"
+    if kind in ("NUMBER", "INTEGER"):
+        lo, hi = node.get("minimum"), node.get("maximum")
+        if lo is not None and hi is not None:
+            return f"{lo:g}-{hi:g}"
+        return "int" if kind == "INTEGER" else "num"
+    return "bool"
+
+
+# ---------------------------------------------------------------------------
+# Registry
+# ---------------------------------------------------------------------------
+
+_stats_lock = threading.Lock()
+_stats: dict[str, Counter[str]] = {}
+
+
+def _record(name: str, outcome: str) -> None:
+    with _stats_lock:
+        _stats.setdefault(name, Counter())[outcome] += 1
+
+
+@dataclass(frozen=True, eq=False)
+class ResponseSchema:
+    name:   str
+    schema: dict
+    hint:   str
+    _check: _Check = field(repr=False)
+    unwrap: tuple[str, ...] = ()          # ARRAY sxema: {"questions": [...]} -> [...]
+
+    @property
+    def expect(self) -> Optional[type]:
+        return {"OBJECT": dict, "ARRAY": list}.get(self.schema["type"])
+
+    def validate(self, data: Any) -> Any:
+        """Tekshiradi va keltiradi. Mos kelmasa SchemaError."""
+        fixes: list[str] = []
+        try:
+            out = self._check(data, fixes)
+        except _Invalid as exc:
+            _record(self.name, "rejected")
+            raise SchemaError(f"{self.name}: {exc}") from None
+        if fixes:
+            _record(self.name, "coerced")
+            logger.debug("Schema %s coerced: %s", self.name, ", ".join(fixes[:10]))
+        else:
+            _record(self.name, "valid")
+        return out
+
+    def parse(self, raw: Any) -> Any:
+        """Model javobi (matn) -> tekshirilgan qiymat. JSON topilmasa ham SchemaError."""
+        try:
+            data = json_extract.extract(raw, self.expect, keys=self.unwrap)
+        except json_extract.JSONNotFound as exc:
+            _record(self.name, "rejected")
+            raise SchemaError(f"{self.name}: {exc}") from exc
+        return self.validate(data)
+
+
+_registry: dict[str, ResponseSchema] = {}
+
+
+def register(name: str, schema: dict, *, hint: str | None = None,
+             unwrap: Sequence[str] = ()) -> ResponseSchema:
+    """Sxemani kompilyatsiya qilib registrga qo'shadi."""
+    entry = ResponseSchema(name, schema, hint or describe(schema), _compile(schema), tuple(unwrap))
+    _registry[name] = entry
+    return entry
+
+
+def get(name: str) -> ResponseSchema:
+    return _registry[name]
+
+
+def registered() -> dict[str, ResponseSchema]:
+    return dict(_registry)
+
+
+def stats() -> dict[str, Any]:
+    """Sxema bo'yicha: valid / coerced (keltirilgan) / rejected."""
+    with _stats_lock:
+        return {
+            name: {**counts, "hint_tokens": estimate_tokens(_registry[name].hint)}
+            for name, counts in _stats.items()
+        }
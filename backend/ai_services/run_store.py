@@ -0,0 +1,175 @@
+"""
+Konsilium run store: har bir tugagan faza DB ga checkpoint qilinadi (ConsiliumRun).
+
+Worker qayta ishga tushsa (gunicorn max_requests) yoki so'rov Phase 3 da uzilsa,
+to'langan Phase 1/2 ishi yo'qolmaydi  -  shu session_id bilan yangi so'rov oxirgi
+tugagan fazadan davom etadi (iter_consilium(session_id=...)):
+
+  phase1     -> Phase 2 (yoki early-exit bo'lsa Phase 3) dan
+  phase2     -> Phase 3 dan
+  completed  -> saqlangan natija qaytariladi, model chaqirilmaydi
+
+Blob formati: zlib(compact JSON) {"v": 1, "ptext": ..., "result": ConsiliumResult.to_dict()}.
+p1/p2/weights result.phases ichida  -  alohida saqlanmaydi. session_id boshqa foydalanuvchi
+yoki boshqa bemor ma'lumotlariga tegishli bo'lsa RunConflict.
+
+Saqlash xatolari konsiliumni to'xtatmaydi (faqat warning). Phase 3 promptlarini oflayn
+qayta ishlatish (benchmark): manage.py replay_phase3 <session_id>.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from django.conf import settings
+
+from .models import ConsiliumRun
+from .prompt_budget import compact
+
+logger = logging.getLogger(__name__)
+
+_FORMAT_VERSION = 1
+_ZLIB_LEVEL = 6
+
+_stats_lock = threading.Lock()
+_counters: Counter[str] = Counter()
+_bytes = {"raw": 0, "packed": 0}
+
+
+class RunConflict(Exception):
+    """session_id boshqa foydalanuvchi yoki boshqa bemor ma'lumotlariga tegishli."""
+
+
+@dataclass
+class Checkpoint:
+    session_id: str
+    stage:      str
+    ptext:      str
+    result:     dict
+
+    @property
+    def phases(self) -> dict:
+        return self.result.get("phases") or {}
+
+    @property
+    def p1(self) -> list[dict]:
+        return self.phases.get("phase1_independent") or []
+
+    @property
+    def p2(self) -> list[dict]:
+        return self.phases.get("phase2_debate") or []
+
+    @property
+    def weights(self) -> Optional[dict[str, float]]:
+        return self.phases.get("refutation_weights")
+
+
+def enabled() -> bool:
+    return bool(getattr(settings, "AI_RUN_STORE_ENABLED", True))
+
+
+def fingerprint(ptext: str, language: str) -> str:
+    return hashlib.sha256(f"{language}\x00{ptext}".encode("utf-8")).hexdigest()
+
+
+def pack(state: dict) -> bytes:
+    raw = compact({"v": _FORMAT_VERSION, **state}).encode("utf-8")
+    blob = zlib.compress(raw, _ZLIB_LEVEL)
+    with _stats_lock:
+        _bytes["raw"] += len(raw)
+        _bytes["packed"] += len(blob)
+    return blob
+
+
+def unpack(blob: bytes) -> dict:
+    state = json.loads(zlib.decompress(bytes(blob)).decode("utf-8"))
+    if state.get("v") != _FORMAT_VERSION:
+        raise ValueError(f"Noma'lum run blob versiyasi: {state.get('v')}")
+    return state
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _counters[name] += 1
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def load(session_id: str, owner: Any, ptext: str, language: str) -> Optional[Checkpoint]:
+    """
+    Resume uchun checkpoint. Yo'q bo'lsa (yoki store o'chirilgan / o'qib bo'lmasa) None.
+    Boshqa foydalanuvchi yoki boshqa bemor ma'lumotlari  -  RunConflict.
+    """
+    if not enabled():
+        return None
+    try:
+        run = ConsiliumRun.objects.filter(session_id=session_id).first()
+    except Exception as exc:
+        logger.warning("Run store lookup failed (%s): %s", session_id, exc)
+        return None
+    if run is None:
+        return None
+    if run.user_id != owner or run.fingerprint != fingerprint(ptext, language):
+        _count("conflicts")
+        raise RunConflict(f"Konsilium sessiyasi {session_id} boshqa so'rovga tegishli")
+    try:
+        state = unpack(run.blob)
+    except Exception as exc:
+        logger.warning("Run store blob unreadable (%s): %s", session_id, exc)
+        return None
+    _count(f"resumed_from_{run.stage}")
+    logger.info("[%s] Resuming consilium from %s checkpoint", session_id, run.stage)
+    return Checkpoint(session_id, run.stage, state["ptext"], state["result"])
+
+
+def save(session_id: str, stage: str, *, ptext: str, language: str, owner: Any,
+         result: dict) -> None:
+    """Faza checkpoint'ini yozadi (upsert). Xato bo'lsa faqat warning."""
+    if not enabled():
+        return
+    try:
+        blob = pack({"ptext": ptext, "result": result})
+        ConsiliumRun.objects.update_or_create(
+            session_id=session_id,
+            defaults={
+                "user_id":     owner,
+                "language":    language,
+                "fingerprint": fingerprint(ptext, language),
+                "stage":       stage,
+                "blob":        blob,
+                "blob_size":   len(blob),
+            },
+        )
+    except Exception as exc:
+        _count("errors")
+        logger.warning("Run store checkpoint %s/%s failed: %s", session_id, stage, exc)
+        return
+    _count(f"saved_{stage}")
+
+
+def replay(session_id: str) -> Checkpoint:
+    """Oflayn Phase 3 replay uchun (egasi tekshirilmaydi). Yo'q bo'lsa ConsiliumRun.DoesNotExist."""
+    run = ConsiliumRun.objects.get(session_id=session_id)
+    state = unpack(run.blob)
+    return Checkpoint(run.session_id, run.stage, state["ptext"], state["result"])
+
+
+def stats() -> dict[str, Any]:
+    with _stats_lock:
+        raw, packed = _bytes["raw"], _bytes["packed"]
+        return {
+            "enabled": enabled(),
+            **dict(_counters),
+            "bytes_raw": raw,
+            "bytes_packed": packed,
+            "compression_ratio": round(packed / raw, 3) if raw else 0.0,
+        }
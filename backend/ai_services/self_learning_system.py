@@ -10,6 +10,8 @@ from django.db import models
 from django.utils import timezone
 from django.conf import settings
 
+from . import llm_governor
+
 logger = logging.getLogger(__name__)
 
 
@@ -104,6 +106,7 @@ class SelfLearningSystem:
         self.success_patterns = {}
         self.failure_patterns = {}
     
+    @llm_governor.priority(llm_governor.LOW)
     def analyze_protocol_outcome(self, protocol_id: str, patient_data: Dict, 
                                 outcome_data: Dict) -> Dict:
         """
@@ -145,6 +148,7 @@ class SelfLearningSystem:
             logger.error(f"Error in outcome analysis: {e}")
             return {'error': str(e)}
     
+    @llm_governor.priority(llm_governor.LOW)
     def get_improved_protocol_template(self, patient_data: Dict, 
                                      base_protocol: Dict) -> Dict:
         """
@@ -0,0 +1,187 @@
+"""
+Single-flight: bir vaqtda kelgan bir xil LLM chaqiruvlarini birlashtirish.
+
+Birinchi chaqiruvchi (leader) API ga boradi, parallel kelgan aynan shu so'rovlar
+(follower) uning Future'ini kutadi. gthread worker ichida threadlar o'rtasida ishlaydi;
+REDIS_URL bo'lsa workerlar o'rtasida ham  -  Django cache.add() lock sifatida, natija esa
+llm_cache umumiy qavatidan o'qiladi.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Awaitable, Callable
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_LOCK_PREFIX = "llm:inflight:"
+
+_inflight: dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
+# asyncio varianti: (event loop id, key) -> asyncio.Future. Bitta loop bitta threadda
+# ishlagani uchun lock kerak emas.
+_ainflight: dict[tuple[int, str], asyncio.Future] = {}
+
+_stats_lock = threading.Lock()
+_stats = {"leaders": 0, "coalesced": 0, "coalesced_remote": 0, "wait_timeouts": 0, "leader_cancels": 0}
+
+
+class _LeaderCancelled(Exception):
+    """ado() leader'i bekor qilindi  -  followerlar fn() ni o'zlari chaqiradi."""
+
+
+def _bump(field: str) -> None:
+    with _stats_lock:
+        _stats[field] += 1
+
+
+def stats() -> dict[str, int]:
+    with _stats_lock:
+        return {**_stats, "inflight": len(_inflight) + len(_ainflight)}
+
+
+def _enabled() -> bool:
+    return bool(getattr(settings, "AI_SINGLEFLIGHT_ENABLED", True))
+
+
+def _wait_timeout() -> float:
+    return float(getattr(settings, "AI_SINGLEFLIGHT_WAIT", 180))
+
+
+def _distributed_enabled() -> bool:
+    return bool(getattr(settings, "AI_SINGLEFLIGHT_DISTRIBUTED", bool(getattr(settings, "REDIS_URL", ""))))
+
+
+# ---------------------------------------------------------------------------
+# Cross-process (Redis lock)
+# ---------------------------------------------------------------------------
+
+def _run_distributed(key: str, fn: Callable[[], str], peek: Callable[[str], str | None]) -> str:
+    """
+    Boshqa worker shu so'rovni bajarayotgan bo'lsa, uning natijasi umumiy keshga
+    tushishini kutadi. Lock yo'qolsa yoki vaqt tugasa  -  o'zi chaqiradi.
+    """
+    try:
+        from django.core.cache import cache
+        lock_key = _LOCK_PREFIX + key
+        wait = _wait_timeout()
+        if cache.add(lock_key, os.getpid(), timeout=int(wait)):
+            try:
+                return fn()
+            finally:
+                cache.delete(lock_key)
+    except Exception as exc:
+        logger.warning("Single-flight lock unavailable, calling directly: %s", exc)
+        return fn()
+
+    deadline = time.monotonic() + wait
+    delay = 0.1
+    while time.monotonic() < deadline:
+        time.sleep(delay)
+        delay = min(delay * 2, 1.0)
+        value = peek(key)
+        if value is not None:
+            _bump("coalesced_remote")
+            return value
+        try:
+            if not cache.get(lock_key):
+                break
+        except Exception:
+            break
+    return fn()
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def do(
+    key: str,
+    fn: Callable[[], str],
+    peek: Callable[[str], str | None] | None = None,
+) -> str:
+    """
+    fn() ni key bo'yicha bir marta bajaradi. peek berilsa (natija umumiy keshga
+    yoziladigan holat) va Redis mavjud bo'lsa, workerlar o'rtasida ham birlashtiriladi.
+    """
+    if not _enabled():
+        return fn()
+
+    with _inflight_lock:
+        fut = _inflight.get(key)
+        leader = fut is None
+        if leader:
+            fut = Future()
+            _inflight[key] = fut
+
+    if not leader:
+        _bump("coalesced")
+        try:
+            return fut.result(timeout=_wait_timeout())
+        except FutureTimeout:
+            _bump("wait_timeouts")
+            logger.warning("Single-flight wait timed out, calling directly")
+            return fn()
+
+    _bump("leaders")
+    try:
+        if peek is not None and _distributed_enabled():
+            result = _run_distributed(key, fn, peek)
+        else:
+            result = fn()
+    except BaseException as exc:
+        fut.set_exception(exc)
+        raise
+    else:
+        fut.set_result(result)
+        return result
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+async def ado(key: str, fn: Callable[[], Awaitable[str]]) -> str:
+    """do() ning asyncio varianti  -  bitta event loop ichida birlashtiradi."""
+    if not _enabled():
+        return await fn()
+
+    loop = asyncio.get_running_loop()
+    slot = (id(loop), key)
+    fut = _ainflight.get(slot)
+    if fut is not None:
+        _bump("coalesced")
+        try:
+            return await asyncio.shield(fut)
+        except _LeaderCancelled:
+            # Leader (boshqa HTTP so'rov) bekor qilindi  -  bu so'rov o'zi chaqiradi
+            _bump("leader_cancels")
+            return await fn()
+
+    fut = loop.create_future()
+    _ainflight[slot] = fut
+    _bump("leaders")
+    try:
+        result = await fn()
+    except asyncio.CancelledError:
+        # fut.cancel() followerlarga CancelledError yuborardi (except Exception ushlamaydi)
+        fut.set_exception(_LeaderCancelled())
+        fut.exception()
+        raise
+    except BaseException as exc:
+        fut.set_exception(exc)
+        fut.exception()   # follower bo'lmasa "never retrieved" ogohlantirishi chiqmasin
+        raise
+    else:
+        fut.set_result(result)
+        return result
+    finally:
+        _ainflight.pop(slot, None)
@@ -0,0 +1,263 @@
+"""
+Bosqichlar grafi (DAG) executor'i: bog'liq bo'lmagan LLM bosqichlari parallel ishlaydi.
+
+Har bir Stage  -  nom, funksiya, bog'liqliklar (deps) va fallback. Bosqich barcha
+deps natijalari tayyor bo'lishi bilan agent_pool'ga topshiriladi; funksiya deps
+natijalarini keyword argument sifatida oladi:
+
+    Stage("risk", lambda triage, algorithm: ..., deps=("triage", "algorithm"), fallback=...)
+
+Umumiy muddat (deadline) yoki bosqichning o'z timeout'i tugasa bosqich bekor qilinadi
+va fallback qiymatini oladi, qolganlari esa shu qiymat bilan davom etadi. Xato bergan
+bosqich ham fallback'ga tushadi (fallback bo'lmasa xato yuqoriga ko'tariladi).
+
+Dinamik rejalashtirish uchun Stage.ready predikati: masalan konsilium Phase 2 agenti
+quorum yetganda boshlanadi yoki early-exit da umuman tashlab yuboriladi (None).
+start().events() natijalarni tugash tartibida beradi (SSE uchun), run()  -  oxirigacha.
+
+Barcha LLM pipeline'lari (klinik qaror, avtonom protokol, ikkala konsilium) shu
+runtime'da  -  rejalashtirish, timeout va metrikalar bitta joyda.
+Har bir bosqich vaqti natijada (timings) va stats() da (health/detailed).
+"""
+
+from __future__ import annotations
+
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Iterator, Mapping
+
+from . import agent_pool
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Stage:
+    name:     str
+    fn:       Callable[..., Any]
+    deps:     tuple[str, ...] = ()
+    fallback: Callable[[], Any] | None = None
+    # ready(results) -> True (topshirish) / False (kutish) / None (tashlab yuborish).
+    # Berilsa deps "yumshoq": fn faqat tayyor bo'lgan deps natijalarini oladi.
+    ready:    Callable[[Mapping[str, Any]], bool | None] | None = None
+    timeout:  float | None = None   # bosqich o'z muddati (umumiy deadline ichida)
+
+
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+
+_stats_lock = threading.Lock()
+_stats: dict[str, dict[str, dict[str, int]]] = {}
+
+
+def _record(graph: str, stage: str, ms: int, status: str) -> None:
+    with _stats_lock:
+        row = _stats.setdefault(graph, {}).setdefault(stage, {
+            "runs": 0, "fallbacks": 0, "timeouts": 0, "ms_total": 0, "ms_max": 0,
+        })
+        row["runs"] += 1
+        row["ms_total"] += ms
+        row["ms_max"] = max(row["ms_max"], ms)
+        if status == "timeout":
+            row["timeouts"] += 1
+        elif status != "ok":
+            row["fallbacks"] += 1
+
+
+def stats() -> dict[str, Any]:
+    with _stats_lock:
+        return {
+            graph: {
+                name: {**row, "ms_avg": round(row["ms_total"] / row["runs"]) if row["runs"] else 0}
+                for name, row in stages.items()
+            }
+            for graph, stages in _stats.items()
+        }
+
+
+# ---------------------------------------------------------------------------
+# Executor
+# ---------------------------------------------------------------------------
+
+class GraphRun:
+    """
+    Bitta graf bajarilishi. start() birinchi to'lqinni darhol topshiradi;
+    events() bosqichlar natijasini (nom, qiymat, status) tugash tartibida beradi.
+    Status: ok | error | timeout | skipped (muddat o'tgach tayyor bo'lgan);
+    dropped (ready() None qaytargan) bosqichlar events() da chiqmaydi.
+    """
+
+    def __init__(self, stages: list[Stage], deadline: float, tenant: Hashable, graph: str):
+        by_name = {s.name: s for s in stages}
+        for s in stages:
+            missing = [d for d in s.deps if d not in by_name]
+            if missing:
+                raise ValueError(f"{graph}: '{s.name}' noma'lum bosqichga bog'liq: {missing}")
+        self.graph    = graph
+        self.tenant   = tenant
+        self.deadline = deadline
+        self.started  = time.monotonic()
+        self.expires  = self.started + deadline
+        self.results: dict[str, Any] = {}
+        self.timings: dict[str, dict[str, Any]] = {}
+        self._order   = {s.name: i for i, s in enumerate(stages)}
+        self._pending = dict(by_name)
+        self._running: dict[Future, tuple[Stage, float]] = {}
+        self._dropped: set[str] = set()
+        self._resolved: list[tuple[str, Any, str]] = []
+        self._first_wave = True
+
+    # -- resolution ---------------------------------------------------------
+
+    def _resolve(self, stage: Stage, value: Any, t0: float, status: str) -> None:
+        ms = int((time.monotonic() - t0) * 1000)
+        self.results[stage.name] = value
+        self.timings[stage.name] = {"ms": ms, "status": status}
+        self._resolved.append((stage.name, value, status))
+        _record(self.graph, stage.name, ms, status)
+
+    def _degrade(self, stage: Stage, t0: float, status: str, exc: BaseException) -> None:
+        if stage.fallback is None:
+            raise exc
+        logger.warning("%s: stage %s -> fallback (%s: %s)", self.graph, stage.name, status, exc)
+        self._resolve(stage, stage.fallback(), t0, status)
+
+    def _drop(self, stage: Stage) -> None:
+        self._dropped.add(stage.name)
+        self.timings[stage.name] = {"ms": 0, "status": "dropped"}
+
+    def _eligible(self, stage: Stage) -> bool | None:
+        if stage.ready is not None:
+            return stage.ready(self.results)
+        if any(d in self._dropped for d in stage.deps):
+            return None
+        return all(d in self.results for d in stage.deps)
+
+    def _cutoff(self, stage: Stage, t0: float) -> float:
+        return min(t0 + stage.timeout, self.expires) if stage.timeout else self.expires
+
+    # -- scheduling ---------------------------------------------------------
+
+    def submit_ready(self) -> bool:
+        """Tayyor bosqichlarni topshiradi; pending o'zgargan bo'lsa True."""
+        ready: list[Stage] = []
+        dropped, changed = False, True
+        while changed:   # drop zanjiri: tashlangan bosqichga bog'liqlar ham tashlanadi
+            changed = False
+            for s in list(self._pending.values()):
+                verdict = self._eligible(s)
+                if verdict is None:
+                    del self._pending[s.name]
+                    self._drop(s)
+                    dropped = changed = True
+                elif verdict:
+                    del self._pending[s.name]
+                    ready.append(s)
+        if not ready:
+            return dropped
+        if time.monotonic() < self.expires:
+            calls = [
+                functools.partial(s.fn, **{d: self.results[d] for d in s.deps if d in self.results})
+                for s in ready
+            ]
+            futures = agent_pool.pool.submit_many(calls, tenant=self.tenant, force=not self._first_wave)
+            self._first_wave = False
+            now = time.monotonic()
+            self._running.update({fut: (s, now) for fut, s in zip(futures, ready)})
+        else:
+            for s in ready:
+                self._degrade(s, time.monotonic(), "skipped",
+                              FutureTimeout(f"{self.graph} deadline"))
+        return True
+
+    def _wait(self) -> None:
+        nearest = min(self._cutoff(s, t0) for s, t0 in self._running.values())
+        done, _ = wait(list(self._running), timeout=max(0.0, nearest - time.monotonic()),
+                       return_when=FIRST_COMPLETED)
+        for fut in sorted(done, key=lambda f: self._order[self._running[f][0].name]):
+            s, t0 = self._running.pop(fut)
+            exc = fut.exception()
+            if exc is None:
+                self._resolve(s, fut.result(), t0, "ok")
+            else:
+                self._degrade(s, t0, "error", exc)
+        now = time.monotonic()
+        for fut, (s, t0) in list(self._running.items()):
+            cutoff = self._cutoff(s, t0)
+            if now < cutoff:
+                continue
+            # Kutayotgan bekor, bajarilayotgan natijasi e'tiborsiz qoladi
+            fut.cancel()
+            del self._running[fut]
+            reason = (f"{self.graph} deadline ({self.deadline:.0f}s)" if cutoff >= self.expires
+                      else f"{s.name} timeout ({s.timeout:g}s)")
+            self._degrade(s, t0, "timeout", FutureTimeout(reason))
+
+    def events(self) -> Iterator[tuple[str, Any, str]]:
+        """
+        (nom, qiymat, status) ni tugash tartibida beradi. ready() predikatlari har bir
+        hodisa iste'molchi tomonidan qayta ishlangandan KEYIN tekshiriladi.
+        """
+        try:
+            while True:
+                while self._resolved:
+                    yield self._resolved.pop(0)
+                if self.submit_ready():
+                    continue
+                if not self._running:
+                    stuck = [s.name for s in self._pending.values() if s.ready is None]
+                    if stuck:
+                        raise ValueError(f"{self.graph}: aylana bog'liqlik: {sorted(stuck)}")
+                    for s in list(self._pending.values()):
+                        self._drop(s)   # ready() endi hech qachon True bo'lmaydi
+                    self._pending.clear()
+                    break
+                self._wait()
+        finally:
+            # Fallback'siz bosqich xatosi yoki iterator tashlab ketildi: navbatdagilar bekor
+            for fut in self._running:
+                fut.cancel()
+        logger.info(
+            "%s finished in %d ms: %s", self.graph, self.total_ms(),
+            ", ".join(f"{k}={v['ms']}ms/{v['status']}" for k, v in self.timings.items()),
+        )
+
+    def total_ms(self) -> int:
+        return int((time.monotonic() - self.started) * 1000)
+
+    def summary(self) -> dict[str, Any]:
+        return {"total_ms": self.total_ms(), "deadline_s": self.deadline, "stages": self.timings}
+
+
+def start(
+    stages: list[Stage],
+    deadline: float,
+    tenant: Hashable = None,
+    graph: str = "graph",
+) -> GraphRun:
+    """
+    Grafni boshlaydi: birinchi to'lqin agent_pool chegarasini tekshiradi (PoolSaturated
+    shu yerda, chaqiruvchi threadida), keyingilari  -  qabul qilingan ishning davomi (force=True).
+    """
+    graph_run = GraphRun(stages, deadline, tenant, graph)
+    graph_run.submit_ready()
+    return graph_run
+
+
+def run(
+    stages: list[Stage],
+    deadline: float,
+    tenant: Hashable = None,
+    graph: str = "graph",
+) -> tuple[dict[str, Any], dict[str, Any]]:
+    """Grafni oxirigacha bajaradi va (natijalar, timings) qaytaradi."""
+    graph_run = start(stages, deadline, tenant, graph)
+    for _ in graph_run.events():
+        pass
+    return graph_run.results, graph_run.summary()
@@ -0,0 +1,11 @@
+"""
+Celery tasks (AI_JOBS_BACKEND=celery). Worker: celery -A medoraai_backend worker
+"""
+from celery import shared_task
+
+from . import jobs
+
+
+@shared_task(name="ai_services.run_ai_job", acks_late=True)
+def run_ai_job(job_id: str) -> None:
+    jobs.run(job_id)
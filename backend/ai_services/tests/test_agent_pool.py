@@ -0,0 +1,60 @@
+"""agent_pool  -  tenant bo'yicha round-robin navbat, backpressure va fan-out muddati."""
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ai_services import agent_pool, views
+
+
+class FairExecutorTests(SimpleTestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def _executor(self, max_workers=1, max_queue=8):
+        executor = agent_pool.FairExecutor(max_workers, max_queue, name="test-pool")
+        # Yagona workerni band qilamiz  -  keyingi partiyalar navbatda yig'iladi
+        gate = executor.submit_many([lambda: self.release.wait(5)], tenant="gate")[0]
+        while not gate.running():
+            time.sleep(0.005)
+        return executor
+
+    def test_round_robin_between_tenants(self):
+        executor = self._executor()
+        order = []
+        busy = executor.submit_many([lambda i=i: order.append(("A", i)) for i in range(3)], tenant="A")
+        other = executor.submit_many([lambda i=i: order.append(("B", i)) for i in range(2)], tenant="B")
+        self.release.set()
+        for fut in busy + other:
+            fut.result(5)
+        self.assertEqual(order, [("A", 0), ("B", 0), ("A", 1), ("B", 1), ("A", 2)])
+
+    def test_saturated_batch_rejected_whole_with_retry_after(self):
+        executor = self._executor(max_queue=3)
+        executor.submit_many([lambda: None], tenant="A")
+        with self.assertRaises(agent_pool.PoolSaturated) as cm, self.assertLogs("ai_services.agent_pool", "WARNING"):
+            executor.submit_many([lambda: None, lambda: None], tenant="B")
+        self.assertGreaterEqual(cm.exception.retry_after, 1)
+        self.assertEqual(executor.stats()["pending"], 1)          # hammasi yoki hech biri
+        self.assertEqual(executor.stats()["rejected"], 1)
+
+        resp = views._busy(cm.exception)
+        self.assertEqual(resp.status_code, 429)
+        self.assertEqual(resp["Retry-After"], str(cm.exception.retry_after))
+
+        # Boshlangan konsiliumning davomi (Phase 2) chegarani chetlab o'tadi
+        futures = executor.submit_many([lambda: "p2"] * 2, tenant="B", force=True)
+        self.release.set()
+        self.assertEqual([f.result(5) for f in futures], ["p2", "p2"])
+
+    def test_fan_out_timeout_cancels_queued(self):
+        executor = self._executor()
+        with mock.patch.object(agent_pool, "pool", executor):
+            out = agent_pool.fan_out([lambda: "ok"] * 2, tenant="A", timeout=0.05)
+        self.assertEqual([res for res, _ in out], [None, None])
+        self.assertTrue(all(isinstance(exc, agent_pool.FutureTimeout) for _, exc in out))
+        self.release.set()
+        executor.submit_many([lambda: None], tenant="A")[0].result(5)
+        self.assertEqual(executor.stats()["cancelled"], 2)
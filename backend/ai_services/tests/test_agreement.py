@@ -0,0 +1,147 @@
+"""agreement + _Debate  -  early-exit quorum, still_possible va spekulyativ Phase 2."""
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from ai_services import agent_pool, agreement, multi_agent_system as mas
+
+_EXIT = dict(AI_EARLY_EXIT_ENABLED=True, AI_EARLY_EXIT_MIN_SHARE=1.0,
+             AI_EARLY_EXIT_MIN_PROBABILITY=85, AI_EARLY_EXIT_MAX_SPREAD=10)
+
+
+def _p1(agent_id, icd10, probability=90, name=None):
+    return {"agent_id": agent_id, "primary_diagnosis": name or f"Tashxis {icd10}",
+            "icd10": icd10, "probability": probability}
+
+
+@override_settings(**_EXIT)
+class AgreementTests(SimpleTestCase):
+    def test_assess_quorum_reached(self):
+        verdict = agreement.assess([_p1("a", "I21.4"), _p1("b", "I21.0", 92),
+                                    _p1("c", "i21"), _p1("d", "I21.9", 88)], 4)
+        self.assertTrue(verdict.agreed)
+        self.assertEqual((verdict.reason, verdict.share, verdict.min_probability), ("agreed", 1.0, 88.0))
+
+    def test_assess_quorum_not_reached(self):
+        p1 = [_p1("a", "I21"), _p1("b", "I21"), _p1("c", "I21"), _p1("d", "J18")]
+        verdict = agreement.assess(p1, 4)
+        self.assertEqual((verdict.agreed, verdict.reason, verdict.share), (False, "diagnoses_differ", 0.75))
+
+        with override_settings(AI_EARLY_EXIT_MIN_SHARE=0.75):
+            self.assertTrue(agreement.assess(p1, 4).agreed)
+        # Xato bergan agent kelishmagan hisoblanadi
+        errored = p1[:3] + [{"agent_id": "d", "error": "timeout"}]
+        self.assertEqual(agreement.assess(errored, 4).reason, "diagnoses_differ")
+        self.assertEqual(agreement.assess([_p1("a", "I21", 60)] * 4, 4).reason, "low_probability")
+
+    def test_still_possible_turns_false(self):
+        self.assertTrue(agreement.still_possible([], 4))
+        self.assertTrue(agreement.still_possible([_p1("a", "I21")], 4))
+        # Ikki xil tashxis: to'liq kelishuv endi imkonsiz
+        self.assertFalse(agreement.still_possible([_p1("a", "I21"), _p1("b", "J18")], 4))
+        # Past ehtimollik keyingi javoblar bilan ko'tarilmaydi
+        self.assertFalse(agreement.still_possible([_p1("a", "I21", 60)], 4))
+
+        with override_settings(AI_EARLY_EXIT_MIN_SHARE=0.75):
+            # 1 + 2 kutilayotgan = 3/4 hali yetadi; 1 + 1 = 2/4 yetmaydi
+            self.assertTrue(agreement.still_possible([_p1("a", "I21"), _p1("b", "J18")], 4))
+            self.assertFalse(agreement.still_possible(
+                [_p1("a", "I21"), _p1("b", "J18"), _p1("c", "K35")], 4))
+        with override_settings(AI_EARLY_EXIT_ENABLED=False):
+            self.assertFalse(agreement.still_possible([], 4))
+
+
+@override_settings(AI_CONSILIUM_QUORUM=3, AI_CONSILIUM_DEADLINE=120, **_EXIT)
+class DebateTests(SimpleTestCase):
+    def setUp(self):
+        self.result = mas._new_result("uz-L", "debate-test")
+        self.ids = [a.id for a in mas.AGENTS]
+
+    def _debate(self):
+        return mas._Debate(self.result, mas.time.monotonic())
+
+    def test_speculative_phase2_start(self):
+        debate = self._debate()
+        debate.phase1_done(0, _p1(self.ids[0], "I21"))
+        debate.phase1_done(1, _p1(self.ids[1], "J18"))
+        # Early-exit imkonsiz, lekin quorum (3) hali yo'q
+        self.assertIsNone(debate.mode)
+        self.assertFalse(debate.phase2_ready(0))
+
+        debate.phase1_done(2, _p1(self.ids[2], "I21"))
+        self.assertEqual(debate.mode, "debate")
+        self.assertTrue(debate.timings["speculative"])
+        self.assertEqual(self.result.phases["path"], "full_debate")
+        self.assertEqual([debate.phase2_ready(i) for i in range(4)], [True, True, True, False])
+
+        # Erta boshlanganlar kechikkan agent fikrini ko'rmaydi, kechikkan esa hammasini ko'radi
+        own, others = debate.phase2_inputs(0)
+        self.assertEqual(own["agent_id"], self.ids[0])
+        self.assertEqual(sorted(r["agent_id"] for r in others), sorted(self.ids[1:3]))
+        debate.phase1_done(3, _p1(self.ids[3], "K35"))
+        self.assertTrue(debate.phase2_ready(3))
+        _, others = debate.phase2_inputs(3)
+        self.assertEqual(sorted(r["agent_id"] for r in others), sorted(self.ids[:3]))
+
+    def test_agreement_skips_phase2(self):
+        debate = self._debate()
+        for i, agent_id in enumerate(self.ids):
+            debate.phase1_done(i, _p1(agent_id, "I21"))
+        self.assertEqual(debate.mode, "early")
+        self.assertIsNone(debate.phase2_ready(0))
+        self.assertEqual(debate.finish()[1], [])
+
+    @override_settings(AI_CONSILIUM_DEADLINE=0)
+    def test_phase2_expired_after_deadline(self):
+        debate = self._debate()
+        self.assertTrue(debate.expired())
+        res = debate.phase2_expired(1)
+        self.assertEqual(res["agent_id"], self.ids[1])
+        self.assertIn("deadline", res["error"])
+        self.assertEqual(debate.timings["timed_out"], [f"phase2:{self.ids[1]}"])
+        self.assertEqual(debate.p2[1], res)
+
+
+@override_settings(AI_CONSILIUM_QUORUM=3, AI_CONSILIUM_DEADLINE=120, **_EXIT)
+class DebateGraphTests(SimpleTestCase):
+    """_debate_events: sekin agentni kutmasdan Phase 2 boshlanadi."""
+
+    def setUp(self):
+        patcher = mock.patch.object(agent_pool, "pool", agent_pool.FairExecutor(8, 32, name="test-debate"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def test_late_agent_joins_running_debate(self):
+        slow = mas.AGENTS[-1].id
+
+        def phase1(agent, ptext):
+            if agent.id == slow:
+                self.release.wait(5)
+            return _p1(agent.id, "I21")
+
+        def phase2(agent, ptext, own, others):
+            return {"agent_id": agent.id, "seen": sorted(r["agent_id"] for r in others)}
+
+        result = mas._new_result("uz-L", "debate-graph-test")
+        debate = mas._Debate(result, mas.time.monotonic())
+        with mock.patch.object(mas, "_phase1_single", side_effect=phase1), \
+                mock.patch.object(mas, "_phase2_single", side_effect=phase2), \
+                mock.patch.object(mas.agreement, "still_possible", return_value=False):
+            events = []
+            for event in mas._debate_events("bemor", None, debate):
+                events.append(event)
+                # Sekin agent faqat qolganlarning Phase 2 si tugagach javob beradi
+                if sum(name == "phase2_agent" for name, _ in events) == len(mas.AGENTS) - 1:
+                    self.release.set()
+        p1, p2 = debate.finish()
+
+        names = [(name, data["agent_id"]) for name, data in events]
+        self.assertEqual(names[-2:], [("phase1_agent", slow), ("phase2_agent", slow)])
+        self.assertTrue(result.phases["timings"]["speculative"])
+        by_id = {r["agent_id"]: r["seen"] for r in p2}
+        self.assertEqual(len(by_id[slow]), len(mas.AGENTS) - 1)
+        self.assertTrue(all(len(seen) == len(mas.AGENTS) - 2 for a, seen in by_id.items() if a != slow))
+        self.assertEqual(len(p1), len(mas.AGENTS))
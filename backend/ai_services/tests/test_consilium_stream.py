@@ -0,0 +1,56 @@
+"""consilium_stream  -  SSE qayta ulanish (Last-Event-ID) va begona foydalanuvchi."""
+import json
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from ai_services import consilium_stream, views
+
+_EVENTS = [
+    ("start", {"session_id": "s1"}),
+    ("phase1_agent", {"agent_id": "a"}),
+    ("phase1_agent", {"agent_id": "b"}),
+    ("phase2_skipped", {"agreed": True}),
+    ("phase3_started", {}),
+    ("result", {"session_id": "s1"}),
+]
+
+
+@override_settings(REDIS_URL="")
+class ConsiliumStreamTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(phone="+998901234567", password="x")
+        with mock.patch.object(consilium_stream, "iter_consilium", return_value=iter(_EVENTS)):
+            self.run_id = consilium_stream.start({"complaints": "Yo'tal"}, "uz-L", owner=self.user.pk)
+        with consilium_stream._runs_lock:
+            log = consilium_stream._runs[self.run_id]
+        while not log.wait(len(_EVENTS), 5)[1]:
+            pass
+        self.addCleanup(consilium_stream._runs.pop, self.run_id, None)
+
+    def _resume(self, user, **headers):
+        request = APIRequestFactory().get(f"/api/ai/consilium/stream/{self.run_id}/", **headers)
+        force_authenticate(request, user=user)
+        return views.consilium_stream_resume_view(request, run_id=self.run_id)
+
+    def test_reconnect_returns_only_later_events(self):
+        response = self._resume(self.user, HTTP_LAST_EVENT_ID="2")
+        self.assertEqual(response.status_code, 200)
+        chunks = [c.decode() if isinstance(c, bytes) else c for c in response.streaming_content]
+        self.assertEqual(chunks[-1], "data: [DONE]\n\n")
+
+        ids, names = [], []
+        for chunk in chunks[:-1]:
+            head, data = chunk.strip().split("\n")
+            ids.append(int(head.removeprefix("id: ")))
+            payload = json.loads(data.removeprefix("data: "))
+            self.assertEqual(payload["run_id"], self.run_id)
+            names.append(payload["event"])
+        self.assertEqual(ids, [3, 4, 5, 6])
+        self.assertEqual(names, [name for name, _ in _EVENTS[2:]])
+
+    def test_other_user_gets_404(self):
+        other = get_user_model().objects.create_user(phone="+998901234568", password="x")
+        self.assertEqual(self._resume(other, HTTP_LAST_EVENT_ID="2").status_code, 404)
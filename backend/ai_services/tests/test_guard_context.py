@@ -0,0 +1,64 @@
+"""guard_context  -  body bir marta parse qilinadi, guard natijalari so'rov ichida qayta ishlatiladi."""
+import json
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+
+from ai_services import guard_context, physiology_filter, views
+from ai_services.anatomy_guard import AnatomyGuardMiddleware
+
+_BODY = {"patient_data": {"complaints": "Ikki kundan beri bosh og'rig'i, ko'ngil aynishi va holsizlik bor."}}
+
+
+@api_view(["POST"])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def _view(request):
+    patient_data = request.data.get("patient_data") or {}
+    ctx = guard_context.current(request)
+    blocked = views._run_filter(request, patient_data) or views._run_filter(request, patient_data)
+    return Response({
+        "blocked": blocked is not None,
+        "same_payload": ctx is not None and request.data is ctx.payload,
+    })
+
+
+class GuardContextTests(SimpleTestCase):
+    def setUp(self):
+        guard_context._counters.clear()
+        self.factory = RequestFactory()
+
+    def _post(self, path, body):
+        request = self.factory.post(path, data=json.dumps(body), content_type="application/json")
+        return AnatomyGuardMiddleware(_view)(request)
+
+    def test_body_parsed_once_and_filter_memoized(self):
+        with mock.patch.object(physiology_filter, "_level2_check", return_value=None) as l2, \
+                mock.patch("ai_services.guard_context.json.loads", wraps=json.loads) as loads:
+            response = self._post("/api/ai/doctor-support/", _BODY)
+        self.assertEqual(response.data, {"blocked": False, "same_payload": True})
+        self.assertEqual(loads.call_count, 1)
+        self.assertEqual(l2.call_count, 1)
+        stats = guard_context.stats()
+        self.assertEqual(stats["body_parsed"], 1)
+        self.assertGreaterEqual(stats["body_reused"], 1)
+        self.assertGreaterEqual(stats["memo_hits"], 2)          # physiology L1 + L2
+
+    def test_middleware_blocks_and_unguarded_path_untouched(self):
+        response = self._post("/api/ai/consilium/", {"patient_data": {"complaints": "Men mushukman"}})
+        self.assertEqual(response.status_code, 422)
+
+        with mock.patch.object(physiology_filter, "_level2_check", return_value=None):
+            response = self._post("/api/ai/recommend-specialists/", _BODY)
+        self.assertEqual(response.data["same_payload"], False)
+
+    def test_memo_requires_same_subject(self):
+        ctx, calls = guard_context.GuardContext(), []
+        first, second = {"a": 1}, {"a": 1}
+        for subject in (first, first, second):
+            ctx.memo("k", subject, lambda: calls.append(1))
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(guard_context.memo(None, "k", first, lambda: "direct"), "direct")
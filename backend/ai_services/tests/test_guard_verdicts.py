@@ -0,0 +1,87 @@
+"""guard_verdicts  -  Level 2 verdikt keshi va Level 2 ning birinchi AI bosqichi bilan parallel ishlashi."""
+import asyncio
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from ai_services import anatomy_guard, guard_verdicts, physiology_filter
+
+_PATIENT = {"complaints": "Uch kundan beri yo'tal, isitma 38.5, tomoq og'rig'i va holsizlik."}
+
+
+class GuardVerdictTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        guard_verdicts._counters.clear()
+
+    def test_fingerprint_ignores_case_punctuation_and_apostrophes(self):
+        a = guard_verdicts.fingerprint("g", "Bosh og‘rig‘i,  ko'ngil aynishi!")
+        b = guard_verdicts.fingerprint("g", "bosh og'rig'i ko'ngil aynishi")
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, guard_verdicts.fingerprint("g", "bosh og'rig'i 2 kun"))
+        self.assertNotEqual(a, guard_verdicts.fingerprint("other", "bosh og'rig'i ko'ngil aynishi"))
+
+    def test_level2_verdict_cached(self):
+        reply = json.dumps({"status": "deceptive", "reason": "sinov"})
+        with mock.patch.object(physiology_filter, "call_model", return_value=reply) as call:
+            first = physiology_filter._level2_check("Bu sinov so'rovi, shunchaki tekshiryapman.")
+            second = physiology_filter._level2_check("bu sinov so'rovi  shunchaki tekshiryapman")
+        self.assertEqual(call.call_count, 1)
+        self.assertEqual((first.level, second.level), ("deceptive", "deceptive"))
+        row = guard_verdicts.stats()["physiology_filter"]
+        self.assertEqual((row["hits"], row["misses"], row["hit_rate"]), (1, 1, 0.5))
+
+    def test_ai_error_not_cached(self):
+        with mock.patch.object(physiology_filter, "call_model", side_effect=RuntimeError("503")):
+            with self.assertLogs("ai_services.physiology_filter", "WARNING"):
+                self.assertIsNone(physiology_filter._level2_check("xato holati matni"))
+        self.assertNotIn("stored", guard_verdicts.stats()["physiology_filter"])
+
+    def test_unparseable_reply_not_cached_as_pass(self):
+        for reply in ("Kechirasiz, javob bera olmayman", "[]", '{"reason": "status yo\'q"}'):
+            with self.subTest(reply), \
+                    mock.patch.object(physiology_filter, "call_model", return_value=reply) as call, \
+                    self.assertLogs("ai_services.physiology_filter", "WARNING"):
+                self.assertIsNone(physiology_filter._level2_check("javobsiz holat matni"))
+                self.assertIsNone(physiology_filter._level2_check("javobsiz holat matni"))
+            self.assertEqual(call.call_count, 2)
+        self.assertNotIn("stored", guard_verdicts.stats()["physiology_filter"])
+
+        reply = json.dumps({"reason": "status yo'q"})
+        with mock.patch("ai_services.azure_utils.call_model", return_value=reply), \
+                self.assertLogs("ai_services.anatomy_guard", "WARNING"):
+            self.assertIsNone(anatomy_guard._level2_check("javobsiz holat matni"))
+        self.assertNotIn("stored", guard_verdicts.stats()["anatomy_guard"])
+
+    def test_block_cancels_stage(self):
+        started, cancelled = asyncio.Event(), []
+
+        async def stage():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        blocked = physiology_filter.FilterResult(False, "deceptive", "x", "AI L2: test")
+        with mock.patch.object(physiology_filter, "_level2_check", return_value=blocked):
+            guard, result = asyncio.run(physiology_filter.arun_guarded(_PATIENT, stage))
+        self.assertFalse(guard.passed)
+        self.assertIsNone(result)
+        self.assertEqual(cancelled, [True])
+        self.assertEqual(guard_verdicts.stats()["physiology_filter"]["parallel_cancelled"], 1)
+
+    def test_pass_returns_stage_result(self):
+        async def stage():
+            return {"ok": 1}
+
+        with mock.patch.object(physiology_filter, "_level2_check", return_value=None):
+            guard, result = asyncio.run(physiology_filter.arun_guarded(_PATIENT, stage))
+        self.assertTrue(guard.passed)
+        self.assertEqual(result, {"ok": 1})
+
+        guard, result = asyncio.run(physiology_filter.arun_guarded({"complaints": "Men mushukman"}, stage))
+        self.assertEqual((guard.level, result), ("deceptive", None))
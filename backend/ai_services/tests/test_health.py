@@ -0,0 +1,17 @@
+"""/health/detailed  -  AI modullari statistikasi bo'limlari bir-biridan mustaqil."""
+from unittest import mock
+
+from django.test import TestCase
+
+from ai_services import llm_policy
+
+
+class HealthDetailedTests(TestCase):
+    def test_failing_section_does_not_hide_others(self):
+        with mock.patch.object(llm_policy, "stats", side_effect=RuntimeError("buzildi")), \
+                self.assertLogs("medoraai_backend.health", "WARNING") as logs:
+            checks = self.client.get("/health/detailed/").json()["checks"]
+        self.assertNotIn("ai_retry_policies", checks)
+        self.assertIn("ai_cache", checks)
+        self.assertIn("ai_uz_context", checks)
+        self.assertIn("ai_retry_policies", logs.output[0])
@@ -0,0 +1,80 @@
+"""jobs  -  Celery ilovasi, dispatch, foydalanuvchi chegarasi va bekor qilish."""
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from ai_services import jobs, views
+from ai_services.models import AIJob
+from ai_services.tasks import run_ai_job
+from medoraai_backend import celery_app
+
+_PARAMS = {"patient_data": {"complaints": "Bosh og'rig'i"}, "language": "uz-L"}
+
+
+class JobsTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(phone="+998901234567", password="x")
+
+    def test_task_bound_to_project_app(self):
+        self.assertIs(run_ai_job.app, celery_app)
+        self.assertEqual(run_ai_job.app.main, "medoraai_backend")
+        self.assertEqual(run_ai_job.app.conf.broker_url, settings.CELERY_BROKER_URL)
+
+    @override_settings(AI_JOBS_BACKEND="celery")
+    def test_celery_dispatch_on_commit(self):
+        with mock.patch.object(run_ai_job, "delay") as delay, self.captureOnCommitCallbacks(execute=True):
+            job = jobs.submit(self.user, "consilium", _PARAMS)
+        delay.assert_called_once_with(str(job.pk))
+
+    @override_settings(AI_JOBS_PER_USER=1)
+    def test_per_user_limit_and_queued_cancel(self):
+        with mock.patch.object(jobs, "_dispatch"), self.captureOnCommitCallbacks(execute=True):
+            job = jobs.submit(self.user, "consilium", _PARAMS)
+            with self.assertRaises(jobs.JobLimitExceeded):
+                jobs.submit(self.user, "consilium", _PARAMS)
+        job = jobs.cancel(job)
+        self.assertEqual(job.status, AIJob.STATUS_CANCELLED)
+        jobs.run(job.pk)                  # bekor qilingan ish olinmaydi
+        self.assertEqual(AIJob.objects.get(pk=job.pk).status, AIJob.STATUS_CANCELLED)
+
+    def _orphan(self, age_s: int, **fields) -> AIJob:
+        return AIJob.objects.create(
+            user=self.user, kind="consilium", params=_PARAMS, status=AIJob.STATUS_RUNNING,
+            started_at=timezone.now() - timedelta(seconds=age_s), **fields,
+        )
+
+    @override_settings(AI_JOBS_PER_USER=2, AI_JOBS_STALE_AFTER=600)
+    def test_orphaned_running_jobs_reaped(self):
+        orphans = [self._orphan(900), self._orphan(700, cancel_requested=True)]
+        with mock.patch.object(jobs, "_dispatch"), self.captureOnCommitCallbacks(execute=True):
+            jobs.submit(self.user, "consilium", _PARAMS)
+        statuses = [AIJob.objects.get(pk=j.pk).status for j in orphans]
+        self.assertEqual(statuses, [AIJob.STATUS_FAILED, AIJob.STATUS_CANCELLED])
+
+        fresh, gone = self._orphan(10), self._orphan(900)
+        self.assertEqual(jobs.cancel(fresh).status, AIJob.STATUS_RUNNING)   # worker tirik  -  kooperativ
+        self.assertEqual(jobs.cancel(gone).status, AIJob.STATUS_CANCELLED)
+
+    def _events(self, job) -> list[str]:
+        request = APIRequestFactory().get(f"/api/ai/jobs/{job.pk}/events/")
+        force_authenticate(request, user=self.user)
+        with mock.patch.object(views.time, "sleep"):
+            return [chunk.decode() if isinstance(chunk, bytes) else chunk
+                    for chunk in views.ai_job_events_view(request, job_id=job.pk).streaming_content]
+
+    @override_settings(AI_JOBS_STALE_AFTER=600)
+    def test_events_stream_ends_for_dead_or_slow_job(self):
+        chunks = self._events(self._orphan(900))
+        self.assertIn('"status": "failed"', chunks[-2])
+        self.assertEqual(chunks[-1], "data: [DONE]\n\n")
+
+        with override_settings(AI_JOBS_EVENTS_TIMEOUT=1), \
+                mock.patch.object(views.time, "monotonic", side_effect=[0.0, 0.5, 2.0]):
+            chunks = self._events(self._orphan(10))
+        self.assertIn('"status": "running"', chunks[0])
+        self.assertEqual(chunks[-1], "data: [DONE]\n\n")
@@ -0,0 +1,87 @@
+"""json_extract  -  model javoblaridagi buzilgan JSON korpusi."""
+from django.test import SimpleTestCase
+
+from ai_services import json_extract
+from ai_services.azure_utils import parse_json
+from ai_services.json_extract import JSONNotFound, extract
+
+# (nomi, model javobi, expect, keys, kutilgan natija)
+CORPUS = [
+    ("clean_object", '{"triage_level": "red", "urgency_score": 0.9}', dict, (),
+     {"triage_level": "red", "urgency_score": 0.9}),
+    ("json_fence", '```json\n{"triage_level": "yellow"}\n```', dict, (),
+     {"triage_level": "yellow"}),
+    ("bare_fence_with_outro", '```\n{"ekg_required": true}\n```\nQo\'shimcha savollar bo\'lsa, yozing.', dict, (),
+     {"ekg_required": True}),
+    ("text_fence", '```text\n["Savol 1?", "Savol 2?"]\n```', list, (),
+     ["Savol 1?", "Savol 2?"]),
+    ("prose_intro", 'Mana bemor uchun tahlil natijasi:\n\n{"primary_diagnosis": "Gipertoniya", "probability": 70}', dict, (),
+     {"primary_diagnosis": "Gipertoniya", "probability": 70}),
+    ("braces_in_outro", '{"risk": "past"}\n\nIzoh: {bu taxminiy baho} va [manba] keltirilmagan.', dict, (),
+     {"risk": "past"}),
+    ("bracket_note_before", '[Eslatma: protokol 2023] {"protocol": "AG-1", "steps": []}', dict, (),
+     {"protocol": "AG-1", "steps": []}),
+    ("braces_inside_strings", '{"reasoning": "qiymat {x} > 140 ] emas", "p": 70}', dict, (),
+     {"reasoning": "qiymat {x} > 140 ] emas", "p": 70}),
+    ("escaped_quotes", '{"complaint": "bemor \\"siqilish\\" dedi", "ok": true}', dict, (),
+     {"complaint": 'bemor "siqilish" dedi', "ok": True}),
+    ("trailing_backslash_in_string", 'Natija: {"path": "C:\\\\", "n": 1} tugadi', dict, (),
+     {"path": "C:\\", "n": 1}),
+    ("trailing_commas", '{"labs_required": ["UQT", "EKG",], "ekg_required": true,\n}', dict, (),
+     {"labs_required": ["UQT", "EKG"], "ekg_required": True}),
+    ("comma_in_string_kept", '{"note": "a, ]", "x": [1, 2,],}', dict, (),
+     {"note": "a, ]", "x": [1, 2]}),
+    ("uzbek_unicode", '```json\n{"tashxis": "Ko‘krak qafasi og‘rig‘i", "icd10": "R07.4"}\n```', dict, (),
+     {"tashxis": "Ko‘krak qafasi og‘rig‘i", "icd10": "R07.4"}),
+    ("crlf_body", '{\r\n  "triage_level": "green",\r\n  "life_threatened": false\r\n}\r\n', dict, (),
+     {"triage_level": "green", "life_threatened": False}),
+    ("two_objects", '{"a": 1}\n{"b": 2}', dict, (), {"a": 1}),
+    ("questions_wrapped", '{"questions": ["Qachon boshlangan?", "Isitma bormi?"]}', list, ("questions",),
+     ["Qachon boshlangan?", "Isitma bormi?"]),
+    ("single_diagnosis_object", '{"name": "Pnevmoniya", "probability": 60}', list, (),
+     [{"name": "Pnevmoniya", "probability": 60}]),
+    ("object_in_list", '[{"recommendations": [{"model": "Kardiolog", "reason": "EKG"}]}]', dict, (),
+     {"recommendations": [{"model": "Kardiolog", "reason": "EKG"}]}),
+    ("array_after_wrong_type", 'Avval {"meta": "v1"} so\'ng ["Savol?"]', list, ("questions",), ["Savol?"]),
+    ("nested_valid_inside_broken", "{'python': 'dict', \"inner\": {\"a\": 1}}", dict, (), {"a": 1}),
+    ("complete_before_truncated", '{"a": 1}\n{"b": [{"c": 2}, {"d', dict, (), {"a": 1}),
+    ("bytes_input", '{"ok": true}'.encode("utf-8"), dict, (), {"ok": True}),
+]
+
+# Tuzatib bo'lmaydigan javoblar
+UNRECOVERABLE = [
+    ("empty", "", dict),
+    ("none", None, dict),
+    ("refusal", "Kechirasiz, bu so'rovga javob bera olmayman.", dict),
+    ("truncated", '{"triage_level": "red", "emergency_actions": ["O2", "Aspirin', dict),
+    ("truncated_nested_complete", '{"triage_level":"urgent","steps":[{"name":"ECG","time":5},{"name":"Tro', dict),
+    ("truncated_after_prose", 'Reja:\n```json\n{"steps": [{"name": "EKG"}, {"na', dict),
+    ("unclosed_fence", '```json\n{"a": [1, 2\n', dict),
+    ("mismatched", '{"a": [1, 2}', dict),
+    ("wrong_type_only", '{"meta": "v1"}', list),
+]
+
+
+class JSONExtractCorpusTests(SimpleTestCase):
+    def test_corpus(self):
+        for name, raw, expect, keys, expected in CORPUS:
+            with self.subTest(name):
+                self.assertEqual(extract(raw, expect, keys=keys), expected)
+
+    def test_unrecoverable(self):
+        for name, raw, expect in UNRECOVERABLE:
+            with self.subTest(name), self.assertRaises(JSONNotFound):
+                extract(raw, expect, keys=("questions",))
+
+    def test_parse_defaults(self):
+        with self.assertLogs("ai_services.json_extract", "WARNING"):
+            self.assertEqual(json_extract.parse("javob yo'q", list, context="t"), [])
+        with self.assertLogs("ai_services.json_extract", "WARNING"):
+            self.assertEqual(parse_json("javob yo'q", "t"), {})
+        self.assertEqual(parse_json('```json\n[1, 2,]\n```'), [1, 2])
+
+    def test_stats(self):
+        extract('{"a": 1}')
+        row = json_extract.stats()
+        self.assertIn(row["backend"], ("json", "orjson"))
+        self.assertGreaterEqual(row["direct"], 1)
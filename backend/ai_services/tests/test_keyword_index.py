@@ -0,0 +1,33 @@
+"""keyword_index  -  so'z chegarasi, bir nechta protokolga tegishli kalit so'zlar va reyting."""
+from django.test import SimpleTestCase
+
+from ai_services import uzbekistan_knowledge_base as kb
+from ai_services.keyword_index import KeywordIndex
+
+
+class KeywordIndexTests(SimpleTestCase):
+    def test_word_boundaries(self):
+        index = KeywordIndex([("acs", ["MI", "yurak xuruj"]), ("dm", ["diabet"])])
+        self.assertEqual(index.rank("Kamida 3 kun, miya chayqalishi"), [])
+        self.assertEqual(index.rank("MI gumon, yurak   xuruji"), ["acs"])
+        self.assertEqual(index.rank("Diabetim bor, qandli diabet"), ["dm"])
+        self.assertEqual(index.rank("prediabet"), [])
+
+    def test_shared_keyword_and_ranking(self):
+        index = KeywordIndex([
+            ("a", ["nafas", "yo'tal"]),
+            ("b", ["nafas qisilishi", "nafas"]),
+            ("c", ["isitma"]),
+        ])
+        self.assertEqual(index.keywords[0].owners, ("a", "b"))
+        self.assertEqual(index.rank("Nafas qisilishi, yo‘tal va isitma"), ["b", "a", "c"])
+        self.assertEqual(index.rank("Nafas qisilishi, yo‘tal va isitma", top_k=1), ["b"])
+        self.assertEqual(index.rank("nafas"), ["a", "b"])
+
+    def test_knowledge_base_protocols(self):
+        found = [p["id"] for p in kb.find_protocols("Qandli diabet, gipertoniyasi bor, qon bosimi 170/100")]
+        self.assertEqual(found, ["uz-ssv-htn-2022", "uz-ssv-dm2-2023"])
+        self.assertEqual(kb.find_protocols("Kamida 2 kundan beri bosh og'rig'i"), [])
+        self.assertEqual(kb.get_uz_protocols(""), "")
+        self.assertEqual([p["id"] for p in kb.find_surgery_protocols("Narkoz va preoperativ tayyorlash", top_k=1)],
+                         ["uz-ssv-surgery-prep-2022"])
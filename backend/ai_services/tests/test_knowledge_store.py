@@ -0,0 +1,61 @@
+"""knowledge_store  -  JSON lines bilimlar bazasi, __slots__ yozuvlar va hot reload."""
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from django.test import SimpleTestCase, override_settings
+
+from ai_services import knowledge_store, uzbekistan_knowledge_base as kb
+
+
+class KnowledgeStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "kb.jsonl"
+        knowledge_store.dump(self.path, kb.current(), version="test-1")
+
+    def tearDown(self):
+        kb.reload(kb._DEFAULT_PATH)
+        self.tmp.cleanup()
+
+    def test_roundtrip_and_dict_access(self):
+        loaded = knowledge_store.load(self.path)
+        self.assertEqual(loaded.version, "test-1")
+        self.assertEqual([d.to_dict() for d in loaded.drugs], [d.to_dict() for d in kb.current().drugs])
+        drug = loaded.drug_by_generic["azitromitsin"]
+        self.assertEqual((drug["trade"], drug["class"], drug.get("missing", "-")), ("Sumamed", "Antibiotik/Makrolid", "-"))
+        self.assertFalse(hasattr(drug, "__dict__"))
+        self.assertIs(loaded.drug_by_class["NSAID"][0].drug_class, kb.current().drug_by_class["NSAID"][0].drug_class)
+        with self.assertRaises(KeyError):
+            drug["missing"]
+
+    def test_bad_line_reports_position(self):
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write('{"kind": "drug", "trade": "X"}\n')
+        with self.assertRaisesRegex(knowledge_store.KnowledgeBaseError, r"kb\.jsonl:\d+:"):
+            knowledge_store.load(self.path)
+
+    def test_hot_reload_on_mtime_change(self):
+        with override_settings(AI_UZ_KB_PATH=str(self.path), AI_UZ_KB_RELOAD_INTERVAL=30):
+            kb.reload()
+            before = kb.get_uz_context("gipertoniya")
+            lines = self.path.read_text(encoding="utf-8").splitlines()
+            rows = [json.loads(line) for line in lines]
+            for row in rows:
+                if row.get("id") == "uz-ssv-htn-2022":
+                    row["name"] = "Gipertoniya (yangi)"
+            self.path.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in rows), encoding="utf-8")
+            os.utime(self.path, (1, 1))
+
+            kb._next_check = 0.0
+            after = kb.get_uz_context("gipertoniya")
+            self.assertNotEqual(before, after)
+            self.assertIn("Gipertoniya (yangi)", after)
+
+            self.path.write_text("{broken\n", encoding="utf-8")
+            os.utime(self.path, (2, 2))
+            kb._next_check = 0.0
+            with self.assertLogs("ai_services.uzbekistan_knowledge_base", "WARNING"):
+                self.assertEqual(kb.get_uz_context("gipertoniya"), after)
+            self.assertGreaterEqual(kb.stats()["reload_errors"], 1)
@@ -0,0 +1,75 @@
+"""llm_governor  -  token bucket to'lishi, model bo'yicha ustuvorlik va throttling()."""
+import asyncio
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from ai_services import llm_governor
+from ai_services.llm_governor import HIGH, LOW, NORMAL
+
+_LIMITS = {"pro": {"rpm": 60, "tpm": 6000}, "flash": {"rpm": 60, "tpm": 6000}}
+
+
+@override_settings(REDIS_URL="", AI_RATE_LIMIT_ENABLED=True, AI_RATE_LIMITS=_LIMITS,
+                   AI_RATE_RESERVE_NORMAL=0.0, AI_RATE_RESERVE_LOW=0.5, AI_RATE_MAX_WAIT=0.05)
+class GovernorTests(SimpleTestCase):
+    def setUp(self):
+        llm_governor._local.clear()
+        llm_governor._waiting.clear()
+        llm_governor._last_429.clear()
+
+    def test_bucket_refills_over_time(self):
+        bucket = llm_governor._LocalBucket(rpm=60, tpm=6000)
+        for _ in range(60):
+            self.assertEqual(bucket.take(10, 0.0), 0)
+        self.assertAlmostEqual(bucket.take(10, 0.0), 1.0, places=1)     # 1 so'rov / soniya
+        bucket.ts -= 2.0                                                  # 2 s o'tdi
+        self.assertEqual(bucket.take(10, 0.0), 0)
+        self.assertGreater(bucket.take(6000, 0.0), 0)                    # TPM ham cheklaydi
+
+    def test_reserve_keeps_capacity_for_higher_priority(self):
+        bucket = llm_governor._local_bucket("pro")
+        bucket.r = 20
+        with llm_governor.priority(LOW), self.assertRaises(llm_governor.RateLimited):
+            llm_governor.acquire("pro", 10)                              # 30 + 1 kerak
+        llm_governor.acquire("pro", 10)                                  # NORMAL: zaxirasiz
+        self.assertEqual(llm_governor.stats()["models"]["pro"]["low"]["timeouts"], 1)
+
+    def test_high_waiter_preempts_only_its_model(self):
+        llm_governor._set_waiting("pro", HIGH, 1)
+        self.assertEqual(llm_governor._next_delay("pro", 10, NORMAL), llm_governor._POLL_SEC)
+        self.assertEqual(llm_governor._next_delay("flash", 10, NORMAL), 0)
+        self.assertEqual(llm_governor._next_delay("pro", 10, HIGH), 0)
+
+        llm_governor.acquire("flash", 10)
+        with self.assertRaises(llm_governor.RateLimited):
+            llm_governor.acquire("pro", 10)
+        llm_governor._set_waiting("pro", HIGH, -1)
+        llm_governor.acquire("pro", 10)
+        self.assertEqual(llm_governor.stats()["waiting"], {})
+
+    def test_immediate_take_is_not_counted_as_waiting(self):
+        with mock.patch.object(llm_governor, "_set_waiting") as waiting:
+            llm_governor.acquire("pro", 10)
+            asyncio.run(llm_governor.aacquire("pro", 10))
+        waiting.assert_not_called()
+
+        llm_governor._local_bucket("pro").drain()
+        with llm_governor.priority(HIGH), self.assertLogs("ai_services.llm_governor", "WARNING"):
+            llm_governor.acquire("pro", 10)                              # HIGH muddat tugasa ham o'tadi
+        self.assertEqual(llm_governor._waiting, {})
+
+    def test_throttling_is_per_model(self):
+        self.assertFalse(llm_governor.throttling("pro"))
+        llm_governor._set_waiting("pro", LOW, 1)
+        self.assertTrue(llm_governor.throttling("pro"))
+        self.assertFalse(llm_governor.throttling("flash"))
+        llm_governor._set_waiting("pro", LOW, -1)
+
+        llm_governor.note_provider_429("flash")
+        self.assertTrue(llm_governor.throttling("flash"))
+        self.assertFalse(llm_governor.throttling("pro"))
+        self.assertGreater(llm_governor._local_bucket("flash").take(10, 0.0), 0)     # bucket bo'shatildi
+        with mock.patch.object(llm_governor.time, "monotonic",
+                               return_value=llm_governor._last_429["flash"] + llm_governor._THROTTLE_WINDOW_SEC):
+            self.assertFalse(llm_governor.throttling("flash"))
@@ -0,0 +1,108 @@
+"""llm_policy  -  fallback, backoff, muddat, ixtiyoriy hedge va cheklangan urinishlar pooli."""
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from ai_services import llm_governor, llm_policy
+
+_ATTEMPTS = (("pro", True), ("pro", False), ("flash", True))
+
+
+def _policy(**kw):
+    kw.setdefault("attempts", _ATTEMPTS)
+    kw.setdefault("backoff_base", 0.0)
+    return llm_policy.RetryPolicy(name="test-" + kw.pop("tag", "x"), **kw)
+
+
+def _parse(raw):
+    if raw == "bad":
+        raise llm_policy.InvalidResponse("json emas")
+    return raw
+
+
+class RetryPolicyTests(SimpleTestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)     # osilib qolgan urinishlar testdan keyin tugasin
+        llm_governor._last_429.clear()
+
+    def test_falls_back_in_order_with_backoff(self):
+        calls = []
+
+        def call(model, json_mode):
+            calls.append((model, json_mode))
+            return {"pro": "bad", "flash": "ok"}[model]
+
+        with mock.patch.object(llm_policy.time, "sleep") as sleep:
+            outcome = llm_policy.run(_policy(backoff_base=0.5), call, _parse)
+        self.assertEqual(outcome.value, "ok")
+        self.assertEqual(calls, list(_ATTEMPTS))
+        self.assertEqual([r.ok for r in outcome.attempts], [False, False, True])
+        self.assertEqual(sleep.call_count, 2)
+        self.assertTrue(all(0 <= c.args[0] <= 1.0 for c in sleep.call_args_list))
+
+    def test_last_error_when_all_attempts_fail(self):
+        with self.assertRaisesMessage(llm_policy.InvalidResponse, "json emas"):
+            llm_policy.run(_policy(), lambda m, j: "bad", _parse)
+
+    def test_deadline_raises_timeout(self):
+        def call(model, json_mode):
+            self.release.wait(5)
+            return "kech"
+
+        with self.assertRaises(TimeoutError):
+            llm_policy.run(_policy(tag="deadline", deadline_sec=0.05), call, _parse)
+        self.assertEqual(llm_policy.stats()["test-deadline"]["deadline_exceeded"], 1)
+
+    def _slow_first(self, calls):
+        def call(model, json_mode):
+            calls.append(model)
+            if len(calls) == 1:
+                self.release.wait(5)
+            return model
+        return call
+
+    def test_hedge_is_opt_in(self):
+        calls = []
+        policy = _policy(hedge=True, hedge_after_sec=0.02, deadline_sec=0.2)
+        with self.assertRaises(TimeoutError):
+            llm_policy.run(policy, self._slow_first(calls), _parse)
+        self.assertEqual(calls, ["pro"])
+
+        calls = []
+        with override_settings(AI_RETRY_HEDGE_ENABLED=True):
+            outcome = llm_policy.run(policy, self._slow_first(calls), _parse)
+        self.assertEqual(outcome.value, "pro")
+        self.assertTrue(outcome.attempts[0].hedged)
+
+    @override_settings(AI_RETRY_HEDGE_ENABLED=True)
+    def test_no_hedge_while_governor_throttles(self):
+        calls = []
+        llm_governor._last_429["pro"] = llm_policy.time.monotonic()
+        policy = _policy(tag="throttled", hedge=True, hedge_after_sec=0.02, deadline_sec=0.2)
+        with self.assertRaises(TimeoutError):
+            llm_policy.run(policy, self._slow_first(calls), _parse)
+        self.assertEqual(calls, ["pro"])
+        self.assertGreaterEqual(llm_policy.stats()["test-throttled"]["hedge_skipped"], 1)
+
+    def test_abandoned_attempts_bounded_by_pool(self):
+        calls = []
+
+        def stuck(model, json_mode):
+            calls.append(model)
+            self.release.wait(5)
+            return model
+
+        with mock.patch.multiple(llm_policy, _pool=None, _slots=None), \
+                override_settings(AI_RETRY_POOL_WORKERS=1):
+            with self.assertRaises(TimeoutError):
+                llm_policy.run(_policy(deadline_sec=0.05), stuck, _parse)
+            # Tashlab ketilgan urinish yagona threadni band qilib turibdi  -  navbatga tushmaymiz
+            with self.assertRaises(TimeoutError):
+                llm_policy.run(_policy(tag="saturated", deadline_sec=0.05), stuck, _parse)
+            self.assertEqual(calls, ["pro"])
+            self.assertEqual(llm_policy.stats()["test-saturated"]["pool_saturated"], 1)
+
+            self.release.set()
+            self.assertEqual(llm_policy.run(_policy(), lambda m, j: "ok", _parse).value, "ok")
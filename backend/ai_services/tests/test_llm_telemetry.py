@@ -0,0 +1,64 @@
+"""llm_telemetry  -  latency histogrammasi, tokenlar, narx va /health/metrics."""
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase, override_settings
+
+from ai_services import llm_policy, llm_telemetry
+
+
+def _response(prompt=1000, output=200, thoughts=50, cached=400):
+    return SimpleNamespace(usage_metadata=SimpleNamespace(
+        prompt_token_count=prompt, candidates_token_count=output,
+        thoughts_token_count=thoughts, cached_content_token_count=cached))
+
+
+@override_settings(AI_MODEL_PRICES={"m": {"input": 1.0, "cached": 0.25, "output": 4.0}})
+class LLMTelemetryTests(SimpleTestCase):
+    def setUp(self):
+        llm_telemetry.reset()
+
+    def test_usage_and_cost(self):
+        self.assertEqual(llm_telemetry.usage_from(_response()), (1000, 250, 400))
+        self.assertEqual(llm_telemetry.usage_from(SimpleNamespace(
+            usage=SimpleNamespace(prompt_tokens=7, completion_tokens=3))), (7, 3, 0))
+        # 600 * 1.0 + 400 * 0.25 + 250 * 4.0 = 1700 -> 0.0017 USD
+        self.assertAlmostEqual(llm_telemetry.cost_usd("m", 1000, 250, 400), 0.0017)
+        self.assertEqual(llm_telemetry.cost_usd("noma'lum", 1000, 250), 0.0)
+
+    def test_render_histogram_and_counters(self):
+        with self.assertLogs("ai_services.llm_telemetry", "INFO") as logs:
+            llm_telemetry.record("m", "doctor_diagnosis", llm_telemetry.OUTCOME_OK, 300, _response())
+            llm_telemetry.record("m", "doctor_diagnosis", llm_telemetry.OUTCOME_OK, 3000, _response())
+            llm_telemetry.record("m", "doctor_diagnosis", llm_telemetry.OUTCOME_CACHE_HIT, 0)
+            llm_telemetry.record("m", None, llm_telemetry.OUTCOME_ERROR, 50, error=TimeoutError())
+        self.assertIn("caller=doctor_diagnosis", logs.output[0])
+        self.assertIn("error=TimeoutError", logs.output[-1])
+
+        text = llm_telemetry.render()
+        ok = 'model="m",caller="doctor_diagnosis",outcome="ok"'
+        self.assertIn(f'ai_llm_calls_total{{{ok}}} 2', text)
+        self.assertIn(f'ai_llm_call_duration_seconds_bucket{{{ok},le="0.5"}} 1', text)
+        self.assertIn(f'ai_llm_call_duration_seconds_bucket{{{ok},le="5"}} 2', text)
+        self.assertIn(f'ai_llm_call_duration_seconds_bucket{{{ok},le="+Inf"}} 2', text)
+        self.assertIn('ai_llm_tokens_total{model="m",caller="doctor_diagnosis",kind="output"} 500', text)
+        self.assertIn('ai_llm_cost_usd_total{model="m",caller="doctor_diagnosis"} 0.003400', text)
+        self.assertIn('caller="default",outcome="error"', text)
+
+        row = llm_telemetry.stats()["doctor_diagnosis/m/ok"]
+        self.assertEqual((row["calls"], row["p50_ms"], row["p95_ms"]), (2, 500, 5000))
+
+    def test_retry_attempts_counted(self):
+        token = llm_policy._attempt.set(llm_policy.AttemptContext("consilium", 1))
+        try:
+            llm_telemetry.record("m", None, llm_telemetry.OUTCOME_OK, 100, _response())
+        finally:
+            llm_policy._attempt.reset(token)
+        self.assertEqual(llm_telemetry.stats()["retries"], {"consilium": 1})
+        self.assertIn('ai_llm_retries_total{caller="consilium"} 1', llm_telemetry.render())
+
+    def test_metrics_endpoint(self):
+        llm_telemetry.record("m", "ziyrak_chat", llm_telemetry.OUTCOME_OK, 1200, _response())
+        response = self.client.get("/health/metrics/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        self.assertIn(b'caller="ziyrak_chat"', response.content)
@@ -0,0 +1,89 @@
+"""prompt_prefix  -  statik prefikslar, Gemini cached content va inline fallback."""
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from ai_services import gemini_utils, prompt_prefix
+from ai_services.azure_utils import _split_prefix, _wire, build_messages
+
+
+class _FakeClient:
+    def __init__(self, fail_create=False, fail_cached=False):
+        self.fail_create, self.fail_cached = fail_create, fail_cached
+        self.created, self.requests = 0, []
+        self.caches = SimpleNamespace(create=self._create)
+        self.models = SimpleNamespace(generate_content=self._generate)
+
+    def _create(self, model, config):
+        if self.fail_create:
+            raise RuntimeError("400 Cached content is too small")
+        self.created += 1
+        return SimpleNamespace(name=f"cachedContents/{self.created}")
+
+    def _generate(self, model, contents, config):
+        self.requests.append(config)
+        if self.fail_cached and "cached_content" in config:
+            raise RuntimeError("404 CachedContent not found")
+        return SimpleNamespace(text="javob", usage_metadata=SimpleNamespace(
+            total_token_count=10, cached_content_token_count=4))
+
+
+@override_settings(AI_CONTEXT_CACHE_MIN_TOKENS=1, AI_RESPONSE_CACHE_ENABLED=False)
+class PromptPrefixTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        prompt_prefix._entries.clear()
+        prompt_prefix._blocked.clear()
+
+    def test_messages_keep_prefix_first(self):
+        prefix = prompt_prefix.register("test:messages", "STATIK")
+        messages = build_messages("dinamik", "savol", prefix=prefix)
+        self.assertEqual([m["content"] for m in messages], ["STATIK", "dinamik", "savol"])
+        found, rest = _split_prefix(messages)
+        self.assertIs(found, prefix)
+        self.assertEqual(len(rest), 2)
+        self.assertNotIn("prefix", _wire(messages)[0])
+        self.assertEqual(len(build_messages("", "savol", prefix=prefix)), 2)
+
+    def test_cached_content_created_once(self):
+        prefix = prompt_prefix.register("test:once", "Katta statik kontekst")
+        client = _FakeClient()
+        names = {prompt_prefix.cached_content(client, "m", prefix) for _ in range(3)}
+        self.assertEqual(names, {"cachedContents/1"})
+        self.assertEqual(client.created, 1)
+
+    @override_settings(AI_CONTEXT_CACHE_MIN_TOKENS=10_000)
+    def test_small_prefix_inline(self):
+        prefix = prompt_prefix.register("test:small", "kichik")
+        client = _FakeClient()
+        self.assertIsNone(prompt_prefix.cached_content(client, "m", prefix))
+        self.assertEqual(client.created, 0)
+
+    def test_create_failure_is_backed_off(self):
+        prefix = prompt_prefix.register("test:fail", "Rad etiladigan kontekst")
+        client = _FakeClient(fail_create=True)
+        with self.assertLogs("ai_services.prompt_prefix", "WARNING"):
+            self.assertIsNone(prompt_prefix.cached_content(client, "m", prefix))
+        self.assertIsNone(prompt_prefix.cached_content(client, "m", prefix))
+        self.assertFalse(prompt_prefix.needs_create("m", prefix))
+
+    def test_call_uses_cached_content_and_falls_back_inline(self):
+        prefix = prompt_prefix.register("test:call", "Gemini statik kontekst")
+        client = _FakeClient()
+        with mock.patch.object(gemini_utils, "_get_client", return_value=client):
+            self.assertEqual(gemini_utils._call_gemini("savol", "m", prefix=prefix, use_cache=False), "javob")
+            self.assertEqual(client.requests[-1]["cached_content"], "cachedContents/1")
+            self.assertNotIn("system_instruction", client.requests[-1])
+
+            client.fail_cached = True
+            with self.assertLogs("ai_services.gemini_utils", "WARNING"):
+                gemini_utils._call_gemini("savol 2", "m", prefix=prefix, use_cache=False)
+            self.assertEqual(client.requests[-1]["system_instruction"], prefix.text)
+            self.assertTrue(prompt_prefix.needs_create("m", prefix))
+
+    def test_cache_key_uses_digest(self):
+        prefix = prompt_prefix.register("test:key", "A" * 5000)
+        keyed = gemini_utils._keyed_config({"temperature": 0.1}, prefix)
+        self.assertEqual(keyed["system_instruction"], prefix.digest)
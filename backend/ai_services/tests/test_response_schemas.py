@@ -0,0 +1,72 @@
+"""response_schemas  -  structured output sxemalari: keltirish, rad etish, Gemini formati."""
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase
+from google.genai import types
+
+from ai_services import doctor_support, gemini_utils, llm_cache, multi_agent_system, response_schemas  # noqa: F401  (registratsiya)
+from ai_services.azure_utils import Deployments, build_messages, call_model
+from ai_services.multi_agent_system import P1_SCHEMA, P3_SCHEMA
+from ai_services.response_schemas import SchemaError, array, integer, obj, string
+
+
+class ResponseSchemaTests(SimpleTestCase):
+    def test_registered_schemas_are_valid_gemini_schemas(self):
+        registered = response_schemas.registered()
+        self.assertIn("consilium_phase3", registered)
+        for name, entry in registered.items():
+            with self.subTest(name):
+                types.Schema.model_validate(entry.schema)
+                self.assertTrue(entry.hint)
+
+    def test_coercion(self):
+        data = P1_SCHEMA.parse(
+            '```json\n{"primary_diagnosis": "Gipertoniya", "probability": "85%",'
+            ' "red_flags": "Kuchli bosh ogriq", "extra": 1}\n```'
+        )
+        self.assertEqual(data["probability"], 85)
+        self.assertEqual(data["red_flags"], ["Kuchli bosh ogriq"])
+        self.assertEqual(data["extra"], 1)
+        self.assertEqual(P1_SCHEMA.parse('{"primary_diagnosis": "X", "probability": 140}')["probability"], 100)
+
+    def test_invalid_optional_field_dropped(self):
+        schema = response_schemas.register("test_optional", obj({
+            "name": string(),
+            "level": string(enum=("HIGH", "LOW")),
+            "items": array(integer(), max_items=2),
+        }, required=("name",)))
+        data = schema.validate({"name": "a", "level": "o'rta", "items": [1, "x", 3, 4]})
+        self.assertNotIn("level", data)
+        self.assertEqual(data["items"], [1, 3])
+        self.assertEqual(schema.validate({"name": "a", "level": "high"})["level"], "HIGH")
+
+    def test_rejection(self):
+        for raw in ("", "Javob bera olmayman", '{"probability": 70}',
+                    '{"primary_diagnosis": "X", "probability": "baland"}'):
+            with self.subTest(raw), self.assertRaises(SchemaError):
+                P1_SCHEMA.parse(raw)
+        with self.assertRaises(SchemaError):
+            P3_SCHEMA.parse('{"consensus_diagnosis": {"probability": 90}}')
+
+    def test_invalid_reply_not_cached(self):
+        llm_cache.clear()
+        messages = build_messages("Tizim", "Bemor: sinov (kesh)", want_json=True)
+        replies = ['{"probability": 70}', '{"primary_diagnosis": "Gripp", "probability": 70}']
+
+        def generate(*args):
+            return SimpleNamespace(text=replies.pop(0), usage_metadata=None)
+
+        with mock.patch.object(gemini_utils, "_get_client", return_value=object()), \
+                mock.patch.object(gemini_utils, "_generate", side_effect=generate) as api:
+            for _ in range(3):
+                raw = call_model(Deployments.mini(), messages, schema=P1_SCHEMA, endpoint="schema_cache_test")
+        # Birinchi javob sxemadan o'tmadi  -  keshlanmadi; ikkinchisi keshdan qaytdi
+        self.assertEqual(api.call_count, 2)
+        self.assertEqual(P1_SCHEMA.parse(raw)["primary_diagnosis"], "Gripp")
+        self.assertEqual(llm_cache.stats()["endpoints"]["schema_cache_test"]["rejected"], 1)
+
+    def test_hint_is_compact(self):
+        self.assertIn('"primary_diagnosis"*: str', P1_SCHEMA.hint)
+        self.assertIn('"probability"*: 0-100', P1_SCHEMA.hint)
+        self.assertIn("consilium_phase1", response_schemas.stats())
@@ -0,0 +1,95 @@
+"""run_store  -  konsilium checkpoint'lari: begona sessiya, o'qib bo'lmaydigan blob va resume."""
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from ai_services import multi_agent_system as mas, run_store
+from ai_services.models import ConsiliumRun
+
+_PATIENT = {"complaints": "Ko'krak qafasida og'riq, hansirash", "age": 58}
+_LANG = "uz-L"
+_SESSION = "resume-test-0001"
+
+
+class RunStoreTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(phone="+998901234567", password="x")
+        self.ptext = mas.patient_text(_PATIENT)
+
+    def _save(self, stage, phases, **extra):
+        result = {"session_id": _SESSION, "language": _LANG, "professors": [], "phases": phases, **extra}
+        run_store.save(_SESSION, stage, ptext=self.ptext, language=_LANG, owner=self.user.pk, result=result)
+
+    def test_conflict_and_unreadable_blob(self):
+        self.assertIsNone(run_store.load(_SESSION, self.user.pk, self.ptext, _LANG))
+        self._save(ConsiliumRun.STAGE_PHASE1, {"phase1_independent": [{"agent_id": "a"}]})
+        cp = run_store.load(_SESSION, self.user.pk, self.ptext, _LANG)
+        self.assertEqual((cp.stage, cp.p1), (ConsiliumRun.STAGE_PHASE1, [{"agent_id": "a"}]))
+
+        other = get_user_model().objects.create_user(phone="+998901234568", password="x")
+        with self.assertRaises(run_store.RunConflict):
+            run_store.load(_SESSION, other.pk, self.ptext, _LANG)
+        with self.assertRaises(run_store.RunConflict):
+            run_store.load(_SESSION, self.user.pk, self.ptext + " boshqa bemor", _LANG)
+
+        ConsiliumRun.objects.filter(session_id=_SESSION).update(blob=b"buzilgan")
+        with self.assertLogs("ai_services.run_store", "WARNING"):
+            self.assertIsNone(run_store.load(_SESSION, self.user.pk, self.ptext, _LANG))
+
+    def test_resume_from_phase2_runs_only_phase3(self):
+        p1 = [{"agent_id": a.id, "primary_diagnosis": "Stenokardiya"} for a in mas.AGENTS]
+        p2 = [{"agent_id": a.id, "refutations": []} for a in mas.AGENTS]
+        weights = {a.id: 1.0 for a in mas.AGENTS}
+        self._save(ConsiliumRun.STAGE_PHASE2, {
+            "phase1_independent": p1, "phase2_debate": p2, "refutation_weights": weights,
+        })
+        consensus = {"consensus_diagnosis": {"name": "Stenokardiya"}, "medications": []}
+
+        with mock.patch.object(mas, "run_phase3", return_value=consensus) as phase3, \
+                mock.patch.object(mas, "_phase2_single") as phase2:
+            events = list(mas.iter_consilium(_PATIENT, _LANG, session_id=_SESSION, owner=self.user.pk))
+        phase2.assert_not_called()
+        phase3.assert_called_once_with(self.ptext, p1, p2, weights)
+        names = [name for name, _ in events]
+        self.assertEqual(events[0][1]["resumed_from"], ConsiliumRun.STAGE_PHASE2)
+        self.assertEqual(names.count("phase1_agent"), len(mas.AGENTS))
+        self.assertEqual(names.count("phase2_agent"), len(mas.AGENTS))
+        self.assertEqual(names[-2:], ["phase3_started", "result"])
+        self.assertEqual(ConsiliumRun.objects.get(session_id=_SESSION).stage, ConsiliumRun.STAGE_COMPLETED)
+
+        # Yakunlangan sessiya  -  saqlangan natija, model chaqirilmaydi
+        with mock.patch.object(mas, "run_phase3") as phase3:
+            again = list(mas.iter_consilium(_PATIENT, _LANG, session_id=_SESSION, owner=self.user.pk))
+        phase3.assert_not_called()
+        self.assertEqual([name for name, _ in again], ["start", "result"])
+        self.assertEqual(again[-1][1]["final_report"], events[-1][1]["final_report"])
+
+    def test_resume_from_phase1_runs_phase2_through_graph(self):
+        p1 = [{"agent_id": a.id, "primary_diagnosis": f"Tashxis {i}"} for i, a in enumerate(mas.AGENTS)]
+        self._save(ConsiliumRun.STAGE_PHASE1, {"phase1_independent": p1, "path": "full_debate"})
+        consensus = {"consensus_diagnosis": {"name": "Stenokardiya"}, "medications": []}
+
+        def phase2(agent, ptext, own, others):
+            return {"agent_id": agent.id, "own": own["agent_id"],
+                    "others": sorted(r["agent_id"] for r in others), "refutations": []}
+
+        with mock.patch.object(mas, "_phase1_single") as phase1, \
+                mock.patch.object(mas, "_phase2_single", side_effect=phase2), \
+                mock.patch.object(mas, "run_phase3", return_value=consensus), \
+                mock.patch.object(mas.stage_graph, "start", wraps=mas.stage_graph.start) as start:
+            events = list(mas.iter_consilium(_PATIENT, _LANG, session_id=_SESSION, owner=self.user.pk))
+        phase1.assert_not_called()
+        stages = start.call_args.args[0]
+        self.assertEqual(sorted(s.name for s in stages), sorted(f"phase2_{a.id}" for a in mas.AGENTS))
+        self.assertEqual(start.call_args.kwargs["graph"], "consilium")
+
+        p2 = [data for name, data in events if name == "phase2_agent"]
+        self.assertEqual(len(p2), len(mas.AGENTS))
+        ids = sorted(a.id for a in mas.AGENTS)
+        for res in p2:   # checkpoint'dagi Phase 1 fikrlari to'liq ko'rinadi
+            self.assertEqual(res["own"], res["agent_id"])
+            self.assertEqual(res["others"], [i for i in ids if i != res["agent_id"]])
+        final = events[-1][1]
+        self.assertTrue(final["phases"]["timings"]["resumed"])
+        self.assertEqual(ConsiliumRun.objects.get(session_id=_SESSION).stage, ConsiliumRun.STAGE_COMPLETED)
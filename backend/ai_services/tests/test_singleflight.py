@@ -0,0 +1,114 @@
+"""singleflight  -  bir xil parallel LLM chaqiruvlarini birlashtirish."""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import SimpleTestCase, override_settings
+
+from ai_services import singleflight
+
+
+@override_settings(AI_SINGLEFLIGHT_DISTRIBUTED=False)
+class SingleFlightTests(SimpleTestCase):
+    def _leader(self, fn, release):
+        """Leader fn() ichida to'xtab turadi; followerlar shu paytda keladi."""
+        entered = threading.Event()
+
+        def blocked():
+            entered.set()
+            release.wait(5)
+            return fn()
+
+        pool = ThreadPoolExecutor(max_workers=4)
+        self.addCleanup(pool.shutdown)
+        leader = pool.submit(singleflight.do, "k", blocked)
+        entered.wait(5)
+        return pool, leader
+
+    def test_followers_share_leader_result(self):
+        calls, release = [], threading.Event()
+        pool, leader = self._leader(lambda: calls.append(1) or "javob", release)
+        followers = [pool.submit(singleflight.do, "k", lambda: "o'zi") for _ in range(3)]
+        while singleflight.stats()["coalesced"] < 3:
+            time.sleep(0.01)
+        release.set()
+        self.assertEqual([f.result(5) for f in (leader, *followers)], ["javob"] * 4)
+        self.assertEqual(calls, [1])
+        self.assertEqual(singleflight.stats()["inflight"], 0)
+
+    def test_leader_error_reaches_followers(self):
+        release = threading.Event()
+
+        def boom():
+            raise RuntimeError("429")
+
+        pool, leader = self._leader(boom, release)
+        before = singleflight.stats()["coalesced"]
+        follower = pool.submit(singleflight.do, "k", lambda: "o'zi")
+        while singleflight.stats()["coalesced"] == before:
+            time.sleep(0.01)
+        release.set()
+        for fut in (leader, follower):
+            with self.assertRaisesMessage(RuntimeError, "429"):
+                fut.result(5)
+
+    @override_settings(AI_SINGLEFLIGHT_WAIT=0.05)
+    def test_follower_wait_timeout_calls_directly(self):
+        release = threading.Event()
+        pool, leader = self._leader(lambda: "leader", release)
+        before = singleflight.stats()["wait_timeouts"]
+        with self.assertLogs("ai_services.singleflight", "WARNING"):
+            self.assertEqual(singleflight.do("k", lambda: "o'zi"), "o'zi")
+        self.assertEqual(singleflight.stats()["wait_timeouts"], before + 1)
+        release.set()
+        self.assertEqual(leader.result(5), "leader")
+
+    @override_settings(AI_SINGLEFLIGHT_ENABLED=False)
+    def test_disabled_calls_every_time(self):
+        calls = []
+        for _ in range(2):
+            singleflight.do("k", lambda: calls.append(1) or "x")
+        self.assertEqual(len(calls), 2)
+
+
+class AsyncSingleFlightTests(SimpleTestCase):
+    def test_followers_share_leader_result(self):
+        calls = []
+
+        async def fn():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "javob"
+
+        async def main():
+            return await asyncio.gather(*(singleflight.ado("k", fn) for _ in range(5)))
+
+        self.assertEqual(asyncio.run(main()), ["javob"] * 5)
+        self.assertEqual(len(calls), 1)
+
+    def test_leader_cancel_does_not_cancel_followers(self):
+        started = []
+
+        async def slow():
+            started.append("leader")
+            await asyncio.sleep(10)
+            return "leader"
+
+        async def own():
+            started.append("follower")
+            return "follower"
+
+        async def main():
+            leader = asyncio.create_task(singleflight.ado("k", slow))
+            await asyncio.sleep(0)
+            follower = asyncio.create_task(singleflight.ado("k", own))
+            await asyncio.sleep(0)
+            leader.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+            return await follower
+
+        self.assertEqual(asyncio.run(main()), "follower")
+        self.assertEqual(started, ["leader", "follower"])
+        self.assertEqual(singleflight.stats()["inflight"], 0)
@@ -0,0 +1,86 @@
+"""stage_graph  -  bog'liqliklar, ready() predikati, fallback va muddatlar."""
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ai_services import agent_pool, stage_graph
+from ai_services.stage_graph import Stage
+
+
+class StageGraphTests(SimpleTestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+        patcher = mock.patch.object(agent_pool, "pool", agent_pool.FairExecutor(4, 32, name="test-graph"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _hang(self, **_):
+        self.release.wait(5)
+        return "kech"
+
+    def test_deps_passed_as_kwargs(self):
+        results, summary = stage_graph.run([
+            Stage("triage", lambda: 2),
+            Stage("algorithm", lambda: 3),
+            Stage("risk", lambda triage, algorithm: triage * algorithm, deps=("triage", "algorithm")),
+        ], deadline=5, graph="test-deps")
+        self.assertEqual(results, {"triage": 2, "algorithm": 3, "risk": 6})
+        self.assertEqual({v["status"] for v in summary["stages"].values()}, {"ok"})
+
+    def test_error_and_stage_timeout_use_fallback(self):
+        def boom():
+            raise RuntimeError("503")
+
+        with self.assertLogs("ai_services.stage_graph", "WARNING"):
+            results, summary = stage_graph.run([
+                Stage("a", boom, fallback=lambda: "a-fb"),
+                Stage("b", self._hang, fallback=lambda: "b-fb", timeout=0.05),
+                Stage("c", lambda a, b: (a, b), deps=("a", "b")),
+            ], deadline=5, graph="test-fallback")
+        self.assertEqual(results["c"], ("a-fb", "b-fb"))
+        self.assertEqual(summary["stages"]["a"]["status"], "error")
+        self.assertEqual(summary["stages"]["b"]["status"], "timeout")
+
+    def test_deadline_times_out_running_and_skips_rest(self):
+        with self.assertLogs("ai_services.stage_graph", "WARNING"):
+            results, summary = stage_graph.run([
+                Stage("slow", self._hang, fallback=lambda: None),
+                Stage("after", lambda slow: "yo'q", deps=("slow",), fallback=lambda: "skip-fb"),
+            ], deadline=0.05, graph="test-deadline")
+        self.assertEqual(results, {"slow": None, "after": "skip-fb"})
+        self.assertEqual(summary["stages"]["slow"]["status"], "timeout")
+        self.assertEqual(summary["stages"]["after"]["status"], "skipped")
+
+    def test_error_without_fallback_propagates(self):
+        def boom():
+            raise RuntimeError("503")
+
+        with self.assertRaisesMessage(RuntimeError, "503"):
+            stage_graph.run([Stage("a", boom)], deadline=5, graph="test-raise")
+
+    def test_ready_predicate_quorum_and_drop(self):
+        graph_run = stage_graph.start([
+            Stage("p1", lambda: 1),
+            Stage("p2", lambda: 2),
+            # quorum: bittasi yetarli, faqat tayyor deps beriladi
+            Stage("debate", lambda **done: sorted(done), deps=("p1", "p2"),
+                  ready=lambda r: "p1" in r or "p2" in r),
+            Stage("early_exit", lambda: "yo'q", ready=lambda r: None if "p1" in r else False),
+            Stage("needs_exit", lambda early_exit: early_exit, deps=("early_exit",)),
+        ], deadline=5, graph="test-ready")
+        names = [name for name, _, _ in graph_run.events()]
+        self.assertNotIn("early_exit", names)
+        self.assertNotIn("needs_exit", names)
+        self.assertEqual(graph_run.timings["needs_exit"]["status"], "dropped")
+        self.assertIn(graph_run.results["debate"], (["p1"], ["p2"], ["p1", "p2"]))
+
+    def test_invalid_graphs(self):
+        with self.assertRaisesMessage(ValueError, "noma'lum"):
+            stage_graph.run([Stage("a", lambda x: x, deps=("x",))], deadline=1, graph="test-bad")
+        with self.assertRaisesMessage(ValueError, "aylana"):
+            stage_graph.run([
+                Stage("a", lambda b: b, deps=("b",)),
+                Stage("b", lambda a: a, deps=("a",)),
+            ], deadline=1, graph="test-cycle")
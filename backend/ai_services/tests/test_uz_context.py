@@ -0,0 +1,25 @@
+"""get_uz_context  -  protokol id lari kortegi bo'yicha LRU keshlangan kontekst bloklari."""
+from django.test import SimpleTestCase
+
+from ai_services import uzbekistan_knowledge_base as kb
+
+_TEXT = "Qandli diabet, gipertoniyasi bor, qon bosimi 170/100"
+
+
+class UzContextTests(SimpleTestCase):
+    def test_blocks_keep_format(self):
+        htn = kb.current().protocol_by_id["uz-ssv-htn-2022"]
+        context = kb.get_uz_context(_TEXT)
+        self.assertTrue(context.startswith(kb._BASE_CONTEXT + "\n\nTEGISHLI SSV PROTOKOLLAR (USHBU HOLAT UCHUN):\n"))
+        self.assertIn(f"\n- {htn.name} ({htn.ref})\n  ICD-10: I10, I11, I12, I13\n", context)
+        self.assertLess(context.index("Gipertoniya"), context.index("Diabet 2-tip"))
+        self.assertEqual(kb.get_uz_context(_TEXT, include_protocols=False), kb._BASE_CONTEXT)
+        self.assertEqual(kb.get_uz_context(""), kb._BASE_CONTEXT)
+        self.assertIn("Preoperativ", kb.get_surgery_context())
+
+    def test_same_protocol_set_reuses_block(self):
+        first = kb.get_uz_protocols(_TEXT)
+        before = kb.stats()["protocols"]["hits"]
+        second = kb.get_uz_protocols("gipertoniya, qon bosimi yuqori, diabet")
+        self.assertIs(first, second)
+        self.assertEqual(kb.stats()["protocols"]["hits"], before + 1)
@@ -6,6 +6,8 @@ from .views import (
     test_gemini,
     # New
     run_consilium_view,
+    consilium_stream_view,
+    consilium_stream_resume_view,
     doctor_support_view,
     doctor_support_stream_view,
     # Legacy
@@ -20,7 +22,13 @@ from .views import (
     stop_monitoring,
     record_treatment_outcome,
     get_improved_protocol,
+    # Background jobs
+    ai_jobs_view,
+    ai_job_detail_view,
+    ai_job_cancel_view,
+    ai_job_events_view,
 )
+from .async_views import consilium_async_view, doctor_support_async_view
 
 app_name = "ai_services"
 
@@ -29,10 +37,14 @@ urlpatterns = [
     # в”Ђв”Ђ Multi-Agent Consilium в”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђ
     path("consilium/",          run_consilium_view,         name="consilium"),
     path("council-debate/",     run_council_debate,         name="council_debate"),  # backwards-compat
+    path("consilium/async/",    consilium_async_view,       name="consilium_async"),  # ASGI
+    path("consilium/stream/",   consilium_stream_view,      name="consilium_stream"),  # SSE
+    path("consilium/stream/<str:run_id>/", consilium_stream_resume_view, name="consilium_stream_resume"),
 
     # в”Ђв”Ђ Doctor Support Mode в”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђ
     path("doctor-support/",     doctor_support_view,        name="doctor_support"),
     path("doctor-stream/",      doctor_support_stream_view, name="doctor_stream"),
+    path("doctor-support/async/", doctor_support_async_view, name="doctor_support_async"),  # ASGI
 
     # в”Ђв”Ђ Basic AI в”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђ
     path("clarifying-questions/",  generate_clarifying_questions, name="clarifying_questions"),
@@ -48,6 +60,12 @@ urlpatterns = [
     path("monitoring/record/",                record_vital_signs, name="record_vital_signs"),
     path("monitoring/stop/<str:session_id>/", stop_monitoring,    name="stop_monitoring"),
 
+    # в”Ђв”Ђ Background jobs в”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”
+    path("jobs/",                             ai_jobs_view,        name="ai_jobs"),
+    path("jobs/<uuid:job_id>/",               ai_job_detail_view,  name="ai_job_detail"),
+    path("jobs/<uuid:job_id>/cancel/",        ai_job_cancel_view,  name="ai_job_cancel"),
+    path("jobs/<uuid:job_id>/events/",        ai_job_events_view,  name="ai_job_events"),  # SSE
+
     # в”Ђв”Ђ Learning в”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђ
     path("learning/outcome/", record_treatment_outcome, name="record_treatment_outcome"),
     path("learning/improve/", get_improved_protocol,    name="get_improved_protocol"),
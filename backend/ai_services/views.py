@@ -7,15 +7,20 @@ AI Services Views  -  Azure AI Foundry
 """
 import json
 import logging
+import re
+import time
 
 from django.conf import settings
 from django.http import StreamingHttpResponse
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework.response import Response
 
-from . import gemini_utils
+from . import consilium_stream, gemini_utils, guard_context, jobs, run_store
+from .agent_pool             import PoolSaturated
+from .models                 import AIJob
 from .multi_agent_system     import run_consilium
 from .doctor_support         import (
     doctor_consult, doctor_consult_stream,
@@ -49,15 +54,44 @@ def _err(code: int, msg: str):
                     status=code)
 
 
+def _busy(exc: PoolSaturated):
+    """Agent pool to'la  -  429 + Retry-After (backpressure)."""
+    resp = _err(429, "AI konsilium navbati band. Birozdan so'ng qayta urinib ko'ring.")
+    resp["Retry-After"] = str(exc.retry_after)
+    return resp
+
+
+_SESSION_ID_RE = re.compile(r"^[\w\-]{8,64}$")
+
+
+def _session_id(request) -> tuple[str | None, Response | None]:
+    """Ixtiyoriy konsilium session_id (run_store resume). Noto'g'ri bo'lsa 400."""
+    value = request.data.get("session_id") or None
+    if value is not None and not _SESSION_ID_RE.match(str(value)):
+        return None, _err(400, "session_id noto'g'ri (8-64 ta harf, raqam, '_' yoki '-')")
+    return value, None
+
+
+def _conflict(exc: run_store.RunConflict):
+    return _err(409, str(exc))
+
+
+def _tenant(request):
+    """agent_pool fairness kaliti: klinika guruhi, bo'lmasa foydalanuvchi."""
+    user = request.user
+    return getattr(user, "clinic_group_id", None) or user.pk
+
+
 def _ai_not_configured():
     return _err(503, "AI xizmati sozlanmagan. Iltimos, GEMINI_API_KEY ni .env faylga kiriting.")
 
 
-def _run_filter(patient_data: dict) -> Response | None:
+def _run_filter(request, patient_data: dict) -> Response | None:
     """
     Run PhysiologyFilter. Returns error Response if blocked, else None.
+    Middleware parse qilgan so'rov konteksti (guard_context) bo'lsa natijalar qayta ishlatiladi.
     """
-    result = physiology_check(patient_data, use_ai=True)
+    result = physiology_check(patient_data, use_ai=True, context=guard_context.current(request))
     if not result.passed:
         return Response(
             {
@@ -83,33 +117,132 @@ def _run_filter(patient_data: dict) -> Response | None:
 def run_consilium_view(request):
     """
     POST /api/ai/consilium/
-    Body: { patient_data, language }
+    Body: { patient_data, language, session_id? }
 
     Phase 1: Independent Analysis (4 agents, parallel)
     Phase 2: Cross-Examination / Debate (4 agents, parallel)
     Phase 3: Consensus (GPT-4o Orchestrator)
+
+    session_id berilsa va shu sessiyaning checkpoint'i bo'lsa (run_store), konsilium
+    oxirgi tugagan fazadan davom etadi. Boshqa foydalanuvchi/bemor sessiyasi  -  409.
     """
     patient_data = _pd(request)
     language     = request.data.get("language", "uz-L")
+    session_id, bad = _session_id(request)
 
+    if bad:
+        return bad
     if not patient_data or not patient_data.get("complaints"):
         return _err(400, "Bemor shikoyatlari kiritilmagan")
     if not _gemini_ok():
         return _ai_not_configured()
 
     # Physiology / Logic Gate filter
-    blocked = _run_filter(patient_data)
+    blocked = _run_filter(request, patient_data)
     if blocked:
         return blocked
 
     try:
-        result = run_consilium(patient_data, language)
+        result = run_consilium(patient_data, language, tenant=_tenant(request),
+                               session_id=session_id, owner=request.user.pk)
         return Response({"success": True, "data": result})
+    except PoolSaturated as exc:
+        return _busy(exc)
+    except run_store.RunConflict as exc:
+        return _conflict(exc)
     except Exception as exc:
         logger.exception("Consilium error: %s", exc)
         return _err(500, f"Konsilium xatosi: {exc}")
 
 
+class _EventStreamRenderer(BaseRenderer):
+    """EventSource "Accept: text/event-stream" yuborsa DRF 406 qaytarmasin (xatolar JSON)."""
+    media_type = "text/event-stream"
+    format     = "event-stream"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+
+def _consilium_sse(run_id: str, after: int) -> StreamingHttpResponse:
+    def event_stream():
+        for ev in consilium_stream.events(run_id, after):
+            if ev is None:
+                yield ": keepalive\n\n"
+                continue
+            payload = {"run_id": run_id, "event": ev["event"], "data": ev["data"]}
+            yield f"id: {ev['id']}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    response = StreamingHttpResponse(event_stream(), content_type="text/event-stream")
+    response["Cache-Control"]     = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    response["X-Consilium-Run"]   = run_id
+    return response
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+@renderer_classes([JSONRenderer, _EventStreamRenderer])
+def consilium_stream_view(request):
+    """
+    POST /api/ai/consilium/stream/
+    Body: { patient_data, language, session_id? }
+    Returns: text/event-stream  -  har bir hodisa: id: <seq>, data: {run_id, event, data}
+      start, phase1_agent (x4, tugash tartibida), phase2_agent (x4),
+      refutation_weights, phase3_started, result | error
+      (Phase 1 da kelishuv bo'lsa phase2_agent/refutation_weights o'rniga phase2_skipped)
+
+    Konsilium fon threadida ishlaydi; uzilgan mijoz GET .../stream/<run_id>/ ga
+    Last-Event-ID bilan qayta ulanadi. Oqim muddati tugagan bo'lsa "start" dagi
+    session_id bilan yangi POST checkpoint'dan davom etadi (start.resumed_from).
+    """
+    patient_data = _pd(request)
+    language     = request.data.get("language", "uz-L")
+    session_id, bad = _session_id(request)
+
+    if bad:
+        return bad
+    if not patient_data or not patient_data.get("complaints"):
+        return _err(400, "Bemor shikoyatlari kiritilmagan")
+    if not _gemini_ok():
+        return _ai_not_configured()
+
+    blocked = _run_filter(request, patient_data)
+    if blocked:
+        return blocked
+
+    try:
+        run_id = consilium_stream.start(patient_data, language, owner=request.user.pk,
+                                        tenant=_tenant(request), session_id=session_id)
+    except PoolSaturated as exc:
+        return _busy(exc)
+    except run_store.RunConflict as exc:
+        return _conflict(exc)
+    except Exception as exc:
+        logger.exception("Consilium stream error: %s", exc)
+        return _err(500, f"Konsilium xatosi: {exc}")
+    return _consilium_sse(run_id, after=0)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@renderer_classes([JSONRenderer, _EventStreamRenderer])
+def consilium_stream_resume_view(request, run_id):
+    """
+    GET /api/ai/consilium/stream/<run_id>/
+    Header Last-Event-ID (yoki ?last_event_id=)  -  shu seq dan keyingi hodisalar.
+    """
+    if not consilium_stream.exists(run_id, request.user.pk):
+        return _err(404, "Konsilium oqimi topilmadi yoki muddati tugagan")
+    raw = request.headers.get("Last-Event-ID") or request.query_params.get("last_event_id") or "0"
+    try:
+        after = max(0, int(raw))
+    except ValueError:
+        after = 0
+    return _consilium_sse(run_id, after)
+
+
 # Backwards-compat alias
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
@@ -150,7 +283,7 @@ def doctor_support_view(request):
         return _err(400, f"Noto'g'ri task_type: {task_type}")
 
     # PhysiologyFilter
-    blocked = _run_filter(patient_data)
+    blocked = _run_filter(request, patient_data)
     if blocked:
         return blocked
 
@@ -179,7 +312,7 @@ def doctor_support_stream_view(request):
     if not _gemini_ok():
         return _ai_not_configured()
 
-    blocked = _run_filter(patient_data)
+    blocked = _run_filter(request, patient_data)
     if blocked:
         return blocked
 
@@ -271,7 +404,7 @@ def generate_diagnoses(request):
     if not _gemini_ok():
         return Response({"success": True, "data": [], "warning": "AI backend da sozlanmagan."})
 
-    blocked = _run_filter(patient_data)
+    blocked = _run_filter(request, patient_data)
     if blocked:
         return blocked
 
@@ -299,7 +432,10 @@ def generate_autonomous_protocol(request):
     if not _gemini_ok():
         return _ai_not_configured()
     try:
-        return Response({"success": True, "data": autonomous_generator.generate_autonomous_protocol(patient_data, language)})
+        return Response({"success": True, "data": autonomous_generator.generate_autonomous_protocol(
+            patient_data, language, tenant=_tenant(request))})
+    except PoolSaturated as exc:
+        return _busy(exc)
     except Exception as exc:
         logger.exception("Autonomous protocol error: %s", exc)
         return _err(500, "Avtonom protokol yaratishda xatolik")
@@ -315,7 +451,10 @@ def make_clinical_decision(request):
     if not _gemini_ok():
         return _ai_not_configured()
     try:
-        return Response({"success": True, "data": clinical_decision_engine.make_autonomous_decision(patient_data, language)})
+        return Response({"success": True, "data": clinical_decision_engine.make_autonomous_decision(
+            patient_data, language, tenant=_tenant(request))})
+    except PoolSaturated as exc:
+        return _busy(exc)
     except Exception as exc:
         logger.exception("Clinical decision error: %s", exc)
         return _err(500, "Klinik qaror qabul qilishda xatolik")
@@ -404,4 +543,125 @@ def get_improved_protocol(request):
         return _err(500, "Yaxshilangan protokolni olishda xatolik")
 
 
+# ---------------------------------------------------------------------------
+# Background jobs (uzoq AI ishlari  -  navbat, poll / SSE, bekor qilish)
+# ---------------------------------------------------------------------------
+
+def _user_job(request, job_id):
+    return AIJob.objects.filter(pk=job_id, user=request.user).first()
+
+
+@api_view(["GET", "POST"])
+@permission_classes([IsAuthenticated])
+def ai_jobs_view(request):
+    """
+    POST /api/ai/jobs/
+    Body: { kind: consilium | autonomous_protocol | clinical_decision, patient_data, language,
+            session_id? (faqat consilium  -  run_store resume) }
+    Returns: 202 { job_id, status, ... }  -  natija GET .../jobs/<job_id>/ yoki .../events/ orqali
+
+    GET /api/ai/jobs/  -  foydalanuvchining oxirgi ishlari (natijasiz)
+    """
+    if request.method == "GET":
+        recent = AIJob.objects.filter(user=request.user)[:20]
+        return Response({"success": True, "data": [j.to_dict(include_result=False) for j in recent]})
+
+    kind         = request.data.get("kind", "consilium")
+    patient_data = _pd(request)
+    language     = request.data.get("language", "uz-L")
+    session_id, bad = _session_id(request)
+
+    if kind not in jobs.KINDS:
+        return _err(400, f"Noma'lum ish turi: {kind}")
+    if bad:
+        return bad
+    if not patient_data or not patient_data.get("complaints"):
+        return _err(400, "Bemor shikoyatlari kiritilmagan")
+    if not _gemini_ok():
+        return _ai_not_configured()
+    if kind == "consilium":
+        blocked = _run_filter(request, patient_data)
+        if blocked:
+            return blocked
+
+    params = {"patient_data": patient_data, "language": language, "tenant": _tenant(request)}
+    if kind == "consilium" and session_id:
+        params["session_id"] = session_id
+    try:
+        job = jobs.submit(request.user, kind, params)
+    except jobs.JobLimitExceeded as exc:
+        return _err(429, str(exc))
+    except Exception as exc:
+        logger.exception("AI job submit error: %s", exc)
+        return _err(500, "AI ishini navbatga qo'yishda xatolik")
+    return Response({"success": True, "data": job.to_dict(include_result=False)},
+                    status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def ai_job_detail_view(request, job_id):
+    """GET /api/ai/jobs/<job_id>/  -  holat, jarayon va (tayyor bo'lsa) natija."""
+    job = _user_job(request, job_id)
+    if job is None:
+        return _err(404, "AI ishi topilmadi")
+    return Response({"success": True, "data": job.to_dict()})
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def ai_job_cancel_view(request, job_id):
+    """POST /api/ai/jobs/<job_id>/cancel/"""
+    job = _user_job(request, job_id)
+    if job is None:
+        return _err(404, "AI ishi topilmadi")
+    if job.status in AIJob.FINAL_STATUSES:
+        return _err(409, "AI ishi allaqachon tugagan")
+    job = jobs.cancel(job)
+    return Response({"success": True, "data": job.to_dict(include_result=False)})
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@renderer_classes([JSONRenderer, _EventStreamRenderer])
+def ai_job_events_view(request, job_id):
+    """
+    GET /api/ai/jobs/<job_id>/events/
+    Returns: text/event-stream  -  holat/jarayon o'zgarganda {job_id, status, progress, ...},
+    oxirida natija bilan to'liq ish va [DONE].
+    """
+    job = _user_job(request, job_id)
+    if job is None:
+        return _err(404, "AI ishi topilmadi")
+
+    def event_stream():
+        last, idle = None, 0.0
+        # Qat'iy muddat: ish qanday holatda bo'lmasin thread bo'shatiladi (keyin GET .../jobs/<id>/)
+        deadline = time.monotonic() + jobs.events_timeout()
+        while time.monotonic() < deadline:
+            current = AIJob.objects.filter(pk=job.pk).first()
+            if current is None:
+                break
+            if jobs.is_stale(current) and jobs.reap_stale(pk=current.pk):
+                continue    # yopilgan holatni keyingi aylanishda yuboramiz
+            final = current.status in AIJob.FINAL_STATUSES
+            snapshot = current.to_dict(include_result=final)
+            if snapshot != last:
+                yield f"data: {json.dumps(snapshot, ensure_ascii=False, default=str)}\n\n"
+                last, idle = snapshot, 0.0
+            if final:
+                break
+            time.sleep(1.0)
+            idle += 1.0
+            if idle >= 15.0:
+                idle = 0.0
+                yield ": keepalive\n\n"
+        yield "data: [DONE]\n\n"
+
+    response = StreamingHttpResponse(event_stream(), content_type="text/event-stream")
+    response["Cache-Control"]     = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 # (Monitoring AI endpoints removed  -  monitoring platform o'chirilgan)
\ No newline at end of file
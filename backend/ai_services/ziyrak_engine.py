@@ -26,11 +26,13 @@ from collections import deque
 from dataclasses import dataclass, field
 from typing import Iterator
 
+from asgiref.sync import sync_to_async
 from django.core.cache import cache
 from django.utils import timezone
 
-from .azure_utils import call_model, Deployments, gpt4o_client, parse_json
-from .uzbekistan_knowledge_base import get_uz_context
+from . import prompt_prefix
+from .azure_utils import acall_model, call_model, Deployments, parse_json, prefix_message, stream_model
+from .uzbekistan_knowledge_base import UZ_BASE_CONTEXT, get_uz_protocols
 from .anatomy_guard import AnatomyGuard
 
 logger = logging.getLogger(__name__)
@@ -74,6 +76,15 @@ _LANG_HINTS = {
     "kaa":  "Barcha javoblar Qoraqolpoq tilida bo'lsin.",
 }
 
+# Statik prefiks (til bo'yicha) import paytida yig'iladi: O'zbekiston konteksti + Ziyrak
+# qoidalari. Har bir chat turida faqat nomi/digest'i ishlatiladi (prompt_prefix).
+_CHAT_PREFIXES = {
+    lang: prompt_prefix.register(
+        f"ziyrak_chat:{lang}", UZ_BASE_CONTEXT + "\n\n" + _ZIYRAK_SYSTEM.format(language_hint=hint),
+    )
+    for lang, hint in _LANG_HINTS.items()
+}
+
 # в”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђ
 # Session context
 # в”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђ
@@ -188,12 +199,9 @@ def end_session(session_id: str) -> bool:
 
 def _build_messages(session: ZiyrakSession, new_user_msg: str,
                     extra_system: str = "") -> list[dict]:
-    lang_hint  = _LANG_HINTS.get(session.language, _LANG_HINTS["uz-L"])
-    kb_ctx     = get_uz_context(
-        complaints_text   = session.patient_data.get("complaints", ""),
-        include_protocols = True,
-    )
-    system_content = _ZIYRAK_SYSTEM.format(language_hint=lang_hint) + "\n\n" + kb_ctx
+    # Statik prefiks birinchi, keyin faqat shu sessiyaga xos dinamik qism
+    prefix = _CHAT_PREFIXES.get(session.language, _CHAT_PREFIXES["uz-L"])
+    system_content = get_uz_protocols(session.patient_data.get("complaints", ""))
 
     if extra_system:
         system_content += "\n\n" + extra_system
@@ -212,7 +220,9 @@ def _build_messages(session: ZiyrakSession, new_user_msg: str,
     if transcript:
         system_content += f"\n\nSUHBAT TRANSKRIPTI:\n{transcript[-2000:]}\n"
 
-    messages: list[dict] = [{"role": "system", "content": system_content}]
+    messages: list[dict] = [prefix_message(prefix)]
+    if system_content.strip():
+        messages.append({"role": "system", "content": system_content.strip()})
     for msg in session.messages:
         messages.append({"role": msg["role"], "content": msg["content"]})
     messages.append({"role": "user", "content": new_user_msg})
@@ -223,21 +233,10 @@ def _build_messages(session: ZiyrakSession, new_user_msg: str,
 # Ziyrak Chat (sync)
 # в”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђ
 
-def ziyrak_chat(
-    session_id:   str,
-    user_message: str,
-    voice_mode:   bool = True,
-) -> dict:
+def _chat_prepare(session_id: str, user_message: str, voice_mode: bool):
     """
-    Shifokor  ->  Ziyrak so'rov.
-
-    Returns:
-        {
-          "text":             "Ziyrak javobi",
-          "session_id":       "...",
-          "is_critical":      false,
-          "critical_message": "",
-        }
+    Sessiya + AnatomyGuard + messages. Guard bloklasa (session, None, javob) qaytadi,
+    aks holda (session, messages, max_tokens).
     """
     session = get_session(session_id)
     if not session:
@@ -246,7 +245,7 @@ def ziyrak_chat(
     guard = AnatomyGuard.check(user_message, use_ai=False)
     if not guard.passed:
         save_session(session)
-        return {
+        return session, None, {
             "text":           guard.message,
             "session_id":     session_id,
             "is_critical":    False,
@@ -258,19 +257,10 @@ def ziyrak_chat(
     if voice_mode:
         prompt += "\n\n[REJIM: Ovozli  -  QISQA va aniq javob, max 2-3 gap]"
 
-    messages = _build_messages(session, prompt)
+    return session, _build_messages(session, prompt), (500 if voice_mode else 1200)
 
-    try:
-        raw  = call_model(
-            Deployments.gpt4o(), messages,
-            response_json=False, temperature=0.2,
-            max_tokens=500 if voice_mode else 1200,
-        )
-        text = raw.strip()
-    except Exception as exc:
-        logger.error("Ziyrak chat failed: %s", exc)
-        raise RuntimeError(f"Ziyrak javobi xatosi: {exc}") from exc
 
+def _chat_finish(session: ZiyrakSession, session_id: str, user_message: str, text: str) -> dict:
     session.add_message("user",      user_message)
     session.add_message("assistant", text)
     save_session(session)
@@ -290,6 +280,68 @@ def ziyrak_chat(
     }
 
 
+def ziyrak_chat(
+    session_id:   str,
+    user_message: str,
+    voice_mode:   bool = True,
+) -> dict:
+    """
+    Shifokor  ->  Ziyrak so'rov.
+
+    Returns:
+        {
+          "text":             "Ziyrak javobi",
+          "session_id":       "...",
+          "is_critical":      false,
+          "critical_message": "",
+        }
+    """
+    session, messages, extra = _chat_prepare(session_id, user_message, voice_mode)
+    if messages is None:
+        return extra
+
+    try:
+        raw  = call_model(
+            Deployments.gpt4o(), messages,
+            response_json=False, temperature=0.2,
+            max_tokens=extra,
+            use_cache=False,
+            endpoint="ziyrak_chat",
+        )
+        text = raw.strip()
+    except Exception as exc:
+        logger.error("Ziyrak chat failed: %s", exc)
+        raise RuntimeError(f"Ziyrak javobi xatosi: {exc}") from exc
+
+    return _chat_finish(session, session_id, user_message, text)
+
+
+async def aziyrak_chat(
+    session_id:   str,
+    user_message: str,
+    voice_mode:   bool = True,
+) -> dict:
+    """ziyrak_chat ning asyncio varianti (ASGI). Sessiya keshi threadda o'qiladi/yoziladi."""
+    session, messages, extra = await sync_to_async(_chat_prepare)(session_id, user_message, voice_mode)
+    if messages is None:
+        return extra
+
+    try:
+        raw  = await acall_model(
+            Deployments.gpt4o(), messages,
+            response_json=False, temperature=0.2,
+            max_tokens=extra,
+            use_cache=False,
+            endpoint="ziyrak_chat",
+        )
+        text = raw.strip()
+    except Exception as exc:
+        logger.error("Ziyrak chat failed: %s", exc)
+        raise RuntimeError(f"Ziyrak javobi xatosi: {exc}") from exc
+
+    return await sync_to_async(_chat_finish)(session, session_id, user_message, text)
+
+
 # в”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђ
 # Ziyrak Chat Stream (SSE)
 # в”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђв”Ђ
@@ -315,18 +367,15 @@ def ziyrak_chat_stream(
 
     full_text = ""
     try:
-        client = gpt4o_client()
-        stream = client.chat.completions.create(
-            model=Deployments.gpt4o(), messages=messages,
+        for delta in stream_model(
+            Deployments.gpt4o(), messages,
             temperature=0.2,
             max_tokens=500 if voice_mode else 1200,
-            stream=True,
-        )
-        for chunk in stream:
-            delta = chunk.choices[0].delta.content or ""
-            if delta:
-                full_text += delta
-                yield delta
+            use_cache=False,
+            endpoint="ziyrak_chat",
+        ):
+            full_text += delta
+            yield delta
     except Exception as exc:
         logger.error("Ziyrak stream error: %s", exc)
         yield f"[Xatolik: {exc}]"
@@ -411,6 +460,13 @@ JSON formatida tahlil bering:
   "consultation_duration_note": "Suhbat sifati haqida"
 }}"""
 
+_DIAGNOSIS_PREFIXES = {
+    lang: prompt_prefix.register(
+        f"ziyrak_diagnosis:{lang}", UZ_BASE_CONTEXT + "\n\n" + _DIAGNOSIS_SYSTEM.format(language_hint=hint),
+    )
+    for lang, hint in _LANG_HINTS.items()
+}
+
 
 def generate_consultation_diagnosis(
     session_id: str, language: str = "uz-L"
@@ -433,18 +489,17 @@ def generate_consultation_diagnosis(
     if len(transcript.strip()) < 50:
         return {"error": "Transkript juda qisqa, tashxis uchun yetarli ma'lumot yo'q."}
 
-    lang_hint = _LANG_HINTS.get(language, _LANG_HINTS["uz-L"])
-    kb_ctx    = get_uz_context(include_protocols=True)
-    system    = _DIAGNOSIS_SYSTEM.format(language_hint=lang_hint) + "\n\n" + kb_ctx
-    user      = _DIAGNOSIS_USER.format(
+    prefix = _DIAGNOSIS_PREFIXES.get(language, _DIAGNOSIS_PREFIXES["uz-L"])
+    user   = _DIAGNOSIS_USER.format(
         transcript=transcript[:4000], patient_info=patient_info
     )
 
     try:
         raw    = call_model(
             Deployments.gpt4o(),
-            [{"role": "system", "content": system}, {"role": "user", "content": user}],
+            [prefix_message(prefix), {"role": "user", "content": user}],
             response_json=True, temperature=0.1, max_tokens=3000,
+            endpoint="ziyrak_diagnosis",
         )
         result = parse_json(raw, "consultation_diagnosis")
         if not isinstance(result, dict):
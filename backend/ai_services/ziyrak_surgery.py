@@ -28,6 +28,7 @@ from pathlib import Path
 from django.core.cache import cache
 from django.utils import timezone
 
+from . import llm_governor
 from .azure_utils import call_model, Deployments, parse_json
 from .uzbekistan_knowledge_base import get_uz_context, get_surgery_context
 
@@ -526,14 +527,16 @@ def _emergency_ai_response(
     )
 
     try:
-        return call_model(
-            Deployments.gpt4o(),
-            [{"role": "system", "content": system},
-             {"role": "user",   "content": user}],
-            response_json = False,
-            temperature   = 0.05,
-            max_tokens    = 400,
-        ).strip()
+        # Favqulodda javob fon chaqiruvlaridan oldin o'tadi (rate governor)
+        with llm_governor.priority(llm_governor.HIGH):
+            return call_model(
+                Deployments.gpt4o(),
+                [{"role": "system", "content": system},
+                 {"role": "user",   "content": user}],
+                response_json = False,
+                temperature   = 0.05,
+                max_tokens    = 400,
+            ).strip()
     except Exception as exc:
         logger.error("Emergency AI response failed: %s", exc)
         steps = protocol.get("steps", [])
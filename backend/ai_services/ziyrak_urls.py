@@ -9,6 +9,7 @@ from .ziyrak_views import (
     surgery_session_create, surgery_voice_command,
     surgery_emergency, surgery_log_get,
 )
+from .async_views import ziyrak_chat_async_view
 
 app_name = "ziyrak"
 
@@ -28,6 +29,7 @@ urlpatterns = [
     # Chat
     path("chat/",                              ziyrak_chat_view,              name="chat"),
     path("chat/stream/",                       ziyrak_chat_stream_view,       name="chat_stream"),
+    path("chat/async/",                        ziyrak_chat_async_view,        name="chat_async"),
     # Diagnosis
     path("diagnosis/",                         consultation_diagnosis_view,   name="diagnosis"),
     # Surgery Mode
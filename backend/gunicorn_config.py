@@ -4,6 +4,7 @@ Farg'ona JSTI | aidoktor.uz
 2 vCPU Azure Standard B2s  -  4 worker (2*CPU+1)
 """
 
+import gc
 import multiprocessing
 import os
 
@@ -21,6 +22,11 @@ backlog          = 2048
 workers          = multiprocessing.cpu_count() * 2 + 1
 worker_class     = "gthread"                  # AI streaming uchun threaded
 threads          = 4                           # Har bir worker uchun thread soni
+# GUNICORN_ASGI=1: uvicorn worker + medoraai_backend.asgi  -  */async/ AI endpointlari
+# bitta event loop'da ishlaydi (konsilium uchun thread band qilinmaydi)
+_ASGI            = os.environ.get("GUNICORN_ASGI", "") in ("1", "true", "True")
+if _ASGI:
+    worker_class = "uvicorn.workers.UvicornWorker"
 worker_connections = 1000
 
 # --- Timeout ---
@@ -47,12 +53,18 @@ daemon        = False                         # systemd boshqaradi
 pidfile       = os.path.join(_LOGDIR, "FJSTI.pid")
 # user/group: leave unset when running as cdcgroup (systemd User=cdcgroup)
 
-# WSGI
-wsgi_app      = "medoraai_backend.wsgi:application"
+# WSGI / ASGI
+wsgi_app      = "medoraai_backend.asgi:application" if _ASGI else "medoraai_backend.wsgi:application"
 
 # --- Worker lifecycle hooks ---
 def on_starting(server):
     server.log.info("Farg'ona JSTI backend starting")
 
+def pre_fork(server, worker):
+    # preload_app: bilimlar bazasi (ai_services.uzbekistan_knowledge_base) va boshqa import-vaqt
+    # obyektlari master'da yuklangan. gc.freeze() ularni GC kuzatuvidan chiqaradi  -  worker'dagi
+    # GC ularning sahifalariga yozmaydi va copy-on-write xotira ulashilgan holda qoladi
+    gc.freeze()
+
 def worker_exit(server, worker):
     server.log.info("Worker %s exited", worker.pid)
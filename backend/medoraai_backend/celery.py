@@ -0,0 +1,13 @@
+"""
+Celery ilovasi (AI fon ishlari uchun, AI_JOBS_BACKEND=celery).
+Worker: celery -A medoraai_backend worker -l info
+"""
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'medoraai_backend.settings')
+
+app = Celery('medoraai_backend')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -1,16 +1,39 @@
 """
 Health Check Endpoints (CORS-safe for frontend health checks).
 """
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.db import connection
 from django.core.cache import cache
 from django.conf import settings
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
+from importlib import import_module
 import logging
 
 logger = logging.getLogger(__name__)
 
+# /health/detailed AI sections: (check name, module, stats function)
+_AI_STATS = (
+    ('ai_cache',            'ai_services.llm_cache',                 'stats'),
+    ('ai_singleflight',     'ai_services.singleflight',              'stats'),
+    ('ai_retry_policies',   'ai_services.llm_policy',                'stats'),
+    ('ai_agent_pool',       'ai_services.agent_pool',                'stats'),
+    ('ai_pipeline_stages',  'ai_services.stage_graph',               'stats'),
+    ('ai_prompt_budget',    'ai_services.prompt_budget',             'stats'),
+    ('ai_consilium_paths',  'ai_services.agreement',                 'stats'),
+    ('ai_run_store',        'ai_services.run_store',                 'stats'),
+    ('ai_json_extract',     'ai_services.json_extract',              'stats'),
+    ('ai_response_schemas', 'ai_services.response_schemas',          'stats'),
+    ('ai_context_cache',    'ai_services.prompt_prefix',             'stats'),
+    ('ai_rate_governor',    'ai_services.llm_governor',              'stats'),
+    ('ai_streams',          'ai_services.gemini_utils',              'stream_stats'),
+    ('ai_llm_calls',        'ai_services.llm_telemetry',             'stats'),
+    ('ai_guard_rules',      'ai_services.guard_rules',               'stats'),
+    ('ai_guard_verdicts',   'ai_services.guard_verdicts',            'stats'),
+    ('ai_guard_context',    'ai_services.guard_context',             'stats'),
+    ('ai_uz_context',       'ai_services.uzbekistan_knowledge_base', 'stats'),
+)
+
 
 def _add_cors(response, request=None):
     """Ensure CORS headers so frontend never gets blocked (fallback)."""
@@ -90,6 +113,14 @@ def health_detailed(request):
     except Exception:
         checks['checks']['ai_configured'] = False
 
+    # AI cache / single-flight / retry / pool / rate governor counters (per worker).
+    # Each section is guarded separately so one failing module does not hide the rest.
+    for name, module, func in _AI_STATS:
+        try:
+            checks['checks'][name] = getattr(import_module(module), func)()
+        except Exception as e:
+            logger.warning(f"AI stats '{name}' unavailable ({module}): {e}")
+
     # Settings check (avoid leaking config in production)
     if getattr(settings, 'DEBUG', False):
         checks['checks']['debug'] = settings.DEBUG
@@ -97,4 +128,11 @@ def health_detailed(request):
 
     status_code = 200 if checks['status'] == 'healthy' else 503
     r = JsonResponse(checks, status=status_code)
-    return _add_cors(r, request)
\ No newline at end of file
+    return _add_cors(r, request)
+
+
+@require_http_methods(['GET'])
+def health_metrics(request):
+    """LLM chaqiruvlari metrikalari (Prometheus text format, shu worker bo'yicha)."""
+    from ai_services import llm_telemetry
+    return HttpResponse(llm_telemetry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
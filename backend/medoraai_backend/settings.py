@@ -197,6 +197,12 @@ REST_FRAMEWORK = {
         'rest_framework.filters.OrderingFilter',
     ),
     'DEFAULT_RENDERER_CLASSES': _REST_RENDERERS,
+    # JSON body AnatomyGuardMiddleware parse qilgan bo'lsa qayta decode qilinmaydi (ai_services.guard_context)
+    'DEFAULT_PARSER_CLASSES': (
+        'ai_services.guard_context.ContextJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     'EXCEPTION_HANDLER': 'medoraai_backend.exceptions.custom_exception_handler',
     'DEFAULT_THROTTLE_CLASSES': [
         'rest_framework.throttling.AnonRateThrottle',
@@ -418,6 +424,110 @@ else:
         }
     }
 
+# AI javob keshi (ai_services.llm_cache): LRU + REDIS_URL bo'lsa umumiy Django cache
+AI_RESPONSE_CACHE_ENABLED = config('AI_RESPONSE_CACHE_ENABLED', default=True, cast=bool)
+AI_RESPONSE_CACHE_MAX_ENTRIES = config('AI_RESPONSE_CACHE_MAX_ENTRIES', default=512, cast=int)
+AI_RESPONSE_CACHE_TTL = config('AI_RESPONSE_CACHE_TTL', default=600, cast=int)  # default, soniya
+AI_RESPONSE_CACHE_SHARED = config('AI_RESPONSE_CACHE_SHARED', default=bool(REDIS_URL), cast=bool)
+AI_RESPONSE_CACHE_TTLS = {
+    'clarifying_questions': config('AI_CACHE_TTL_CLARIFYING', default=1800, cast=int),
+    'recommend_specialists': config('AI_CACHE_TTL_SPECIALISTS', default=1800, cast=int),
+    'generate_diagnoses': config('AI_CACHE_TTL_DIAGNOSES', default=900, cast=int),
+}
+# Statik prompt prefikslari uchun Gemini cached content (ai_services.prompt_prefix): prefiks
+# MIN_TOKENS dan katta bo'lsa model bo'yicha bir marta yaratiladi, aks holda system_instruction.
+# MIN_TOKENS taxminiy (belgi/4); lotin o'zbekchada haqiqiy token ~1.3x ko'p  -  768 ~ Gemini 1024
+AI_CONTEXT_CACHE_ENABLED = config('AI_CONTEXT_CACHE_ENABLED', default=True, cast=bool)
+AI_CONTEXT_CACHE_TTL = config('AI_CONTEXT_CACHE_TTL', default=3600, cast=int)  # soniya
+AI_CONTEXT_CACHE_MIN_TOKENS = config('AI_CONTEXT_CACHE_MIN_TOKENS', default=768, cast=int)
+# PhysiologyFilter / AnatomyGuard Level 2 (AI) verdiktlari keshi (ai_services.guard_verdicts):
+# normallashtirilgan matn fingerprint'i bo'yicha, REDIS_URL bo'lsa workerlar o'rtasida umumiy
+AI_GUARD_VERDICT_CACHE_ENABLED = config('AI_GUARD_VERDICT_CACHE_ENABLED', default=True, cast=bool)
+AI_GUARD_VERDICT_TTL = config('AI_GUARD_VERDICT_TTL', default=21600, cast=int)  # soniya
+# O'zbekiston bilimlar bazasi fayli (ai_services.knowledge_store, JSON lines); bo'sh bo'lsa
+# ai_services/data/uzbekistan_kb.jsonl. Fayl o'zgarsa har worker shu interval ichida qayta yuklaydi
+AI_UZ_KB_PATH = config('AI_UZ_KB_PATH', default='')
+AI_UZ_KB_RELOAD_INTERVAL = config('AI_UZ_KB_RELOAD_INTERVAL', default=60, cast=int)  # soniya; 0  -  o'chirilgan
+# Bir xil parallel AI so'rovlarini birlashtirish (ai_services.singleflight)
+AI_SINGLEFLIGHT_ENABLED = config('AI_SINGLEFLIGHT_ENABLED', default=True, cast=bool)
+AI_SINGLEFLIGHT_DISTRIBUTED = config('AI_SINGLEFLIGHT_DISTRIBUTED', default=bool(REDIS_URL), cast=bool)
+AI_SINGLEFLIGHT_WAIT = config('AI_SINGLEFLIGHT_WAIT', default=180, cast=int)  # soniya
+# AI retry/fallback siyosati (ai_services.llm_policy): bitta funksiya uchun umumiy muddat
+AI_RETRY_DEADLINE_SEC = config('AI_RETRY_DEADLINE_SEC', default=60, cast=int)
+# Urinishlar pooli (worker boshiga threadlar; muddati o'tgan urinishlar ham slot egallaydi)
+# va hedge  -  ixtiyoriy: yoqilsa faqat hedge=True policylar uchun, governor cheklamaganda
+AI_RETRY_POOL_WORKERS = config('AI_RETRY_POOL_WORKERS', default=16, cast=int)
+AI_RETRY_HEDGE_ENABLED = config('AI_RETRY_HEDGE_ENABLED', default=False, cast=bool)
+# Konsilium agentlari uchun umumiy executor (ai_services.agent_pool): worker boshiga
+# threadlar soni va navbat chegarasi  -  oshsa 429 + Retry-After
+AI_POOL_WORKERS = config('AI_POOL_WORKERS', default=8, cast=int)
+AI_POOL_MAX_QUEUE = config('AI_POOL_MAX_QUEUE', default=32, cast=int)
+# Klinik qaror / avtonom protokol / professorlar konsiliumi bosqichlar grafi umumiy muddati
+# (gunicorn timeout=180 dan kichik)
+AI_PIPELINE_DEADLINE = config('AI_PIPELINE_DEADLINE', default=120, cast=int)  # soniya
+# Konsilium Phase 1 + Phase 2 umumiy muddati va Phase 2 ni kutmasdan boshlash uchun
+# yetarli Phase 1 javoblari soni (quorum, 4 agentdan)
+AI_CONSILIUM_DEADLINE = config('AI_CONSILIUM_DEADLINE', default=120, cast=int)  # soniya
+AI_CONSILIUM_QUORUM = config('AI_CONSILIUM_QUORUM', default=3, cast=int)
+# Early-exit: Phase 1 da agentlar ulushi >= MIN_SHARE bir xil tashxis (ICD-10 yoki nom),
+# eng past ehtimollik >= MIN_PROBABILITY va farq <= MAX_SPREAD bo'lsa Phase 2 o'tkazilmaydi
+AI_EARLY_EXIT_ENABLED = config('AI_EARLY_EXIT_ENABLED', default=True, cast=bool)
+AI_EARLY_EXIT_MIN_SHARE = config('AI_EARLY_EXIT_MIN_SHARE', default=1.0, cast=float)
+AI_EARLY_EXIT_MIN_PROBABILITY = config('AI_EARLY_EXIT_MIN_PROBABILITY', default=85, cast=int)
+AI_EARLY_EXIT_MAX_SPREAD = config('AI_EARLY_EXIT_MAX_SPREAD', default=10, cast=int)
+# Konsilium Phase 2/3 promptidagi agent fikrlari uchun byudjet (taxminiy token,
+# ai_services.prompt_budget): oshsa past og'irlikdagi fikrlar qisqartiriladi
+AI_PROMPT_BUDGET = {
+    'phase2': config('AI_PROMPT_BUDGET_PHASE2', default=2500, cast=int),
+    'phase3': config('AI_PROMPT_BUDGET_PHASE3', default=6000, cast=int),
+}
+# Gemini RPM/TPM token-bucket governor (ai_services.llm_governor): REDIS_URL bo'lsa barcha
+# workerlar uchun umumiy, aks holda har bir worker uchun alohida
+AI_RATE_LIMIT_ENABLED = config('AI_RATE_LIMIT_ENABLED', default=True, cast=bool)
+AI_RATE_LIMITS = {
+    GEMINI_MODEL_PRO: {
+        'rpm': config('AI_RATE_RPM_PRO', default=150, cast=int),
+        'tpm': config('AI_RATE_TPM_PRO', default=2_000_000, cast=int),
+    },
+    GEMINI_MODEL_FLASH: {
+        'rpm': config('AI_RATE_RPM_FLASH', default=1000, cast=int),
+        'tpm': config('AI_RATE_TPM_FLASH', default=1_000_000, cast=int),
+    },
+    'default': {
+        'rpm': config('AI_RATE_RPM_DEFAULT', default=300, cast=int),
+        'tpm': config('AI_RATE_TPM_DEFAULT', default=1_000_000, cast=int),
+    },
+}
+AI_RATE_RESERVE_NORMAL = config('AI_RATE_RESERVE_NORMAL', default=0.1, cast=float)  # HIGH uchun zaxira
+AI_RATE_RESERVE_LOW = config('AI_RATE_RESERVE_LOW', default=0.3, cast=float)
+AI_RATE_MAX_WAIT = config('AI_RATE_MAX_WAIT', default=20, cast=int)  # soniya
+# LLM telemetriyasi (ai_services.llm_telemetry, /health/metrics): taxminiy narx uchun
+# USD / 1M token; 'cached'  -  kontekst keshidan o'qilgan prompt tokenlar
+AI_MODEL_PRICES = {
+    GEMINI_MODEL_PRO: {
+        'input': config('AI_PRICE_INPUT_PRO', default=1.25, cast=float),
+        'cached': config('AI_PRICE_CACHED_PRO', default=0.31, cast=float),
+        'output': config('AI_PRICE_OUTPUT_PRO', default=10.0, cast=float),
+    },
+    GEMINI_MODEL_FLASH: {
+        'input': config('AI_PRICE_INPUT_FLASH', default=0.30, cast=float),
+        'cached': config('AI_PRICE_CACHED_FLASH', default=0.075, cast=float),
+        'output': config('AI_PRICE_OUTPUT_FLASH', default=2.50, cast=float),
+    },
+}
+# /api/ai/consilium/stream/: hodisalar jurnali qayta ulanish uchun shuncha saqlanadi (soniya)
+AI_CONSILIUM_STREAM_TTL = config('AI_CONSILIUM_STREAM_TTL', default=900, cast=int)
+# Konsilium fazalarini DB ga checkpoint qilish (ConsiliumRun)  -  shu session_id bilan resume
+AI_RUN_STORE_ENABLED = config('AI_RUN_STORE_ENABLED', default=True, cast=bool)
+
+# AI background jobs: 'local' (jarayon ichidagi thread pool) yoki 'celery' (CELERY_BROKER_URL kerak)
+AI_JOBS_BACKEND = config('AI_JOBS_BACKEND', default='local')
+AI_JOBS_PER_USER = config('AI_JOBS_PER_USER', default=2, cast=int)
+AI_JOBS_LOCAL_WORKERS = config('AI_JOBS_LOCAL_WORKERS', default=2, cast=int)
+# started_at shundan eski running ish yetim (worker qayta ishga tushgan) deb yopiladi; events oqimi muddati
+AI_JOBS_STALE_AFTER = config('AI_JOBS_STALE_AFTER', default=AI_PIPELINE_DEADLINE + 300, cast=int)  # soniya
+AI_JOBS_EVENTS_TIMEOUT = config('AI_JOBS_EVENTS_TIMEOUT', default=AI_JOBS_STALE_AFTER + 60, cast=int)  # soniya
+
 # Logging Configuration  -  file handlers only if logs dir exists and is writable (avoid startup crash)
 _LOGS_DIR = BASE_DIR / 'logs'
 def _logs_writable():
@@ -7,7 +7,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
-from .health import health_check, health_detailed
+from .health import health_check, health_detailed, health_metrics
 
 # Swagger (drf_yasg) optional — may fail if pkg_resources unavailable (e.g. Python 3.14)
 _schema_view = None
@@ -52,6 +52,7 @@ urlpatterns = [
     path('', root_view, name='root'),
     path('health/', health_check, name='health_check'),
     path('health/detailed/', health_detailed, name='health_detailed'),
+    path('health/metrics/', health_metrics, name='health_metrics'),
     path('admin/', admin.site.urls),
     path('api/auth/', include('accounts.urls')),
     path('api/patients/', include('patients.urls')),